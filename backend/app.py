@@ -1,15 +1,32 @@
+import asyncio
+import base64
 import json
+import math
 import os
 import re
 import time
 import uuid
-from datetime import datetime, timedelta
-from typing import Any, Callable, Dict, Iterable, List, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Tuple
+from urllib.parse import unquote
 
-import boto3
 from botocore.exceptions import ClientError
 
+import async_io
+import dynamo_client
+import instrumentation
+import jwt_verifier
+import profiling
+import response_compression
+from catalog_snapshots import manifest_key
+from inventory import InsufficientStockError, InventoryStore, ReservationConflictError, line_quantity
+from usage_rollups import LEVELS as ROLLUP_LEVELS
+from usage_sketches import TOP_PATHS, TOP_PRODUCTS, Sketch, counts as unique_counts, decode as decode_sketches, heavy_hitters, merge_all
+from usage_tiering import query_aggregates
 from usage_tracker import tracker
+from webhook_idempotency import DuplicateDeliveryError, WebhookDeduplicator, dedupe_key
+from webhook_queue import MAX_BATCH_SIZE, WebhookQueue, async_enabled, coalesce
 
 
 Headers = Dict[str, str]
@@ -24,10 +41,39 @@ Route = Tuple[
 
 
 MAX_PAYMENT_RETRIES = 3
+WEBHOOK_BATCH_CONCURRENCY = int(os.getenv("WEBHOOK_BATCH_CONCURRENCY", "4"))
+BATCH_MAX_REQUESTS = int(os.getenv("BATCH_MAX_REQUESTS", "10"))
+BATCH_MAX_BODY_BYTES = int(os.getenv("BATCH_MAX_BODY_BYTES", str(64 * 1024)))
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "4"))
+BATCH_TIMEOUT_S = float(os.getenv("BATCH_TIMEOUT_S", "10"))
+BATCH_METHODS = ("GET", "POST", "PATCH", "DELETE")
+BATCH_GET_LIMIT = 100
+BATCH_WRITE_LIMIT = 25
+MAX_UNPROCESSED_ATTEMPTS = 5
 
 
-def _dynamodb_resource():
-    return boto3.resource("dynamodb", region_name=os.getenv("AWS_REGION", "us-east-1"))
+def _chunks(values: List[Any], size: int) -> Iterator[List[Any]]:
+    for start in range(0, len(values), size):
+        yield values[start : start + size]
+
+
+def _key_id(key: Dict[str, Any]) -> Tuple[str, ...]:
+    return tuple(f"{attribute}={key[attribute]}" for attribute in sorted(key))
+
+
+def _apply_projection(request: Dict[str, Any], fields: Iterable[str] | None) -> Dict[str, Any]:
+    """Add a ``ProjectionExpression`` for top-level ``fields`` to a read request.
+
+    Every name is aliased because many attribute names (``name``, ``status``)
+    are DynamoDB reserved words.
+    """
+
+    if not fields:
+        return request
+    names = {f"#f{index}": field for index, field in enumerate(dict.fromkeys(fields))}
+    request["ProjectionExpression"] = ", ".join(names)
+    request["ExpressionAttributeNames"] = {**request.get("ExpressionAttributeNames", {}), **names}
+    return request
 
 
 class DynamoRepository:
@@ -35,37 +81,121 @@ class DynamoRepository:
         self.table_name = os.environ.get(table_env)
         if not self.table_name:
             raise RuntimeError(f"Missing DynamoDB table env var: {table_env}")
-        self.table = _dynamodb_resource().Table(self.table_name)
+        self.table = dynamo_client.table(self.table_name)
+        self.client = dynamo_client.client()
 
     def put_item(self, item: Dict[str, Any]) -> None:
-        for attempt in range(3):
-            try:
-                self.table.put_item(Item=item)
-                return
-            except ClientError as exc:  # pragma: no cover - retried
-                if attempt >= 2:
-                    raise
-                time.sleep(0.1 * (2**attempt))
+        self.table.put_item(Item=item)
 
-    def get_item(self, key: Dict[str, Any]) -> Dict[str, Any] | None:
+    def get_item(self, key: Dict[str, Any], fields: Iterable[str] | None = None) -> Dict[str, Any] | None:
         try:
-            response = self.table.get_item(Key=key)
+            response = self.table.get_item(**_apply_projection({"Key": key}, fields))
         except ClientError:
             return None
         return response.get("Item")
 
-    def query_by_tenant(self, tenant_id: str) -> List[Dict[str, Any]]:
+    def get_many(self, keys: List[Dict[str, Any]], fields: Iterable[str] | None = None) -> List[Dict[str, Any]]:
+        """``BatchGetItem`` in chunks of 100; items come back in key order, missing ones omitted.
+
+        With ``fields`` only those attributes (plus the key) are read.
+        """
+
+        unique = list({_key_id(key): key for key in keys}.values())
+        found: Dict[Tuple[str, ...], Dict[str, Any]] = {}
+        for chunk in _chunks(unique, BATCH_GET_LIMIT):
+            projected = [*fields, *chunk[0]] if fields else None
+            request: Dict[str, Any] = {self.table_name: _apply_projection({"Keys": chunk}, projected)}
+            for attempt in range(MAX_UNPROCESSED_ATTEMPTS):
+                response = self.client.batch_get_item(RequestItems=request)
+                for item in response.get("Responses", {}).get(self.table_name, []):
+                    found[_key_id({attribute: item.get(attribute) for attribute in chunk[0]})] = item
+                request = response.get("UnprocessedKeys") or {}
+                if not request:
+                    break
+                time.sleep(dynamo_client.backoff(attempt))
+            else:
+                raise RuntimeError(f"BatchGetItem left unprocessed keys in {self.table_name}")
+        return [found[_key_id(key)] for key in keys if _key_id(key) in found]
+
+    def put_many(self, items: Iterable[Dict[str, Any]]) -> None:
+        self._write_many([{"PutRequest": {"Item": item}} for item in items])
+
+    def delete_many(self, keys: Iterable[Dict[str, Any]]) -> None:
+        self._write_many([{"DeleteRequest": {"Key": key}} for key in keys])
+
+    def _write_many(self, requests: List[Dict[str, Any]]) -> None:
+        """``BatchWriteItem`` in chunks of 25, retrying ``UnprocessedItems`` with backoff.
+
+        Each chunk must not contain the same key twice (a DynamoDB rule).
+        """
+
+        for chunk in _chunks(requests, BATCH_WRITE_LIMIT):
+            pending: Dict[str, Any] = {self.table_name: chunk}
+            for attempt in range(MAX_UNPROCESSED_ATTEMPTS):
+                pending = self.client.batch_write_item(RequestItems=pending).get("UnprocessedItems") or {}
+                if not pending:
+                    break
+                time.sleep(dynamo_client.backoff(attempt))
+            else:
+                raise RuntimeError(f"BatchWriteItem left unprocessed items in {self.table_name}")
+
+    def query(
+        self,
+        key_condition: str,
+        values: Dict[str, Any],
+        index_name: str | None = None,
+        names: Dict[str, str] | None = None,
+        newest_first: bool = False,
+        page_size: int | None = None,
+        fields: Iterable[str] | None = None,
+    ) -> Iterator[Dict[str, Any]]:
+        """Lazily yield every matching item, fetching the next page only when needed."""
+
+        request: Dict[str, Any] = {
+            "KeyConditionExpression": key_condition,
+            "ExpressionAttributeValues": values,
+            "ScanIndexForward": not newest_first,
+        }
+        if index_name:
+            request["IndexName"] = index_name
+        if names:
+            request["ExpressionAttributeNames"] = names
+        if page_size:
+            request["Limit"] = page_size
+        _apply_projection(request, fields)
+        while True:
+            response = self.table.query(**request)
+            yield from response.get("Items", [])
+            if not response.get("LastEvaluatedKey"):
+                return
+            request["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+    def scan(
+        self,
+        filter_expression: str | None = None,
+        values: Dict[str, Any] | None = None,
+        fields: Iterable[str] | None = None,
+    ) -> Iterator[Dict[str, Any]]:
+        """Yield every item, following ``LastEvaluatedKey`` past the 1 MB page limit."""
+
+        request: Dict[str, Any] = {}
+        if filter_expression:
+            request.update(FilterExpression=filter_expression, ExpressionAttributeValues=values)
+        _apply_projection(request, fields)
+        while True:
+            response = self.table.scan(**request)
+            yield from response.get("Items", [])
+            if not response.get("LastEvaluatedKey"):
+                return
+            request["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+    def query_by_tenant(self, tenant_id: str, fields: Iterable[str] | None = None) -> List[Dict[str, Any]]:
         try:
             if tenant_id == "*":
-                response = self.table.scan()
-            else:
-                response = self.table.scan(
-                    FilterExpression="tenantId = :tenantId",
-                    ExpressionAttributeValues={":tenantId": tenant_id},
-                )
+                return list(self.scan(fields=fields))
+            return list(self.scan("tenantId = :tenantId", {":tenantId": tenant_id}, fields=fields))
         except ClientError:
             return []
-        return response.get("Items", [])
 
 
 class TenantRepository(DynamoRepository):
@@ -74,13 +204,213 @@ class TenantRepository(DynamoRepository):
         self.put_item(onboarding_record)
 
 
+class ProductRepository(DynamoRepository):
+    def list_for_tenant(self, tenant_id: str, fields: Iterable[str] | None = None) -> List[Dict[str, Any]]:
+        projected = [*fields, "productId"] if fields else None
+        return sorted(self.query_by_tenant(tenant_id, projected), key=lambda item: str(item.get("productId", "")))
+
+
+class VersionConflictError(Exception):
+    """Raised when an optimistic-concurrency write loses against another writer."""
+
+
+def _is_conditional_failure(exc: ClientError) -> bool:
+    return (exc.response or {}).get("Error", {}).get("Code") == "ConditionalCheckFailedException"
+
+
 class CartRepository(DynamoRepository):
+    """Carts keyed by ``cartId`` whose lines live in an ``items`` map keyed by productId.
+
+    Line changes are single ``UpdateItem`` calls that adjust ``totals`` by a
+    delta and bump ``version``; callers may pass the version they last saw to
+    turn the write into a compare-and-swap.
+    """
+
+    MAX_WRITE_ATTEMPTS = 3
+    TTL_HOURS = 2
+    _NAMES = {
+        "#items": "items",
+        "#qty": "quantity",
+        "#totals": "totals",
+        "#amount": "amount",
+        "#version": "version",
+        "#ttl": "ttl",
+    }
+
     def save(self, cart: Dict[str, Any]) -> None:
         self.put_item(cart)
 
+    def create(self, cart: Dict[str, Any]) -> Dict[str, Any]:
+        self.table.put_item(Item=cart, ConditionExpression="attribute_not_exists(cartId)")
+        return cart
+
     def get(self, cart_id: str) -> Dict[str, Any] | None:
         return self.get_item({"cartId": cart_id})
 
+    def find_active(self, tenant_id: str, user_id: str) -> Dict[str, Any] | None:
+        """Return the newest unexpired cart for a user with one ``UserCartIndex`` query."""
+
+        try:
+            response = self.table.query(
+                IndexName="UserCartIndex",
+                KeyConditionExpression="userId = :userId",
+                ExpressionAttributeValues={":userId": cart_user_key(tenant_id, user_id)},
+                ScanIndexForward=False,
+                Limit=1,
+            )
+        except ClientError:
+            return None
+        items = response.get("Items", [])
+        if not items:
+            return None
+        cart = items[0]
+        if cart.get("tenantId") != tenant_id or float(cart.get("ttl") or 0) < time.time():
+            return None
+        return cart
+
+    def _write(
+        self,
+        cart_id: str,
+        tenant_id: str,
+        set_actions: List[str],
+        condition: str,
+        names: Dict[str, str],
+        values: Dict[str, Any],
+        remove_clause: str = "",
+    ) -> Dict[str, Any]:
+        expires_at = datetime.utcnow() + timedelta(hours=self.TTL_HOURS)
+        actions = set_actions + ["updatedAt = :now", "expiresAt = :expiresAt", "#ttl = :ttl"]
+        update_expression = "SET " + ", ".join(actions)
+        if remove_clause:
+            update_expression += f" REMOVE {remove_clause}"
+        update_expression += " ADD #version :one"
+        response = self.table.update_item(
+            Key={"cartId": cart_id},
+            UpdateExpression=update_expression,
+            ConditionExpression=f"tenantId = :tenant AND {condition}",
+            ExpressionAttributeNames={**self._NAMES, **names},
+            ExpressionAttributeValues={
+                **values,
+                ":tenant": tenant_id,
+                ":one": 1,
+                ":now": datetime.utcnow().isoformat() + "Z",
+                ":expiresAt": expires_at.isoformat() + "Z",
+                ":ttl": int(expires_at.timestamp()),
+            },
+            ReturnValues="ALL_NEW",
+        )
+        return response["Attributes"]
+
+    @staticmethod
+    def _version_clause(version: int | None) -> Tuple[str, Dict[str, Any]]:
+        if version is None:
+            return "", {}
+        if int(version) == 0:
+            return " AND (attribute_not_exists(#version) OR #version = :version)", {":version": 0}
+        return " AND #version = :version", {":version": int(version)}
+
+    def add_item(self, cart_id: str, tenant_id: str, line: Dict[str, Any], expected_version: int | None = None) -> Dict[str, Any] | None:
+        """Add ``line`` to the cart without reading it first.
+
+        An existing line gets its quantity incremented; otherwise the line is
+        inserted. Each attempt is one conditional ``UpdateItem``.
+        """
+
+        quantity = int(line.get("quantity", 1))
+        delta = float(line.get("price", 0)) * quantity
+        names = {"#pid": str(line["productId"])}
+        version_condition, version_values = self._version_clause(expected_version)
+        values = {":qty": quantity, ":delta": delta, **version_values}
+        totals_actions = ["#totals.#amount = #totals.#amount + :delta", "#totals.#qty = #totals.#qty + :qty"]
+
+        for _ in range(self.MAX_WRITE_ATTEMPTS):
+            try:
+                return self._write(
+                    cart_id,
+                    tenant_id,
+                    ["#items.#pid.#qty = #items.#pid.#qty + :qty", *totals_actions],
+                    "attribute_exists(#items.#pid)" + version_condition,
+                    names,
+                    values,
+                )
+            except ClientError as exc:
+                if not _is_conditional_failure(exc):
+                    raise
+            try:
+                return self._write(
+                    cart_id,
+                    tenant_id,
+                    ["#items.#pid = :line", *totals_actions],
+                    "attribute_exists(cartId) AND attribute_not_exists(#items.#pid)" + version_condition,
+                    names,
+                    {**values, ":line": {**line, "quantity": quantity}},
+                )
+            except ClientError as exc:
+                if not _is_conditional_failure(exc):
+                    raise
+            if expected_version is not None:
+                break
+        return self._raise_conflict_or_missing(cart_id, tenant_id)
+
+    def set_quantity(
+        self, cart_id: str, tenant_id: str, product_id: str, quantity: int, expected_version: int | None = None
+    ) -> Dict[str, Any] | None:
+        """Change a line's quantity; zero or less removes the line."""
+
+        for _ in range(self.MAX_WRITE_ATTEMPTS):
+            cart = self.get(cart_id)
+            if not cart or cart.get("tenantId") != tenant_id:
+                return None
+            version = int(cart.get("version", 0))
+            if expected_version is not None and int(expected_version) != version:
+                raise VersionConflictError(f"Cart {cart_id} is at version {version}")
+            line = (cart.get("items") or {}).get(product_id)
+            if line is None:
+                return cart
+            current_quantity = int(line.get("quantity", 0))
+            new_quantity = max(0, int(quantity))
+            price = float(line.get("price", 0))
+            version_condition, version_values = self._version_clause(version)
+            values = {
+                ":delta": price * (new_quantity - current_quantity),
+                ":qtyDelta": new_quantity - current_quantity,
+                **version_values,
+            }
+            totals_actions = ["#totals.#amount = #totals.#amount + :delta", "#totals.#qty = #totals.#qty + :qtyDelta"]
+            names = {"#pid": product_id}
+            try:
+                if new_quantity == 0:
+                    return self._write(
+                        cart_id, tenant_id, totals_actions, "attribute_exists(#items.#pid)" + version_condition, names, values, "#items.#pid"
+                    )
+                return self._write(
+                    cart_id,
+                    tenant_id,
+                    ["#items.#pid.#qty = :newQty", *totals_actions],
+                    "attribute_exists(#items.#pid)" + version_condition,
+                    names,
+                    {**values, ":newQty": new_quantity},
+                )
+            except ClientError as exc:
+                if not _is_conditional_failure(exc):
+                    raise
+                if expected_version is not None:
+                    break
+        return self._raise_conflict_or_missing(cart_id, tenant_id)
+
+    def remove_item(self, cart_id: str, tenant_id: str, product_id: str, expected_version: int | None = None) -> Dict[str, Any] | None:
+        return self.set_quantity(cart_id, tenant_id, product_id, 0, expected_version)
+
+    def _raise_conflict_or_missing(self, cart_id: str, tenant_id: str) -> None:
+        cart = self.get(cart_id)
+        if not cart or cart.get("tenantId") != tenant_id:
+            return None
+        raise VersionConflictError(f"Cart {cart_id} is at version {cart.get('version', 0)}")
+
+
+def cart_user_key(tenant_id: str, user_id: str) -> str:
+    return user_id if user_id.startswith(f"{tenant_id}#") else f"{tenant_id}#{user_id}"
+
 
 class OrderRepository(DynamoRepository):
     def save(self, order: Dict[str, Any]) -> None:
@@ -90,7 +420,39 @@ class OrderRepository(DynamoRepository):
         return self.get_item({"orderId": order_id})
 
 
+def encode_cursor(last_key: Dict[str, Any] | None) -> str | None:
+    if not last_key:
+        return None
+    return base64.urlsafe_b64encode(json.dumps(last_key, default=str).encode()).decode()
+
+
+def decode_cursor(cursor: str, key_attributes: Iterable[str] | None = None, **expected: str) -> Dict[str, Any]:
+    """Turn ``cursor`` back into an ``ExclusiveStartKey``.
+
+    With ``key_attributes`` the key must hold exactly those string attributes,
+    and every ``expected`` attribute must match, so a cursor crafted for
+    another index or tenant is rejected instead of reaching DynamoDB.
+    """
+
+    try:
+        decoded = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError) as exc:
+        raise ValueError("Invalid cursor") from exc
+    if not isinstance(decoded, dict):
+        raise ValueError("Invalid cursor")
+    if key_attributes is not None and (set(decoded) != set(key_attributes) or not all(isinstance(value, str) and value for value in decoded.values())):
+        raise ValueError("Invalid cursor")
+    if any(decoded.get(name) != value for name, value in expected.items()):
+        raise ValueError("Invalid cursor")
+    return decoded
+
+
 class SubscriptionRepository(DynamoRepository):
+    MAX_TRANSACTION_ATTEMPTS = 5
+    PAYMENTS_INDEX = "PaymentsByTenant"
+    # LastEvaluatedKey of the index: its keys plus the table key.
+    PAYMENTS_CURSOR_KEYS = ("tenantId", "receivedAt", "transactionId")
+
     def __init__(self, table_env: str) -> None:
         super().__init__(table_env)
 
@@ -101,6 +463,14 @@ class SubscriptionRepository(DynamoRepository):
         existing = self.get_item(self._subscription_key(tenant_id)) or {}
         if existing:
             return existing
+        return self._default_subscription(tenant_id)
+
+    def get_subscriptions(self, tenant_ids: List[str], fields: Iterable[str] | None = None) -> Dict[str, Dict[str, Any]]:
+        projected = [*fields, "tenantId"] if fields else None
+        stored = {item["tenantId"]: item for item in self.get_many([self._subscription_key(tenant_id) for tenant_id in tenant_ids], projected)}
+        return {tenant_id: stored.get(tenant_id) or self._default_subscription(tenant_id) for tenant_id in tenant_ids}
+
+    def _default_subscription(self, tenant_id: str) -> Dict[str, Any]:
         now_iso = datetime.utcnow().isoformat() + "Z"
         return {
             "transactionId": f"{tenant_id}#subscription",
@@ -116,40 +486,222 @@ class SubscriptionRepository(DynamoRepository):
         self.put_item(subscription)
         return subscription
 
+    def activate_plan(self, tenant_id: str, plan_id: str, preference_id: str, subscription_id: str | None) -> Dict[str, Any]:
+        """Start (or restart) a plan in one ``UpdateItem`` and return the new item."""
+
+        now_iso = datetime.utcnow().isoformat() + "Z"
+        subscription_clause = "subscriptionId = :subscription" if subscription_id else "subscriptionId = if_not_exists(subscriptionId, :subscription)"
+        response = self.table.update_item(
+            Key=self._subscription_key(tenant_id),
+            UpdateExpression=(
+                "SET tenantId = :tenant, createdAt = if_not_exists(createdAt, :now), updatedAt = :now, "
+                f"planId = :plan, preferenceId = :preference, #status = :active, retryAttempts = :zero, {subscription_clause}"
+            ),
+            ExpressionAttributeNames={"#status": "status"},
+            ExpressionAttributeValues={
+                ":tenant": tenant_id,
+                ":now": now_iso,
+                ":plan": plan_id,
+                ":preference": preference_id,
+                ":active": "active",
+                ":zero": 0,
+                ":subscription": subscription_id or f"{tenant_id}#sub-{uuid.uuid4().hex[:8]}",
+            },
+            ReturnValues="ALL_NEW",
+        )
+        return response["Attributes"]
+
+    def _status_update(self, tenant_id: str, statuses: List[str], suspend: bool) -> Dict[str, Any]:
+        """Fold a sequence of payment statuses into one update expression.
+
+        Without an approval in the batch the retry counter is incremented with
+        ``ADD``; whether that reaches ``MAX_PAYMENT_RETRIES`` is decided by the
+        condition, and ``suspend`` selects the variant to try.
+        """
+
+        categories = [_payment_category(status) for status in statuses]
+        last_success = max((index for index, category in enumerate(categories) if category == "success"), default=-1)
+        failures = sum(1 for category in categories[last_success + 1 :] if category == "failure")
+        final = categories[-1]
+        now_iso = datetime.utcnow().isoformat() + "Z"
+
+        sets = ["tenantId = :tenant", "createdAt = if_not_exists(createdAt, :now)", "updatedAt = :now", "#status = :status"]
+        values: Dict[str, Any] = {":tenant": tenant_id, ":now": now_iso}
+        update: Dict[str, Any] = {"Key": self._subscription_key(tenant_id), "ExpressionAttributeNames": {"#status": "status"}}
+        add = ""
+        if last_success >= 0:
+            sets += ["retryAttempts = :retries", "nextBillingAt = :next"]
+            values[":retries"] = failures
+            values[":next"] = (datetime.utcnow() + timedelta(days=30)).isoformat() + "Z"
+            suspend = failures >= MAX_PAYMENT_RETRIES
+        elif failures:
+            add = " ADD retryAttempts :failures"
+            values[":failures"] = failures
+            threshold = MAX_PAYMENT_RETRIES - failures
+            if final == "failure" and threshold > 0:
+                values[":threshold"] = threshold
+                update["ConditionExpression"] = (
+                    "retryAttempts >= :threshold" if suspend else "attribute_not_exists(retryAttempts) OR retryAttempts < :threshold"
+                )
+            else:
+                suspend = threshold <= 0
+
+        if final == "success":
+            values[":status"] = "active"
+        elif final == "pending":
+            values[":status"] = "pending"
+        elif suspend:
+            values[":status"] = "suspended"
+            values[":reason"] = "payment_failed"
+            sets.append("suspendedReason = :reason")
+        else:
+            values[":status"] = "retrying"
+        update["UpdateExpression"] = "SET " + ", ".join(sets) + add
+        update["ExpressionAttributeValues"] = values
+        return update
+
+    def record_payments(self, tenant_id: str, receipts: List[Dict[str, Any]], dedupe_records: List[Dict[str, Any]]) -> None:
+        """Apply receipts to the subscription and store them in one transaction.
+
+        Each dedupe record is written with ``attribute_not_exists`` so a
+        concurrent delivery of the same notification cancels the transaction
+        with ``DuplicateDeliveryError`` instead of being applied twice.
+        """
+
+        statuses = [receipt["status"] for receipt in receipts]
+        puts = [{"Put": {"TableName": self.table_name, "Item": receipt}} for receipt in receipts]
+        puts += [
+            {
+                "Put": {
+                    "TableName": self.table_name,
+                    "Item": record,
+                    "ConditionExpression": "attribute_not_exists(transactionId)",
+                }
+            }
+            for record in dedupe_records
+        ]
+        suspend = False
+        for attempt in range(self.MAX_TRANSACTION_ATTEMPTS):
+            update = self._status_update(tenant_id, statuses, suspend)
+            try:
+                self.client.transact_write_items(TransactItems=[{"Update": {"TableName": self.table_name, **update}}, *puts])
+                return
+            except ClientError as exc:
+                codes = [reason.get("Code", "None") for reason in (exc.response or {}).get("CancellationReasons", [])]
+                if "ConditionalCheckFailed" in codes[1:]:
+                    raise DuplicateDeliveryError(tenant_id) from exc
+                if codes and codes[0] == "ConditionalCheckFailed" and "ConditionExpression" in update:
+                    suspend = not suspend
+                elif "TransactionConflict" in codes and attempt + 1 < self.MAX_TRANSACTION_ATTEMPTS:
+                    time.sleep(dynamo_client.backoff(attempt))
+                else:
+                    raise
+        raise RuntimeError(f"Could not apply payment statuses for {tenant_id}")
+
     def log_payment(self, receipt: Dict[str, Any]) -> None:
         self.put_item(receipt)
 
-    def list_payments(self, tenant_id: str) -> List[Dict[str, Any]]:
-        return sorted(self.query_by_tenant(tenant_id), key=lambda item: item.get("receivedAt", ""))
+    def recent_payments(self, tenant_id: str, limit: int = 10, cursor: str | None = None) -> Tuple[List[Dict[str, Any]], str | None]:
+        """Newest receipts first from ``PaymentsByTenant`` plus a cursor for older ones.
+
+        The index is keyed by ``tenantId`` and ``receivedAt``; only receipts carry
+        ``receivedAt``, so subscriptions and dedupe records never land in it.
+        """
 
+        request: Dict[str, Any] = {
+            "IndexName": self.PAYMENTS_INDEX,
+            "KeyConditionExpression": "tenantId = :tenant",
+            "ExpressionAttributeValues": {":tenant": tenant_id},
+            "ScanIndexForward": False,
+            "Limit": limit,
+        }
+        if cursor:
+            request["ExclusiveStartKey"] = decode_cursor(cursor, self.PAYMENTS_CURSOR_KEYS, tenantId=tenant_id)
+        response = self.table.query(**request)
+        return response.get("Items", []), encode_cursor(response.get("LastEvaluatedKey"))
 
-def build_response(status_code: int, body: Dict[str, Any], extra_headers: Headers | None = None) -> Dict[str, Any]:
+
+def build_response(
+    status_code: int,
+    body: Dict[str, Any],
+    extra_headers: Headers | None = None,
+    *,
+    accept_encoding: str | None = None,
+) -> Dict[str, Any]:
     headers = {
         "Content-Type": "application/json",
         "Access-Control-Allow-Origin": "*",
         "Access-Control-Allow-Headers": "Authorization,Content-Type,X-Tenant-Id",
-        "Access-Control-Allow-Methods": "GET,POST,OPTIONS",
+        "Access-Control-Allow-Methods": "GET,POST,PATCH,DELETE,OPTIONS",
     }
     if extra_headers:
         headers.update(extra_headers)
-    return {
+    response: Dict[str, Any] = {
         "statusCode": status_code,
         "headers": headers,
         "body": json.dumps(body),
     }
+    if accept_encoding:
+        response["body"], response["isBase64Encoded"] = response_compression.encode_body(response["body"], headers, accept_encoding)
+    return response
+
+
+def parse_fields(raw: str | None, allowed: frozenset[str]) -> List[str] | None:
+    """Attributes named by a ``fields=a,b`` query parameter, or ``None`` for whole items."""
+
+    if not raw or not raw.strip():
+        return None
+    fields = list(dict.fromkeys(field.strip() for field in raw.split(",") if field.strip()))
+    unknown = [field for field in fields if field not in allowed]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    return fields
+
+
+def select_fields(item: Dict[str, Any], fields: List[str] | None) -> Dict[str, Any]:
+    if fields is None:
+        return item
+    return {field: item[field] for field in fields if field in item}
+
+
+def request_body(event: Dict[str, Any]) -> bytes:
+    """The body as the client sent it.
+
+    The API's ``*/*`` binary media type (for compressed responses) also makes
+    API Gateway base64-encode request bodies.
+    """
+
+    body = event.get("body") or ""
+    if event.get("isBase64Encoded"):
+        return base64.b64decode(body)
+    return body.encode()
+
+
+def request_body_size(event: Dict[str, Any]) -> int:
+    """Size of :func:`request_body` in bytes, computed without decoding it."""
+
+    body = event.get("body") or ""
+    if not event.get("isBase64Encoded"):
+        return len(body.encode())
+    return len(body) * 3 // 4 - (len(body) - len(body.rstrip("=")))
 
 
 def parse_body(event: Dict[str, Any]) -> Dict[str, Any]:
-    raw_body = event.get("body")
-    if not raw_body:
+    if not event.get("body"):
         return {}
     try:
-        return json.loads(raw_body)
-    except (json.JSONDecodeError, TypeError):
+        return json.loads(request_body(event))
+    except (json.JSONDecodeError, TypeError, ValueError):
         return {}
 
 
 def get_claims(event: Dict[str, Any]) -> Dict[str, Any]:
+    if jwt_verifier.enabled():
+        token = jwt_verifier.bearer_token(event.get("headers"))
+        try:
+            return jwt_verifier.get_verifier().verify(token) if token else {}
+        except jwt_verifier.InvalidTokenError:
+            return {}
     request_context = event.get("requestContext") or {}
     authorizer = request_context.get("authorizer") or {}
     jwt_context = authorizer.get("jwt") or {}
@@ -163,7 +715,23 @@ class AuthError(Exception):
         self.details = details or {}
 
 
+def _expired_token_error(event: Dict[str, Any]) -> AuthError:
+    refresh_token = (event.get("headers") or {}).get("X-Refresh-Token")
+    return AuthError(401, "Token expired. Refresh required.", details={"refreshTokenProvided": bool(refresh_token)})
+
+
 def validate_token(event: Dict[str, Any]) -> Dict[str, Any]:
+    if jwt_verifier.enabled():
+        token = jwt_verifier.bearer_token(event.get("headers"))
+        if not token:
+            raise AuthError(401, "Missing authorization context")
+        try:
+            return jwt_verifier.get_verifier().verify(token)
+        except jwt_verifier.TokenExpiredError as exc:
+            raise _expired_token_error(event) from exc
+        except jwt_verifier.InvalidTokenError as exc:
+            raise AuthError(401, str(exc)) from exc
+
     claims = get_claims(event)
     if not claims:
         raise AuthError(401, "Missing authorization context")
@@ -171,10 +739,7 @@ def validate_token(event: Dict[str, Any]) -> Dict[str, Any]:
     exp = claims.get("exp")
     now = datetime.utcnow().timestamp()
     if exp and float(exp) <= now:
-        refresh_token = (event.get("headers") or {}).get("X-Refresh-Token")
-        message = "Token expired. Refresh required."
-        details = {"refreshTokenProvided": bool(refresh_token)}
-        raise AuthError(401, message, details=details)
+        raise _expired_token_error(event)
 
     return claims
 
@@ -195,27 +760,51 @@ def record_usage_event(
     requests: int = 0,
     orders: int = 0,
     gmv: float = 0.0,
+    product_ids: Iterable[Any] = (),
 ) -> None:
-    body_size = len((event.get("body") or "").encode())
-    tracker.record_usage(
-        tenant_id=tenant_id,
-        requests=requests,
-        orders=orders,
-        gmv=gmv,
-        bytes_consumed=body_size,
-        metadata={
-            "path": event.get("path", ""),
-            "method": event.get("httpMethod", ""),
-            "userAgent": (event.get("headers") or {}).get("User-Agent", ""),
-            "sourceIp": (event.get("requestContext") or {}).get("identity", {}).get("sourceIp", ""),
-        },
-    )
+    body_size = request_body_size(event)
+    metadata = {
+        "path": event.get("path", ""),
+        "method": event.get("httpMethod", ""),
+        "userAgent": (event.get("headers") or {}).get("User-Agent", ""),
+        "sourceIp": (event.get("requestContext") or {}).get("identity", {}).get("sourceIp", ""),
+    }
+    products = [str(product_id) for product_id in dict.fromkeys(product_ids) if product_id is not None]
+    if products:
+        metadata["productIds"] = ",".join(products)
+    with instrumentation.phase("usage"):
+        tracker.record_usage(
+            tenant_id=tenant_id,
+            requests=requests,
+            orders=orders,
+            gmv=gmv,
+            bytes_consumed=body_size,
+            metadata=metadata,
+        )
 
 
 tenant_repository: TenantRepository | None = None
 cart_repository: CartRepository | None = None
 order_repository: OrderRepository | None = None
 subscription_repository: SubscriptionRepository | None = None
+product_repository: ProductRepository | None = None
+inventory_store: InventoryStore | None = None
+webhook_deduplicator: WebhookDeduplicator | None = None
+webhook_queue: WebhookQueue | None = None
+
+
+def _get_webhook_deduplicator() -> WebhookDeduplicator:
+    global webhook_deduplicator
+    if webhook_deduplicator is None:
+        webhook_deduplicator = WebhookDeduplicator("TRANSACTIONS_TABLE")
+    return webhook_deduplicator
+
+
+def _get_webhook_queue() -> WebhookQueue:
+    global webhook_queue
+    if webhook_queue is None:
+        webhook_queue = WebhookQueue()
+    return webhook_queue
 
 
 def _get_repositories() -> Tuple[TenantRepository, CartRepository, OrderRepository, SubscriptionRepository]:
@@ -238,39 +827,88 @@ def process_payment_status(
     amount: float | None,
     currency: str | None,
 ) -> Dict[str, Any]:
+    notification = {"resourceId": resource_id, "status": status, "amount": amount, "currency": currency}
+    return process_payment_batch(tenant_id, [notification])[0]
+
+
+def process_payment_batch(tenant_id: str, notifications: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Apply several notifications of one tenant with a single ``TransactWriteItems``."""
+
     _, _, _, subscriptions = _get_repositories()
-    subscription = subscriptions.get_subscription(tenant_id)
-    normalized_status = status.lower()
-    successful_statuses = {"approved", "authorized"}
-    pending_statuses = {"in_process", "pending"}
-
-    if normalized_status in successful_statuses:
-        subscription["retryAttempts"] = 0
-        subscription["status"] = "active"
-        subscription["nextBillingAt"] = (datetime.utcnow() + timedelta(days=30)).isoformat() + "Z"
-    elif normalized_status in pending_statuses:
-        subscription["status"] = "pending"
-    else:
-        subscription["retryAttempts"] = subscription.get("retryAttempts", 0) + 1
-        subscription["status"] = "retrying"
-        if subscription["retryAttempts"] >= MAX_PAYMENT_RETRIES:
-            subscription["status"] = "suspended"
-            subscription["suspendedReason"] = "payment_failed"
+    dedupe = _get_webhook_deduplicator()
+    results: List[Dict[str, Any] | None] = [None] * len(notifications)
+    pending: Dict[str, Tuple[int, Dict[str, Any]]] = {}
+    for index, notification in enumerate(notifications):
+        resource_id = notification["resourceId"]
+        status = notification["status"]
+        key = dedupe_key(tenant_id, resource_id, status)
+        stored = dedupe.find(key)
+        if stored is None and key in pending:
+            stored = pending[key][1]
+        if stored is not None:
+            results[index] = {**stored, "duplicate": True}
+            continue
 
-    subscriptions.update_subscription(subscription)
+        transaction_id = resource_id if resource_id.startswith(tenant_id) else f"{tenant_id}#{resource_id}"
+        pending[key] = (
+            index,
+            {
+                "transactionId": transaction_id,
+                "receivedAt": notification.get("receivedAt") or datetime.utcnow().isoformat() + "Z",
+                "resourceId": resource_id,
+                "status": status,
+                "tenantId": tenant_id,
+                "amount": notification.get("amount"),
+                "currency": notification.get("currency") or "USD",
+                **({"orderId": notification["orderId"]} if notification.get("orderId") else {}),
+            },
+        )
+
+    _commit_paid_reservations(tenant_id, [receipt for _, receipt in pending.values()])
+    while pending:
+        receipts = [receipt for _, receipt in pending.values()]
+        try:
+            subscriptions.record_payments(tenant_id, receipts, [dedupe.record(key, tenant_id, receipt) for key, (_, receipt) in pending.items()])
+        except DuplicateDeliveryError:
+            # A concurrent delivery won at least one notification; drop those and retry the rest.
+            applied_elsewhere = {key: dedupe.find(key) for key in pending}
+            if not any(applied_elsewhere.values()):
+                raise
+            for key, stored in applied_elsewhere.items():
+                if stored is not None:
+                    index, _ = pending.pop(key)
+                    results[index] = {**stored, "duplicate": True}
+            continue
+        for key, (index, receipt) in pending.items():
+            dedupe.remember(key, receipt)
+            results[index] = dict(receipt)
+        break
+    return [result or {} for result in results]
 
-    transaction_id = resource_id if resource_id.startswith(tenant_id) else f"{tenant_id}#{resource_id}"
-    receipt = {
-        "transactionId": transaction_id,
-        "receivedAt": datetime.utcnow().isoformat() + "Z",
-        "resourceId": resource_id,
-        "status": status,
-        "tenantId": tenant_id,
-        "amount": amount,
-        "currency": currency or "USD",
-    }
-    subscriptions.log_payment(receipt)
-    return receipt
+
+def _commit_paid_reservations(tenant_id: str, receipts: List[Dict[str, Any]]) -> None:
+    """Turn the stock reservation of each approved order into a sale.
+
+    Runs before the payment is recorded: a redelivered notification commits
+    again, which is a no-op once the reservation is no longer active.
+    """
+
+    inventory = _get_inventory()
+    if inventory is None:
+        return
+    for receipt in receipts:
+        order_id = receipt.get("orderId")
+        if order_id and _payment_category(receipt["status"]) == "success":
+            inventory.commit(tenant_id, order_id if order_id.startswith(f"{tenant_id}#") else f"{tenant_id}#{order_id}")
+
+
+def _payment_category(status: str) -> str:
+    normalized_status = status.lower()
+    if normalized_status in {"approved", "authorized"}:
+        return "success"
+    if normalized_status in {"in_process", "pending"}:
+        return "pending"
+    return "failure"
 
 
 def create_tenant(event: Dict[str, Any], _: Dict[str, str]) -> LambdaResponse:
@@ -319,21 +957,9 @@ def create_subscription_checkout(event: Dict[str, Any], params: Dict[str, str])
     payload = parse_body(event)
     plan_id = payload.get("planId") or "standard"
     _, _, _, subscriptions = _get_repositories()
-    subscription = subscriptions.get_subscription(tenant_id)
-    subscription_id = payload.get("subscriptionId") or subscription.get("subscriptionId") or f"{tenant_id}#sub-{uuid.uuid4().hex[:8]}"
     preference_id = f"{tenant_id}#pref-sub-{uuid.uuid4().hex[:8]}"
-
-    subscription.update(
-        {
-            "planId": plan_id,
-            "subscriptionId": subscription_id,
-            "preferenceId": preference_id,
-            "status": "active",
-            "retryAttempts": 0,
-            "updatedAt": datetime.utcnow().isoformat() + "Z",
-        }
-    )
-    subscriptions.update_subscription(subscription)
+    subscription = subscriptions.activate_plan(tenant_id, plan_id, preference_id, payload.get("subscriptionId"))
+    subscription_id = subscription["subscriptionId"]
 
     checkout = {
         "tenantId": tenant_id,
@@ -374,9 +1000,8 @@ def create_tenant_user(event: Dict[str, Any], params: Dict[str, str]) -> LambdaR
     return 201, response, headers
 
 
-def get_products(_: Dict[str, Any], params: Dict[str, str]) -> LambdaResponse:
-    tenant_id = params.get("tenantId", "public")
-    products = [
+def _demo_products(tenant_id: str) -> List[Dict[str, Any]]:
+    return [
         {
             "tenantId": tenant_id,
             "productId": f"{tenant_id}#prd-001",
@@ -398,8 +1023,28 @@ def get_products(_: Dict[str, Any], params: Dict[str, str]) -> LambdaResponse:
             "assetPrefix": f"s3://commerce-assets/{tenant_id}/products/prd-002",
         },
     ]
+
+
+def list_catalog_products(tenant_id: str, fields: List[str] | None = None) -> List[Dict[str, Any]]:
+    """Return the tenant catalog from ``PRODUCTS_TABLE`` or the demo data."""
+
+    if not os.environ.get("PRODUCTS_TABLE"):
+        return [select_fields(product, fields) for product in _demo_products(tenant_id)]
+    global product_repository
+    if product_repository is None:
+        product_repository = ProductRepository("PRODUCTS_TABLE")
+    return [select_fields(product, fields) for product in product_repository.list_for_tenant(tenant_id, fields)]
+
+
+def get_products(event: Dict[str, Any], params: Dict[str, str]) -> LambdaResponse:
+    tenant_id = params.get("tenantId", "public")
+    products = list_catalog_products(tenant_id, event.get("fields"))
+    headers: Headers = {}
+    snapshot_base = os.getenv("CATALOG_SNAPSHOT_BASE_URL")
+    if snapshot_base:
+        headers["X-Catalog-Manifest"] = f"{snapshot_base.rstrip('/')}/{manifest_key(tenant_id)}"
     record_usage_event({}, tenant_id, requests=1)
-    return 200, {"items": products, "count": len(products)}, {}
+    return 200, {"items": products, "count": len(products)}, headers
 
 
 def get_product_by_id(event: Dict[str, Any], params: Dict[str, str]) -> LambdaResponse:
@@ -415,53 +1060,211 @@ def get_product_by_id(event: Dict[str, Any], params: Dict[str, str]) -> LambdaRe
         "stock": 8,
         "assetPrefix": f"s3://commerce-assets/{tenant_id}/products/{product_id}",
     }
-    record_usage_event(event, tenant_id, requests=1)
-    return 200, product, {}
+    record_usage_event(event, tenant_id, requests=1, product_ids=[product_id])
+    return 200, select_fields(product, event.get("fields")), {}
+
+
+def _integer(raw: Any, name: str) -> int:
+    """``raw`` as an int; ValueError (answered with 400) when it is not a whole number."""
+
+    if isinstance(raw, float) and raw.is_integer():
+        raw = int(raw)
+    if isinstance(raw, (int, str)) and not isinstance(raw, bool):
+        try:
+            return int(raw)
+        except ValueError:
+            pass
+    raise ValueError(f"{name} must be an integer")
+
+
+def _cart_line(item: Dict[str, Any]) -> Dict[str, Any]:
+    return {**item, "productId": str(item.get("productId")), "quantity": _integer(item.get("quantity", 1), "quantity")}
+
+
+def _render_cart(cart: Dict[str, Any]) -> Dict[str, Any]:
+    items = cart.get("items") or {}
+    totals = dict(cart.get("totals") or {})
+    if "amount" in totals:
+        totals["amount"] = round(float(totals["amount"]), 2)
+    return {**cart, "items": list(items.values()) if isinstance(items, dict) else items, "totals": totals}
+
+
+def _expected_version(event: Dict[str, Any], payload: Dict[str, Any]) -> int | None:
+    raw = payload.get("expectedVersion")
+    if raw is None:
+        raw = (event.get("queryStringParameters") or {}).get("expectedVersion")
+    if raw is None:
+        raw = (event.get("headers") or {}).get("If-Match")
+    if raw in (None, ""):
+        return None
+    return _integer(raw.strip('"') if isinstance(raw, str) else raw, "expectedVersion")
+
+
+def _conflict_response(exc: VersionConflictError) -> LambdaResponse:
+    return 409, {"message": "Cart was modified concurrently. Reload and retry.", "detail": str(exc)}, {}
 
 
 def create_cart(event: Dict[str, Any], params: Dict[str, str]) -> LambdaResponse:
     _, carts, _, _ = _get_repositories()
     payload = parse_body(event)
     tenant_id = params.get("tenantId", "public")
-    items = payload.get("items", [])
-    cart_id = payload.get("cartId") or f"{tenant_id}#cart-{uuid.uuid4().hex[:8]}"
-    totals = sum(item.get("price", 0) * item.get("quantity", 1) for item in items)
-    expires_at = datetime.utcnow() + timedelta(hours=2)
+    items_payload = payload.get("items", [])
+    if not isinstance(items_payload, list) or not all(isinstance(item, dict) for item in items_payload):
+        return 400, {"message": "items must be a list of objects"}, {}
+    try:
+        lines = [_cart_line(item) for item in items_payload if item.get("productId") is not None]
+        expected = _expected_version(event, payload) if payload.get("cartId") else None
+    except ValueError as exc:
+        return 400, {"message": str(exc)}, {}
+    delta = sum(float(line.get("price", 0)) * line["quantity"] for line in lines)
+
+    if payload.get("cartId"):
+        cart: Dict[str, Any] | None = None
+        try:
+            for line in lines:
+                cart = carts.add_item(payload["cartId"], tenant_id, line, expected)
+                if cart is None:
+                    break
+                expected = None if expected is None else int(cart["version"])
+            cart = cart if lines else carts.get(payload["cartId"])
+        except VersionConflictError as exc:
+            return _conflict_response(exc)
+        if not cart or cart.get("tenantId") != tenant_id:
+            return 404, {"message": "Cart not found"}, {}
+        record_usage_event(event, tenant_id, requests=1, gmv=delta, product_ids=[line["productId"] for line in lines])
+        return 200, _render_cart(cart), {}
+
+    user_id = payload.get("userId") or get_claims(event).get("sub") or f"guest-{uuid.uuid4().hex[:8]}"
+    items: Dict[str, Dict[str, Any]] = {}
+    for line in lines:
+        if line["productId"] in items:
+            items[line["productId"]]["quantity"] += line["quantity"]
+        else:
+            items[line["productId"]] = line
+    now = datetime.utcnow()
+    expires_at = now + timedelta(hours=CartRepository.TTL_HOURS)
     cart = {
         "tenantId": tenant_id,
-        "cartId": cart_id,
+        "cartId": f"{tenant_id}#cart-{uuid.uuid4().hex[:8]}",
+        "userId": cart_user_key(tenant_id, str(user_id)),
         "items": items,
-        "totals": {"amount": round(totals, 2), "currency": payload.get("currency", "USD")},
+        "totals": {
+            "amount": round(delta, 2),
+            "quantity": sum(line["quantity"] for line in items.values()),
+            "currency": payload.get("currency", "USD"),
+        },
+        "version": 1,
+        "createdAt": now.isoformat() + "Z",
+        "updatedAt": now.isoformat() + "Z",
         "expiresAt": expires_at.isoformat() + "Z",
         "ttl": int(expires_at.timestamp()),
     }
-    carts.save(cart)
-    record_usage_event(event, tenant_id, requests=1, gmv=totals)
-    return 201, cart, {}
+    carts.create(cart)
+    record_usage_event(event, tenant_id, requests=1, gmv=delta, product_ids=list(items))
+    return 201, _render_cart(cart), {}
 
 
 def get_cart(event: Dict[str, Any], params: Dict[str, str]) -> LambdaResponse:
     _, carts, _, _ = _get_repositories()
-    user_id = (event.get("queryStringParameters") or {}).get("userId", "guest")
+    query = event.get("queryStringParameters") or {}
+    user_id = query.get("userId") or get_claims(event).get("sub") or "guest"
     tenant_id = params.get("tenantId", "public")
-    cart_id = f"{tenant_id}#cart-{user_id}"
-    cart = carts.get(cart_id)
+    if query.get("cartId"):
+        cart = carts.get(query["cartId"])
+        cart = cart if cart and cart.get("tenantId") == tenant_id else None
+    else:
+        cart = carts.find_active(tenant_id, str(user_id))
     if not cart:
         cart = {
             "tenantId": tenant_id,
-            "cartId": cart_id,
-            "items": [],
-            "totals": {"amount": 0.0, "currency": "USD"},
-            "userId": user_id,
+            "cartId": None,
+            "items": {},
+            "totals": {"amount": 0.0, "quantity": 0, "currency": "USD"},
+            "userId": cart_user_key(tenant_id, str(user_id)),
+            "version": 0,
         }
     record_usage_event(event, tenant_id, requests=1)
-    return 200, cart, {}
+    return 200, _render_cart(cart), {}
+
+
+def add_cart_item(event: Dict[str, Any], params: Dict[str, str]) -> LambdaResponse:
+    _, carts, _, _ = _get_repositories()
+    payload = parse_body(event)
+    tenant_id = params.get("tenantId", "public")
+    if payload.get("productId") is None:
+        return 400, {"message": "productId is required"}, {}
+    try:
+        line = _cart_line(payload.get("item") or {k: v for k, v in payload.items() if k != "expectedVersion"})
+        expected = _expected_version(event, payload)
+    except ValueError as exc:
+        return 400, {"message": str(exc)}, {}
+    try:
+        cart = carts.add_item(unquote(params["cartId"]), tenant_id, line, expected)
+    except VersionConflictError as exc:
+        return _conflict_response(exc)
+    if cart is None:
+        return 404, {"message": "Cart not found"}, {}
+    record_usage_event(event, tenant_id, requests=1, gmv=float(line.get("price", 0)) * line["quantity"], product_ids=[line["productId"]])
+    return 200, _render_cart(cart), {}
+
+
+def update_cart_item(event: Dict[str, Any], params: Dict[str, str]) -> LambdaResponse:
+    _, carts, _, _ = _get_repositories()
+    payload = parse_body(event)
+    tenant_id = params.get("tenantId", "public")
+    if payload.get("quantity") is None:
+        return 400, {"message": "quantity is required"}, {}
+    try:
+        quantity = _integer(payload["quantity"], "quantity")
+        expected = _expected_version(event, payload)
+    except ValueError as exc:
+        return 400, {"message": str(exc)}, {}
+    try:
+        cart = carts.set_quantity(unquote(params["cartId"]), tenant_id, unquote(params["productId"]), quantity, expected)
+    except VersionConflictError as exc:
+        return _conflict_response(exc)
+    if cart is None:
+        return 404, {"message": "Cart not found"}, {}
+    record_usage_event(event, tenant_id, requests=1, product_ids=[unquote(params["productId"])])
+    return 200, _render_cart(cart), {}
+
+
+def remove_cart_item(event: Dict[str, Any], params: Dict[str, str]) -> LambdaResponse:
+    _, carts, _, _ = _get_repositories()
+    tenant_id = params.get("tenantId", "public")
+    try:
+        expected = _expected_version(event, {})
+    except ValueError as exc:
+        return 400, {"message": str(exc)}, {}
+    try:
+        cart = carts.remove_item(unquote(params["cartId"]), tenant_id, unquote(params["productId"]), expected)
+    except VersionConflictError as exc:
+        return _conflict_response(exc)
+    if cart is None:
+        return 404, {"message": "Cart not found"}, {}
+    record_usage_event(event, tenant_id, requests=1, product_ids=[unquote(params["productId"])])
+    return 200, _render_cart(cart), {}
+
+
+def _get_inventory() -> InventoryStore | None:
+    global inventory_store
+    if inventory_store is None and os.environ.get("INVENTORY_TABLE"):
+        inventory_store = InventoryStore()
+    return inventory_store
 
 
 def create_order(event: Dict[str, Any], params: Dict[str, str]) -> LambdaResponse:
     _, _, orders, _ = _get_repositories()
     payload = parse_body(event)
     tenant_id = params.get("tenantId", "public")
+    items = payload.get("items", [])
+    if not isinstance(items, list) or not all(isinstance(item, dict) for item in items):
+        return 400, {"message": "items must be a list of objects"}, {}
+    try:
+        for item in items:
+            line_quantity(item)
+    except ValueError as exc:
+        return 400, {"message": str(exc)}, {}
     order_id = f"{tenant_id}#ord-{uuid.uuid4().hex[:10]}"
     preference_id = f"{tenant_id}#pref-{uuid.uuid4().hex[:6]}"
     now_iso = datetime.utcnow().isoformat() + "Z"
@@ -470,45 +1273,128 @@ def create_order(event: Dict[str, Any], params: Dict[str, str]) -> LambdaRespons
         "orderId": order_id,
         "amount": payload.get("amount", 0),
         "currency": payload.get("currency", "USD"),
-        "items": payload.get("items", []),
+        "items": items,
         "paymentPreferenceId": preference_id,
         "paymentStatus": "pending",
         "status": "created",
         "createdAt": now_iso,
         "updatedAt": now_iso,
     }
-    orders.save(order)
+
+    inventory = _get_inventory()
+    if inventory is not None and order["items"]:
+        try:
+            reservation = inventory.reserve(tenant_id, order_id, order["items"])
+        except InsufficientStockError as exc:
+            return 409, {"message": "Insufficient stock", "sku": exc.sku, "requested": exc.requested, "available": exc.available}, {}
+        except ReservationConflictError as exc:
+            return 503, {"message": str(exc)}, {"Retry-After": "1"}
+        if reservation.lines:
+            order["inventoryStatus"] = "reserved"
+            order["reservationExpiresAt"] = reservation.expiresAt
+        else:
+            order["inventoryStatus"] = "untracked"
+
+    try:
+        orders.save(order)
+    except ClientError:
+        if inventory is not None and order.get("inventoryStatus") == "reserved":
+            inventory.release(tenant_id, order_id)
+        raise
     headers = {"X-MercadoPago-Preference": preference_id}
-    record_usage_event(event, tenant_id, requests=1, orders=1, gmv=payload.get("amount", 0))
+    product_ids = [item.get("productId") or item.get("sku") for item in order["items"] if isinstance(item, dict)]
+    record_usage_event(event, tenant_id, requests=1, orders=1, gmv=payload.get("amount", 0), product_ids=product_ids)
     return 201, order, headers
 
 
-def handle_mercadopago_webhook(event: Dict[str, Any], params: Dict[str, str]) -> LambdaResponse:
-    payload = parse_body(event)
-    tenant_id = params.get("tenantId", "public")
+def _normalize_webhook(payload: Dict[str, Any], tenant_id: str) -> Dict[str, Any]:
     notification_type = payload.get("type") or payload.get("action") or "payment"
     data = payload.get("data") or {}
-    resource_id = data.get("id") or "unknown"
-
+    notification = {
+        "tenantId": tenant_id,
+        "notificationType": notification_type,
+        "resourceId": str(data.get("id") or "unknown"),
+        "status": data.get("status") or payload.get("status") or "pending",
+        "receivedAt": datetime.utcnow().isoformat() + "Z",
+    }
     if notification_type.startswith("subscription"):
-        plan_id = data.get("planId") or data.get("plan_id") or payload.get("planId")
-        receipt = process_payment_status(
-            tenant_id,
-            resource_id,
-            data.get("status") or payload.get("status") or "pending",
-            data.get("amount"),
-            data.get("currency"),
-        )
-        receipt.update({"notificationType": notification_type, "planId": plan_id})
+        notification["planId"] = data.get("planId") or data.get("plan_id") or payload.get("planId")
+        notification["amount"] = data.get("amount")
+        notification["currency"] = data.get("currency")
     else:
-        payment_status = data.get("status") or payload.get("status") or "pending"
-        amount = data.get("transaction_amount") or data.get("amount")
-        currency = data.get("currency_id") or data.get("currency")
-        receipt = process_payment_status(tenant_id, resource_id, payment_status, amount, currency)
-        receipt.update({"notificationType": notification_type})
+        notification["amount"] = data.get("transaction_amount") or data.get("amount")
+        # Checkout preferences carry the order id as ``external_reference``.
+        order_id = data.get("external_reference") or payload.get("external_reference")
+        if order_id:
+            notification["orderId"] = str(order_id)
+        notification["currency"] = data.get("currency_id") or data.get("currency")
+    return notification
+
+
+def _with_notification_details(receipt: Dict[str, Any], notification: Dict[str, Any]) -> Dict[str, Any]:
+    receipt.update({"notificationType": notification["notificationType"]})
+    if "planId" in notification:
+        receipt["planId"] = notification["planId"]
+    return receipt
+
+
+def handle_mercadopago_webhook(event: Dict[str, Any], params: Dict[str, str]) -> LambdaResponse:
+    payload = parse_body(event)
+    tenant_id = params.get("tenantId", "public")
+    notification = _normalize_webhook(payload, tenant_id)
 
+    if async_enabled():
+        if notification["resourceId"] == "unknown":
+            return 400, {"message": "Notification without data.id"}, {}
+        message_id = _get_webhook_queue().send(notification)
+        record_usage_event(event, tenant_id, requests=1)
+        return 202, {"accepted": True, "messageId": message_id}, {}
+
+    receipt = process_payment_batch(tenant_id, [notification])[0]
+    _with_notification_details(receipt, notification)
     record_usage_event(event, tenant_id, requests=1)
-    return 200, receipt, {}
+    headers = {"X-Idempotent-Replay": "true"} if receipt.pop("duplicate", False) else {}
+    return 200, receipt, headers
+
+
+def _process_tenant_group(tenant_id: str, latest: Dict[str, Dict[str, Any]]) -> None:
+    ordered = sorted(latest.values(), key=lambda item: item["_order"])
+    notifications = [{key: value for key, value in item.items() if key != "_order"} for item in ordered]
+    process_payment_batch(tenant_id, notifications)
+
+
+def webhook_batch_handler(event: Dict[str, Any], _: Any = None) -> Dict[str, Any]:
+    """SQS consumer: coalesce the batch per tenant and report partial failures."""
+
+    groups, message_ids, malformed = coalesce(event.get("Records") or [])
+    failures = list(malformed)
+    workers = max(1, min(WEBHOOK_BATCH_CONCURRENCY, len(groups)))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(_process_tenant_group, tenant_id, latest): tenant_id for tenant_id, latest in groups.items()}
+        for future, tenant_id in futures.items():
+            try:
+                future.result()
+            except Exception:  # noqa: BLE001 - SQS redelivers the whole group
+                failures.extend(message_ids[tenant_id])
+    return {"batchItemFailures": [{"itemIdentifier": message_id} for message_id in failures]}
+
+
+def drain_local_webhook_queue() -> int:
+    """Consume the in-process queue (local runs); returns processed messages."""
+
+    queue = _get_webhook_queue()
+    if queue.local is None:
+        return 0
+    processed = 0
+    while len(queue.local):
+        records = queue.local.receive(MAX_BATCH_SIZE)
+        result = webhook_batch_handler({"Records": records})
+        failed = {item["itemIdentifier"] for item in result["batchItemFailures"]}
+        processed += len(records) - len(failed)
+        if failed:
+            queue.local.requeue(record for record in records if record["messageId"] in failed)
+            break
+    return processed
 
 
 def get_sales_analytics(_: Dict[str, Any], params: Dict[str, str]) -> LambdaResponse:
@@ -528,40 +1414,101 @@ def get_sales_analytics(_: Dict[str, Any], params: Dict[str, str]) -> LambdaResp
     return 200, metrics, {}
 
 
+def _billing_limit(event: Dict[str, Any]) -> int:
+    query = event.get("queryStringParameters") or {}
+    return max(1, min(int(query.get("limit") or 10), 100))
+
+
+def _billing_status_body(tenant_id: str, subscription: Dict[str, Any], page: Tuple[List[Dict[str, Any]], str | None]) -> Dict[str, Any]:
+    payments, next_cursor = page
+    return {
+        "tenantId": tenant_id,
+        "subscription": subscription,
+        "recentPayments": list(reversed(payments)),
+        "nextCursor": next_cursor,
+    }
+
+
 def get_billing_status(event: Dict[str, Any], params: Dict[str, str]) -> LambdaResponse:
     _, _, _, subscriptions = _get_repositories()
     tenant_id = params.get("tenantId", "public")
+    cursor = (event.get("queryStringParameters") or {}).get("cursor")
+    try:
+        page = subscriptions.recent_payments(tenant_id, _billing_limit(event), cursor)
+    except ValueError:
+        return 400, {"message": "Invalid limit or cursor"}, {}
     subscription = subscriptions.get_subscription(tenant_id)
-    payments = subscriptions.list_payments(tenant_id)[-10:]
-    response = {
+    record_usage_event(event, tenant_id, requests=1)
+    return 200, _billing_status_body(tenant_id, subscription, page), {}
+
+
+async def get_billing_status_async(event: Dict[str, Any], params: Dict[str, str]) -> LambdaResponse:
+    """:func:`get_billing_status` with the payment page and the subscription read concurrently."""
+
+    subscriptions = async_io.AsyncRepository(_get_repositories()[3])
+    tenant_id = params.get("tenantId", "public")
+    cursor = (event.get("queryStringParameters") or {}).get("cursor")
+    try:
+        page, subscription = await asyncio.gather(
+            subscriptions.recent_payments(tenant_id, _billing_limit(event), cursor),
+            subscriptions.get_subscription(tenant_id),
+        )
+    except ValueError:
+        return 400, {"message": "Invalid limit or cursor"}, {}
+    await async_io.run_io(record_usage_event, event, tenant_id, requests=1)
+    return 200, _billing_status_body(tenant_id, subscription, page), {}
+
+
+def _billing_entry(tenant_id: str, subscription: Dict[str, Any], fields: List[str] | None) -> Dict[str, Any]:
+    return {
         "tenantId": tenant_id,
-        "subscription": subscription,
-        "recentPayments": payments,
+        "subscription": select_fields(subscription, fields),
+        "billingHealth": "suspended" if subscription.get("status") == "suspended" else "ok",
     }
-    record_usage_event(event, tenant_id, requests=1)
-    return 200, response, {}
+
+
+def _billing_tenant_ids(subscriptions: SubscriptionRepository) -> List[str]:
+    all_records = subscriptions.query_by_tenant(tenant_id="*", fields=["tenantId"])  # type: ignore[arg-type]
+    return sorted({str(rec["tenantId"]) for rec in all_records if rec.get("tenantId")})
 
 
 def list_billing_status(event: Dict[str, Any], _: Dict[str, str]) -> LambdaResponse:
     _, _, _, subscriptions = _get_repositories()
     claims = validate_token(event)
     require_admin(claims)
+    fields = event.get("fields")
 
     tenants: List[Dict[str, Any]] = []
-    all_records = subscriptions.query_by_tenant(tenant_id="*")  # type: ignore[arg-type]
-    tenant_ids = {rec.get("tenantId") for rec in all_records if rec.get("tenantId")}
+    tenant_ids = _billing_tenant_ids(subscriptions)
+    # ``billingHealth`` is derived from ``status``, so it is always read.
+    subscriptions_by_tenant = subscriptions.get_subscriptions(tenant_ids, [*fields, "status"] if fields else None)
     for tenant_id in tenant_ids:
-        subscription = subscriptions.get_subscription(str(tenant_id))
-        last_payment = next((p for p in reversed(subscriptions.list_payments(str(tenant_id))) if p.get("tenantId") == tenant_id), None)
-        tenants.append(
-            {
-                "tenantId": tenant_id,
-                "subscription": subscription,
-                "lastPayment": last_payment,
-                "billingHealth": "suspended" if subscription.get("status") == "suspended" else "ok",
-            }
-        )
+        entry = _billing_entry(tenant_id, subscriptions_by_tenant[tenant_id], fields)
+        if fields is None:
+            latest, _ = subscriptions.recent_payments(str(tenant_id), limit=1)
+            entry["lastPayment"] = latest[0] if latest else None
+        tenants.append(entry)
+
+    return 200, {"items": tenants, "total": len(tenants)}, {}
+
+
+async def list_billing_status_async(event: Dict[str, Any], _: Dict[str, str]) -> LambdaResponse:
+    """:func:`list_billing_status` with the subscriptions and every last-payment query in flight together."""
 
+    repository = _get_repositories()[3]
+    subscriptions = async_io.AsyncRepository(repository)
+    require_admin(validate_token(event))
+    fields = event.get("fields")
+
+    tenant_ids = await async_io.run_io(_billing_tenant_ids, repository)
+    reads = [subscriptions.get_subscriptions(tenant_ids, [*fields, "status"] if fields else None)]
+    if fields is None:
+        reads.extend(subscriptions.recent_payments(tenant_id, limit=1) for tenant_id in tenant_ids)
+    subscriptions_by_tenant, *pages = await asyncio.gather(*reads)
+
+    tenants = [_billing_entry(tenant_id, subscriptions_by_tenant[tenant_id], fields) for tenant_id in tenant_ids]
+    for entry, (latest, _) in zip(tenants, pages):
+        entry["lastPayment"] = latest[0] if latest else None
     return 200, {"items": tenants, "total": len(tenants)}, {}
 
 
@@ -585,15 +1532,7 @@ def list_tenant_usage(event: Dict[str, Any], _: Dict[str, str]) -> LambdaRespons
     allowed_metrics = ["requests", "orders", "gmv", "bytes"]
     metrics = [m for m in (requested_metrics or "").split(",") if m in allowed_metrics] or allowed_metrics
 
-    filtered_records = []
-    for record in tracker.get_aggregates():
-        period_date = datetime.fromisoformat(record.period).date()
-        if start_date_obj and period_date < start_date_obj:
-            continue
-        if end_date_obj and period_date > end_date_obj:
-            continue
-        filtered_records.append(record)
-
+    filtered_records = query_aggregates(None, start_date_obj, end_date_obj)
     filtered_records.sort(key=lambda rec: (rec.period, rec.tenantId), reverse=True)
     total = len(filtered_records)
 
@@ -611,6 +1550,7 @@ def list_tenant_usage(event: Dict[str, Any], _: Dict[str, str]) -> LambdaRespons
                 "tenantId": record.tenantId,
                 "period": record.period,
                 "usage": usage_slice,
+                "unique": unique_counts(decode_sketches(record.sketches)),
                 "createdAt": record.createdAt,
             }
         )
@@ -635,7 +1575,7 @@ def export_usage_metrics(event: Dict[str, Any], _: Dict[str, str]) -> LambdaResp
     metrics = [m for m in (params.get("metrics") or "").split(",") if m] or ["tenantId", "period", "requests", "orders", "gmv", "bytes"]
 
     rows = [metrics]
-    for record in tracker.get_aggregates():
+    for record in query_aggregates():
         row = []
         for metric in metrics:
             if metric == "tenantId":
@@ -654,10 +1594,62 @@ def export_usage_metrics(event: Dict[str, Any], _: Dict[str, str]) -> LambdaResp
     return 200, {"data": csv_body, "rows": len(rows) - 1}, headers
 
 
+def _parse_usage_bound(value: str | None, *, end: bool) -> datetime | None:
+    """``YYYY-MM-DD`` or an ISO timestamp; a bare end date includes that whole day."""
+
+    if not value:
+        return None
+    moment = datetime.fromisoformat(value)
+    if moment.tzinfo is not None:
+        # Buckets are naive UTC.
+        moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return moment + timedelta(days=1) if end and len(value) == 10 else moment
+
+
+def _tenant_usage_rollup(tenant_id: str, query: Dict[str, str], resolution: str) -> LambdaResponse:
+    if resolution != "auto" and resolution not in ROLLUP_LEVELS:
+        return 400, {"message": f"Invalid resolution. Use auto or one of: {', '.join(ROLLUP_LEVELS)}."}, {}
+    try:
+        start = _parse_usage_bound(query.get("startDate"), end=False)
+        end = _parse_usage_bound(query.get("endDate"), end=True)
+    except ValueError:
+        return 400, {"message": "Invalid date format. Use YYYY-MM-DD or an ISO timestamp."}, {}
+    end = end or datetime.utcnow()
+    start = start or end - timedelta(days=1)
+
+    rollups = tracker.rollups
+    level = rollups.level_for(start, end) if resolution == "auto" else resolution
+    summary, buckets_read = rollups.total(tenant_id, start, end)
+    body = {
+        "tenantId": tenant_id,
+        "resolution": level,
+        "startDate": start.isoformat(),
+        "endDate": end.isoformat(),
+        "summary": summary,
+        "bucketsRead": buckets_read,
+        "series": rollups.series(tenant_id, level, start, end),
+    }
+    return 200, body, {"X-Tenant-Id": tenant_id}
+
+
+def _period_sketches(tenant_id: str, records: Iterable[Any], start: date | None, end: date | None) -> Dict[str, Dict[str, Sketch]]:
+    """Sketches per day: the aggregate's once the day is aggregated, else this process's live ones."""
+
+    low, high = start.isoformat() if start else "", end.isoformat() if end else "9999-12-31"
+    by_period = {period: sketches for period, sketches in tracker.live_sketches(tenant_id).items() if low <= period <= high}
+    for record in records:
+        if record.sketches:
+            by_period[record.period] = decode_sketches(record.sketches)
+    return by_period
+
+
 def get_tenant_usage(event: Dict[str, Any], params: Dict[str, str]) -> LambdaResponse:
     tenant_id = params.get("tenantId") or event.get("tenantId")
     if not tenant_id:
         return 401, {"message": "Missing tenant context"}, {}
+    resolution = (event.get("queryStringParameters") or {}).get("resolution")
+    if resolution:
+        return _tenant_usage_rollup(tenant_id, event.get("queryStringParameters") or {}, resolution)
     start = (event.get("queryStringParameters") or {}).get("startDate")
     end = (event.get("queryStringParameters") or {}).get("endDate")
 
@@ -667,25 +1659,127 @@ def get_tenant_usage(event: Dict[str, Any], params: Dict[str, str]) -> LambdaRes
     except ValueError:
         return 400, {"message": "Invalid date format. Use YYYY-MM-DD."}, {}
 
-    records = []
-    for record in tracker.get_aggregates():
-        if record.tenantId != tenant_id:
-            continue
-        period_date = datetime.fromisoformat(record.period).date()
-        if start_date_obj and period_date < start_date_obj:
-            continue
-        if end_date_obj and period_date > end_date_obj:
-            continue
-        records.append(record)
-
+    records = query_aggregates(tenant_id, start_date_obj, end_date_obj)
     summary = {"requests": 0.0, "orders": 0.0, "gmv": 0.0, "bytes": 0.0}
+    by_period = _period_sketches(tenant_id, records, start_date_obj, end_date_obj)
     history = []
     for rec in sorted(records, key=lambda r: r.period, reverse=True):
         for metric in summary:
             summary[metric] += float(rec.usage.get(metric, 0))
-        history.append({"period": rec.period, "usage": rec.usage, "createdAt": rec.createdAt})
+        history.append({"period": rec.period, "usage": rec.usage, "unique": unique_counts(by_period.get(rec.period, {})), "createdAt": rec.createdAt})
+
+    sketches = merge_all(by_period.values())
+    body = {
+        "tenantId": tenant_id,
+        "summary": summary,
+        "unique": unique_counts(sketches),
+        "topPaths": heavy_hitters(sketches, TOP_PATHS, "path"),
+        "topProducts": heavy_hitters(sketches, TOP_PRODUCTS, "productId"),
+        "history": history,
+    }
+    return 200, body, {"X-Tenant-Id": tenant_id}
+
+
+def _batch_sub_event(event: Dict[str, Any], request: Dict[str, Any], tenant_id: str) -> Dict[str, Any]:
+    """Validate one batch entry and turn it into a proxy event sharing the batch's credentials."""
+
+    method = str(request.get("method") or "GET").upper()
+    path = str(request.get("path") or "")
+    if method not in BATCH_METHODS:
+        raise ValueError(f"Unsupported method {method}")
+    if not path.startswith(f"/v1/{tenant_id}/") or path.rstrip("/") == f"/v1/{tenant_id}/batch":
+        raise ValueError(f"Path must be a /v1/{tenant_id}/ resource other than the batch endpoint")
+    body = request.get("body")
+    for name in ("headers", "query"):
+        if not isinstance(request.get(name) or {}, dict):
+            raise ValueError(f"{name} must be an object")
+    headers = {
+        name: value
+        for name, value in (event.get("headers") or {}).items()
+        # The batch response is compressed as a whole, not each entry.
+        if name.lower() not in ("accept-encoding", "content-length")
+    }
+    return {
+        "path": path,
+        "httpMethod": method,
+        "headers": {**headers, **{name: value for name, value in (request.get("headers") or {}).items() if name.lower() != "authorization"}},
+        "queryStringParameters": request.get("query") or None,
+        "body": body if body is None or isinstance(body, str) else json.dumps(body),
+        "requestContext": event.get("requestContext") or {},
+    }
+
+
+def _batch_entry(request_id: Any, response: Dict[str, Any]) -> Dict[str, Any]:
+    body = response.get("body")
+    try:
+        body = json.loads(body) if body else None
+    except (json.JSONDecodeError, TypeError):
+        pass
+    headers = {name: value for name, value in response.get("headers", {}).items() if not name.startswith("Access-Control-") and name != "Content-Type"}
+    return {"id": request_id, "status": response["statusCode"], "headers": headers, "body": body}
+
+
+def batch_requests(event: Dict[str, Any], params: Dict[str, str]) -> LambdaResponse:
+    """Run up to ``BATCH_MAX_REQUESTS`` sub-requests of one tenant in one invocation.
+
+    Entries are dispatched through :func:`route_event` with the batch's
+    verified claims. Consecutive ``GET`` entries run concurrently (at most
+    ``BATCH_CONCURRENCY`` at a time); any other method waits for the reads
+    before it and runs alone, so writes keep their order. Entries not started
+    within ``BATCH_TIMEOUT_S`` are answered with 504.
+    """
 
-    return 200, {"tenantId": tenant_id, "summary": summary, "history": history}, {"X-Tenant-Id": tenant_id}
+    tenant_id = params.get("tenantId", "public")
+    # Checked before parsing so an oversized body is never decoded.
+    if request_body_size(event) > BATCH_MAX_BODY_BYTES:
+        return 413, {"message": f"Batch body exceeds {BATCH_MAX_BODY_BYTES} bytes", "maxBodyBytes": BATCH_MAX_BODY_BYTES}, {}
+    payload = parse_body(event)
+    requests = payload.get("requests") if isinstance(payload, dict) else None
+    if not isinstance(requests, list) or not requests:
+        return 400, {"message": "requests must be a non-empty list"}, {}
+    if len(requests) > BATCH_MAX_REQUESTS:
+        return 413, {"message": f"At most {BATCH_MAX_REQUESTS} requests per batch", "maxRequests": BATCH_MAX_REQUESTS}, {}
+    claims = event.get("verifiedClaims") or validate_token(event)
+    deadline = time.monotonic() + BATCH_TIMEOUT_S
+
+    results: List[Dict[str, Any] | None] = [None] * len(requests)
+    pending: List[Tuple[int, Dict[str, Any]]] = []
+    for index, request in enumerate(requests):
+        if not isinstance(request, dict):
+            results[index] = {"id": index, "status": 400, "headers": {}, "body": {"message": "entry must be an object"}}
+            continue
+        request_id = request.get("id", index)
+        try:
+            pending.append((index, _batch_sub_event(event, request, tenant_id)))
+        except ValueError as exc:
+            results[index] = {"id": request_id, "status": 400, "headers": {}, "body": {"message": str(exc)}}
+
+    def run(index: int, sub_event: Dict[str, Any]) -> None:
+        request = requests[index]
+        request_id = request.get("id", index)
+        if time.monotonic() > deadline:
+            results[index] = {"id": request_id, "status": 504, "headers": {}, "body": {"message": "Batch time budget exhausted"}}
+            return
+        try:
+            with instrumentation.detached():
+                results[index] = _batch_entry(request_id, route_event(sub_event, claims=claims))
+        except Exception as exc:  # noqa: BLE001 - one failing entry must not fail the batch
+            results[index] = {"id": request_id, "status": 500, "headers": {}, "body": {"message": "Internal server error", "error": str(exc)}}
+
+    with ThreadPoolExecutor(max_workers=max(1, BATCH_CONCURRENCY)) as pool:
+        reads: List[Any] = []
+        for index, sub_event in pending:
+            if sub_event["httpMethod"] == "GET":
+                reads.append(pool.submit(run, index, sub_event))
+                continue
+            for future in reads:
+                future.result()
+            reads = []
+            run(index, sub_event)
+        for future in reads:
+            future.result()
+
+    return 200, {"tenantId": tenant_id, "responses": results}, {}
 
 
 def extract_tenant_id_from_claims(claims: Dict[str, Any]) -> str | None:
@@ -741,6 +1835,21 @@ ROUTES: Iterable[Route] = (
     ),
     ("POST", re.compile(r"^/v1/(?P<tenantId>[^/]+)/cart$"), create_cart, True, True),
     ("GET", re.compile(r"^/v1/(?P<tenantId>[^/]+)/cart$"), get_cart, True, True),
+    ("POST", re.compile(r"^/v1/(?P<tenantId>[^/]+)/cart/(?P<cartId>[^/]+)/items$"), add_cart_item, True, True),
+    (
+        "PATCH",
+        re.compile(r"^/v1/(?P<tenantId>[^/]+)/cart/(?P<cartId>[^/]+)/items/(?P<productId>[^/]+)$"),
+        update_cart_item,
+        True,
+        True,
+    ),
+    (
+        "DELETE",
+        re.compile(r"^/v1/(?P<tenantId>[^/]+)/cart/(?P<cartId>[^/]+)/items/(?P<productId>[^/]+)$"),
+        remove_cart_item,
+        True,
+        True,
+    ),
     ("POST", re.compile(r"^/v1/(?P<tenantId>[^/]+)/orders$"), create_order, True, True),
     (
         "POST",
@@ -753,47 +1862,209 @@ ROUTES: Iterable[Route] = (
     ("GET", re.compile(r"^/v1/(?P<tenantId>[^/]+)/analytics/sales$"), get_sales_analytics, True, True),
     ("GET", re.compile(r"^/v1/(?P<tenantId>[^/]+)/usage$"), get_tenant_usage, True, True),
     ("GET", re.compile(r"^/v1/(?P<tenantId>[^/]+)/billing$"), get_billing_status, True, True),
+    ("POST", re.compile(r"^/v1/(?P<tenantId>[^/]+)/batch$"), batch_requests, True, True),
     ("GET", re.compile(r"^/v1/admin/tenants/usage$"), list_tenant_usage, True, False),
     ("GET", re.compile(r"^/v1/admin/tenants/usage/export$"), export_usage_metrics, True, False),
     ("GET", re.compile(r"^/v1/admin/tenants/billing$"), list_billing_status, True, False),
 )
 
+PRODUCT_FIELDS = frozenset({"tenantId", "productId", "name", "description", "price", "currency", "stock", "category", "assetPrefix"})
+SUBSCRIPTION_FIELDS = frozenset(
+    {"tenantId", "status", "planId", "subscriptionId", "preferenceId", "retryAttempts", "nextBillingAt", "createdAt", "updatedAt"}
+)
+# Handler -> attributes a ``fields`` query parameter may select.
+FIELD_SCHEMAS: Dict[str, frozenset[str]] = {
+    "get_products": PRODUCT_FIELDS,
+    "get_product_by_id": PRODUCT_FIELDS,
+    "list_billing_status": SUBSCRIPTION_FIELDS,
+}
+
+# Handlers with an asyncio variant used by ``route_event_async``.
+ASYNC_HANDLERS: Dict[str, Callable[[Dict[str, Any], Dict[str, str]], Any]] = {
+    "get_billing_status": get_billing_status_async,
+    "list_billing_status": list_billing_status_async,
+}
+
+# Handlers whose responses may be compressed (see ``response_compression``).
+COMPRESSED_ROUTES = frozenset(
+    {
+        "get_products",
+        "get_tenant_usage",
+        "get_billing_status",
+        "list_tenant_usage",
+        "export_usage_metrics",
+        "list_billing_status",
+        "batch_requests",
+    }
+)
 
-def route_event(event: Dict[str, Any]) -> Dict[str, Any]:
-    path = event.get("path", "")
-    http_method = event.get("httpMethod", "")
 
+def _match_route(http_method: str, path: str) -> Tuple[Callable[[Dict[str, Any], Dict[str, str]], LambdaResponse], Dict[str, str], bool, bool] | None:
     for method, pattern, handler, requires_auth, requires_tenant in ROUTES:
         if http_method != method:
             continue
         match = pattern.match(path)
-        if not match:
-            continue
-        params = match.groupdict()
-        claims: Dict[str, Any] = {}
-        if requires_auth:
-            try:
+        if match:
+            return handler, match.groupdict(), requires_auth, requires_tenant
+    return None
+
+
+Dispatch = Tuple[Callable[[Dict[str, Any], Dict[str, str]], LambdaResponse], Dict[str, Any], Dict[str, str]]
+
+
+def _prepare_route(event: Dict[str, Any], claims: Dict[str, Any] | None) -> Dispatch | Dict[str, Any]:
+    """Match, authenticate and resolve the tenant: the handler call, or an error response."""
+
+    path = event.get("path", "")
+    http_method = event.get("httpMethod", "")
+    metrics = instrumentation.current()
+
+    with instrumentation.phase("route"):
+        matched = _match_route(http_method, path)
+    if matched is None:
+        return build_response(404, {"message": "Resource not found", "path": path})
+    handler, params, requires_auth, requires_tenant = matched
+    if metrics is not None:
+        metrics.route, metrics.tenant_id = handler.__name__, params.get("tenantId")
+    verified = claims is not None
+    claims = claims or {}
+    if requires_auth and not verified:
+        try:
+            with instrumentation.phase("auth"):
                 claims = validate_token(event)
-            except AuthError as exc:
-                return build_response(exc.status_code, {"message": str(exc), **exc.details})
-        if requires_tenant:
-            try:
-                tenant_id, event, params, path_tenant = inject_tenant(event, params, claims=claims)
-            except AuthError as exc:
-                return build_response(exc.status_code, {"message": str(exc), **exc.details})
+        except AuthError as exc:
+            return build_response(exc.status_code, {"message": str(exc), **exc.details})
+        # Lets a batch hand the claims to its entries without verifying again.
+        event = {**event, "verifiedClaims": claims}
+    if requires_tenant:
         try:
-            status_code, payload, headers = handler(event, params)
+            with instrumentation.phase("tenant"):
+                tenant_id, event, params, path_tenant = inject_tenant(event, params, claims=claims)
         except AuthError as exc:
             return build_response(exc.status_code, {"message": str(exc), **exc.details})
-        return build_response(status_code, payload, headers)
+        if metrics is not None:
+            metrics.tenant_id = tenant_id
+    schema = FIELD_SCHEMAS.get(handler.__name__)
+    if schema is not None:
+        try:
+            fields = parse_fields((event.get("queryStringParameters") or {}).get("fields"), schema)
+        except ValueError as exc:
+            return build_response(400, {"message": str(exc), "allowedFields": sorted(schema)})
+        event = {**event, "fields": fields}
+    return handler, event, params
+
+
+def _serialize(handler: Callable[..., LambdaResponse], event: Dict[str, Any], result: LambdaResponse) -> Dict[str, Any]:
+    status_code, payload, headers = result
+    accept_encoding = None
+    if handler.__name__ in COMPRESSED_ROUTES:
+        accept_encoding = response_compression.accept_encoding_header(event.get("headers"))
+    with instrumentation.phase("serialize"):
+        return build_response(status_code, payload, headers, accept_encoding=accept_encoding)
+
+
+def _circuit_open_response(exc: dynamo_client.CircuitOpenError) -> Dict[str, Any]:
+    return build_response(503, {"message": str(exc)}, {"Retry-After": str(max(1, math.ceil(exc.retry_in)))})
+
+
+def route_event(event: Dict[str, Any], *, claims: Dict[str, Any] | None = None) -> Dict[str, Any]:
+    """Dispatch ``event``; ``claims`` already verified by the caller (a batch) skip token validation."""
+
+    prepared = _prepare_route(event, claims)
+    if isinstance(prepared, dict):
+        return prepared
+    handler, event, params = prepared
+    try:
+        with instrumentation.phase("handler"):
+            result = handler(event, params)
+    except AuthError as exc:
+        return build_response(exc.status_code, {"message": str(exc), **exc.details})
+    except dynamo_client.CircuitOpenError as exc:
+        return _circuit_open_response(exc)
+    return _serialize(handler, event, result)
+
+
+async def route_event_async(event: Dict[str, Any], *, claims: Dict[str, Any] | None = None) -> Dict[str, Any]:
+    """:func:`route_event` on an event loop.
+
+    Handlers listed in ``ASYNC_HANDLERS`` gather their independent reads;
+    every other handler runs unchanged on the I/O pool.
+    """
+
+    prepared = _prepare_route(event, claims)
+    if isinstance(prepared, dict):
+        return prepared
+    handler, event, params = prepared
+    coroutine = ASYNC_HANDLERS.get(handler.__name__)
+    try:
+        with instrumentation.phase("handler"):
+            if coroutine is not None:
+                result = await coroutine(event, params)
+            else:
+                result = await async_io.run_io(handler, event, params)
+    except AuthError as exc:
+        return build_response(exc.status_code, {"message": str(exc), **exc.details})
+    except dynamo_client.CircuitOpenError as exc:
+        return _circuit_open_response(exc)
+    return _serialize(handler, event, result)
 
-    return build_response(404, {"message": "Resource not found", "path": path})
+
+def _profile_reason(event: Dict[str, Any]) -> str | None:
+    """Why this request should be profiled, or ``None`` (the common, free case)."""
+
+    if profiling.header_requested(event.get("headers")):
+        try:
+            require_admin(validate_token(event))
+            return "header"
+        except AuthError:
+            pass
+    if profiling.has_allow_list():
+        tenant_id = (event.get("pathParameters") or {}).get("tenantId") or extract_tenant_id_from_claims(get_claims(event))
+        if profiling.take_tenant_sample(tenant_id):
+            return "tenant"
+    return None
+
+
+def _profiled_route(event: Dict[str, Any], reason: str) -> Dict[str, Any]:
+    tenant_id = (event.get("pathParameters") or {}).get("tenantId") or extract_tenant_id_from_claims(get_claims(event))
+    response, url = profiling.profile_call(
+        lambda: route_event(event),
+        tenant_id=tenant_id,
+        reason=reason,
+        label=f"{event.get('httpMethod', '')} {event.get('path', '')}",
+        request_id=(event.get("requestContext") or {}).get("requestId"),
+    )
+    if url:
+        response["headers"][profiling.RESPONSE_HEADER] = url
+        response["headers"]["Access-Control-Expose-Headers"] = profiling.RESPONSE_HEADER
+    return response
 
 
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    token = instrumentation.start_request()
+    try:
+        if event.get("httpMethod") == "OPTIONS":
+            response = build_response(200, {"message": "OK"})
+        else:
+            reason = _profile_reason(event)
+            response = route_event(event) if reason is None else _profiled_route(event, reason)
+    except Exception as exc:  # noqa: BLE001
+        response = build_response(500, {"message": "Internal server error", "error": str(exc)})
+    instrumentation.finish(token, response["statusCode"])
+    return response
+
+
+def async_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    """Lambda entry point dispatching through :func:`route_event_async`; ``handler`` stays available."""
+
+    token = instrumentation.start_request()
     try:
         if event.get("httpMethod") == "OPTIONS":
-            return build_response(200, {"message": "OK"})
-        return route_event(event)
+            response = build_response(200, {"message": "OK"})
+        else:
+            reason = _profile_reason(event)
+            response = asyncio.run(route_event_async(event)) if reason is None else _profiled_route(event, reason)
     except Exception as exc:  # noqa: BLE001
-        return build_response(500, {"message": "Internal server error", "error": str(exc)})
+        response = build_response(500, {"message": "Internal server error", "error": str(exc)})
+    instrumentation.finish(token, response["statusCode"])
+    return response
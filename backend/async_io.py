@@ -0,0 +1,56 @@
+"""asyncio bridge to the blocking boto3 clients.
+
+There is no async DynamoDB client in the Lambda runtime (and the local
+stand-ins are synchronous), so coroutines hand blocking calls to a shared
+thread pool of ``ASYNC_IO_CONCURRENCY`` workers with :func:`run_io`. That
+pool is the concurrency bound: a handler can ``gather`` as many reads as it
+likes, at most that many hit DynamoDB at once and the rest queue. The
+caller's context is copied into the worker so instrumentation still sees the
+sampled request.
+"""
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, TypeVar
+
+T = TypeVar("T")
+
+CONCURRENCY = int(os.getenv("ASYNC_IO_CONCURRENCY", "8"))
+
+_executor: ThreadPoolExecutor | None = None
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=max(1, CONCURRENCY), thread_name_prefix="async-io")
+    return _executor
+
+
+async def run_io(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Await ``func(*args, **kwargs)`` running on the I/O pool."""
+
+    context = contextvars.copy_context()
+    call = functools.partial(context.run, func, *args, **kwargs)
+    return await asyncio.get_running_loop().run_in_executor(_get_executor(), call)
+
+
+class AsyncRepository:
+    """Awaitable view of a repository: each method call goes through :func:`run_io`."""
+
+    def __init__(self, repository: Any) -> None:
+        self._repository = repository
+
+    def __getattr__(self, name: str) -> Any:
+        attribute = getattr(self._repository, name)
+        if not callable(attribute):
+            return attribute
+
+        async def call(*args: Any, **kwargs: Any) -> Any:
+            return await run_io(attribute, *args, **kwargs)
+
+        return call
@@ -0,0 +1,5 @@
+"""Offline performance harnesses that run against the in-repo AWS stand-ins.
+
+Run them from ``backend/`` as modules, e.g.
+``python -m benchmarks.inventory_contention --help``.
+"""
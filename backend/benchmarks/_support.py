@@ -0,0 +1,135 @@
+"""Shared helpers for the benchmark scripts.
+
+Importing this module puts the repository root first on ``sys.path`` so the
+local ``boto3``/``botocore`` stand-ins are used instead of any installed SDK.
+"""
+from __future__ import annotations
+
+import json
+import math
+import os
+import sys
+import uuid
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Sequence
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+ROOT = os.path.abspath(os.path.join(BACKEND_DIR, ".."))
+for path in (BACKEND_DIR, ROOT):
+    if path in sys.path:
+        sys.path.remove(path)
+    sys.path.insert(0, path)
+
+
+def percentile(sorted_values: Sequence[float], q: float) -> float:
+    """Nearest-rank percentile of an already sorted sequence (``q`` in 0..100)."""
+
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(q / 100.0 * len(sorted_values)))
+    return float(sorted_values[min(rank, len(sorted_values)) - 1])
+
+
+def latency_summary(samples_ms: Sequence[float]) -> Dict[str, float]:
+    ordered = sorted(samples_ms)
+    return {
+        "count": len(ordered),
+        "p50Ms": round(percentile(ordered, 50), 3),
+        "p95Ms": round(percentile(ordered, 95), 3),
+        "p99Ms": round(percentile(ordered, 99), 3),
+        "maxMs": round(ordered[-1], 3) if ordered else 0.0,
+    }
+
+
+def write_json(path: str | None, payload: Any) -> None:
+    if not path:
+        return
+    with open(path, "w", encoding="utf-8") as handle:
+        json.dump(payload, handle, indent=2, sort_keys=True, default=str)
+        handle.write("\n")
+
+
+def _index(name: str, hash_key: str, range_key: str | None = None) -> Dict[str, Any]:
+    schema = [{"AttributeName": hash_key, "KeyType": "HASH"}]
+    if range_key:
+        schema.append({"AttributeName": range_key, "KeyType": "RANGE"})
+    return {"IndexName": name, "KeySchema": schema, "Projection": {"ProjectionType": "ALL"}}
+
+
+# Env var -> (key attributes, global secondary indexes). Products follow
+# cloudformation/backend.yml (tenantId + productId). Orders, carts and
+# transactions keep the single-attribute key ``app`` addresses them by
+# (``get_item({"cartId": ...})``); the template prefixes those with tenantId.
+STACK_TABLES: Dict[str, Any] = {
+    "ORDERS_TABLE": (("orderId",), []),
+    "CARTS_TABLE": (("cartId",), [_index("UserCartIndex", "userId", "createdAt")]),
+    "TRANSACTIONS_TABLE": (("transactionId",), [_index("PaymentsByTenant", "tenantId", "receivedAt")]),
+    "INVENTORY_TABLE": (("inventoryKey",), []),
+    "PRODUCTS_TABLE": (("tenantId", "productId"), []),
+}
+APP_GLOBALS = (
+    "tenant_repository",
+    "cart_repository",
+    "order_repository",
+    "subscription_repository",
+    "product_repository",
+    "inventory_store",
+    "webhook_deduplicator",
+    "webhook_queue",
+)
+
+
+@contextmanager
+def local_stack(prefix: str = "bench", **env: str) -> Iterator[Dict[str, str]]:
+    """Create fresh stack tables in the local stand-in and point ``app`` at them.
+
+    Environment variables and the lazily created repositories in ``app`` are
+    restored on exit, so benchmarks can run inside the test suite.
+    """
+
+    import app
+    import boto3
+
+    resource = boto3.resource("dynamodb", region_name=os.getenv("AWS_REGION", "us-east-1"))
+    run_id = uuid.uuid4().hex[:6]
+    tables: Dict[str, str] = {}
+    for env_name, (keys, indexes) in STACK_TABLES.items():
+        name = f"{prefix}-{env_name.split('_')[0].lower()}-{run_id}"
+        resource.create_table(
+            TableName=name,
+            KeySchema=[{"AttributeName": key, "KeyType": key_type} for key, key_type in zip(keys, ("HASH", "RANGE"))],
+            BillingMode="PAY_PER_REQUEST",
+            GlobalSecondaryIndexes=indexes,
+        )
+        tables[env_name] = name
+
+    overrides = {**tables, **env}
+    saved_env = {name: os.environ.get(name) for name in overrides}
+    saved_globals = {name: getattr(app, name) for name in APP_GLOBALS}
+    os.environ.update(overrides)
+    for name in APP_GLOBALS:
+        setattr(app, name, None)
+    try:
+        yield tables
+    finally:
+        for name, value in saved_env.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+        for name, value in saved_globals.items():
+            setattr(app, name, value)
+
+
+def count_items(table_name: str) -> int:
+    import boto3
+
+    table = boto3.resource("dynamodb", region_name=os.getenv("AWS_REGION", "us-east-1")).Table(table_name)
+    request: Dict[str, Any] = {"Select": "COUNT"}
+    total = 0
+    while True:
+        response = table.scan(**request)
+        total += response["Count"]
+        if "LastEvaluatedKey" not in response:
+            return total
+        request["ExclusiveStartKey"] = response["LastEvaluatedKey"]
@@ -0,0 +1,84 @@
+"""Latency of the sync and async entry points on the billing routes.
+
+Seeds ``--tenants`` subscriptions, adds ``--read-latency-ms`` to every local
+DynamoDB read and times ``app.handler`` against ``app.async_handler`` on a
+tenant's billing status and on the admin billing list. The async variants
+keep their independent reads in flight together, so their latency should
+approach the slowest read instead of the sum.
+
+    python -m benchmarks.async_dispatch --tenants 4 --read-latency-ms 50 --repeats 5
+"""
+from __future__ import annotations
+
+import argparse
+import time
+from datetime import date
+from typing import Any, Callable, Dict, List, Sequence
+
+from benchmarks._support import latency_summary, local_stack, write_json
+
+import app
+import boto3
+
+
+def _event(path: str, claims: Dict[str, str]) -> Dict[str, Any]:
+    return {
+        "path": path,
+        "httpMethod": "GET",
+        "headers": {},
+        "queryStringParameters": {},
+        "requestContext": {"authorizer": {"jwt": {"claims": {"exp": (date.today().toordinal() + 1) * 86400, **claims}}}},
+    }
+
+
+def _time(entry_point: Callable[[Dict[str, Any], Any], Dict[str, Any]], event: Dict[str, Any], repeats: int) -> Dict[str, float]:
+    samples: List[float] = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        response = entry_point(event, None)
+        samples.append((time.perf_counter() - started) * 1000)
+        if response["statusCode"] != 200:
+            raise RuntimeError(f"{event['path']} answered {response['statusCode']}")
+    return latency_summary(samples)
+
+
+def run_benchmark(tenants: int = 4, read_latency_ms: float = 50.0, repeats: int = 5) -> List[Dict[str, Any]]:
+    with local_stack("async-bench"):
+        _, _, _, subscriptions = app._get_repositories()
+        tenant_ids = [f"bench-{index:04d}" for index in range(tenants)]
+        for tenant_id in tenant_ids:
+            subscriptions.activate_plan(tenant_id, "growth", "pref-1", None)
+        events = {
+            "get_billing_status": _event(f"/v1/{tenant_ids[0]}/billing", {"custom:tenantId": tenant_ids[0]}),
+            "list_billing_status": _event("/v1/admin/tenants/billing", {"roles": "admin"}),
+        }
+        boto3.configure_local_dynamodb(read_latency_ms=read_latency_ms)
+        try:
+            results = []
+            for route, event in events.items():
+                sync, asynchronous = _time(app.handler, event, repeats), _time(app.async_handler, event, repeats)
+                speedup = round(sync["p50Ms"] / asynchronous["p50Ms"], 2) if asynchronous["p50Ms"] else 0.0
+                results.append({"route": route, "sync": sync, "async": asynchronous, "speedup": speedup})
+            return results
+        finally:
+            boto3.configure_local_dynamodb()
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tenants", type=int, default=4)
+    parser.add_argument("--read-latency-ms", type=float, default=50.0)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--json", dest="json_path", help="Write the results to this file")
+    args = parser.parse_args(argv)
+
+    results = run_benchmark(args.tenants, args.read_latency_ms, args.repeats)
+    print(f"{'route':<20} {'sync p50':>9} {'async p50':>10} {'speedup':>8}")
+    for row in results:
+        print(f"{row['route']:<20} {row['sync']['p50Ms']:>9} {row['async']['p50Ms']:>10} {row['speedup']:>8}")
+    write_json(args.json_path, {"benchmark": "async_dispatch", "results": results})
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
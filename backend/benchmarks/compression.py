@@ -0,0 +1,111 @@
+"""Size reduction and CPU cost of response compression on real payloads.
+
+Seeds ``--tenants`` x ``--days`` daily usage aggregates, renders the admin
+usage list, the CSV export and one tenant's usage history through
+``app.route_event`` and compresses each body with every supported encoding
+(brotli only when the ``brotli`` package is installed).
+
+    python -m benchmarks.compression --tenants 200 --days 30 --repeats 20
+"""
+from __future__ import annotations
+
+import argparse
+import base64
+import time
+from datetime import date, timedelta
+from typing import Any, Dict, List, Sequence
+
+from benchmarks._support import latency_summary, write_json
+
+import app
+import response_compression
+from usage_tracker import UsageRecord, tracker
+
+
+def _event(path: str, query: Dict[str, str] | None = None) -> Dict[str, Any]:
+    claims = {"exp": (date.today().toordinal() + 1) * 86400, "roles": "admin", "custom:tenantId": "bench-0000"}
+    return {
+        "path": path,
+        "httpMethod": "GET",
+        "headers": {},
+        "queryStringParameters": query or {},
+        "requestContext": {"authorizer": {"jwt": {"claims": claims}}},
+    }
+
+
+def build_payloads(tenants: int, days: int) -> Dict[str, str]:
+    """Uncompressed bodies of the compressible routes, keyed by route."""
+
+    today = date.today()
+    try:
+        for day in range(days):
+            period = (today - timedelta(days=day)).isoformat()
+            for index in range(tenants):
+                tracker.append_aggregate(
+                    UsageRecord(
+                        tenantId=f"bench-{index:04d}",
+                        period=period,
+                        usage={"requests": float(900 + index * 7 % 400), "orders": float(index % 37), "gmv": round(index * 13.37, 2), "bytes": float(51200 + index)},
+                        createdAt=f"{period}T00:05:00Z",
+                    )
+                )
+        events = {
+            "list_tenant_usage": _event("/v1/admin/tenants/usage", {"pageSize": "100"}),
+            "export_usage_metrics": _event("/v1/admin/tenants/usage/export"),
+            "get_tenant_usage": _event("/v1/bench-0000/usage"),
+        }
+        return {route: app.route_event(event)["body"] for route, event in events.items()}
+    finally:
+        tracker.reset()
+
+
+def measure(body: str, encoding: str, repeats: int) -> Dict[str, Any]:
+    data = body.encode()
+    samples: List[float] = []
+    compressed = b""
+    for _ in range(repeats):
+        started = time.perf_counter()
+        compressed = response_compression.compress(data, encoding)
+        samples.append((time.perf_counter() - started) * 1000)
+    encoded = len(base64.b64encode(compressed))
+    return {
+        "encoding": encoding,
+        "rawBytes": len(data),
+        "compressedBytes": len(compressed),
+        # What API Gateway receives from Lambda, and what counts against the payload limit.
+        "base64Bytes": encoded,
+        "ratio": round(len(data) / encoded, 2) if encoded else 0.0,
+        "cpu": latency_summary(samples),
+    }
+
+
+def run_benchmark(tenants: int = 200, days: int = 30, repeats: int = 20) -> List[Dict[str, Any]]:
+    payloads = build_payloads(tenants, days)
+    return [
+        {"route": route, **measure(body, encoding, repeats)}
+        for route, body in payloads.items()
+        for encoding in response_compression.supported_encodings()
+    ]
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tenants", type=int, default=200)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--json", dest="json_path", help="Write the results to this file")
+    args = parser.parse_args(argv)
+
+    results = run_benchmark(args.tenants, args.days, args.repeats)
+    print(f"{'route':<22} {'enc':>4} {'raw KB':>9} {'sent KB':>9} {'ratio':>6} {'p50 ms':>8} {'p99 ms':>8}")
+    for row in results:
+        print(
+            f"{row['route']:<22} {row['encoding']:>4} {row['rawBytes'] / 1024:>9.1f} {row['base64Bytes'] / 1024:>9.1f} "
+            f"{row['ratio']:>6} {row['cpu']['p50Ms']:>8} {row['cpu']['p99Ms']:>8}"
+        )
+    write_json(args.json_path, {"benchmark": "compression", "results": results})
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
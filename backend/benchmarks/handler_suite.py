@@ -0,0 +1,178 @@
+"""End-to-end latency of every API route under synthetic multi-tenant traffic.
+
+Builds fresh stack tables in the local DynamoDB stand-in, onboards
+``--tenants`` tenants (catalog, stock and an open cart each) and then drives
+``app.handler`` with a weighted mix of API Gateway events. Reports per-route
+p50/p95/p99 latency, service rate, status codes, allocations per request
+(a separate ``tracemalloc`` pass, so tracing does not skew the timings),
+stored item counts and the read/write units consumed per table.
+
+    python -m benchmarks.handler_suite --tenants 50 --requests 5000 --json run.json
+    python -m benchmarks.handler_suite --baseline run.json --tolerance 0.2
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import time
+import tracemalloc
+from collections import Counter, defaultdict
+from typing import Any, Dict, List, Sequence
+
+from benchmarks._support import count_items, latency_summary, local_stack, write_json
+from benchmarks.traffic import TrafficGenerator, TrafficProfile, parse_claims, parse_mix
+
+import app
+import boto3
+from usage_tracker import tracker
+
+
+def _allocations(generator: TrafficGenerator, samples: int) -> Dict[str, Dict[str, float]]:
+    """Mean peak and retained bytes per request for each route."""
+
+    results: Dict[str, Dict[str, float]] = {}
+    tracemalloc.start()
+    try:
+        for route in generator.routes():
+            peaks: List[int] = []
+            retained: List[int] = []
+            for _ in range(samples):
+                event = generator.event(route)
+                tracemalloc.reset_peak()
+                before = tracemalloc.get_traced_memory()[0]
+                app.handler(event, None)
+                current, peak = tracemalloc.get_traced_memory()
+                peaks.append(peak - before)
+                retained.append(current - before)
+            results[route] = {
+                "meanPeakKb": round(sum(peaks) / len(peaks) / 1024, 2),
+                "meanRetainedKb": round(sum(retained) / len(retained) / 1024, 2),
+            }
+    finally:
+        tracemalloc.stop()
+    return results
+
+
+def run_suite(
+    profile: TrafficProfile,
+    requests: int = 2000,
+    warmup: int = 200,
+    allocation_samples: int = 20,
+    webhook_mode: str = "sync",
+) -> Dict[str, Any]:
+    with local_stack("bench", WEBHOOK_MODE=webhook_mode) as tables:
+        tracker.reset()
+        generator = TrafficGenerator(profile)
+        generator.seed()
+        for _, event in generator.stream(warmup):
+            app.handler(event, None)
+        boto3.reset_local_dynamodb()
+
+        samples: Dict[str, List[float]] = defaultdict(list)
+        statuses: Dict[str, Counter] = defaultdict(Counter)
+        started = time.perf_counter()
+        for route, event in generator.stream(requests):
+            request_started = time.perf_counter()
+            response = app.handler(event, None)
+            samples[route].append((time.perf_counter() - request_started) * 1000)
+            statuses[route][str(response["statusCode"])] += 1
+        elapsed = time.perf_counter() - started
+        capacity = {env_name: boto3.local_dynamodb_stats(name) for env_name, name in tables.items()}
+
+        allocations = _allocations(generator, allocation_samples) if allocation_samples else {}
+        stored = {env_name: count_items(name) for env_name, name in tables.items()}
+        tracker.reset()
+
+    routes = {}
+    for route, route_samples in sorted(samples.items()):
+        busy_s = sum(route_samples) / 1000
+        routes[route] = {
+            "latency": latency_summary(route_samples),
+            "servicePerS": round(len(route_samples) / busy_s, 1) if busy_s else 0.0,
+            "statuses": dict(statuses[route]),
+            "allocations": allocations.get(route, {}),
+        }
+    return {
+        "benchmark": "handler_suite",
+        "config": {
+            "tenants": profile.tenants,
+            "requests": requests,
+            "bodyBytes": profile.body_bytes,
+            "productsPerTenant": profile.products_per_tenant,
+            "mix": profile.mix,
+            "seed": profile.seed,
+            "webhookMode": webhook_mode,
+        },
+        "elapsedS": round(elapsed, 4),
+        "throughputPerS": round(requests / elapsed, 1) if elapsed else 0.0,
+        "routes": routes,
+        "storedItems": stored,
+        "capacity": {
+            env_name: {key: stats[key] for key in ("readUnits", "writeUnits", "indexWriteUnits", "requests")}
+            for env_name, stats in capacity.items()
+        },
+    }
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], tolerance: float = 0.2, floor_ms: float = 0.05) -> List[str]:
+    """Routes whose p95 grew by more than ``tolerance`` (and ``floor_ms``) over the baseline."""
+
+    regressions = []
+    for route, result in current["routes"].items():
+        before = baseline.get("routes", {}).get(route)
+        if not before:
+            continue
+        old, new = before["latency"]["p95Ms"], result["latency"]["p95Ms"]
+        if new > old * (1 + tolerance) and new - old > floor_ms:
+            regressions.append(f"{route}: p95 {old:.3f} ms -> {new:.3f} ms")
+    return regressions
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tenants", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--warmup", type=int, default=200)
+    parser.add_argument("--mix", help="Route weights, e.g. get_products=5,create_order=1 (others keep their default)")
+    parser.add_argument("--body-bytes", type=int, default=256, help="Padding added to request bodies and line items")
+    parser.add_argument("--products-per-tenant", type=int, default=20)
+    parser.add_argument("--claim", action="append", help="Extra JWT claim name=value added to every token")
+    parser.add_argument("--allocation-samples", type=int, default=20, help="Requests per route traced with tracemalloc (0 disables)")
+    parser.add_argument("--webhook-mode", choices=["sync", "async"], default="sync")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", dest="json_path", help="Write the results to this file")
+    parser.add_argument("--baseline", help="Previous --json output to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative p95 growth before failing")
+    args = parser.parse_args(argv)
+
+    profile = TrafficProfile(
+        tenants=args.tenants,
+        mix=parse_mix(args.mix),
+        body_bytes=args.body_bytes,
+        products_per_tenant=args.products_per_tenant,
+        claims=parse_claims(args.claim),
+        seed=args.seed,
+    )
+    result = run_suite(profile, args.requests, args.warmup, args.allocation_samples, args.webhook_mode)
+
+    print(f"{'route':<30} {'count':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'peak KB':>8} statuses")
+    for route, row in result["routes"].items():
+        latency = row["latency"]
+        print(
+            f"{route:<30} {latency['count']:>6} {latency['p50Ms']:>8} {latency['p95Ms']:>8} {latency['p99Ms']:>8} "
+            f"{row['allocations'].get('meanPeakKb', '-'):>8} {row['statuses']}"
+        )
+    print(f"throughput: {result['throughputPerS']} req/s; stored items: {result['storedItems']}")
+    write_json(args.json_path, result)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as handle:
+            regressions = compare(json.load(handle), result, args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
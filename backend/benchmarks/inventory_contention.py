@@ -0,0 +1,111 @@
+"""Hot-SKU reservation throughput with and without counter shards.
+
+Every worker thread reserves one unit of the same SKU per simulated order.
+The local DynamoDB stand-in serializes writes per item for
+``--write-latency-ms`` and cancels transactions that touch an item with a
+write in flight, so a single stock counter becomes the bottleneck the same
+way a hot partition key does in DynamoDB.
+
+    python -m benchmarks.inventory_contention --shards 1 4 16 --threads 16
+"""
+from __future__ import annotations
+
+import argparse
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Sequence
+
+from benchmarks._support import latency_summary, write_json
+
+import boto3
+from inventory import InventoryError, InventoryStore
+
+TENANT_ID = "bench"
+HOT_SKU = "hot-sku"
+
+
+def _create_table(name: str) -> None:
+    boto3.resource("dynamodb", region_name="us-east-1").create_table(
+        TableName=name,
+        KeySchema=[{"AttributeName": "inventoryKey", "KeyType": "HASH"}],
+        AttributeDefinitions=[{"AttributeName": "inventoryKey", "AttributeType": "S"}],
+        BillingMode="PAY_PER_REQUEST",
+    )
+
+
+def run_scenario(shards: int, threads: int, orders_per_thread: int, write_latency_ms: float) -> Dict[str, Any]:
+    table_name = f"bench-inventory-{shards}-{uuid.uuid4().hex[:6]}"
+    _create_table(table_name)
+    store = InventoryStore(table_name)
+    total_orders = threads * orders_per_thread
+    store.set_stock(TENANT_ID, HOT_SKU, total_orders * 2, shards=shards)
+    boto3.configure_local_dynamodb(write_latency_ms=write_latency_ms)
+
+    def worker(worker_id: int) -> List[Dict[str, Any]]:
+        results = []
+        for order_number in range(orders_per_thread):
+            order_id = f"ord-{worker_id}-{order_number}"
+            started = time.perf_counter()
+            try:
+                reservation = store.reserve(TENANT_ID, order_id, [{"sku": HOT_SKU, "quantity": 1}])
+                results.append({"ok": True, "attempts": reservation.attempts, "ms": (time.perf_counter() - started) * 1000})
+            except InventoryError:
+                results.append({"ok": False, "attempts": 0, "ms": (time.perf_counter() - started) * 1000})
+        return results
+
+    started = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            outcomes = [result for batch in pool.map(worker, range(threads)) for result in batch]
+    finally:
+        boto3.configure_local_dynamodb(write_latency_ms=0)
+    elapsed = time.perf_counter() - started
+
+    succeeded = [outcome for outcome in outcomes if outcome["ok"]]
+    report = store.reconcile_sku(TENANT_ID, HOT_SKU, repair=False)
+    return {
+        "shards": shards,
+        "threads": threads,
+        "orders": total_orders,
+        "reserved": len(succeeded),
+        "failed": total_orders - len(succeeded),
+        "elapsedS": round(elapsed, 4),
+        "throughputPerS": round(len(succeeded) / elapsed, 1) if elapsed else 0.0,
+        "meanAttempts": round(sum(outcome["attempts"] for outcome in succeeded) / max(1, len(succeeded)), 3),
+        "latency": latency_summary([outcome["ms"] for outcome in succeeded]),
+        "stockDrift": report.drift,
+    }
+
+
+def run_benchmark(
+    shard_counts: Sequence[int] = (1, 4, 16),
+    threads: int = 16,
+    orders_per_thread: int = 50,
+    write_latency_ms: float = 2.0,
+) -> List[Dict[str, Any]]:
+    return [run_scenario(shards, threads, orders_per_thread, write_latency_ms) for shards in shard_counts]
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--shards", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--orders-per-thread", type=int, default=50)
+    parser.add_argument("--write-latency-ms", type=float, default=2.0)
+    parser.add_argument("--json", dest="json_path", help="Write the results to this file")
+    args = parser.parse_args(argv)
+
+    results = run_benchmark(args.shards, args.threads, args.orders_per_thread, args.write_latency_ms)
+    print(f"{'shards':>6} {'reserved':>8} {'res/s':>9} {'attempts':>8} {'p50 ms':>8} {'p99 ms':>8} {'drift':>5}")
+    for row in results:
+        print(
+            f"{row['shards']:>6} {row['reserved']:>8} {row['throughputPerS']:>9} {row['meanAttempts']:>8} "
+            f"{row['latency']['p50Ms']:>8} {row['latency']['p99Ms']:>8} {row['stockDrift']:>5}"
+        )
+    write_json(args.json_path, {"benchmark": "inventory_contention", "results": results})
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
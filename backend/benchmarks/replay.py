@@ -0,0 +1,208 @@
+"""Replay API Gateway event streams against ``app.handler`` at a target arrival rate.
+
+Events come from a JSONL file (one API Gateway proxy event per line, as
+captured from the Lambda, or ``{"event": {...}}`` wrappers) or are generated
+with :mod:`benchmarks.traffic` (``--synthetic N``; ``--record`` saves them
+for later replays). They run in-process on a thread pool or, with
+``--executor process``, on forked worker processes that each start from a
+copy of the seeded local tables.
+
+Arrivals are open-loop: request ``i`` is due at ``i / rate`` seconds whether
+or not earlier requests have finished, and latency is measured from that
+due time, so queueing behind a saturated pool shows up in the percentiles
+instead of silently lowering the offered load. ``--find-saturation`` raises
+the rate by ``--step`` until throughput falls behind the offered rate or the
+p99 breaks ``--slo-ms``.
+
+    python -m benchmarks.replay --synthetic 5000 --rate 400 --concurrency 8
+    python -m benchmarks.replay --events captured.jsonl --executor process --find-saturation
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import multiprocessing
+import time
+from collections import defaultdict
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import ExitStack
+from typing import Any, Dict, Iterable, List, Sequence, Tuple
+
+from benchmarks._support import latency_summary, local_stack, write_json
+from benchmarks.traffic import TrafficGenerator, TrafficProfile, parse_mix
+
+import app
+from usage_tracker import tracker
+
+Outcome = Tuple[str, str, int, float, float, float]
+
+
+def load_events(path: str, refresh_tokens: bool = True) -> List[Dict[str, Any]]:
+    """Read a JSONL capture; ``refresh_tokens`` moves JWT ``exp`` claims an hour ahead."""
+
+    with open(path, encoding="utf-8") as handle:
+        events = [json.loads(line) for line in handle if line.strip()]
+    events = [entry.get("event", entry) for entry in events]
+    if refresh_tokens:
+        for event in events:
+            claims = app.get_claims(event)
+            if claims.get("exp"):
+                claims["exp"] = int(time.time()) + 3600
+    return events
+
+
+def save_events(path: str, events: Iterable[Dict[str, Any]]) -> None:
+    with open(path, "w", encoding="utf-8") as handle:
+        for event in events:
+            handle.write(json.dumps(event) + "\n")
+
+
+def classify(event: Dict[str, Any]) -> Tuple[str, str]:
+    """(route, tenant) for an event, using the same table ``route_event`` does."""
+
+    path = event.get("path", "")
+    for method, pattern, handler, _, _ in app.ROUTES:
+        match = pattern.match(path) if method == event.get("httpMethod") else None
+        if match:
+            tenant = match.groupdict().get("tenantId") or (event.get("pathParameters") or {}).get("tenantId") or "-"
+            return handler.__name__, tenant
+    return "unrouted", "-"
+
+
+def _invoke(event: Dict[str, Any], due: float) -> Outcome:
+    started = time.time()
+    try:
+        status = int(app.handler(event, None)["statusCode"])
+    except Exception:  # noqa: BLE001 - the handler itself should never raise
+        status = 599
+    finished = time.time()
+    route, tenant = classify(event)
+    return route, tenant, status, due, started, finished
+
+
+def _summarize(outcomes: List[Outcome]) -> Dict[str, Any]:
+    latencies = [(finished - due) * 1000 for *_, due, _, finished in outcomes]
+    service = [(finished - started) * 1000 for *_, started, finished in outcomes]
+    server_errors = sum(1 for outcome in outcomes if outcome[2] >= 500)
+    client_errors = sum(1 for outcome in outcomes if 400 <= outcome[2] < 500)
+    return {
+        "latency": latency_summary(latencies),
+        "service": latency_summary(service),
+        "errorRate": round(server_errors / len(outcomes), 4) if outcomes else 0.0,
+        "clientErrorRate": round(client_errors / len(outcomes), 4) if outcomes else 0.0,
+    }
+
+
+def _grouped(outcomes: List[Outcome], position: int) -> Dict[str, Dict[str, Any]]:
+    groups: Dict[str, List[Outcome]] = defaultdict(list)
+    for outcome in outcomes:
+        groups[outcome[position]].append(outcome)
+    return {name: _summarize(members) for name, members in sorted(groups.items())}
+
+
+def run_load(events: Sequence[Dict[str, Any]], executor: Executor, rate: float) -> Dict[str, Any]:
+    """Submit ``events`` at ``rate`` per second (0 = as fast as possible) and wait for all."""
+
+    futures = []
+    started = time.time()
+    for index, event in enumerate(events):
+        due = started + (index / rate if rate else 0.0)
+        delay = due - time.time()
+        if delay > 0:
+            time.sleep(delay)
+        futures.append(executor.submit(_invoke, event, due if rate else time.time()))
+    outcomes: List[Outcome] = [future.result() for future in futures]
+    elapsed = max(outcome[5] for outcome in outcomes) - started if outcomes else 0.0
+    return {
+        "offeredPerS": rate or None,
+        "requests": len(outcomes),
+        "elapsedS": round(elapsed, 4),
+        "throughputPerS": round(len(outcomes) / elapsed, 1) if elapsed else 0.0,
+        **_summarize(outcomes),
+        "routes": _grouped(outcomes, 0),
+        "tenants": _grouped(outcomes, 1),
+    }
+
+
+def find_saturation(
+    events: Sequence[Dict[str, Any]], executor: Executor, start_rate: float, step: float, slo_ms: float, max_steps: int = 12
+) -> Dict[str, Any]:
+    """Raise the rate until throughput lags the offer by >10% or p99 exceeds ``slo_ms``."""
+
+    steps = []
+    sustained = None
+    rate = start_rate
+    for _ in range(max_steps):
+        result = run_load(events, executor, rate)
+        healthy = result["throughputPerS"] >= 0.9 * rate and result["latency"]["p99Ms"] <= slo_ms
+        steps.append({key: result[key] for key in ("offeredPerS", "throughputPerS", "latency", "errorRate")} | {"healthy": healthy})
+        if not healthy:
+            break
+        sustained = rate
+        rate = round(rate * step, 1)
+    return {"saturationPerS": sustained, "sloMs": slo_ms, "steps": steps}
+
+
+def _executor(kind: str, concurrency: int) -> Executor:
+    if kind == "process":
+        return ProcessPoolExecutor(max_workers=concurrency, mp_context=multiprocessing.get_context("fork"))
+    return ThreadPoolExecutor(max_workers=concurrency)
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--events", help="JSONL file with API Gateway events")
+    source.add_argument("--synthetic", type=int, help="Generate this many events with benchmarks.traffic")
+    parser.add_argument("--record", help="Also write the synthetic events to this JSONL file")
+    parser.add_argument("--keep-exp", action="store_true", help="Replay captured JWT exp claims unchanged")
+    parser.add_argument("--tenants", type=int, default=20)
+    parser.add_argument("--mix", help="Route weights for --synthetic, e.g. get_products=5,create_order=1")
+    parser.add_argument("--executor", choices=["thread", "process"], default="thread")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--rate", type=float, default=200.0, help="Arrivals per second (0 = closed loop, as fast as possible)")
+    parser.add_argument("--find-saturation", action="store_true")
+    parser.add_argument("--step", type=float, default=1.5, help="Rate multiplier between saturation steps")
+    parser.add_argument("--slo-ms", type=float, default=250.0, help="p99 latency objective for the saturation search")
+    parser.add_argument("--local", action=argparse.BooleanOptionalAction, default=True, help="Run against fresh local tables")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", dest="json_path", help="Write the results to this file")
+    args = parser.parse_args(argv)
+
+    with ExitStack() as stack:
+        if args.local:
+            stack.enter_context(local_stack("replay"))
+            tracker.reset()
+        if args.synthetic:
+            generator = TrafficGenerator(TrafficProfile(tenants=args.tenants, mix=parse_mix(args.mix), seed=args.seed))
+            generator.seed()
+            events = [event for _, event in generator.stream(args.synthetic)]
+            if args.record:
+                save_events(args.record, events)
+        else:
+            events = load_events(args.events, refresh_tokens=not args.keep_exp)
+
+        executor = stack.enter_context(_executor(args.executor, args.concurrency))
+        if args.find_saturation:
+            result = find_saturation(events, executor, args.rate or 50.0, args.step, args.slo_ms)
+            for row in result["steps"]:
+                print(
+                    f"offered {row['offeredPerS']:>8}/s achieved {row['throughputPerS']:>8}/s "
+                    f"p99 {row['latency']['p99Ms']:>9} ms errors {row['errorRate']:.2%} {'ok' if row['healthy'] else 'SATURATED'}"
+                )
+            print(f"sustained rate: {result['saturationPerS']} req/s")
+        else:
+            result = run_load(events, executor, args.rate)
+            print(f"{'route':<30} {'count':>6} {'p50 ms':>8} {'p99 ms':>8} {'5xx':>7} {'4xx':>7}")
+            for route, row in result["routes"].items():
+                print(
+                    f"{route:<30} {row['latency']['count']:>6} {row['latency']['p50Ms']:>8} {row['latency']['p99Ms']:>8} "
+                    f"{row['errorRate']:>7.2%} {row['clientErrorRate']:>7.2%}"
+                )
+            print(f"throughput: {result['throughputPerS']} req/s (offered {result['offeredPerS']}); error rate {result['errorRate']:.2%}")
+    write_json(args.json_path, {"benchmark": "replay", "executor": args.executor, "concurrency": args.concurrency, **result})
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
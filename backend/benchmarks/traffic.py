@@ -0,0 +1,248 @@
+"""Synthetic multi-tenant API Gateway traffic for every route in ``app.ROUTES``.
+
+Events are shaped like the REST API proxy events the Lambda receives: path
+and query parameters, a JSON body padded to ``body_bytes`` and the Cognito
+JWT claims API Gateway places under ``requestContext.authorizer``. Routes
+are named after their handler function (``create_order``, ``get_cart``...)
+and picked at random according to a weighted mix.
+"""
+from __future__ import annotations
+
+import json
+import random
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, Tuple
+from urllib.parse import quote
+
+from benchmarks import _support  # noqa: F401 - local boto3 stand-in first on sys.path
+
+import app
+from inventory import InventoryStore
+
+ROUTE_NAMES = tuple(handler.__name__ for _, _, handler, _, _ in app.ROUTES)
+
+# Storefront reads dominate; admin reports and onboarding are rare.
+DEFAULT_MIX: Dict[str, float] = {
+    "create_tenant": 0.2,
+    "create_tenant_user": 0.3,
+    "get_products": 20,
+    "get_product_by_id": 15,
+    "create_cart": 6,
+    "get_cart": 12,
+    "add_cart_item": 10,
+    "update_cart_item": 5,
+    "remove_cart_item": 3,
+    "create_order": 6,
+    "create_subscription_checkout": 0.5,
+    "handle_mercadopago_webhook": 6,
+    "get_sales_analytics": 2,
+    "get_tenant_usage": 2,
+    "get_billing_status": 2,
+    "list_tenant_usage": 0.3,
+    "export_usage_metrics": 0.2,
+    "list_billing_status": 0.3,
+    "batch_requests": 3,
+}
+PAYMENT_STATUSES = ("approved", "approved", "approved", "pending", "rejected")
+
+
+def parse_mix(text: str | None) -> Dict[str, float]:
+    """``"get_products=5,create_order=1"`` -> weights; unknown routes are rejected."""
+
+    mix = dict(DEFAULT_MIX)
+    if not text:
+        return mix
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in ROUTE_NAMES:
+            raise ValueError(f"Unknown route {name!r}; expected one of {', '.join(ROUTE_NAMES)}")
+        mix[name] = float(weight or 0)
+    return mix
+
+
+def parse_claims(pairs: List[str] | None) -> Dict[str, Any]:
+    claims: Dict[str, Any] = {}
+    for pair in pairs or []:
+        name, _, value = pair.partition("=")
+        claims[name.strip()] = value
+    return claims
+
+
+@dataclass
+class TrafficProfile:
+    tenants: int = 20
+    mix: Dict[str, float] = field(default_factory=lambda: dict(DEFAULT_MIX))
+    body_bytes: int = 256
+    products_per_tenant: int = 20
+    claims: Dict[str, Any] = field(default_factory=dict)
+    seed: int = 7
+
+
+class TrafficGenerator:
+    def __init__(self, profile: TrafficProfile) -> None:
+        self.profile = profile
+        self.rng = random.Random(profile.seed)
+        self.tenant_ids = [f"bench-{index:04d}" for index in range(profile.tenants)]
+        self.carts: Dict[str, str] = {}
+        routes = [name for name in ROUTE_NAMES if profile.mix.get(name, 0) > 0]
+        self._routes = routes
+        self._weights = [profile.mix[name] for name in routes]
+
+    # -- seeding -------------------------------------------------------------
+    def seed(self, invoke: Callable[[Dict[str, Any], Any], Dict[str, Any]] = app.handler) -> None:
+        """Onboard every tenant, stock its catalog and open one cart per tenant."""
+
+        inventory = InventoryStore()
+        products = app.ProductRepository("PRODUCTS_TABLE")
+        for tenant_id in self.tenant_ids:
+            invoke(self._event("POST", "/v1/tenants", {"tenantId": tenant_id, "name": f"Tienda {tenant_id}"}, auth=False), None)
+            catalog = [
+                {
+                    "productId": f"{tenant_id}#{sku}",
+                    "tenantId": tenant_id,
+                    "name": f"Producto {sku}",
+                    "price": round(self.rng.uniform(5, 200), 2),
+                    "currency": "USD",
+                    "category": self.rng.choice(["apparel", "footwear", "home", "tech"]),
+                }
+                for sku in self._skus()
+            ]
+            products.put_many(catalog)
+            for sku in self._skus():
+                inventory.set_stock(tenant_id, sku, 10**7, shards=4)
+            created = invoke(self.event("create_cart", tenant_id), None)
+            self.carts[tenant_id] = json.loads(created["body"])["cartId"]
+
+    # -- events --------------------------------------------------------------
+    def stream(self, count: int) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        for _ in range(count):
+            route = self.rng.choices(self._routes, weights=self._weights)[0]
+            yield route, self.event(route)
+
+    def routes(self) -> List[str]:
+        return list(self._routes)
+
+    def event(self, route: str, tenant_id: str | None = None) -> Dict[str, Any]:
+        tenant = tenant_id or self.rng.choice(self.tenant_ids)
+        cart = quote(self.carts.get(tenant, f"{tenant}#cart-missing"), safe="")
+        sku = self.rng.choice(self._skus())
+        builders: Dict[str, Callable[[], Dict[str, Any]]] = {
+            "create_tenant": lambda: self._event("POST", "/v1/tenants", {"name": "Tienda nueva", "notes": self._padding()}, auth=False),
+            "create_tenant_user": lambda: self._event(
+                "POST", f"/v1/tenants/{tenant}/users", {"email": f"user@{tenant}.example.com", "notes": self._padding()}, tenant
+            ),
+            "get_products": lambda: self._event("GET", f"/v1/{tenant}/products", None, tenant),
+            "get_product_by_id": lambda: self._event("GET", f"/v1/{tenant}/products/{sku}", None, tenant),
+            "create_cart": lambda: self._event("POST", f"/v1/{tenant}/cart", {"items": self._lines(tenant)}, tenant),
+            "get_cart": lambda: self._event("GET", f"/v1/{tenant}/cart", None, tenant),
+            "add_cart_item": lambda: self._event("POST", f"/v1/{tenant}/cart/{cart}/items", self._lines(tenant, 1)[0], tenant),
+            "update_cart_item": lambda: self._event(
+                "PATCH", f"/v1/{tenant}/cart/{cart}/items/{quote(tenant + '#' + sku, safe='')}", {"quantity": self.rng.randint(1, 4)}, tenant
+            ),
+            "remove_cart_item": lambda: self._event(
+                "DELETE", f"/v1/{tenant}/cart/{cart}/items/{quote(tenant + '#' + sku, safe='')}", None, tenant
+            ),
+            "create_order": lambda: self._event(
+                "POST",
+                f"/v1/{tenant}/orders",
+                {
+                    "amount": round(self.rng.uniform(10, 500), 2),
+                    "currency": "USD",
+                    "items": [{"sku": sku, "quantity": self.rng.randint(1, 3), "description": self._padding()}],
+                },
+                tenant,
+            ),
+            "create_subscription_checkout": lambda: self._event(
+                "POST", f"/v1/{tenant}/subscriptions/checkout", {"planId": self.rng.choice(["standard", "pro"])}, tenant
+            ),
+            "handle_mercadopago_webhook": lambda: self._event(
+                "POST",
+                f"/v1/{tenant}/webhooks/mercadopago",
+                {
+                    "type": "payment",
+                    "data": {
+                        "id": f"pay-{uuid.UUID(int=self.rng.getrandbits(128)).hex[:12]}",
+                        "status": self.rng.choice(PAYMENT_STATUSES),
+                        "transaction_amount": round(self.rng.uniform(10, 500), 2),
+                        "currency_id": "USD",
+                    },
+                },
+                auth=False,
+            ),
+            "get_sales_analytics": lambda: self._event("GET", f"/v1/{tenant}/analytics/sales", None, tenant),
+            "get_tenant_usage": lambda: self._event("GET", f"/v1/{tenant}/usage", None, tenant),
+            "get_billing_status": lambda: self._event("GET", f"/v1/{tenant}/billing", None, tenant, query={"limit": "10"}),
+            "list_tenant_usage": lambda: self._event("GET", "/v1/admin/tenants/usage", None, tenant, admin=True),
+            "export_usage_metrics": lambda: self._event("GET", "/v1/admin/tenants/usage/export", None, tenant, admin=True),
+            "list_billing_status": lambda: self._event("GET", "/v1/admin/tenants/billing", None, tenant, admin=True),
+            # One storefront page view: listing, a product detail and the cart.
+            "batch_requests": lambda: self._event(
+                "POST",
+                f"/v1/{tenant}/batch",
+                {
+                    "requests": [
+                        {"id": "products", "path": f"/v1/{tenant}/products", "query": {"fields": "productId,name,price"}},
+                        {"id": "product", "path": f"/v1/{tenant}/products/{sku}"},
+                        {"id": "cart", "path": f"/v1/{tenant}/cart"},
+                    ]
+                },
+                tenant,
+            ),
+        }
+        return builders[route]()
+
+    # -- helpers -------------------------------------------------------------
+    def _skus(self) -> List[str]:
+        return [f"prd-{index:03d}" for index in range(max(1, self.profile.products_per_tenant))]
+
+    def _padding(self) -> str:
+        return "x" * self.profile.body_bytes
+
+    def _lines(self, tenant_id: str, count: int | None = None) -> List[Dict[str, Any]]:
+        return [
+            {
+                "productId": f"{tenant_id}#{self.rng.choice(self._skus())}",
+                "quantity": self.rng.randint(1, 3),
+                "price": round(self.rng.uniform(5, 200), 2),
+                "description": self._padding(),
+            }
+            for _ in range(count or self.rng.randint(1, 3))
+        ]
+
+    def _claims(self, tenant_id: str, admin: bool) -> Dict[str, Any]:
+        claims: Dict[str, Any] = {
+            "sub": f"user-{tenant_id}",
+            "custom:tenantId": tenant_id,
+            "exp": int(time.time()) + 3600,
+            "email": f"user@{tenant_id}.example.com",
+        }
+        if admin:
+            claims["cognito:groups"] = ["admin"]
+        return {**claims, **self.profile.claims}
+
+    def _event(
+        self,
+        method: str,
+        path: str,
+        body: Dict[str, Any] | None,
+        tenant_id: str | None = None,
+        *,
+        auth: bool = True,
+        admin: bool = False,
+        query: Dict[str, str] | None = None,
+    ) -> Dict[str, Any]:
+        request_context: Dict[str, Any] = {"identity": {"sourceIp": f"10.0.{self.rng.randint(0, 255)}.{self.rng.randint(1, 254)}"}}
+        if auth and tenant_id:
+            request_context["authorizer"] = {"jwt": {"claims": self._claims(tenant_id, admin)}}
+        return {
+            "path": path,
+            "httpMethod": method,
+            "headers": {"Content-Type": "application/json", "User-Agent": "bench/1.0"},
+            "body": json.dumps(body) if body is not None else None,
+            "pathParameters": {"tenantId": tenant_id} if tenant_id else {},
+            "queryStringParameters": query or {},
+            "requestContext": request_context,
+        }
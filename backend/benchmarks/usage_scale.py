@@ -0,0 +1,221 @@
+"""Usage pipeline at scale: millions of raw events through the nightly jobs and admin views.
+
+Generates ``--events`` synthetic ``UsageRecord``s through
+``tracker.record_usage`` for ``--tenants`` tenants over ``--days`` days.
+Tenant traffic is heavy-tailed (Pareto weights), so a few tenants cross
+their plan limits. The run then times, and traces with ``tracemalloc``:
+
+* ``aggregate_daily_usage`` for every day; the slowest night is what must
+  fit in the job's timeout;
+* ``run_limit_checks`` for the last day, with a contract for every tenant;
+* ``list_tenant_usage``, ``get_tenant_usage`` (once per sampled tenant) and
+  ``export_usage_metrics``, called like the admin API calls them.
+
+Each phase is checked against a time budget (``--budget phase=seconds``) and
+the traced peak against ``--memory-budget-mb``; the exit status is 1 when
+any budget is exceeded. Raw events cost roughly 1 KB each in memory, so 10^7
+events need about 10 GB.
+
+    python -m benchmarks.usage_scale --events 1000000 --tenants 2000 --days 30
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta
+from typing import Any, Callable, Dict, List, Sequence, Tuple
+
+from benchmarks._support import latency_summary, write_json
+
+import app
+from notification_service import NotificationService
+from usage_aggregator import aggregate_daily_usage
+from usage_monitor import run_limit_checks
+from usage_plans import list_plans, register_contract, reset_registry
+from usage_tracker import tracker
+
+# Nightly jobs get the Lambda maximum; admin views the API Gateway integration timeout.
+DEFAULT_BUDGETS_S: Dict[str, float] = {
+    "aggregate_daily_usage": 900.0,
+    "run_limit_checks": 900.0,
+    "list_tenant_usage": 29.0,
+    "get_tenant_usage": 29.0,
+    "export_usage_metrics": 29.0,
+}
+ADMIN_CLAIMS = {"sub": "bench-admin", "cognito:groups": ["admin"]}
+
+
+def generate_events(events: int, tenants: int, days: int, end: date, seed: int = 7) -> List[str]:
+    """Record ``events`` raw usage events ending on ``end``; returns the tenant ids."""
+
+    rng = random.Random(seed)
+    tenant_ids = [f"t-scale-{index:05d}" for index in range(tenants)]
+    weights = [rng.paretovariate(1.2) for _ in tenant_ids]
+    start = datetime.combine(end - timedelta(days=days - 1), datetime.min.time())
+    span_s = days * 86400
+    for tenant_id in rng.choices(tenant_ids, weights=weights, k=events):
+        is_order = rng.random() < 0.05
+        tracker.record_usage(
+            tenant_id=tenant_id,
+            requests=1,
+            orders=1 if is_order else 0,
+            gmv=round(rng.uniform(5, 400), 2) if is_order else 0.0,
+            bytes_consumed=rng.randint(200, 4000),
+            timestamp=start + timedelta(seconds=rng.randrange(span_s)),
+        )
+    return tenant_ids
+
+
+def _measure(name: str, operation: Callable[[], Any], trace_memory: bool) -> Tuple[Any, Dict[str, Any]]:
+    if trace_memory:
+        tracemalloc.start()
+    started = time.perf_counter()
+    try:
+        result = operation()
+    finally:
+        elapsed = time.perf_counter() - started
+        peak = tracemalloc.get_traced_memory()[1] if trace_memory else 0
+        if trace_memory:
+            tracemalloc.stop()
+    return result, {"phase": name, "seconds": round(elapsed, 4), "peakMb": round(peak / 2**20, 2)}
+
+
+def _admin_event(query: Dict[str, str], tenant_id: str | None = None) -> Dict[str, Any]:
+    claims = {**ADMIN_CLAIMS, "exp": int(time.time()) + 3600}
+    if tenant_id:
+        claims["custom:tenantId"] = tenant_id
+    return {
+        "httpMethod": "GET",
+        "headers": {},
+        "queryStringParameters": query,
+        "requestContext": {"authorizer": {"jwt": {"claims": claims}}},
+        **({"tenantId": tenant_id} if tenant_id else {}),
+    }
+
+
+def run_scale(
+    events: int = 1_000_000,
+    tenants: int = 2000,
+    days: int = 30,
+    tenant_queries: int = 50,
+    budgets_s: Dict[str, float] | None = None,
+    memory_budget_mb: float = 1024.0,
+    trace_memory: bool = True,
+    seed: int = 7,
+) -> Dict[str, Any]:
+    budgets = {**DEFAULT_BUDGETS_S, **(budgets_s or {})}
+    end = date.today() - timedelta(days=1)
+    periods = [(end - timedelta(days=offset)).isoformat() for offset in reversed(range(days))]
+    tracker.reset()
+    reset_registry()
+    try:
+        started = time.perf_counter()
+        tenant_ids = generate_events(events, tenants, days, end, seed)
+        generation_s = time.perf_counter() - started
+        plan_ids = sorted(list_plans())
+        rng = random.Random(seed)
+        for tenant_id in tenant_ids:
+            register_contract(tenant_id, rng.choice(plan_ids), {"email": f"ops@{tenant_id}.example.com"})
+
+        phases: List[Dict[str, Any]] = []
+        nightly: List[float] = []
+        for period in periods:
+            _, measured = _measure("aggregate_daily_usage", lambda: list(aggregate_daily_usage(date.fromisoformat(period))), trace_memory)
+            nightly.append(measured["seconds"])
+            if not phases or measured["seconds"] >= phases[0]["seconds"]:
+                phases[:1] = [{**measured, "period": period}]
+        phases[0]["totalSeconds"] = round(sum(nightly), 4)
+
+        checks, measured = _measure("run_limit_checks", lambda: run_limit_checks(end, NotificationService()), trace_memory)
+        phases.append({**measured, "evaluatedTenants": checks["evaluatedTenants"], "alerts": len(checks["alerts"])})
+
+        window = {"startDate": periods[-7:][0], "endDate": periods[-1], "pageSize": "100"}
+        listing, measured = _measure("list_tenant_usage", lambda: app.list_tenant_usage(_admin_event(window), {}), trace_memory)
+        phases.append({**measured, "total": listing[1]["total"]})
+
+        sampled = rng.sample(tenant_ids, min(tenant_queries, len(tenant_ids)))
+        latencies: List[float] = []
+
+        def query_tenants() -> None:
+            for tenant_id in sampled:
+                request_started = time.perf_counter()
+                app.get_tenant_usage(_admin_event(window, tenant_id), {"tenantId": tenant_id})
+                latencies.append((time.perf_counter() - request_started) * 1000)
+
+        _, measured = _measure("get_tenant_usage", query_tenants, trace_memory)
+        summary = latency_summary(latencies)
+        phases.append({**measured, "latency": summary})
+
+        export, measured = _measure("export_usage_metrics", lambda: app.export_usage_metrics(_admin_event({}), {}), trace_memory)
+        phases.append({**measured, "rows": export[1]["rows"], "bytes": len(export[1]["data"])})
+    finally:
+        tracker.reset()
+        reset_registry()
+
+    violations = []
+    for phase in phases:
+        budget = budgets.get(phase["phase"])
+        # Per-request views are judged on their p99, batch jobs on wall time.
+        seconds = phase["latency"]["p99Ms"] / 1000 if "latency" in phase else phase["seconds"]
+        if budget is not None and seconds > budget:
+            violations.append(f"{phase['phase']}: {seconds} s > {budget} s")
+        if trace_memory and phase["peakMb"] > memory_budget_mb:
+            violations.append(f"{phase['phase']}: peak {phase['peakMb']} MB > {memory_budget_mb} MB")
+    return {
+        "benchmark": "usage_scale",
+        "config": {"events": events, "tenants": tenants, "days": days, "seed": seed, "memoryBudgetMb": memory_budget_mb, "budgetsS": budgets},
+        "generationS": round(generation_s, 4),
+        "phases": phases,
+        "violations": violations,
+    }
+
+
+def _parse_budgets(pairs: List[str] | None) -> Dict[str, float]:
+    budgets = {}
+    for pair in pairs or []:
+        name, _, seconds = pair.partition("=")
+        if name not in DEFAULT_BUDGETS_S:
+            raise SystemExit(f"Unknown phase {name!r}; expected one of {', '.join(DEFAULT_BUDGETS_S)}")
+        budgets[name] = float(seconds)
+    return budgets
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--events", type=int, default=1_000_000)
+    parser.add_argument("--tenants", type=int, default=2000)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--tenant-queries", type=int, default=50, help="Tenants sampled for get_tenant_usage")
+    parser.add_argument("--budget", action="append", help="Time budget phase=seconds (repeatable)")
+    parser.add_argument("--memory-budget-mb", type=float, default=1024.0, help="Maximum traced peak per phase")
+    parser.add_argument("--no-trace", action="store_true", help="Skip tracemalloc (faster, no memory figures)")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", dest="json_path", help="Write the results to this file")
+    args = parser.parse_args(argv)
+
+    result = run_scale(
+        args.events,
+        args.tenants,
+        args.days,
+        args.tenant_queries,
+        _parse_budgets(args.budget),
+        args.memory_budget_mb,
+        not args.no_trace,
+        args.seed,
+    )
+    print(f"generated {args.events} events in {result['generationS']} s")
+    print(f"{'phase':<24} {'seconds':>10} {'peak MB':>9} details")
+    for phase in result["phases"]:
+        details = {key: value for key, value in phase.items() if key not in {"phase", "seconds", "peakMb"}}
+        print(f"{phase['phase']:<24} {phase['seconds']:>10} {phase['peakMb']:>9} {json.dumps(details)}")
+    for violation in result["violations"]:
+        print(f"BUDGET EXCEEDED {violation}")
+    write_json(args.json_path, result)
+    return 1 if result["violations"] else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,281 @@
+"""Static catalog snapshots published to S3 and served through CloudFront.
+
+The job renders every tenant's product listing and category pages as JSON
+objects so storefronts can read them from the CDN instead of invoking the
+API Lambda. Pages are content addressed: a page is rewritten only when the
+products it contains change, and a short-lived manifest tells the frontend
+which page objects are current. ``GET /v1/{tenantId}/products`` remains the
+fallback for anything the snapshots do not cover (search, stale manifests).
+
+Superseded pages are not deleted right away: CDN and browser copies of the
+previous manifest may still point at them for up to its ``max-age``. They
+are listed under ``retired`` in the new manifest and deleted by a later
+publish once ``CATALOG_SNAPSHOT_RETIRE_AFTER_S`` has passed.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List
+
+import boto3
+try:  # pragma: no cover - compatibility with stubs in repo
+    from botocore.exceptions import BotoCoreError, ClientError
+except ImportError:  # pragma: no cover
+    from botocore.exceptions import ClientError
+
+    class BotoCoreError(Exception):
+        ...
+
+
+SNAPSHOT_PREFIX = "catalog"
+DEFAULT_PAGE_SIZE = 50
+MANIFEST_CACHE_CONTROL = "public, max-age=60"
+PAGE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# Must exceed the manifest max-age (60 s) plus CDN propagation.
+RETIRE_AFTER_S = max(60, int(os.getenv("CATALOG_SNAPSHOT_RETIRE_AFTER_S", "300")))
+
+
+def manifest_key(tenant_id: str) -> str:
+    return f"{SNAPSHOT_PREFIX}/{tenant_id}/manifest.json"
+
+
+def _slugify(value: str) -> str:
+    slug = re.sub(r"[^a-z0-9]+", "-", value.lower()).strip("-")
+    return slug or "uncategorized"
+
+
+def _etag(products: List[Dict[str, Any]]) -> str:
+    canonical = json.dumps(products, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode()).hexdigest()[:16]
+
+
+class SnapshotStore:
+    """Object store for snapshots.
+
+    Writes to ``CATALOG_SNAPSHOT_BUCKET`` in S3 when configured and to the
+    ``CATALOG_SNAPSHOT_DIR`` directory otherwise, which keeps tests and local
+    runs off the network.
+    """
+
+    def __init__(self, bucket: str | None = None, local_dir: str | None = None) -> None:
+        self.bucket = bucket if bucket is not None else os.getenv("CATALOG_SNAPSHOT_BUCKET")
+        self.local_dir = Path(local_dir or os.getenv("CATALOG_SNAPSHOT_DIR") or "/tmp/catalog-snapshots")
+        self._s3 = None
+
+    def _s3_client(self):
+        if self._s3 is None:
+            self._s3 = boto3.client("s3", region_name=os.getenv("AWS_REGION", "us-east-1"))
+        return self._s3
+
+    def read_json(self, key: str) -> Dict[str, Any] | None:
+        if self.bucket:
+            try:
+                response = self._s3_client().get_object(Bucket=self.bucket, Key=key)
+                return json.loads(response["Body"].read())
+            except (ClientError, BotoCoreError, ValueError):
+                return None
+        path = self.local_dir / key
+        if not path.exists():
+            return None
+        try:
+            return json.loads(path.read_text())
+        except ValueError:
+            return None
+
+    def write_json(self, key: str, payload: Dict[str, Any], cache_control: str) -> None:
+        body = json.dumps(payload, separators=(",", ":"), default=str)
+        if self.bucket:
+            self._s3_client().put_object(
+                Bucket=self.bucket,
+                Key=key,
+                Body=body.encode(),
+                ContentType="application/json",
+                CacheControl=cache_control,
+            )
+            return
+        path = self.local_dir / key
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(path.suffix + ".tmp")
+        tmp_path.write_text(body)
+        tmp_path.replace(path)
+
+    def delete(self, key: str) -> None:
+        if self.bucket:
+            try:
+                self._s3_client().delete_object(Bucket=self.bucket, Key=key)
+            except (ClientError, BotoCoreError):  # pragma: no cover - defensive
+                pass
+            return
+        path = self.local_dir / key
+        if path.exists():
+            path.unlink()
+
+
+@dataclass
+class SnapshotResult:
+    tenantId: str
+    manifestKey: str
+    written: List[str] = field(default_factory=list)
+    unchanged: List[str] = field(default_factory=list)
+    retired: List[str] = field(default_factory=list)
+    removed: List[str] = field(default_factory=list)
+
+    @property
+    def changed(self) -> bool:
+        return bool(self.written or self.retired or self.removed)
+
+
+def _paginate(products: List[Dict[str, Any]], page_size: int) -> List[List[Dict[str, Any]]]:
+    return [products[index : index + page_size] for index in range(0, len(products), page_size)] or [[]]
+
+
+def _render_pages(products: List[Dict[str, Any]], page_size: int) -> Dict[str, List[Dict[str, Any]]]:
+    """Group products into logical pages: ``products/N`` and ``categories/<slug>/N``."""
+
+    ordered = sorted(products, key=lambda item: str(item.get("productId", "")))
+    pages: Dict[str, List[Dict[str, Any]]] = {}
+    for number, chunk in enumerate(_paginate(ordered, page_size), start=1):
+        pages[f"products/{number}"] = chunk
+
+    by_category: Dict[str, List[Dict[str, Any]]] = {}
+    for product in ordered:
+        by_category.setdefault(_slugify(str(product.get("category") or "")), []).append(product)
+    for slug, category_products in sorted(by_category.items()):
+        for number, chunk in enumerate(_paginate(category_products, page_size), start=1):
+            pages[f"categories/{slug}/{number}"] = chunk
+    return pages
+
+
+def _page_key(tenant_id: str, page_id: str, etag: str) -> str:
+    return f"{SNAPSHOT_PREFIX}/{tenant_id}/{page_id}.{etag}.json"
+
+
+def publish_tenant_snapshot(
+    tenant_id: str,
+    products: Iterable[Dict[str, Any]],
+    store: SnapshotStore | None = None,
+    page_size: int | None = None,
+    now: datetime | None = None,
+) -> SnapshotResult:
+    """Render and publish the snapshot for one tenant, rewriting only changed pages."""
+
+    store = store or SnapshotStore()
+    page_size = max(1, page_size or int(os.getenv("CATALOG_SNAPSHOT_PAGE_SIZE", DEFAULT_PAGE_SIZE)))
+    products = list(products)
+    previous = store.read_json(manifest_key(tenant_id)) or {}
+    previous_pages: Dict[str, Dict[str, Any]] = previous.get("pages", {})
+    reusable_pages = previous_pages if previous.get("pageSize") == page_size else {}
+
+    result = SnapshotResult(tenantId=tenant_id, manifestKey=manifest_key(tenant_id))
+    now = now or datetime.utcnow()
+    now_iso = now.isoformat() + "Z"
+    pages: Dict[str, Dict[str, Any]] = {}
+    for page_id, page_products in _render_pages(products, page_size).items():
+        etag = _etag(page_products)
+        key = _page_key(tenant_id, page_id, etag)
+        existing = reusable_pages.get(page_id)
+        if existing and existing.get("etag") == etag:
+            pages[page_id] = existing
+            result.unchanged.append(key)
+            continue
+        page_number = int(page_id.rsplit("/", 1)[1])
+        store.write_json(
+            key,
+            {"tenantId": tenant_id, "page": page_number, "items": page_products, "count": len(page_products)},
+            PAGE_CACHE_CONTROL,
+        )
+        pages[page_id] = {"key": key, "etag": etag, "count": len(page_products), "updatedAt": now_iso}
+        result.written.append(key)
+
+    live_keys = {page["key"] for page in pages.values()}
+    retired: Dict[str, str] = {}
+    delete_before = (now - timedelta(seconds=RETIRE_AFTER_S)).isoformat() + "Z"
+    for key, retired_at in (previous.get("retired") or {}).items():
+        if key in live_keys:
+            continue  # content addressed: the same page is current again
+        if retired_at <= delete_before:
+            result.removed.append(key)
+        else:
+            retired[key] = retired_at
+    for page in previous_pages.values():
+        if page.get("key") and page["key"] not in live_keys and page["key"] not in retired:
+            retired[page["key"]] = now_iso
+            result.retired.append(page["key"])
+
+    if not result.changed and previous:
+        return result
+
+    categories: Dict[str, List[str]] = {}
+    listing: List[str] = []
+    for page_id in sorted(pages, key=lambda pid: (pid.rsplit("/", 1)[0], int(pid.rsplit("/", 1)[1]))):
+        scope = page_id.rsplit("/", 1)[0]
+        if scope == "products":
+            listing.append(pages[page_id]["key"])
+        else:
+            categories.setdefault(scope.split("/", 1)[1], []).append(pages[page_id]["key"])
+
+    manifest = {
+        "tenantId": tenant_id,
+        "version": int(previous.get("version", 0)) + 1,
+        "generatedAt": now_iso,
+        "pageSize": page_size,
+        "productCount": len(products),
+        "listing": listing,
+        "categories": categories,
+        "pages": pages,
+        "retired": retired,
+        "fallback": {
+            "products": f"/v1/{tenant_id}/products",
+            "product": f"/v1/{tenant_id}/products/{{productId}}",
+        },
+    }
+    store.write_json(manifest_key(tenant_id), manifest, MANIFEST_CACHE_CONTROL)
+    # Only after the manifest: no current manifest points at these any more.
+    for key in result.removed:
+        store.delete(key)
+    return result
+
+
+def publish_snapshots(
+    tenant_ids: Iterable[str],
+    load_products: Callable[[str], Iterable[Dict[str, Any]]],
+    store: SnapshotStore | None = None,
+    page_size: int | None = None,
+) -> List[SnapshotResult]:
+    store = store or SnapshotStore()
+    return [publish_tenant_snapshot(tenant_id, load_products(tenant_id), store, page_size) for tenant_id in tenant_ids]
+
+
+def lambda_handler(event: dict, context: object | None = None) -> Dict[str, Any]:
+    """Scheduled or stream-triggered entry point.
+
+    ``event["tenantIds"]`` lists the tenants to refresh; DynamoDB stream
+    records from the products table are reduced to the tenants they touch.
+    """
+
+    from app import list_catalog_products
+
+    event = event or {}
+    tenant_ids = set(event.get("tenantIds") or [])
+    for record in event.get("Records", []):
+        image = (record.get("dynamodb") or {}).get("NewImage") or (record.get("dynamodb") or {}).get("OldImage") or {}
+        tenant_value = image.get("tenantId") or {}
+        if tenant_value.get("S"):
+            tenant_ids.add(tenant_value["S"])
+    if not tenant_ids and os.getenv("TENANT_ID"):
+        tenant_ids.add(os.environ["TENANT_ID"])
+
+    results = publish_snapshots(sorted(tenant_ids), list_catalog_products)
+    return {
+        "tenants": len(results),
+        "pagesWritten": sum(len(result.written) for result in results),
+        "pagesUnchanged": sum(len(result.unchanged) for result in results),
+        "pagesRetired": sum(len(result.retired) for result in results),
+        "pagesRemoved": sum(len(result.removed) for result in results),
+    }
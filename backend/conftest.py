@@ -1,7 +1,77 @@
 import os
 import sys
 
+import pytest
+
 # Ensure local stubs (boto3, botocore, moto) are discoverable during tests
 ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 if ROOT not in sys.path:
     sys.path.insert(0, ROOT)
+
+import boto3  # noqa: E402
+from moto import mock_dynamodb  # noqa: E402
+
+
+@pytest.fixture()
+def dynamodb_tables(monkeypatch):
+    with mock_dynamodb():
+        resource = boto3.resource("dynamodb", region_name="us-east-1")
+        resource.create_table(
+            TableName="test-orders",
+            KeySchema=[{"AttributeName": "orderId", "KeyType": "HASH"}],
+            AttributeDefinitions=[{"AttributeName": "orderId", "AttributeType": "S"}],
+            BillingMode="PAY_PER_REQUEST",
+        )
+        resource.create_table(
+            TableName="test-carts",
+            KeySchema=[{"AttributeName": "cartId", "KeyType": "HASH"}],
+            AttributeDefinitions=[
+                {"AttributeName": "cartId", "AttributeType": "S"},
+                {"AttributeName": "userId", "AttributeType": "S"},
+                {"AttributeName": "createdAt", "AttributeType": "S"},
+            ],
+            BillingMode="PAY_PER_REQUEST",
+            GlobalSecondaryIndexes=[
+                {
+                    "IndexName": "UserCartIndex",
+                    "KeySchema": [
+                        {"AttributeName": "userId", "KeyType": "HASH"},
+                        {"AttributeName": "createdAt", "KeyType": "RANGE"},
+                    ],
+                    "Projection": {"ProjectionType": "ALL"},
+                }
+            ],
+        )
+        resource.create_table(
+            TableName="test-transactions",
+            KeySchema=[{"AttributeName": "transactionId", "KeyType": "HASH"}],
+            AttributeDefinitions=[
+                {"AttributeName": "transactionId", "AttributeType": "S"},
+                {"AttributeName": "tenantId", "AttributeType": "S"},
+                {"AttributeName": "receivedAt", "AttributeType": "S"},
+            ],
+            BillingMode="PAY_PER_REQUEST",
+            GlobalSecondaryIndexes=[
+                {
+                    "IndexName": "PaymentsByTenant",
+                    "KeySchema": [
+                        {"AttributeName": "tenantId", "KeyType": "HASH"},
+                        {"AttributeName": "receivedAt", "KeyType": "RANGE"},
+                    ],
+                    "Projection": {"ProjectionType": "ALL"},
+                }
+            ],
+        )
+
+        resource.create_table(
+            TableName="test-inventory",
+            KeySchema=[{"AttributeName": "inventoryKey", "KeyType": "HASH"}],
+            AttributeDefinitions=[{"AttributeName": "inventoryKey", "AttributeType": "S"}],
+            BillingMode="PAY_PER_REQUEST",
+        )
+
+        monkeypatch.setenv("ORDERS_TABLE", "test-orders")
+        monkeypatch.setenv("CARTS_TABLE", "test-carts")
+        monkeypatch.setenv("TRANSACTIONS_TABLE", "test-transactions")
+        monkeypatch.setenv("INVENTORY_TABLE", "test-inventory")
+        yield resource
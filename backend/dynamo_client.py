@@ -0,0 +1,331 @@
+"""Process-wide DynamoDB access shared by every repository.
+
+One boto3 resource per region is created with a pooled HTTP connection
+config and reused by all tables, instead of each repository building its
+own. Calls made through :func:`table` or :func:`client` go through
+:func:`call`, which adds:
+
+* retries with full jitter for throttling and transient errors, drawn from
+  one retry budget shared by the whole container so a throttling storm
+  does not multiply into a retry storm;
+* a circuit breaker per table that opens after repeated throttling and
+  fails fast with :class:`CircuitOpenError` until a cool-down has passed.
+
+Business errors (failed conditions, cancelled transactions, validation)
+are never retried here; callers keep handling them as before.
+"""
+from __future__ import annotations
+
+import functools
+import os
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Tuple
+
+import boto3
+try:  # pragma: no cover - compatibility with stubs in repo
+    from botocore.exceptions import BotoCoreError, ClientError
+except ImportError:  # pragma: no cover
+    from botocore.exceptions import ClientError
+
+    class BotoCoreError(Exception):
+        ...
+try:  # pragma: no cover - the local botocore stub has no config module
+    from botocore.config import Config
+except ImportError:  # pragma: no cover
+    Config = None
+
+import instrumentation
+
+
+MAX_POOL_CONNECTIONS = int(os.getenv("DYNAMODB_MAX_POOL_CONNECTIONS", "50"))
+MAX_ATTEMPTS = int(os.getenv("DYNAMODB_MAX_ATTEMPTS", "4"))
+RETRY_BASE_S = float(os.getenv("DYNAMODB_RETRY_BASE_MS", "25")) / 1000
+RETRY_CAP_S = float(os.getenv("DYNAMODB_RETRY_CAP_MS", "1000")) / 1000
+RETRY_BUDGET = int(os.getenv("DYNAMODB_RETRY_BUDGET", "500"))
+BREAKER_THRESHOLD = int(os.getenv("DYNAMODB_BREAKER_THRESHOLD", "5"))
+BREAKER_WINDOW_S = float(os.getenv("DYNAMODB_BREAKER_WINDOW_S", "10"))
+BREAKER_COOLDOWN_S = float(os.getenv("DYNAMODB_BREAKER_COOLDOWN_S", "5"))
+
+THROTTLING_CODES = {
+    "ProvisionedThroughputExceededException",
+    "ThrottlingException",
+    "RequestLimitExceeded",
+    "ThrottlingError",
+}
+TRANSIENT_CODES = {"InternalServerError", "ServiceUnavailable", "TransactionInProgressException"}
+RETRY_COST = 5
+TIMEOUT_RETRY_COST = 10
+
+TABLE_OPERATIONS = {"get_item", "put_item", "update_item", "delete_item", "query", "scan"}
+CLIENT_OPERATIONS = {"batch_get_item", "batch_write_item", "transact_get_items", "transact_write_items"}
+
+
+class CircuitOpenError(Exception):
+    """Raised without calling DynamoDB while a table's breaker is open.
+
+    Deliberately not a ``ClientError``: repositories read some ``ClientError``s
+    as "not found", and an open breaker must surface as 503 instead.
+    """
+
+    def __init__(self, table_name: str, retry_in: float) -> None:
+        super().__init__(f"{table_name} is throttling; retry in {retry_in:.1f}s")
+        self.table_name = table_name
+        self.retry_in = retry_in
+
+
+class RetryBudget:
+    """Token bucket shared by all retries: each retry spends, each success refunds one."""
+
+    def __init__(self, capacity: int = RETRY_BUDGET) -> None:
+        self.capacity = capacity
+        self.tokens = capacity
+        self._lock = threading.Lock()
+
+    def spend(self, cost: int) -> bool:
+        with self._lock:
+            if self.tokens < cost:
+                return False
+            self.tokens -= cost
+            return True
+
+    def refund(self, amount: int = 1) -> None:
+        with self._lock:
+            self.tokens = min(self.capacity, self.tokens + amount)
+
+
+class CircuitBreaker:
+    """Opens after ``threshold`` throttles inside ``window`` seconds; one probe after ``cooldown``."""
+
+    def __init__(self, name: str, threshold: int = BREAKER_THRESHOLD, window: float = BREAKER_WINDOW_S, cooldown: float = BREAKER_COOLDOWN_S) -> None:
+        self.name = name
+        self.threshold = threshold
+        self.window = window
+        self.cooldown = cooldown
+        self.state = "closed"
+        self._throttles: list[float] = []
+        self._opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def before_call(self) -> None:
+        with self._lock:
+            if self.state == "closed":
+                return
+            elapsed = time.monotonic() - self._opened_at
+            if self.state == "open" and elapsed >= self.cooldown:
+                self.state = "half-open"
+                return
+            raise CircuitOpenError(self.name, max(0.0, self.cooldown - elapsed))
+
+    def release_probe(self) -> None:
+        """Hand back a probe that never reached DynamoDB; the next call probes instead."""
+
+        with self._lock:
+            if self.state == "half-open":
+                self.state = "open"
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.state = "closed"
+            self._throttles.clear()
+
+    def record_failure(self) -> None:
+        """A probe that did not complete (timeout): stay open for another cool-down."""
+
+        with self._lock:
+            if self.state == "half-open":
+                self.state, self._opened_at = "open", time.monotonic()
+
+    def record_throttle(self) -> None:
+        now = time.monotonic()
+        with self._lock:
+            if self.state == "half-open":
+                self.state, self._opened_at = "open", now
+                return
+            self._throttles = [moment for moment in self._throttles if now - moment < self.window] + [now]
+            if len(self._throttles) >= self.threshold:
+                self.state, self._opened_at = "open", now
+
+    @property
+    def is_open(self) -> bool:
+        return self.state == "open"
+
+
+_lock = threading.Lock()
+_resources: Dict[str, Any] = {}
+_tables: Dict[Tuple[str, str], "ResilientTable"] = {}
+_breakers: Dict[str, CircuitBreaker] = {}
+retry_budget = RetryBudget()
+
+
+def _region(region_name: str | None) -> str:
+    return region_name or os.getenv("AWS_REGION", "us-east-1")
+
+
+def resource(region_name: str | None = None):
+    """Shared boto3 DynamoDB resource for ``region_name`` (pooled connections)."""
+
+    region = _region(region_name)
+    with _lock:
+        if region not in _resources:
+            options: Dict[str, Any] = {"region_name": region}
+            if Config is not None:
+                options["config"] = Config(
+                    max_pool_connections=MAX_POOL_CONNECTIONS,
+                    retries={"total_max_attempts": 1},
+                    tcp_keepalive=True,
+                )
+            _resources[region] = boto3.resource("dynamodb", **options)
+        return _resources[region]
+
+
+def table(name: str, region_name: str | None = None) -> "ResilientTable":
+    region = _region(region_name)
+    with _lock:
+        cached = _tables.get((region, name))
+    if cached is None:
+        cached = ResilientTable(resource(region).Table(name), name)
+        with _lock:
+            cached = _tables.setdefault((region, name), cached)
+    return cached
+
+
+def client(region_name: str | None = None) -> "ResilientClient":
+    return ResilientClient(resource(region_name).meta.client)
+
+
+def breaker(table_name: str) -> CircuitBreaker:
+    with _lock:
+        if table_name not in _breakers:
+            _breakers[table_name] = CircuitBreaker(table_name)
+        return _breakers[table_name]
+
+
+def reset() -> None:
+    """Drop cached resources, breakers and budget (tests and benchmarks)."""
+
+    global retry_budget
+    with _lock:
+        _resources.clear()
+        _tables.clear()
+        _breakers.clear()
+        retry_budget = RetryBudget()
+
+
+def _error_code(exc: ClientError) -> str:
+    return (exc.response or {}).get("Error", {}).get("Code", "")
+
+
+def _is_throttle(exc: ClientError) -> bool:
+    if _error_code(exc) in THROTTLING_CODES:
+        return True
+    reasons = (exc.response or {}).get("CancellationReasons") or []
+    return any(reason.get("Code") in THROTTLING_CODES for reason in reasons)
+
+
+def backoff(attempt: int) -> float:
+    """Full jitter: uniform between zero and the capped exponential delay."""
+
+    return random.uniform(0, min(RETRY_CAP_S, RETRY_BASE_S * (2**attempt)))
+
+
+def call(table_names: Iterable[str], operation: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    if instrumentation.current() is None:
+        return _call(table_names, operation, *args, **kwargs)
+    started = time.perf_counter()
+    try:
+        return _call(table_names, operation, *args, **kwargs)
+    finally:
+        name = getattr(operation, "__name__", type(operation).__name__)
+        instrumentation.record_call(table_names, name, time.perf_counter() - started, kwargs)
+
+
+def _call(table_names: Iterable[str], operation: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    breakers = [breaker(name) for name in sorted(set(table_names))]
+    for admitted, table_breaker in enumerate(breakers):
+        try:
+            table_breaker.before_call()
+        except CircuitOpenError:
+            # Breakers already moved to half-open would otherwise wait for a probe forever.
+            for earlier in breakers[:admitted]:
+                earlier.release_probe()
+            raise
+
+    attempt = 0
+    while True:
+        try:
+            result = operation(*args, **kwargs)
+        except ClientError as exc:
+            throttled = _is_throttle(exc)
+            for table_breaker in breakers:
+                # DynamoDB answered: anything but throttling closes a half-open breaker.
+                if throttled:
+                    table_breaker.record_throttle()
+                else:
+                    table_breaker.record_success()
+            if not (throttled or _error_code(exc) in TRANSIENT_CODES):
+                raise
+            cost = RETRY_COST
+            error: Exception = exc
+        except BotoCoreError as exc:
+            for table_breaker in breakers:
+                table_breaker.record_failure()
+            cost = TIMEOUT_RETRY_COST
+            error = exc
+        except BaseException:
+            # No answer from DynamoDB (a bug in the operation, an interrupt): end any probe.
+            for table_breaker in breakers:
+                table_breaker.record_failure()
+            raise
+        else:
+            for table_breaker in breakers:
+                table_breaker.record_success()
+            retry_budget.refund()
+            return result
+
+        attempt += 1
+        if attempt >= MAX_ATTEMPTS or any(table_breaker.is_open for table_breaker in breakers) or not retry_budget.spend(cost):
+            raise error
+        time.sleep(backoff(attempt))
+
+
+class ResilientTable:
+    """Wraps a boto3 ``Table``; data-plane calls go through :func:`call`."""
+
+    def __init__(self, wrapped: Any, name: str) -> None:
+        self._table = wrapped
+        self.name = name
+
+    def __getattr__(self, attribute: str) -> Any:
+        value = getattr(self._table, attribute)
+        if attribute in TABLE_OPERATIONS:
+            return functools.partial(call, (self.name,), value)
+        return value
+
+
+class ResilientClient:
+    """Wraps ``resource.meta.client`` for batch and transactional calls."""
+
+    def __init__(self, wrapped: Any) -> None:
+        self._client = wrapped
+
+    @staticmethod
+    def _tables_in(attribute: str, kwargs: Dict[str, Any]) -> set:
+        if attribute.startswith("batch_"):
+            return set(kwargs.get("RequestItems") or {})
+        return {
+            request.get("TableName", "")
+            for entry in kwargs.get("TransactItems") or []
+            for request in entry.values()
+        }
+
+    def __getattr__(self, attribute: str) -> Any:
+        value = getattr(self._client, attribute)
+        if attribute not in CLIENT_OPERATIONS:
+            return value
+
+        def invoke(**kwargs: Any) -> Any:
+            return call(self._tables_in(attribute, kwargs), value, **kwargs)
+
+        return invoke
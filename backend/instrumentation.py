@@ -0,0 +1,153 @@
+"""Per-request hot-path timings emitted as CloudWatch Embedded Metric Format.
+
+A sampled request gets a :class:`RequestMetrics` for the duration of
+``route_event``: phases (route matching, auth, tenant injection, handler,
+serialization, usage recording) are timed with :func:`phase` and every
+DynamoDB call made through ``dynamo_client`` is counted, timed and sized
+with :func:`record_call`. :func:`finish` writes one EMF JSON line to
+stdout, which CloudWatch Logs turns into metrics in ``METRICS_NAMESPACE``
+with a ``Route`` dimension. Phases nest the way the code does:
+``HandlerMs`` includes ``UsageMs`` and the DynamoDB time spent inside the
+handler.
+
+Sampling is controlled by ``METRICS_SAMPLE_RATE`` (0 disables, 1 records
+every request). Requests that are not sampled only pay for a context
+variable lookup per instrumented block.
+"""
+from __future__ import annotations
+
+import contextvars
+import json
+import os
+import random
+import sys
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Any, Callable, Dict, Iterator, List
+
+SAMPLE_RATE = float(os.getenv("METRICS_SAMPLE_RATE", "0"))
+NAMESPACE = os.getenv("METRICS_NAMESPACE", "PocCommerce/HotPath")
+
+# Phase name -> EMF metric name.
+PHASES = {
+    "route": "RouteMatchMs",
+    "auth": "AuthMs",
+    "tenant": "TenantMs",
+    "handler": "HandlerMs",
+    "serialize": "SerializeMs",
+    "usage": "UsageMs",
+}
+_DISABLED = nullcontext()
+_current: contextvars.ContextVar["RequestMetrics | None"] = contextvars.ContextVar("request_metrics", default=None)
+
+
+def _stdout(line: str) -> None:
+    sys.stdout.write(line + "\n")
+
+
+# Replaced in tests to capture the emitted lines.
+sink: Callable[[str], None] = _stdout
+
+
+class RequestMetrics:
+    __slots__ = ("started", "route", "tenant_id", "phases", "calls")
+
+    def __init__(self) -> None:
+        self.started = time.perf_counter()
+        self.route = "unrouted"
+        self.tenant_id: str | None = None
+        self.phases: Dict[str, float] = {}
+        self.calls: List[Dict[str, Any]] = []
+
+    def add_phase(self, name: str, seconds: float) -> None:
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def document(self, status_code: int) -> Dict[str, Any]:
+        values: Dict[str, Any] = {PHASES[name]: round(seconds * 1000, 3) for name, seconds in self.phases.items()}
+        values.update(
+            {
+                "TotalMs": round((time.perf_counter() - self.started) * 1000, 3),
+                "DynamoCalls": len(self.calls),
+                "DynamoMs": round(sum(call["ms"] for call in self.calls), 3),
+                "DynamoPayloadBytes": sum(call["bytes"] for call in self.calls),
+            }
+        )
+        units = {name: "Count" if name == "DynamoCalls" else "Bytes" if name.endswith("Bytes") else "Milliseconds" for name in values}
+        return {
+            "_aws": {
+                "Timestamp": int(time.time() * 1000),
+                "CloudWatchMetrics": [
+                    {
+                        "Namespace": NAMESPACE,
+                        "Dimensions": [["Route"]],
+                        "Metrics": [{"Name": name, "Unit": unit} for name, unit in units.items()],
+                    }
+                ],
+            },
+            "Route": self.route,
+            "StatusCode": status_code,
+            "TenantId": self.tenant_id,
+            "DynamoCallDetails": self.calls,
+            **values,
+        }
+
+
+def start_request(sample_rate: float | None = None) -> contextvars.Token | None:
+    """Begin a sampled request; returns ``None`` (and records nothing) when not sampled."""
+
+    rate = SAMPLE_RATE if sample_rate is None else sample_rate
+    if rate <= 0 or (rate < 1 and random.random() >= rate):
+        return None
+    return _current.set(RequestMetrics())
+
+
+def current() -> RequestMetrics | None:
+    return _current.get()
+
+
+@contextmanager
+def _timed(metrics: RequestMetrics, name: str) -> Iterator[None]:
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.add_phase(name, time.perf_counter() - started)
+
+
+def phase(name: str):
+    """Time a block as ``name`` for the sampled request, if any."""
+
+    metrics = _current.get()
+    if metrics is None:
+        return _DISABLED
+    return _timed(metrics, name)
+
+
+@contextmanager
+def detached() -> Iterator[None]:
+    """Run a block outside the sampled request (batch sub-requests keep the batch's route)."""
+
+    token = _current.set(None)
+    try:
+        yield
+    finally:
+        _current.reset(token)
+
+
+def record_call(table_names: Any, operation: str, seconds: float, payload: Dict[str, Any]) -> None:
+    metrics = _current.get()
+    if metrics is None:
+        return
+    size = len(json.dumps(payload, default=str))
+    metrics.calls.append({"tables": sorted(table_names), "operation": operation, "ms": round(seconds * 1000, 3), "bytes": size})
+
+
+def finish(token: contextvars.Token | None, status_code: int) -> None:
+    """Emit the EMF line for a sampled request and clear it from the context."""
+
+    if token is None:
+        return
+    metrics = _current.get()
+    _current.reset(token)
+    if metrics is not None:
+        sink(json.dumps(metrics.document(status_code), default=str))
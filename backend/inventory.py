@@ -0,0 +1,591 @@
+"""Contention-safe inventory reservations for order creation.
+
+Stock for each SKU is split across ``N`` counter shards stored in
+``INVENTORY_TABLE``. An order reserves all of its lines in a single
+``TransactWriteItems`` call: one conditional decrement per line on a
+randomly chosen shard (scatter) plus the reservation record itself. When a
+shard runs dry the line is retried on other shards and, if needed, split
+across several of them; ``rebalance_shards`` pulls the remaining stock back
+into an even spread (reclaim).
+
+Only SKUs with a ``meta`` record are tracked: lines for unseeded SKUs are
+left out of the reservation (see ``Reservation.untracked``) instead of being
+rejected for lack of stock.
+
+Reservations carry an ``expiresAt`` deadline and a ``ttl`` attribute. A paid
+order ``commit``s its reservation; the sweep returns stock held by expired
+ones before DynamoDB TTL removes the records, and ``reconcile_sku`` repairs
+any drift between the on-hand ledger and the shards.
+
+Every write to a ``meta`` or shard item also bumps its ``version``, so the
+reconciliation can make its repair conditional on nothing having moved since
+it read the counters.
+
+Item layout (single ``inventoryKey`` hash key):
+
+* ``{tenant}#{sku}#meta`` – ``onHand`` ledger and ``shardCount``.
+* ``{tenant}#{sku}#shard-{n}`` – ``available`` units on shard ``n``.
+* ``{tenant}#reservation#{orderId}`` – reserved ``lines`` and ``status``.
+"""
+from __future__ import annotations
+
+import os
+import random
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Tuple
+
+try:  # pragma: no cover - compatibility with stubs in repo
+    from botocore.exceptions import BotoCoreError, ClientError
+except ImportError:  # pragma: no cover
+    from botocore.exceptions import ClientError
+
+    class BotoCoreError(Exception):
+        ...
+
+import dynamo_client
+
+
+DEFAULT_SHARDS = int(os.getenv("INVENTORY_DEFAULT_SHARDS", "1"))
+RESERVATION_MINUTES = int(os.getenv("INVENTORY_RESERVATION_MINUTES", "15"))
+TTL_GRACE_HOURS = 24
+MAX_ATTEMPTS = 6
+SHARD_COUNT_CACHE_SECONDS = 60.0
+
+
+class InventoryError(Exception):
+    pass
+
+
+class InsufficientStockError(InventoryError):
+    def __init__(self, sku: str, requested: int, available: int) -> None:
+        super().__init__(f"Insufficient stock for {sku}: requested {requested}, available {available}")
+        self.sku = sku
+        self.requested = requested
+        self.available = available
+
+
+class InvalidOrderLineError(InventoryError, ValueError):
+    """An order line whose quantity is not a positive integer."""
+
+    def __init__(self, sku: str, quantity: Any) -> None:
+        super().__init__(f"Quantity for {sku or 'line'} must be a positive integer, got {quantity!r}")
+        self.sku = sku
+
+
+def line_quantity(line: Dict[str, Any]) -> int:
+    """The line's quantity (1 when missing); InvalidOrderLineError unless it is a positive integer."""
+
+    raw = line.get("quantity", 1)
+    if isinstance(raw, float) and raw.is_integer():
+        raw = int(raw)
+    quantity = 0
+    if isinstance(raw, (int, str)) and not isinstance(raw, bool):
+        try:
+            quantity = int(raw)
+        except ValueError:
+            pass
+    if quantity <= 0:
+        raise InvalidOrderLineError(str(line.get("sku") or line.get("productId") or ""), raw)
+    return quantity
+
+
+class ReservationConflictError(InventoryError):
+    """Raised when contention keeps cancelling the reservation transaction."""
+
+
+@dataclass
+class Reservation:
+    tenantId: str
+    orderId: str
+    lines: List[Dict[str, Any]]
+    expiresAt: str
+    status: str = "active"
+    attempts: int = 1
+    untracked: List[str] = field(default_factory=list)
+
+    def as_item(self, ttl: int) -> Dict[str, Any]:
+        return {
+            "inventoryKey": reservation_key(self.tenantId, self.orderId),
+            "tenantId": self.tenantId,
+            "orderId": self.orderId,
+            "recordType": "reservation",
+            "lines": self.lines,
+            "status": self.status,
+            "expiresAt": self.expiresAt,
+            "createdAt": datetime.utcnow().isoformat() + "Z",
+            "ttl": ttl,
+        }
+
+
+@dataclass
+class ReconciliationReport:
+    tenantId: str
+    sku: str
+    onHand: int
+    available: int
+    reserved: int
+    drift: int
+    repaired: bool = False
+    shards: Dict[int, int] = field(default_factory=dict)
+
+
+def meta_key(tenant_id: str, sku: str) -> str:
+    return f"{tenant_id}#{sku}#meta"
+
+
+def shard_key(tenant_id: str, sku: str, shard: int) -> str:
+    return f"{tenant_id}#{sku}#shard-{shard}"
+
+
+def reservation_key(tenant_id: str, order_id: str) -> str:
+    return f"{tenant_id}#reservation#{order_id}"
+
+
+def _error_code(exc: ClientError) -> str:
+    return (exc.response or {}).get("Error", {}).get("Code", "")
+
+
+def _cancellation_codes(exc: ClientError) -> List[str]:
+    return [reason.get("Code", "None") for reason in (exc.response or {}).get("CancellationReasons", [])]
+
+
+def _split_evenly(quantity: int, shards: int) -> List[int]:
+    base, remainder = divmod(max(0, quantity), shards)
+    return [base + (1 if index < remainder else 0) for index in range(shards)]
+
+
+class InventoryStore:
+    def __init__(self, table_name: str | None = None) -> None:
+        self.table_name = table_name or os.environ.get("INVENTORY_TABLE")
+        if not self.table_name:
+            raise RuntimeError("Missing DynamoDB table env var: INVENTORY_TABLE")
+        self.table = dynamo_client.table(self.table_name)
+        self.client = dynamo_client.client()
+        self._shard_counts: Dict[Tuple[str, str], Tuple[int | None, float]] = {}
+
+    # -- primitives ----------------------------------------------------------
+    def _transact(self, items: List[Dict[str, Any]]) -> None:
+        self.client.transact_write_items(TransactItems=items)
+
+    def _get(self, key: str) -> Dict[str, Any] | None:
+        try:
+            return self.table.get_item(Key={"inventoryKey": key}, ConsistentRead=True).get("Item")
+        except (ClientError, BotoCoreError):
+            return None
+
+    def _tracked_shards(self, tenant_id: str, sku: str) -> int | None:
+        """Shard count of ``sku``, or ``None`` when it has no inventory record.
+
+        Read errors propagate: treating an unreadable SKU as untracked would
+        let orders skip the reservation.
+        """
+
+        cached = self._shard_counts.get((tenant_id, sku))
+        if cached and cached[1] > time.monotonic():
+            return cached[0]
+        meta = self.table.get_item(Key={"inventoryKey": meta_key(tenant_id, sku)}, ConsistentRead=True).get("Item")
+        count = int(meta.get("shardCount") or DEFAULT_SHARDS) if meta else None
+        self._shard_counts[(tenant_id, sku)] = (count, time.monotonic() + SHARD_COUNT_CACHE_SECONDS)
+        return count
+
+    def shard_count(self, tenant_id: str, sku: str) -> int:
+        try:
+            return self._tracked_shards(tenant_id, sku) or DEFAULT_SHARDS
+        except (ClientError, BotoCoreError):
+            return DEFAULT_SHARDS
+
+    def shard_levels(self, tenant_id: str, sku: str) -> Dict[int, int]:
+        return {
+            shard: int((self._get(shard_key(tenant_id, sku, shard)) or {}).get("available", 0))
+            for shard in range(self.shard_count(tenant_id, sku))
+        }
+
+    # -- stock administration -----------------------------------------------
+    def set_stock(self, tenant_id: str, sku: str, on_hand: int, shards: int | None = None) -> None:
+        """Overwrite the ledger and spread ``on_hand`` evenly across ``shards``.
+
+        Only meant for seeding and manual recounts; it ignores stock that is
+        currently held by active reservations.
+        """
+
+        shards = max(1, shards or DEFAULT_SHARDS)
+        now_iso = datetime.utcnow().isoformat() + "Z"
+        items = [
+            {
+                "Put": {
+                    "TableName": self.table_name,
+                    "Item": {
+                        "inventoryKey": meta_key(tenant_id, sku),
+                        "tenantId": tenant_id,
+                        "sku": sku,
+                        "recordType": "meta",
+                        "onHand": int(on_hand),
+                        "shardCount": shards,
+                        "version": 0,
+                        "updatedAt": now_iso,
+                    },
+                }
+            }
+        ]
+        for shard, available in enumerate(_split_evenly(int(on_hand), shards)):
+            items.append(
+                {
+                    "Put": {
+                        "TableName": self.table_name,
+                        "Item": {
+                            "inventoryKey": shard_key(tenant_id, sku, shard),
+                            "tenantId": tenant_id,
+                            "sku": sku,
+                            "recordType": "shard",
+                            "shard": shard,
+                            "available": available,
+                            "version": 0,
+                        },
+                    }
+                }
+            )
+        self._transact(items)
+        self._shard_counts[(tenant_id, sku)] = (shards, time.monotonic() + SHARD_COUNT_CACHE_SECONDS)
+
+    def rebalance_shards(self, tenant_id: str, sku: str) -> bool:
+        """Reclaim stock from full shards into drained ones.
+
+        The new spread is written in one transaction conditioned on every
+        shard still holding the value that was read, so a concurrent
+        reservation simply makes the rebalance a no-op.
+        """
+
+        levels = self.shard_levels(tenant_id, sku)
+        target = _split_evenly(sum(levels.values()), len(levels))
+        items = []
+        for shard, current in levels.items():
+            if current == target[shard]:
+                continue
+            items.append(
+                {
+                    "Update": {
+                        "TableName": self.table_name,
+                        "Key": {"inventoryKey": shard_key(tenant_id, sku, shard)},
+                        "UpdateExpression": "SET available = :target ADD version :one",
+                        "ConditionExpression": "available = :current",
+                        "ExpressionAttributeValues": {":target": target[shard], ":current": current, ":one": 1},
+                    }
+                }
+            )
+        if not items:
+            return False
+        try:
+            self._transact(items)
+        except ClientError as exc:
+            if _error_code(exc) != "TransactionCanceledException":
+                raise
+            return False
+        return True
+
+    # -- reservations ----------------------------------------------------------
+    def _allocate(
+        self, tenant_id: str, demand: Dict[str, int], exhausted: Dict[str, set], split: set
+    ) -> Dict[str, List[Tuple[int, int]]]:
+        """Choose shard allocations for each SKU: a random live shard, or a split."""
+
+        allocation: Dict[str, List[Tuple[int, int]]] = {}
+        for sku, quantity in demand.items():
+            shards = self.shard_count(tenant_id, sku)
+            if sku in split:
+                levels = self.shard_levels(tenant_id, sku)
+                total = sum(levels.values())
+                if total < quantity:
+                    raise InsufficientStockError(sku, quantity, total)
+                remaining = quantity
+                chunks: List[Tuple[int, int]] = []
+                for shard, available in sorted(levels.items(), key=lambda entry: -entry[1]):
+                    if remaining <= 0:
+                        break
+                    take = min(available, remaining)
+                    if take > 0:
+                        chunks.append((shard, take))
+                        remaining -= take
+                allocation[sku] = chunks
+                continue
+            candidates = [shard for shard in range(shards) if shard not in exhausted.get(sku, set())]
+            if not candidates:
+                split.add(sku)
+                return self._allocate(tenant_id, demand, exhausted, split)
+            allocation[sku] = [(random.choice(candidates), quantity)]
+        return allocation
+
+    def reserve(self, tenant_id: str, order_id: str, lines: Iterable[Dict[str, Any]], ttl_minutes: int | None = None) -> Reservation:
+        """Reserve every tracked order line atomically or raise.
+
+        Lines for SKUs without inventory records are listed in
+        ``untracked``; when no line is tracked nothing is written.
+        """
+
+        demand: Dict[str, int] = {}
+        untracked: List[str] = []
+        for line in lines:
+            sku = str(line.get("sku") or line.get("productId") or "")
+            quantity = line_quantity(line)
+            if not sku:
+                continue
+            if self._tracked_shards(tenant_id, sku) is None:
+                untracked.append(sku)
+                continue
+            demand[sku] = demand.get(sku, 0) + quantity
+        expires_at = datetime.utcnow() + timedelta(minutes=ttl_minutes or RESERVATION_MINUTES)
+        ttl = int((expires_at + timedelta(hours=TTL_GRACE_HOURS)).timestamp())
+        if not demand:
+            return Reservation(tenantId=tenant_id, orderId=order_id, lines=[], expiresAt="", status="untracked", attempts=0, untracked=untracked)
+
+        exhausted: Dict[str, set] = {}
+        split: set = set()
+        for attempt in range(1, MAX_ATTEMPTS + 1):
+            allocation = self._allocate(tenant_id, demand, exhausted, split)
+            reserved_lines = [
+                {"sku": sku, "shard": shard, "quantity": quantity}
+                for sku, chunks in allocation.items()
+                for shard, quantity in chunks
+            ]
+            reservation = Reservation(
+                tenantId=tenant_id,
+                orderId=order_id,
+                lines=reserved_lines,
+                expiresAt=expires_at.isoformat() + "Z",
+                attempts=attempt,
+                untracked=untracked,
+            )
+            items = [
+                {
+                    "Update": {
+                        "TableName": self.table_name,
+                        "Key": {"inventoryKey": shard_key(tenant_id, line["sku"], line["shard"])},
+                        "UpdateExpression": "SET available = available - :qty ADD version :one",
+                        "ConditionExpression": "available >= :qty",
+                        "ExpressionAttributeValues": {":qty": line["quantity"], ":one": 1},
+                    }
+                }
+                for line in reserved_lines
+            ]
+            items.append(
+                {
+                    "Put": {
+                        "TableName": self.table_name,
+                        "Item": reservation.as_item(ttl),
+                        "ConditionExpression": "attribute_not_exists(inventoryKey)",
+                    }
+                }
+            )
+            try:
+                self._transact(items)
+            except ClientError as exc:
+                if _error_code(exc) != "TransactionCanceledException":
+                    raise
+                codes = _cancellation_codes(exc)
+            else:
+                for sku in exhausted:
+                    try:
+                        self.rebalance_shards(tenant_id, sku)
+                    except (ClientError, BotoCoreError):  # pragma: no cover - reclaim is best effort
+                        pass
+                return reservation
+            if codes and codes[-1] == "ConditionalCheckFailed":
+                existing = self._get(reservation_key(tenant_id, order_id)) or {}
+                return Reservation(
+                    tenantId=tenant_id,
+                    orderId=order_id,
+                    lines=list(existing.get("lines", [])),
+                    expiresAt=str(existing.get("expiresAt", "")),
+                    status=str(existing.get("status", "active")),
+                    attempts=attempt,
+                    untracked=untracked,
+                )
+            for line, code in zip(reserved_lines, codes):
+                if code == "ConditionalCheckFailed":
+                    exhausted.setdefault(line["sku"], set()).add(line["shard"])
+            if "TransactionConflict" in codes:
+                time.sleep(random.uniform(0, 0.005 * (2**attempt)))
+        raise ReservationConflictError(f"Could not reserve stock for order {order_id} after {MAX_ATTEMPTS} attempts")
+
+    def _finish(self, tenant_id: str, order_id: str, status: str, expected_status: str = "active") -> bool:
+        record = self._get(reservation_key(tenant_id, order_id))
+        if not record or record.get("status") != expected_status:
+            return False
+        items: List[Dict[str, Any]] = [
+            {
+                "Update": {
+                    "TableName": self.table_name,
+                    "Key": {"inventoryKey": reservation_key(tenant_id, order_id)},
+                    "UpdateExpression": "SET #status = :status, finishedAt = :now",
+                    "ConditionExpression": "#status = :expected",
+                    "ExpressionAttributeNames": {"#status": "status"},
+                    "ExpressionAttributeValues": {
+                        ":status": status,
+                        ":expected": expected_status,
+                        ":now": datetime.utcnow().isoformat() + "Z",
+                    },
+                }
+            }
+        ]
+        totals: Dict[Tuple[str, str], int] = {}
+        for line in record.get("lines", []):
+            if status == "released":
+                target = shard_key(tenant_id, line["sku"], int(line["shard"]))
+                attribute = "available"
+            else:
+                target = meta_key(tenant_id, line["sku"])
+                attribute = "onHand"
+            totals[(target, attribute)] = totals.get((target, attribute), 0) + int(line["quantity"])
+        for (target, attribute), quantity in totals.items():
+            delta = quantity if status == "released" else -quantity
+            items.append(
+                {
+                    "Update": {
+                        "TableName": self.table_name,
+                        "Key": {"inventoryKey": target},
+                        "UpdateExpression": f"ADD {attribute} :delta, version :one",
+                        "ExpressionAttributeValues": {":delta": delta, ":one": 1},
+                    }
+                }
+            )
+        try:
+            self._transact(items)
+        except ClientError as exc:
+            if _error_code(exc) != "TransactionCanceledException":
+                raise
+            return False
+        return True
+
+    def release(self, tenant_id: str, order_id: str) -> bool:
+        """Return reserved units to the shards they were taken from."""
+
+        return self._finish(tenant_id, order_id, "released")
+
+    def commit(self, tenant_id: str, order_id: str) -> bool:
+        """Mark the reservation as sold and take the units off the on-hand ledger."""
+
+        return self._finish(tenant_id, order_id, "committed")
+
+    # -- sweeps ------------------------------------------------------------------
+    def _records(self, tenant_id: str, record_type: str, consistent: bool = False) -> List[Dict[str, Any]]:
+        request: Dict[str, Any] = {
+            "FilterExpression": "tenantId = :tenantId AND recordType = :recordType",
+            "ExpressionAttributeValues": {":tenantId": tenant_id, ":recordType": record_type},
+            "ConsistentRead": consistent,
+        }
+        records: List[Dict[str, Any]] = []
+        try:
+            while True:
+                response = self.table.scan(**request)
+                records.extend(response.get("Items", []))
+                if not response.get("LastEvaluatedKey"):
+                    return records
+                request["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+        except (ClientError, BotoCoreError):
+            return []
+
+    def release_expired(self, tenant_id: str, now: datetime | None = None) -> List[str]:
+        deadline = (now or datetime.utcnow()).isoformat() + "Z"
+        released = []
+        for record in self._records(tenant_id, "reservation"):
+            if record.get("status") == "active" and str(record.get("expiresAt", "")) <= deadline:
+                if self.release(tenant_id, str(record["orderId"])):
+                    released.append(str(record["orderId"]))
+        return released
+
+    def _counters(self, tenant_id: str, sku: str) -> Tuple[Dict[str, Any], Dict[int, Dict[str, Any]]]:
+        """Meta and shard items of ``sku`` read together with ``TransactGetItems``."""
+
+        shards = self.shard_count(tenant_id, sku)
+        while True:
+            keys = [meta_key(tenant_id, sku)] + [shard_key(tenant_id, sku, shard) for shard in range(shards)]
+            response = self.client.transact_get_items(
+                TransactItems=[{"Get": {"TableName": self.table_name, "Key": {"inventoryKey": key}}} for key in keys]
+            )
+            items = [entry.get("Item") or {} for entry in response.get("Responses", [])]
+            meta, shard_items = items[0], items[1:]
+            current = int(meta.get("shardCount") or DEFAULT_SHARDS)
+            if current == shards:
+                return meta, {shard: item for shard, item in enumerate(shard_items) if item}
+            shards = current  # re-sharded since the count was cached
+
+    @staticmethod
+    def _unchanged(item: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
+        if "version" not in item:
+            return "attribute_not_exists(version)", {}
+        return "version = :version", {":version": item["version"]}
+
+    def reconcile_sku(self, tenant_id: str, sku: str, repair: bool = True) -> ReconciliationReport:
+        """Compare ``onHand`` with shard stock plus active reservations and repair drift.
+
+        The counters come from one transactional read and the reservations
+        from a consistent scan after it. Any reservation, release or commit
+        landing in between bumps a ``version``, and the repair is conditioned
+        on every version still matching, so a race cancels the repair (and
+        the next sweep retries) instead of "correcting" a sale in flight.
+        """
+
+        meta, shard_items = self._counters(tenant_id, sku)
+        reserved = sum(
+            int(line["quantity"])
+            for record in self._records(tenant_id, "reservation", consistent=True)
+            if record.get("status") == "active"
+            for line in record.get("lines", [])
+            if line.get("sku") == sku
+        )
+        levels = {shard: int(item.get("available", 0)) for shard, item in shard_items.items()}
+        on_hand = int(meta.get("onHand", 0))
+        available = sum(levels.values())
+        report = ReconciliationReport(
+            tenantId=tenant_id,
+            sku=sku,
+            onHand=on_hand,
+            available=available,
+            reserved=reserved,
+            drift=on_hand - available - reserved,
+            shards=levels,
+        )
+        if not (repair and report.drift and levels and meta):
+            return report
+        target_shard = max(levels, key=lambda shard: levels[shard]) if report.drift < 0 else min(levels, key=lambda shard: levels[shard])
+        items: List[Dict[str, Any]] = []
+        for key, item in [(meta_key(tenant_id, sku), meta)] + [(shard_key(tenant_id, sku, shard), shard_items[shard]) for shard in levels]:
+            condition, values = self._unchanged(item)
+            request: Dict[str, Any] = {
+                "TableName": self.table_name,
+                "Key": {"inventoryKey": key},
+                "ConditionExpression": condition,
+            }
+            if key == shard_key(tenant_id, sku, target_shard):
+                request["UpdateExpression"] = "ADD available :drift, version :one"
+                request["ExpressionAttributeValues"] = {**values, ":drift": report.drift, ":one": 1}
+                items.append({"Update": request})
+            else:
+                if values:
+                    request["ExpressionAttributeValues"] = values
+                items.append({"ConditionCheck": request})
+        try:
+            self._transact(items)
+        except ClientError as exc:
+            if _error_code(exc) != "TransactionCanceledException":
+                raise
+            return report
+        report.repaired = True
+        return report
+
+    def reconcile_tenant(self, tenant_id: str, repair: bool = True) -> List[ReconciliationReport]:
+        return [self.reconcile_sku(tenant_id, str(meta["sku"]), repair) for meta in self._records(tenant_id, "meta")]
+
+
+def sweep_handler(event: dict, context: object | None = None) -> Dict[str, Any]:
+    """Scheduled sweep: release expired reservations, then reconcile every SKU."""
+
+    store = InventoryStore()
+    tenant_ids = list((event or {}).get("tenantIds") or [os.getenv("TENANT_ID", "public")])
+    released: Dict[str, List[str]] = {}
+    drift: Dict[str, Dict[str, int]] = {}
+    for tenant_id in tenant_ids:
+        released[tenant_id] = store.release_expired(tenant_id)
+        drift[tenant_id] = {report.sku: report.drift for report in store.reconcile_tenant(tenant_id) if report.drift}
+    return {"released": released, "drift": drift}
@@ -0,0 +1,240 @@
+"""In-Lambda verification of Cognito RS256 JWTs.
+
+Enabled with ``JWT_VERIFICATION=local``; ``validate_token`` then reads the
+``Authorization: Bearer`` header instead of trusting the claims API Gateway's
+authorizer placed in ``requestContext``, so the API can run without the
+authorizer hop (or behind an HTTP API / in a container).
+
+Signing keys come from the user pool's JWKS (``COGNITO_JWKS_URL``, or derived
+from ``COGNITO_ISSUER``), or from ``JWKS_FILE`` for tests and local runs. The
+key set is fetched once per container and refreshed every ``JWKS_TTL_S``
+seconds; a token signed with an unknown ``kid`` triggers an early refresh
+(at most once every ``JWKS_MIN_REFRESH_S``) so key rotation is picked up
+without a redeploy.
+
+Verified tokens are cached in a bounded LRU keyed by the SHA-256 of the token
+until their ``exp``, so repeat requests with the same token skip the RSA
+operation and the JSON decoding.
+"""
+from __future__ import annotations
+
+import base64
+import hashlib
+import json
+import os
+import threading
+import time
+import urllib.request
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Tuple
+
+# DER prefix of the PKCS#1 v1.5 DigestInfo for SHA-256 (RFC 8017, section 9.2).
+SHA256_DIGEST_INFO = bytes.fromhex("3031300d060960864801650304020105000420")
+CLOCK_SKEW_S = int(os.getenv("JWT_CLOCK_SKEW_S", "60"))
+CACHE_SIZE = int(os.getenv("JWT_CACHE_SIZE", "2048"))
+JWKS_TTL_S = int(os.getenv("JWKS_TTL_S", "3600"))
+JWKS_MIN_REFRESH_S = int(os.getenv("JWKS_MIN_REFRESH_S", "60"))
+
+
+class InvalidTokenError(Exception):
+    pass
+
+
+class TokenExpiredError(InvalidTokenError):
+    pass
+
+
+def enabled() -> bool:
+    return os.getenv("JWT_VERIFICATION", "authorizer").lower() == "local"
+
+
+def bearer_token(headers: Dict[str, Any] | None) -> str | None:
+    if not headers:
+        return None
+    value = headers.get("Authorization") or headers.get("authorization") or ""
+    scheme, _, token = str(value).partition(" ")
+    if scheme.lower() == "bearer" and token.strip():
+        return token.strip()
+    return None
+
+
+def _b64decode(segment: str) -> bytes:
+    return base64.urlsafe_b64decode(segment + "=" * (-len(segment) % 4))
+
+
+def _b64int(segment: str) -> int:
+    return int.from_bytes(_b64decode(segment), "big")
+
+
+def rsa_verify(message: bytes, signature: bytes, modulus: int, exponent: int) -> bool:
+    """RSASSA-PKCS1-v1_5 verification with SHA-256 (the JWS ``RS256`` algorithm)."""
+
+    size = (modulus.bit_length() + 7) // 8
+    if len(signature) != size:
+        return False
+    encoded = pow(int.from_bytes(signature, "big"), exponent, modulus).to_bytes(size, "big")
+    digest_info = SHA256_DIGEST_INFO + hashlib.sha256(message).digest()
+    padding = size - len(digest_info) - 3
+    return padding >= 8 and encoded == b"\x00\x01" + b"\xff" * padding + b"\x00" + digest_info
+
+
+def _default_jwks_url() -> str | None:
+    url = os.getenv("COGNITO_JWKS_URL")
+    if url:
+        return url
+    issuer = os.getenv("COGNITO_ISSUER")
+    return f"{issuer.rstrip('/')}/.well-known/jwks.json" if issuer else None
+
+
+def _fetch_url(url: str) -> Dict[str, Any]:
+    with urllib.request.urlopen(url, timeout=3) as response:  # noqa: S310 - fixed https endpoint
+        return json.loads(response.read())
+
+
+class JwksCache:
+    """Signing keys by ``kid``, loaded from ``JWKS_FILE`` or the pool's JWKS URL."""
+
+    def __init__(
+        self,
+        url: str | None = None,
+        path: str | None = None,
+        fetch: Callable[[str], Dict[str, Any]] = _fetch_url,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.path = path if path is not None else os.getenv("JWKS_FILE")
+        self.url = url if url is not None else _default_jwks_url()
+        self._fetch = fetch
+        self._clock = clock
+        self._keys: Dict[str, Tuple[int, int]] = {}
+        self._loaded_at = float("-inf")
+        self._lock = threading.Lock()
+
+    def _load(self) -> Dict[str, Any]:
+        if self.path:
+            with open(self.path, encoding="utf-8") as handle:
+                return json.load(handle)
+        if self.url:
+            return self._fetch(self.url)
+        raise InvalidTokenError("No JWKS configured (set COGNITO_JWKS_URL, COGNITO_ISSUER or JWKS_FILE)")
+
+    def refresh(self) -> None:
+        document = self._load()
+        self._keys = {
+            key["kid"]: (_b64int(key["n"]), _b64int(key["e"]))
+            for key in document.get("keys", [])
+            if key.get("kty") == "RSA" and key.get("use", "sig") == "sig"
+        }
+        self._loaded_at = self._clock()
+
+    def key(self, kid: str) -> Tuple[int, int]:
+        now = self._clock()
+        key = self._keys.get(kid)
+        if key is not None and now - self._loaded_at < JWKS_TTL_S:
+            return key
+        with self._lock:
+            # Unknown kid: the pool may have rotated keys. Refresh, but not on
+            # every request carrying a bogus kid.
+            stale = now - self._loaded_at >= JWKS_TTL_S
+            if stale or (kid not in self._keys and now - self._loaded_at >= JWKS_MIN_REFRESH_S):
+                try:
+                    self.refresh()
+                except (OSError, ValueError, KeyError) as exc:
+                    if not self._keys:
+                        raise InvalidTokenError("Signing keys unavailable") from exc
+        key = self._keys.get(kid)
+        if key is None:
+            raise InvalidTokenError("Unknown signing key")
+        return key
+
+
+class JwtVerifier:
+    def __init__(
+        self,
+        jwks: JwksCache | None = None,
+        issuer: str | None = None,
+        client_id: str | None = None,
+        cache_size: int = CACHE_SIZE,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.jwks = jwks or JwksCache(clock=clock)
+        self.issuer = issuer if issuer is not None else os.getenv("COGNITO_ISSUER")
+        self.client_id = client_id if client_id is not None else os.getenv("COGNITO_APP_CLIENT_ID")
+        self.cache_size = cache_size
+        self._clock = clock
+        self._verified: "OrderedDict[str, Tuple[Dict[str, Any], float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def verify(self, token: str) -> Dict[str, Any]:
+        """Claims of a valid token; raises :class:`InvalidTokenError` otherwise."""
+
+        cache_key = hashlib.sha256(token.encode()).hexdigest()
+        now = self._clock()
+        with self._lock:
+            cached = self._verified.get(cache_key)
+            if cached is not None:
+                self._verified.move_to_end(cache_key)
+        if cached is not None:
+            claims, expires_at = cached
+            if now >= expires_at + CLOCK_SKEW_S:
+                with self._lock:
+                    self._verified.pop(cache_key, None)
+                raise TokenExpiredError("Token expired")
+            return claims
+
+        claims = self._verify_uncached(token, now)
+        with self._lock:
+            self._verified[cache_key] = (claims, float(claims["exp"]))
+            while len(self._verified) > self.cache_size:
+                self._verified.popitem(last=False)
+        return claims
+
+    def _verify_uncached(self, token: str, now: float) -> Dict[str, Any]:
+        try:
+            header_segment, payload_segment, signature_segment = token.split(".")
+            header = json.loads(_b64decode(header_segment))
+            claims = json.loads(_b64decode(payload_segment))
+            signature = _b64decode(signature_segment)
+        except ValueError as exc:
+            raise InvalidTokenError("Malformed token") from exc
+        if not isinstance(header, dict) or not isinstance(claims, dict):
+            raise InvalidTokenError("Malformed token")
+        if header.get("alg") != "RS256":
+            raise InvalidTokenError("Unsupported token algorithm")
+        modulus, exponent = self.jwks.key(str(header.get("kid")))
+        if not rsa_verify(f"{header_segment}.{payload_segment}".encode(), signature, modulus, exponent):
+            raise InvalidTokenError("Invalid token signature")
+
+        if "exp" not in claims:
+            raise InvalidTokenError("Token has no expiry")
+        if now >= float(claims["exp"]) + CLOCK_SKEW_S:
+            raise TokenExpiredError("Token expired")
+        if claims.get("nbf") and now + CLOCK_SKEW_S < float(claims["nbf"]):
+            raise InvalidTokenError("Token not yet valid")
+        if self.issuer and claims.get("iss") != self.issuer:
+            raise InvalidTokenError("Unexpected token issuer")
+        if self.client_id:
+            audience = claims.get("aud") if claims.get("token_use") == "id" else claims.get("client_id")
+            if audience != self.client_id:
+                raise InvalidTokenError("Token issued for another client")
+        return claims
+
+    def clear(self) -> None:
+        with self._lock:
+            self._verified.clear()
+
+
+_verifier: JwtVerifier | None = None
+
+
+def get_verifier() -> JwtVerifier:
+    global _verifier
+    if _verifier is None:
+        _verifier = JwtVerifier()
+    return _verifier
+
+
+def reset_verifier() -> None:
+    """Drop the cached key set and verified tokens (configuration changed)."""
+
+    global _verifier
+    _verifier = None
@@ -0,0 +1,216 @@
+"""On-demand ``cProfile`` + ``tracemalloc`` capture for individual API requests.
+
+A request is profiled when either:
+
+* it carries ``X-Profile-Request: true`` and the caller is an admin (the
+  header is ignored for everyone else), or
+* its tenant is listed in ``PROFILE_TENANTS``. ``t-1`` profiles every
+  request of ``t-1``; ``t-2:50`` profiles the next 50 requests of ``t-2``
+  handled by each Lambda container.
+
+The capture is written to ``PROFILE_BUCKET`` in S3 when configured and to the
+``PROFILE_DIR`` directory otherwise: ``<key>.pstats`` holds the raw
+``cProfile`` stats (load with ``pstats.Stats``) and ``<key>.json`` a summary
+with the slowest functions, the top allocation sites still live when the
+request ends and the traced peak. The summary's location is returned to the
+caller in the ``X-Profile-Url`` response header.
+
+Requests that are not selected never touch the profiler; with no allow-list
+configured the check is a header lookup.
+"""
+from __future__ import annotations
+
+import cProfile
+import json
+import marshal
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Tuple, TypeVar
+
+import boto3
+try:  # pragma: no cover - compatibility with stubs in repo
+    from botocore.exceptions import BotoCoreError, ClientError
+except ImportError:  # pragma: no cover
+    from botocore.exceptions import ClientError
+
+    class BotoCoreError(Exception):
+        ...
+
+
+HEADER = "X-Profile-Request"
+RESPONSE_HEADER = "X-Profile-Url"
+PROFILE_PREFIX = "profiles"
+TOP_N = int(os.getenv("PROFILE_TOP_N", "25"))
+TRACE_FRAMES = int(os.getenv("PROFILE_TRACE_FRAMES", "10"))
+
+T = TypeVar("T")
+
+
+def parse_allow_list(text: str | None) -> Dict[str, int | None]:
+    """``"t-1,t-2:50"`` -> ``{"t-1": None, "t-2": 50}`` (``None`` = every request)."""
+
+    allowed: Dict[str, int | None] = {}
+    for entry in (text or "").split(","):
+        tenant_id, _, count = entry.strip().partition(":")
+        if tenant_id:
+            allowed[tenant_id] = int(count) if count else None
+    return allowed
+
+
+_allowed = parse_allow_list(os.getenv("PROFILE_TENANTS"))
+_lock = threading.Lock()
+# cProfile and tracemalloc are process wide; one capture at a time.
+_capturing = threading.Lock()
+
+
+def configure(tenants: str | None) -> None:
+    """Replace the tenant allow-list (and its remaining sample counts)."""
+
+    global _allowed
+    with _lock:
+        _allowed = parse_allow_list(tenants)
+
+
+def has_allow_list() -> bool:
+    return bool(_allowed)
+
+
+def header_requested(headers: Dict[str, Any] | None) -> bool:
+    if not headers:
+        return False
+    value = headers.get(HEADER) or headers.get(HEADER.lower())
+    return str(value or "").strip().lower() in {"1", "true", "yes"}
+
+
+def take_tenant_sample(tenant_id: str | None) -> bool:
+    """Whether ``tenant_id`` is allow-listed, consuming one of its samples if counted."""
+
+    if not tenant_id or tenant_id not in _allowed:
+        return False
+    with _lock:
+        remaining = _allowed.get(tenant_id, 0)
+        if remaining is None:
+            return True
+        if remaining <= 0:
+            return False
+        _allowed[tenant_id] = remaining - 1
+        return True
+
+
+class ProfileStore:
+    """Writes captures to ``PROFILE_BUCKET`` or, without one, to ``PROFILE_DIR``."""
+
+    def __init__(self, bucket: str | None = None, local_dir: str | None = None) -> None:
+        self.bucket = bucket if bucket is not None else os.getenv("PROFILE_BUCKET")
+        self.local_dir = Path(local_dir or os.getenv("PROFILE_DIR") or "/tmp/request-profiles")
+        self._s3 = None
+
+    def _s3_client(self):
+        if self._s3 is None:
+            self._s3 = boto3.client("s3", region_name=os.getenv("AWS_REGION", "us-east-1"))
+        return self._s3
+
+    def write(self, key: str, body: bytes, content_type: str) -> str:
+        if self.bucket:
+            self._s3_client().put_object(Bucket=self.bucket, Key=key, Body=body, ContentType=content_type)
+            return f"s3://{self.bucket}/{key}"
+        path = self.local_dir / key
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(body)
+        return path.resolve().as_uri()
+
+
+def _function_name(entry: Tuple[str, int, str]) -> str:
+    filename, line, name = entry
+    return f"{filename}:{line}({name})" if line else name
+
+
+def _top_functions(stats: Dict[Tuple[str, int, str], Any]) -> List[Dict[str, Any]]:
+    ranked = sorted(stats.items(), key=lambda item: item[1][3], reverse=True)[:TOP_N]
+    return [
+        {
+            "function": _function_name(entry),
+            "calls": calls,
+            "primitiveCalls": primitive,
+            "totalMs": round(total * 1000, 3),
+            "cumulativeMs": round(cumulative * 1000, 3),
+        }
+        for entry, (primitive, calls, total, cumulative, _) in ranked
+    ]
+
+
+def _top_allocations(snapshot: tracemalloc.Snapshot) -> List[Dict[str, Any]]:
+    snapshot = snapshot.filter_traces(
+        [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__)]
+    )
+    return [
+        {"site": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}", "sizeKb": round(stat.size / 1024, 2), "count": stat.count}
+        for stat in snapshot.statistics("lineno")[:TOP_N]
+    ]
+
+
+def profile_call(
+    operation: Callable[[], T],
+    *,
+    tenant_id: str | None,
+    reason: str,
+    label: str,
+    request_id: str | None = None,
+    store: ProfileStore | None = None,
+) -> Tuple[T, str | None]:
+    """Run ``operation`` under the profilers and publish the capture.
+
+    Returns the operation's result and the summary URL. The URL is ``None``
+    when another capture is already running in this process or the capture
+    could not be stored; the operation itself always runs exactly once.
+    """
+
+    if not _capturing.acquire(blocking=False):
+        return operation(), None
+    try:
+        profiler = cProfile.Profile()
+        owns_tracing = not tracemalloc.is_tracing()
+        if owns_tracing:
+            tracemalloc.start(TRACE_FRAMES)
+        tracemalloc.reset_peak()
+        started = time.perf_counter()
+        profiler.enable()
+        try:
+            result = operation()
+        finally:
+            profiler.disable()
+            elapsed = time.perf_counter() - started
+            snapshot = tracemalloc.take_snapshot()
+            peak = tracemalloc.get_traced_memory()[1]
+            if owns_tracing:
+                tracemalloc.stop()
+    finally:
+        _capturing.release()
+
+    now = datetime.utcnow()
+    key = f"{PROFILE_PREFIX}/{tenant_id or '_'}/{now:%Y-%m-%d}/{now:%H%M%S}-{request_id or uuid.uuid4().hex[:12]}"
+    stats = pstats.Stats(profiler).stats  # type: ignore[attr-defined]
+    summary = {
+        "request": label,
+        "tenantId": tenant_id,
+        "reason": reason,
+        "capturedAt": now.isoformat() + "Z",
+        "durationMs": round(elapsed * 1000, 3),
+        "peakTracedKb": round(peak / 1024, 2),
+        "statsKey": f"{key}.pstats",
+        "topFunctions": _top_functions(stats),
+        "topAllocations": _top_allocations(snapshot),
+    }
+    store = store or ProfileStore()
+    try:
+        store.write(f"{key}.pstats", marshal.dumps(stats), "application/octet-stream")
+        url = store.write(f"{key}.json", json.dumps(summary, default=str).encode(), "application/json")
+    except (ClientError, BotoCoreError, OSError):
+        url = None
+    return result, url
@@ -0,0 +1,79 @@
+"""``Accept-Encoding``-aware compression of API Gateway proxy responses.
+
+Only routes listed in ``app.COMPRESSED_ROUTES`` are considered, and only when
+the serialized body is at least ``RESPONSE_COMPRESSION_MIN_BYTES`` (1 KiB by
+default): below that the gzip header and the base64 expansion cost more than
+they save. Brotli is used when the client accepts it and the optional
+``brotli`` package is installed; gzip otherwise. Compressed bodies are base64
+encoded with ``isBase64Encoded`` set, which API Gateway decodes for the
+``*/*`` binary media type configured in ``cloudformation/backend.yml``.
+"""
+from __future__ import annotations
+
+import base64
+import gzip
+import os
+from typing import Dict, Tuple
+
+try:  # pragma: no cover - optional dependency
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+MIN_BYTES = int(os.getenv("RESPONSE_COMPRESSION_MIN_BYTES", "1024"))
+GZIP_LEVEL = int(os.getenv("RESPONSE_GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("RESPONSE_BROTLI_QUALITY", "5"))
+
+
+def supported_encodings() -> Tuple[str, ...]:
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def negotiate(accept_encoding: str | None) -> str | None:
+    """Best supported encoding allowed by an ``Accept-Encoding`` header."""
+
+    if not accept_encoding:
+        return None
+    weights: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().partition(";")
+        weight = 1.0
+        if params.strip().startswith("q="):
+            try:
+                weight = float(params.strip()[2:])
+            except ValueError:
+                weight = 0.0
+        weights[coding.strip().lower()] = weight
+    ranked = [
+        (weights.get(coding, weights.get("*", 0.0)), -index, coding)
+        for index, coding in enumerate(supported_encodings())
+    ]
+    weight, _, coding = max(ranked)
+    return coding if weight > 0 else None
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def encode_body(body: str, headers: Dict[str, str], accept_encoding: str | None, min_bytes: int | None = None) -> Tuple[str, bool]:
+    """Body to return and whether it is base64; updates ``headers`` when compressing."""
+
+    data = body.encode()
+    encoding = negotiate(accept_encoding)
+    if encoding is None or len(data) < (MIN_BYTES if min_bytes is None else min_bytes):
+        return body, False
+    headers["Content-Encoding"] = encoding
+    headers["Vary"] = "Accept-Encoding"
+    return base64.b64encode(compress(data, encoding)).decode(), True
+
+
+def accept_encoding_header(event_headers: Dict[str, str] | None) -> str | None:
+    """Header lookup is case-insensitive: API Gateway forwards what the client sent."""
+
+    for name, value in (event_headers or {}).items():
+        if name.lower() == "accept-encoding":
+            return value
+    return None
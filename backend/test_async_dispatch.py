@@ -0,0 +1,89 @@
+import json
+import threading
+import uuid
+from datetime import date
+
+import app
+import async_io
+from app import async_handler, handler
+
+
+def billing_event(path: str, claims: dict) -> dict:
+    return {
+        "path": path,
+        "httpMethod": "GET",
+        "headers": {},
+        "queryStringParameters": {},
+        "requestContext": {"authorizer": {"jwt": {"claims": {"exp": (date.today().toordinal() + 1) * 86400, **claims}}}},
+    }
+
+
+class InFlightLatch:
+    """Holds each wrapped call until ``expected`` calls are in flight at once.
+
+    Calls that overlap release each other immediately; calls made one after
+    another each wait out ``timeout`` and leave ``peak`` at 1.
+    """
+
+    def __init__(self, expected: int, timeout: float = 5.0) -> None:
+        self.expected, self.timeout = expected, timeout
+        self.current = self.peak = 0
+        self._condition = threading.Condition()
+
+    def wrap(self, func):
+        def call(*args, **kwargs):
+            with self._condition:
+                self.current += 1
+                self.peak = max(self.peak, self.current)
+                self._condition.notify_all()
+                self._condition.wait_for(lambda: self.peak >= self.expected, timeout=self.timeout)
+            try:
+                return func(*args, **kwargs)
+            finally:
+                with self._condition:
+                    self.current -= 1
+
+        return call
+
+
+def test_async_dispatch_matches_sync_and_overlaps_reads(dynamodb_tables, monkeypatch):
+    monkeypatch.setattr(app, "subscription_repository", None)
+    _, _, _, subscriptions = app._get_repositories()
+    tenant_ids = [f"t-async-{uuid.uuid4().hex[:6]}" for _ in range(4)]
+    for tenant_id in tenant_ids:
+        subscriptions.activate_plan(tenant_id, "growth", "pref-1", None)
+    own = billing_event(f"/v1/{tenant_ids[0]}/billing", {"custom:tenantId": tenant_ids[0]})
+    admin = billing_event("/v1/admin/tenants/billing", {"roles": "admin"})
+    own_sync, list_sync = handler(own, None), handler(admin, None)
+    recent_payments = subscriptions.recent_payments
+
+    # The subscription and payment reads are in flight together instead of one after another.
+    own_latch = InFlightLatch(expected=2)
+    monkeypatch.setattr(subscriptions, "get_subscription", own_latch.wrap(subscriptions.get_subscription))
+    monkeypatch.setattr(subscriptions, "recent_payments", own_latch.wrap(recent_payments))
+    own_async = async_handler(own, None)
+    total = json.loads(list_sync["body"])["total"]
+    list_latch = InFlightLatch(expected=total + 1)
+    monkeypatch.setattr(subscriptions, "get_subscriptions", list_latch.wrap(subscriptions.get_subscriptions))
+    monkeypatch.setattr(subscriptions, "recent_payments", list_latch.wrap(recent_payments))
+    list_async = async_handler(admin, None)
+
+    assert own_async["statusCode"] == own_sync["statusCode"] == 200
+    assert json.loads(own_async["body"]) == json.loads(own_sync["body"])
+    assert json.loads(list_async["body"]) == json.loads(list_sync["body"])
+    assert {item["tenantId"] for item in json.loads(list_async["body"])["items"]} >= set(tenant_ids)
+    assert own_latch.peak == 2
+    assert list_latch.peak == total + 1 <= async_io.CONCURRENCY
+
+
+def test_async_dispatch_keeps_errors_and_falls_back_for_sync_handlers(dynamodb_tables):
+    tenant_id = f"t-async-{uuid.uuid4().hex[:6]}"
+    bad_cursor = billing_event(f"/v1/{tenant_id}/billing", {"custom:tenantId": tenant_id})
+    bad_cursor["queryStringParameters"] = {"cursor": "not-a-cursor"}
+    forbidden = billing_event("/v1/admin/tenants/billing", {"custom:tenantId": tenant_id})
+    products = billing_event(f"/v1/{tenant_id}/products", {"custom:tenantId": tenant_id})
+
+    for event in (bad_cursor, forbidden, products):
+        assert async_handler(event, None)["statusCode"] == handler(event, None)["statusCode"]
+    assert async_handler(forbidden, None)["statusCode"] == 403
+    assert async_handler(bad_cursor, None)["statusCode"] == 400
@@ -0,0 +1,71 @@
+import uuid
+
+import pytest
+
+import dynamo_client
+from app import OrderRepository, SubscriptionRepository
+
+
+@pytest.fixture()
+def orders(dynamodb_tables):
+    return OrderRepository("ORDERS_TABLE")
+
+
+def test_get_many_chunks_keys_and_keeps_request_order(orders, monkeypatch):
+    prefix = uuid.uuid4().hex[:6]
+    orders.put_many([{"orderId": f"{prefix}-{index}", "tenantId": "t-batch", "amount": index} for index in range(130)])
+    calls = []
+    original = orders.client.batch_get_item
+    monkeypatch.setattr(orders.client, "batch_get_item", lambda **kw: calls.append(1) or original(**kw), raising=False)
+
+    keys = [{"orderId": f"{prefix}-{index}"} for index in (129, 3, 3, 77)] + [{"orderId": f"{prefix}-{index}"} for index in range(120)]
+    items = orders.get_many(keys + [{"orderId": f"{prefix}-missing"}])
+
+    assert len(calls) == 2
+    assert [item["amount"] for item in items[:4]] == [129, 3, 3, 77]
+    assert len(items) == 124
+
+
+def test_delete_many_removes_items(orders):
+    keys = [{"orderId": f"del-{uuid.uuid4().hex[:6]}"} for _ in range(30)]
+    orders.put_many([{**key, "tenantId": "t-batch"} for key in keys])
+
+    orders.delete_many(keys)
+
+    assert orders.get_many(keys) == []
+
+
+def test_unprocessed_items_are_retried(orders, monkeypatch):
+    monkeypatch.setattr(dynamo_client, "backoff", lambda attempt: 0)
+    original = orders.client.batch_write_item
+    rounds = []
+
+    def partially_throttled(RequestItems):
+        rounds.append(len(RequestItems[orders.table_name]))
+        first, *rest = RequestItems[orders.table_name]
+        original(RequestItems={orders.table_name: [first]})
+        return {"UnprocessedItems": {orders.table_name: rest} if rest else {}}
+
+    monkeypatch.setattr(orders.client, "batch_write_item", partially_throttled, raising=False)
+    orders.put_many([{"orderId": f"slow-{index}", "tenantId": "t-batch"} for index in range(3)])
+
+    assert rounds == [3, 2, 1]
+
+
+def test_query_iterates_pages_lazily(dynamodb_tables, monkeypatch):
+    subscriptions = SubscriptionRepository("TRANSACTIONS_TABLE")
+    tenant_id = f"t-{uuid.uuid4().hex[:6]}"
+    subscriptions.put_many(
+        [{"transactionId": f"{tenant_id}#pay-{index}", "tenantId": tenant_id, "receivedAt": f"2024-01-01T00:00:{index:02d}Z"} for index in range(25)]
+    )
+    pages = []
+    original = subscriptions.table.query
+    monkeypatch.setattr(subscriptions.table, "query", lambda **kw: pages.append(1) or original(**kw), raising=False)
+
+    results = subscriptions.query("tenantId = :tenant", {":tenant": tenant_id}, index_name="PaymentsByTenant", newest_first=True, page_size=10)
+    first = next(results)
+
+    assert first["transactionId"] == f"{tenant_id}#pay-24"
+    assert len(pages) == 1
+    assert len([first, *results]) == 25
+    assert len(pages) == 3
@@ -0,0 +1,121 @@
+import json
+import time
+import uuid
+from datetime import date
+
+import boto3
+
+import app
+from app import handler
+from usage_tracker import tracker
+
+
+def batch_event(tenant_id: str, requests: list) -> dict:
+    return {
+        "path": f"/v1/{tenant_id}/batch",
+        "httpMethod": "POST",
+        "headers": {},
+        "body": json.dumps({"requests": requests}),
+        "requestContext": {"authorizer": {"jwt": {"claims": {"exp": (date.today().toordinal() + 1) * 86400, "custom:tenantId": tenant_id, "sub": "u-1"}}}},
+    }
+
+
+def test_batch_runs_sub_requests_with_per_item_status(dynamodb_tables):
+    tenant_id = f"t-batch-{uuid.uuid4().hex[:6]}"
+    tracker.reset()
+
+    response = handler(
+        batch_event(
+            tenant_id,
+            [
+                {"id": "products", "path": f"/v1/{tenant_id}/products", "query": {"fields": "productId,price"}},
+                {"id": "new-cart", "method": "POST", "path": f"/v1/{tenant_id}/cart", "body": {"items": [{"productId": "prd-1", "quantity": 2, "price": 5}]}},
+                {"id": "cart", "path": f"/v1/{tenant_id}/cart"},
+                {"id": "other-tenant", "path": "/v1/t-other/cart"},
+                {"id": "missing", "path": f"/v1/{tenant_id}/nothing"},
+                {"id": "nested", "method": "POST", "path": f"/v1/{tenant_id}/batch"},
+            ],
+        ),
+        None,
+    )
+
+    assert response["statusCode"] == 200
+    entries = {entry["id"]: entry for entry in json.loads(response["body"])["responses"]}
+    assert [entries[key]["status"] for key in ("products", "new-cart", "cart", "other-tenant", "missing", "nested")] == [200, 201, 200, 400, 404, 400]
+    assert set(entries["products"]["body"]["items"][0]) == {"productId", "price"}
+    assert entries["cart"]["body"]["cartId"] == entries["new-cart"]["body"]["cartId"]  # the write ran before the read after it
+    assert len([record for record in tracker.get_raw_events() if record.tenantId == tenant_id]) == 3
+
+
+def test_batch_caps_and_concurrent_reads(dynamodb_tables):
+    tenant_id = f"t-batch-{uuid.uuid4().hex[:6]}"
+    reads = [{"id": index, "path": f"/v1/{tenant_id}/cart", "query": {"userId": f"u-{index}"}} for index in range(4)]
+
+    too_many = handler(batch_event(tenant_id, reads * 3), None)
+    boto3.configure_local_dynamodb(read_latency_ms=100)
+    try:
+        started = time.perf_counter()
+        response = handler(batch_event(tenant_id, reads), None)
+        elapsed = time.perf_counter() - started
+    finally:
+        boto3.configure_local_dynamodb()
+
+    assert too_many["statusCode"] == 413
+    assert [entry["status"] for entry in json.loads(response["body"])["responses"]] == [200] * 4
+    assert elapsed < 0.3  # four 100 ms reads overlap instead of adding up
+
+
+def test_batch_body_size_is_checked_first_and_entries_must_be_objects(dynamodb_tables, monkeypatch):
+    tenant_id = f"t-batch-{uuid.uuid4().hex[:6]}"
+    monkeypatch.setattr(app, "BATCH_MAX_BODY_BYTES", 256)
+    oversized = batch_event(tenant_id, [])
+    oversized["body"] = "{" + "x" * 300  # never parsed
+
+    too_big = handler(oversized, None)
+    mixed = handler(batch_event(tenant_id, ["cart", {"id": "cart", "path": f"/v1/{tenant_id}/cart"}]), None)
+
+    assert too_big["statusCode"] == 413 and json.loads(too_big["body"])["maxBodyBytes"] == 256
+    first, second = json.loads(mixed["body"])["responses"]
+    assert first == {"id": 0, "status": 400, "headers": {}, "body": {"message": "entry must be an object"}}
+    assert second["id"] == "cart" and second["status"] == 200
+
+
+def test_batch_entries_validate_headers_and_query_and_reuse_the_claims(dynamodb_tables, monkeypatch):
+    tenant_id = f"t-batch-{uuid.uuid4().hex[:6]}"
+    verified = []
+    original = app.validate_token
+    monkeypatch.setattr(app, "validate_token", lambda event: verified.append(event["path"]) or original(event))
+
+    response = handler(
+        batch_event(
+            tenant_id,
+            [
+                {"id": "bad-headers", "path": f"/v1/{tenant_id}/cart", "headers": ["x"]},
+                {"id": "bad-query", "path": f"/v1/{tenant_id}/cart", "query": "userId=u-1"},
+                {"id": "ok", "path": f"/v1/{tenant_id}/cart"},
+            ],
+        ),
+        None,
+    )
+
+    assert response["statusCode"] == 200
+    entries = {entry["id"]: entry for entry in json.loads(response["body"])["responses"]}
+    assert entries["bad-headers"] == {"id": "bad-headers", "status": 400, "headers": {}, "body": {"message": "headers must be an object"}}
+    assert entries["bad-query"]["body"] == {"message": "query must be an object"}
+    assert entries["ok"]["status"] == 200
+    assert verified == [f"/v1/{tenant_id}/batch"]  # once, by the router
+
+
+def test_concurrent_entries_record_usage_consistently(dynamodb_tables):
+    tenant_id = f"t-batch-{uuid.uuid4().hex[:6]}"
+    tracker.reset()
+    for index in range(150):  # fill the top-products summary so every entry evicts a counter
+        tracker.record_usage(tenant_id, requests=1, metadata={"productIds": f"old-{index}"})
+    entries = [{"id": index, "path": f"/v1/{tenant_id}/products/new-{index}"} for index in range(10)]
+
+    response = handler(batch_event(tenant_id, entries), None)
+
+    assert [entry["status"] for entry in json.loads(response["body"])["responses"]] == [200] * 10
+    products = tracker.live_sketches(tenant_id)[date.today().isoformat()]["topProducts"]
+    assert products.total == 160 and len(products.counters) == products.capacity
+    assert len([record for record in tracker.get_raw_events() if record.tenantId == tenant_id]) == 160
@@ -0,0 +1,67 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import app
+from benchmarks._support import local_stack
+from benchmarks.async_dispatch import run_benchmark as run_async_dispatch
+from benchmarks.compression import run_benchmark as run_compression
+from benchmarks.handler_suite import compare, run_suite
+from benchmarks.replay import classify, load_events, run_load, save_events
+from benchmarks.traffic import ROUTE_NAMES, TrafficGenerator, TrafficProfile
+from benchmarks.usage_scale import DEFAULT_BUDGETS_S, run_scale
+from usage_tracker import tracker
+
+
+def test_handler_suite_exercises_every_route_without_errors():
+    profile = TrafficProfile(tenants=2, mix={name: 1 for name in ROUTE_NAMES}, body_bytes=64, products_per_tenant=3)
+    repositories_before = app.cart_repository
+
+    result = run_suite(profile, requests=len(ROUTE_NAMES) * 8, warmup=0, allocation_samples=1)
+
+    assert set(result["routes"]) == set(ROUTE_NAMES)
+    assert all(int(status) < 500 for row in result["routes"].values() for status in row["statuses"])
+    assert result["storedItems"]["PRODUCTS_TABLE"] == 6
+    assert result["capacity"]["CARTS_TABLE"]["writeUnits"] > 0
+    assert app.cart_repository is repositories_before
+    assert compare(result, result) == []
+
+
+def test_usage_scale_reports_every_phase_and_enforces_budgets():
+    result = run_scale(events=3000, tenants=40, days=3, tenant_queries=5, budgets_s={"list_tenant_usage": 0.0})
+
+    assert [phase["phase"] for phase in result["phases"]] == list(DEFAULT_BUDGETS_S)
+    assert result["phases"][1]["evaluatedTenants"] == 40
+    assert result["violations"] and result["violations"][0].startswith("list_tenant_usage")
+    assert tracker.get_raw_events() == []
+
+
+def test_replay_reports_routes_and_tenants_at_an_open_loop_rate(tmp_path):
+    with local_stack("replay-test"):
+        generator = TrafficGenerator(TrafficProfile(tenants=2, products_per_tenant=2))
+        generator.seed()
+        capture = tmp_path / "events.jsonl"
+        save_events(str(capture), [event for _, event in generator.stream(40)])
+        events = load_events(str(capture))
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            result = run_load(events, executor, rate=2000)
+
+    assert result["requests"] == 40
+    assert result["errorRate"] == 0
+    assert set(result["tenants"]) <= {"bench-0000", "bench-0001", "-"}
+    assert sum(row["latency"]["count"] for row in result["routes"].values()) == 40
+    assert classify({"httpMethod": "GET", "path": "/v1/t-9/cart"}) == ("get_cart", "t-9")
+
+
+def test_compression_benchmark_reports_size_and_cpu_per_route():
+    results = run_compression(tenants=20, days=5, repeats=2)
+
+    assert {row["route"] for row in results} == {"list_tenant_usage", "export_usage_metrics", "get_tenant_usage"}
+    assert all(row["base64Bytes"] < row["rawBytes"] and row["cpu"]["count"] == 2 for row in results)
+    assert tracker.get_aggregates() == []
+
+
+def test_async_dispatch_benchmark_times_both_entry_points():
+    results = run_async_dispatch(tenants=2, read_latency_ms=0, repeats=1)
+
+    assert [row["route"] for row in results] == ["get_billing_status", "list_billing_status"]
+    assert all(row["sync"]["count"] == row["async"]["count"] == 1 for row in results)
@@ -0,0 +1,112 @@
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import handler
+
+
+def cart_event(path: str, http_method: str = "POST", body: dict | None = None, query: dict | None = None) -> dict:
+    return {
+        "path": path,
+        "httpMethod": http_method,
+        "headers": {},
+        "body": json.dumps(body) if body is not None else None,
+        "queryStringParameters": query or {},
+        "requestContext": {
+            "authorizer": {
+                "jwt": {
+                    "claims": {
+                        "custom:tenantId": "t-1",
+                        "sub": "user-42",
+                        "exp": (datetime.utcnow() + timedelta(minutes=5)).timestamp(),
+                    }
+                }
+            }
+        },
+    }
+
+
+def create_cart(items: list) -> dict:
+    response = handler(cart_event("/v1/t-1/cart", body={"items": items, "currency": "USD"}), {})
+    assert response["statusCode"] == 201
+    return json.loads(response["body"])
+
+
+def test_item_level_updates_maintain_totals_and_version(dynamodb_tables):
+    cart = create_cart([{"productId": "p1", "price": 10.0, "quantity": 1}])
+    cart_id = cart["cartId"]
+    assert cart["version"] == 1
+
+    added = handler(cart_event(f"/v1/t-1/cart/{cart_id}/items", body={"productId": "p2", "price": 5.5, "quantity": 2}), {})
+    again = handler(cart_event(f"/v1/t-1/cart/{cart_id}/items", body={"productId": "p1", "price": 10.0, "quantity": 1}), {})
+    changed = handler(cart_event(f"/v1/t-1/cart/{cart_id}/items/p2", http_method="PATCH", body={"quantity": 1}), {})
+    removed = handler(cart_event(f"/v1/t-1/cart/{cart_id}/items/p1", http_method="DELETE"), {})
+
+    assert added["statusCode"] == again["statusCode"] == changed["statusCode"] == removed["statusCode"] == 200
+    body = json.loads(removed["body"])
+    assert body["version"] == 5
+    assert body["totals"]["amount"] == pytest.approx(5.5)
+    assert body["totals"]["quantity"] == 1
+    assert body["items"] == [{"productId": "p2", "price": 5.5, "quantity": 1}]
+
+    stored = dynamodb_tables.Table("test-carts").get_item(Key={"cartId": cart_id})["Item"]
+    assert set(stored["items"]) == {"p2"}
+
+
+def test_stale_expected_version_is_rejected(dynamodb_tables):
+    cart = create_cart([{"productId": "p1", "price": 10.0, "quantity": 1}])
+    cart_id = cart["cartId"]
+
+    first_tab = handler(
+        cart_event(f"/v1/t-1/cart/{cart_id}/items", body={"productId": "p2", "price": 1.0, "expectedVersion": 1}), {}
+    )
+    second_tab = handler(
+        cart_event(f"/v1/t-1/cart/{cart_id}/items", body={"productId": "p3", "price": 2.0, "expectedVersion": 1}), {}
+    )
+
+    assert first_tab["statusCode"] == 200
+    assert second_tab["statusCode"] == 409
+    stored = dynamodb_tables.Table("test-carts").get_item(Key={"cartId": cart_id})["Item"]
+    assert set(stored["items"]) == {"p1", "p2"}
+    assert stored["totals"]["amount"] == pytest.approx(11.0)
+
+
+def test_get_cart_resolves_active_cart_through_user_index(dynamodb_tables):
+    cart = create_cart([{"productId": "p9", "price": 3.0, "quantity": 3}])
+
+    response = handler(cart_event("/v1/t-1/cart", http_method="GET", query={"userId": "user-42"}), {})
+    body = json.loads(response["body"])
+
+    assert response["statusCode"] == 200
+    assert body["cartId"] == cart["cartId"]
+    assert body["totals"]["amount"] == pytest.approx(9.0)
+
+
+def test_updates_to_unknown_cart_return_404(dynamodb_tables):
+    response = handler(cart_event("/v1/t-1/cart/t-1%23cart-missing/items", body={"productId": "p1", "price": 1.0}), {})
+
+    assert response["statusCode"] == 404
+
+
+def test_malformed_quantity_or_version_returns_400(dynamodb_tables):
+    cart_id = create_cart([{"productId": "p1", "price": 10.0, "quantity": 1}])["cartId"]
+    bad_header = cart_event(f"/v1/t-1/cart/{cart_id}/items/p1", http_method="DELETE")
+    bad_header["headers"] = {"If-Match": 'W/"abc"'}
+
+    responses = [
+        handler(cart_event(f"/v1/t-1/cart/{cart_id}/items", body={"productId": "p2", "expectedVersion": "v1"}), {}),
+        handler(cart_event(f"/v1/t-1/cart/{cart_id}/items/p1", http_method="PATCH", body={"quantity": "two"}), {}),
+        handler(cart_event(f"/v1/t-1/cart/{cart_id}/items/p1", http_method="PATCH", body={"quantity": 1.5}), {}),
+        handler(cart_event(f"/v1/t-1/cart/{cart_id}/items/p1", http_method="PATCH", body={}), {}),
+        handler(cart_event("/v1/t-1/cart", body={"items": [{"productId": "p3", "quantity": None}]}), {}),
+        handler(bad_header, {}),
+        handler(cart_event("/v1/t-1/cart", body={"items": ["x"]}), {}),
+        handler(cart_event("/v1/t-1/cart", body={"items": {"productId": "p1"}}), {}),
+    ]
+
+    assert [response["statusCode"] for response in responses] == [400] * 8
+    assert json.loads(responses[-1]["body"])["message"] == "items must be a list of objects"
+    assert json.loads(responses[1]["body"])["message"] == "quantity must be an integer"
+    stored = dynamodb_tables.Table("test-carts").get_item(Key={"cartId": cart_id})["Item"]
+    assert stored["version"] == 1 and set(stored["items"]) == {"p1"}
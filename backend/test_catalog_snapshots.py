@@ -0,0 +1,74 @@
+import json
+from datetime import datetime, timedelta
+
+from app import handler
+from catalog_snapshots import RETIRE_AFTER_S, SnapshotStore, manifest_key, publish_tenant_snapshot
+
+
+def build_products(count: int, category: str = "apparel") -> list:
+    return [
+        {"tenantId": "t-1", "productId": f"t-1#prd-{index:03d}", "name": f"Item {index}", "price": 10.0 + index, "category": category}
+        for index in range(count)
+    ]
+
+
+def test_snapshot_writes_listing_category_pages_and_manifest(tmp_path):
+    store = SnapshotStore(bucket="", local_dir=str(tmp_path))
+    products = build_products(3) + build_products(1, category="Foot Wear")
+    products[-1]["productId"] = "t-1#prd-900"
+
+    result = publish_tenant_snapshot("t-1", products, store=store, page_size=2)
+
+    manifest = json.loads((tmp_path / manifest_key("t-1")).read_text())
+    assert manifest["productCount"] == 4
+    assert len(manifest["listing"]) == 2
+    assert set(manifest["categories"]) == {"apparel", "foot-wear"}
+    assert manifest["fallback"]["products"] == "/v1/t-1/products"
+    first_page = json.loads((tmp_path / manifest["listing"][0]).read_text())
+    assert [item["productId"] for item in first_page["items"]] == ["t-1#prd-000", "t-1#prd-001"]
+    assert len(result.written) == 5  # 2 listing + 2 apparel + 1 foot-wear
+
+
+def test_snapshot_rebuilds_only_changed_pages(tmp_path):
+    store = SnapshotStore(bucket="", local_dir=str(tmp_path))
+    products = build_products(4)
+    publish_tenant_snapshot("t-1", products, store=store, page_size=2)
+    first_manifest = json.loads((tmp_path / manifest_key("t-1")).read_text())
+
+    unchanged = publish_tenant_snapshot("t-1", products, store=store, page_size=2)
+    assert unchanged.written == [] and not unchanged.changed
+
+    products[3]["price"] = 99.0
+    result = publish_tenant_snapshot("t-1", products, store=store, page_size=2)
+    manifest = json.loads((tmp_path / manifest_key("t-1")).read_text())
+
+    assert manifest["version"] == first_manifest["version"] + 1
+    assert manifest["listing"][0] == first_manifest["listing"][0]
+    assert manifest["listing"][1] != first_manifest["listing"][1]
+    assert len(result.written) == 2  # listing page 2 and category page 2
+    assert (tmp_path / first_manifest["listing"][1]).exists()  # cached manifests still point at it
+    assert first_manifest["listing"][1] in manifest["retired"]
+
+    later = publish_tenant_snapshot("t-1", products, store=store, page_size=2, now=datetime.utcnow() + timedelta(seconds=RETIRE_AFTER_S + 1))
+    assert sorted(later.removed) == sorted(result.retired)
+    assert not (tmp_path / first_manifest["listing"][1]).exists()
+    assert json.loads((tmp_path / manifest_key("t-1")).read_text())["retired"] == {}
+
+
+def test_products_route_advertises_manifest(monkeypatch):
+    monkeypatch.setenv("CATALOG_SNAPSHOT_BASE_URL", "https://cdn.example.com/")
+    event = {
+        "path": "/v1/t-1/products",
+        "httpMethod": "GET",
+        "headers": {},
+        "body": None,
+        "requestContext": {
+            "authorizer": {"jwt": {"claims": {"custom:tenantId": "t-1", "exp": (datetime.utcnow() + timedelta(minutes=5)).timestamp()}}}
+        },
+    }
+
+    response = handler(event, {})
+
+    assert response["statusCode"] == 200
+    assert response["headers"]["X-Catalog-Manifest"] == "https://cdn.example.com/catalog/t-1/manifest.json"
+    assert json.loads(response["body"])["count"] == 2
@@ -0,0 +1,127 @@
+import time
+from datetime import date
+
+import pytest
+from botocore.exceptions import ClientError
+
+import app
+import dynamo_client
+
+
+def throttled() -> ClientError:
+    return ClientError({"Error": {"Code": "ProvisionedThroughputExceededException", "Message": "slow down"}}, "PutItem")
+
+
+@pytest.fixture(autouse=True)
+def fresh_registry(monkeypatch):
+    dynamo_client.reset()
+    monkeypatch.setattr(dynamo_client, "backoff", lambda attempt: 0)
+    yield
+    dynamo_client.reset()
+
+
+def test_throttled_calls_are_retried_from_the_shared_budget():
+    calls = []
+
+    def flaky():
+        calls.append(1)
+        if len(calls) < 3:
+            raise throttled()
+        return "ok"
+
+    assert dynamo_client.call(["orders"], flaky) == "ok"
+    assert len(calls) == 3
+    assert dynamo_client.retry_budget.tokens == dynamo_client.RETRY_BUDGET - 2 * dynamo_client.RETRY_COST + 1
+
+
+def test_business_errors_are_not_retried():
+    calls = []
+
+    def conditional():
+        calls.append(1)
+        raise ClientError({"Error": {"Code": "ConditionalCheckFailedException"}}, "PutItem")
+
+    with pytest.raises(ClientError):
+        dynamo_client.call(["orders"], conditional)
+    assert len(calls) == 1
+
+
+def test_breaker_opens_on_throttling_and_fails_fast(monkeypatch):
+    calls = []
+
+    def always_throttled():
+        calls.append(1)
+        raise throttled()
+
+    for _ in range(2):
+        with pytest.raises(ClientError):
+            dynamo_client.call(["carts"], always_throttled)
+    assert dynamo_client.breaker("carts").is_open
+    attempts = len(calls)
+
+    with pytest.raises(dynamo_client.CircuitOpenError):
+        dynamo_client.call(["carts"], always_throttled)
+    assert len(calls) == attempts
+    assert dynamo_client.call(["orders"], lambda: "other tables keep working") == "other tables keep working"
+
+    monkeypatch.setattr(dynamo_client.breaker("carts"), "cooldown", 0)
+    assert dynamo_client.call(["carts"], lambda: "probe") == "probe"
+    assert dynamo_client.breaker("carts").state == "closed"
+
+
+def test_tables_share_one_resource(dynamodb_tables):
+    orders = dynamo_client.table("test-orders")
+
+    assert dynamo_client.table("test-orders") is orders
+    assert dynamo_client.resource() is dynamo_client.resource()
+    orders.put_item(Item={"orderId": "o-pool", "tenantId": "t-1"})
+    assert dynamo_client.table("test-orders").get_item(Key={"orderId": "o-pool"})["Item"]["tenantId"] == "t-1"
+
+
+def test_probe_answered_with_a_business_error_closes_the_breaker(monkeypatch):
+    table_breaker = dynamo_client.breaker("carts")
+    table_breaker.state, table_breaker.cooldown = "open", 0
+
+    def conditional():
+        raise ClientError({"Error": {"Code": "ConditionalCheckFailedException"}}, "PutItem")
+
+    with pytest.raises(ClientError):
+        dynamo_client.call(["carts"], conditional)
+    assert table_breaker.state == "closed"
+    assert dynamo_client.call(["carts"], lambda: "ok") == "ok"
+
+
+def test_transaction_blocked_by_one_table_does_not_wedge_the_others():
+    first, second = dynamo_client.breaker("A"), dynamo_client.breaker("B")
+    first.state, first.cooldown = "open", 0
+    second.state, second._opened_at = "open", time.monotonic()
+
+    with pytest.raises(dynamo_client.CircuitOpenError):
+        dynamo_client.call(["A", "B"], lambda: "never runs")
+    assert first.state == "open"
+    assert dynamo_client.call(["A"], lambda: "probe") == "probe"
+    assert first.state == "closed"
+
+    second.state, second.cooldown = "open", 0
+
+    def broken():
+        raise KeyError("bug in the operation")
+
+    with pytest.raises(KeyError):
+        dynamo_client.call(["B"], broken)
+    assert second.state == "open"
+    assert dynamo_client.call(["B"], lambda: "probe") == "probe"
+
+
+def test_open_breaker_is_a_503_not_a_missing_item(dynamodb_tables, monkeypatch):
+    monkeypatch.setattr(app, "subscription_repository", None)
+    _, _, _, subscriptions = app._get_repositories()
+    table_breaker = dynamo_client.breaker(subscriptions.table_name)
+    table_breaker.state, table_breaker._opened_at = "open", time.monotonic()
+    claims = {"custom:tenantId": "t-open", "exp": (date.today().toordinal() + 1) * 86400}
+
+    response = app.handler({"path": "/v1/t-open/billing", "httpMethod": "GET", "headers": {}, "requestContext": {"authorizer": {"jwt": {"claims": claims}}}}, None)
+
+    assert not isinstance(dynamo_client.CircuitOpenError("t", 1.0), ClientError)
+    assert response["statusCode"] == 503
+    assert int(response["headers"]["Retry-After"]) >= 1
@@ -1,42 +1,14 @@
+import base64
 import json
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 
-import boto3
 import pytest
-from moto import mock_dynamodb
 
+import app
 from app import handler
 
 
-@pytest.fixture()
-def dynamodb_tables(monkeypatch):
-    with mock_dynamodb():
-        resource = boto3.resource("dynamodb", region_name="us-east-1")
-        resource.create_table(
-            TableName="test-orders",
-            KeySchema=[{"AttributeName": "orderId", "KeyType": "HASH"}],
-            AttributeDefinitions=[{"AttributeName": "orderId", "AttributeType": "S"}],
-            BillingMode="PAY_PER_REQUEST",
-        )
-        resource.create_table(
-            TableName="test-carts",
-            KeySchema=[{"AttributeName": "cartId", "KeyType": "HASH"}],
-            AttributeDefinitions=[{"AttributeName": "cartId", "AttributeType": "S"}],
-            BillingMode="PAY_PER_REQUEST",
-        )
-        resource.create_table(
-            TableName="test-transactions",
-            KeySchema=[{"AttributeName": "transactionId", "KeyType": "HASH"}],
-            AttributeDefinitions=[{"AttributeName": "transactionId", "AttributeType": "S"}],
-            BillingMode="PAY_PER_REQUEST",
-        )
-
-        monkeypatch.setenv("ORDERS_TABLE", "test-orders")
-        monkeypatch.setenv("CARTS_TABLE", "test-carts")
-        monkeypatch.setenv("TRANSACTIONS_TABLE", "test-transactions")
-        yield resource
-
-
 def auth_headers(tenant_id: str = "t-1") -> dict:
     return {
         "requestContext": {
@@ -110,11 +82,12 @@ def test_create_order_and_payment_retry(dynamodb_tables):
     first_attempt = handler(webhook_event, {})
     assert first_attempt["statusCode"] == 200
 
-    retry_event = json.loads(webhook_event["body"])
-    retry_event["data"]["status"] = "rejected"
-    webhook_event["body"] = json.dumps(retry_event)
-    handler(webhook_event, {})
-    handler(webhook_event, {})
+    # Each retry of a charge reaches us as a new payment id.
+    for payment_id in ("pay-1b", "pay-1c"):
+        retry_event = json.loads(webhook_event["body"])
+        retry_event["data"]["id"] = payment_id
+        webhook_event["body"] = json.dumps(retry_event)
+        handler(webhook_event, {})
 
     transactions_table = dynamodb_tables.Table("test-transactions")
     subscription_item = transactions_table.get_item(Key={"transactionId": "t-2#subscription"}).get("Item")
@@ -142,3 +115,92 @@ def test_webhook_success_resets_retry(dynamodb_tables):
     subscription_item = transactions_table.get_item(Key={"transactionId": "t-3#subscription"}).get("Item")
     assert subscription_item["status"] == "active"
     assert subscription_item.get("retryAttempts", 0) == 0
+
+
+def test_duplicate_webhook_returns_stored_receipt(dynamodb_tables):
+    webhook_event = {
+        "path": "/v1/t-4/webhooks/mercadopago",
+        "httpMethod": "POST",
+        "headers": {},
+        "body": json.dumps({
+            "type": "payment",
+            "data": {"id": "pay-4", "status": "rejected", "transaction_amount": 30, "currency_id": "USD"},
+        }),
+        "pathParameters": {"tenantId": "t-4"},
+        "queryStringParameters": {},
+        "requestContext": {},
+    }
+
+    first = handler(webhook_event, {})
+    app.webhook_deduplicator.cache.clear()  # simulate a cold container
+    second = handler(webhook_event, {})
+    third = handler(webhook_event, {})
+
+    assert first["statusCode"] == second["statusCode"] == third["statusCode"] == 200
+    assert "X-Idempotent-Replay" not in first["headers"]
+    assert second["headers"]["X-Idempotent-Replay"] == "true"
+    assert json.loads(second["body"])["receivedAt"] == json.loads(first["body"])["receivedAt"]
+
+    transactions_table = dynamodb_tables.Table("test-transactions")
+    subscription_item = transactions_table.get_item(Key={"transactionId": "t-4#subscription"}).get("Item")
+    assert subscription_item["retryAttempts"] == 1
+    assert subscription_item["status"] == "retrying"
+
+
+def test_concurrent_rejections_are_counted_once_each(dynamodb_tables):
+    def deliver(payment_id: str) -> int:
+        event = {
+            "path": "/v1/t-5/webhooks/mercadopago",
+            "httpMethod": "POST",
+            "headers": {},
+            "body": json.dumps({"type": "payment", "data": {"id": payment_id, "status": "rejected"}}),
+            "pathParameters": {"tenantId": "t-5"},
+            "queryStringParameters": {},
+            "requestContext": {},
+        }
+        return handler(event, {})["statusCode"]
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        statuses = list(pool.map(deliver, ["pay-5a", "pay-5b", "pay-5c", "pay-5d"]))
+
+    assert statuses == [200] * 4
+    subscription_item = dynamodb_tables.Table("test-transactions").get_item(Key={"transactionId": "t-5#subscription"})["Item"]
+    assert subscription_item["retryAttempts"] == 4
+    assert subscription_item["status"] == "suspended"
+    assert subscription_item["suspendedReason"] == "payment_failed"
+
+
+def test_billing_status_pages_through_payment_history(dynamodb_tables):
+    for payment_id in ("pay-6a", "pay-6b", "pay-6c", "pay-6d", "pay-6e"):
+        handler(
+            {
+                "path": "/v1/t-6/webhooks/mercadopago",
+                "httpMethod": "POST",
+                "headers": {},
+                "body": json.dumps({"type": "payment", "data": {"id": payment_id, "status": "approved"}}),
+                "pathParameters": {"tenantId": "t-6"},
+                "queryStringParameters": {},
+                "requestContext": {},
+            },
+            {},
+        )
+
+    pages, cursor = [], None
+    while True:
+        query = {"limit": "2", **({"cursor": cursor} if cursor else {})}
+        response = handler({"path": "/v1/t-6/billing", "httpMethod": "GET", "headers": {}, "queryStringParameters": query, **auth_headers("t-6")}, {})
+        assert response["statusCode"] == 200
+        body = json.loads(response["body"])
+        pages.append([payment["resourceId"] for payment in body["recentPayments"]])
+        cursor = body["nextCursor"]
+        if not cursor:
+            break
+
+    assert pages == [["pay-6d", "pay-6e"], ["pay-6b", "pay-6c"], ["pay-6a"]]
+    invalid = handler({"path": "/v1/t-6/billing", "httpMethod": "GET", "headers": {}, "queryStringParameters": {"cursor": "%%%"}, **auth_headers("t-6")}, {})
+    assert invalid["statusCode"] == 400
+    key = {"tenantId": "t-6", "receivedAt": "2024-01-01T00:00:00Z", "transactionId": "t-6#pay-6a"}
+    for forged in ({"tenantId": "t-6"}, {**key, "extra": "x"}, {**key, "tenantId": "t-7"}, {**key, "receivedAt": 5}, ["t-6"]):
+        cursor = base64.urlsafe_b64encode(json.dumps(forged).encode()).decode()
+        response = handler({"path": "/v1/t-6/billing", "httpMethod": "GET", "headers": {}, "queryStringParameters": {"cursor": cursor}, **auth_headers("t-6")}, {})
+        assert response["statusCode"] == 400
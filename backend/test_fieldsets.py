@@ -0,0 +1,56 @@
+import json
+import uuid
+from datetime import date
+
+import app
+from app import ProductRepository, handler
+
+
+def tenant_event(path: str, query: dict, claims: dict) -> dict:
+    return {
+        "path": path,
+        "httpMethod": "GET",
+        "headers": {},
+        "queryStringParameters": query,
+        "requestContext": {"authorizer": {"jwt": {"claims": {"exp": (date.today().toordinal() + 1) * 86400, **claims}}}},
+    }
+
+
+def test_product_fields_are_projected_in_dynamodb(dynamodb_tables, monkeypatch):
+    table_name = f"test-products-{uuid.uuid4().hex[:6]}"
+    dynamodb_tables.create_table(
+        TableName=table_name,
+        KeySchema=[{"AttributeName": "productId", "KeyType": "HASH"}],
+        AttributeDefinitions=[{"AttributeName": "productId", "AttributeType": "S"}],
+        BillingMode="PAY_PER_REQUEST",
+    )
+    monkeypatch.setenv("PRODUCTS_TABLE", table_name)
+    repository = ProductRepository("PRODUCTS_TABLE")
+    repository.put_many(
+        {"tenantId": "t-fs", "productId": f"t-fs#prd-{index}", "name": f"Item {index}", "price": 10 + index, "description": "x" * 2000, "stock": 3}
+        for index in range(3)
+    )
+    requests = []
+    scan = repository.table.scan
+    monkeypatch.setattr(repository.table, "scan", lambda **request: requests.append(request) or scan(**request))
+    monkeypatch.setattr(app, "product_repository", repository)
+
+    response = handler(tenant_event("/v1/t-fs/products", {"fields": "productId,name,price"}, {"custom:tenantId": "t-fs"}), None)
+    invalid = handler(tenant_event("/v1/t-fs/products", {"fields": "name,cost"}, {"custom:tenantId": "t-fs"}), None)
+
+    body = json.loads(response["body"])
+    assert body["items"] == [{"productId": f"t-fs#prd-{index}", "name": f"Item {index}", "price": 10 + index} for index in range(3)]
+    assert sorted(requests[0]["ExpressionAttributeNames"].values()) == ["name", "price", "productId"]
+    assert invalid["statusCode"] == 400 and "cost" in json.loads(invalid["body"])["message"]
+
+
+def test_billing_list_returns_only_requested_subscription_fields(dynamodb_tables, monkeypatch):
+    monkeypatch.setattr(app, "subscription_repository", None)
+    _, _, _, subscriptions = app._get_repositories()
+    tenant_id = f"t-bill-{uuid.uuid4().hex[:6]}"
+    subscriptions.activate_plan(tenant_id, "growth", "pref-1", None)
+
+    response = handler(tenant_event("/v1/admin/tenants/billing", {"fields": "status,planId"}, {"roles": "admin"}), None)
+
+    items = {item["tenantId"]: item for item in json.loads(response["body"])["items"]}
+    assert items[tenant_id] == {"tenantId": tenant_id, "subscription": {"status": "active", "planId": "growth"}, "billingHealth": "ok"}
@@ -0,0 +1,48 @@
+import json
+from datetime import date
+
+import instrumentation
+from app import handler
+
+
+def cart_event(tenant_id: str) -> dict:
+    return {
+        "path": f"/v1/{tenant_id}/cart",
+        "httpMethod": "POST",
+        "headers": {},
+        "body": json.dumps({"items": [{"productId": "p-1", "quantity": 2, "price": 5}]}),
+        "queryStringParameters": {},
+        "requestContext": {
+            "authorizer": {"jwt": {"claims": {"sub": "u-1", "custom:tenantId": tenant_id, "exp": (date.today().toordinal() + 1) * 86400}}}
+        },
+    }
+
+
+def test_sampled_requests_emit_one_emf_line_with_phases_and_dynamo_calls(dynamodb_tables, monkeypatch):
+    lines = []
+    monkeypatch.setattr(instrumentation, "sink", lines.append)
+    monkeypatch.setattr(instrumentation, "SAMPLE_RATE", 1.0)
+
+    response = handler(cart_event("t-metrics"), {})
+
+    assert response["statusCode"] == 201
+    assert len(lines) == 1
+    document = json.loads(lines[0])
+    definition = document["_aws"]["CloudWatchMetrics"][0]
+    assert definition["Dimensions"] == [["Route"]]
+    assert {"RouteMatchMs", "AuthMs", "TenantMs", "HandlerMs", "SerializeMs", "UsageMs", "DynamoMs"} <= {metric["Name"] for metric in definition["Metrics"]}
+    assert (document["Route"], document["TenantId"], document["StatusCode"]) == ("create_cart", "t-metrics", 201)
+    assert document["DynamoCalls"] == 1
+    assert document["DynamoCallDetails"][0]["operation"] == "put_item"
+    assert document["DynamoPayloadBytes"] > 0
+    assert instrumentation.current() is None
+
+
+def test_unsampled_requests_emit_nothing(dynamodb_tables, monkeypatch):
+    lines = []
+    monkeypatch.setattr(instrumentation, "sink", lines.append)
+    monkeypatch.setattr(instrumentation, "SAMPLE_RATE", 0.0)
+
+    assert handler(cart_event("t-metrics"), {})["statusCode"] == 201
+    assert lines == []
+    assert instrumentation.phase("handler") is instrumentation.phase("route")
@@ -0,0 +1,157 @@
+import json
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+
+import app
+from app import handler
+from benchmarks.inventory_contention import run_benchmark
+from inventory import InsufficientStockError, InvalidOrderLineError, InventoryStore, meta_key, reservation_key, shard_key
+
+
+@pytest.fixture()
+def tenant_id() -> str:
+    return f"t-inv-{uuid.uuid4().hex[:6]}"
+
+
+@pytest.fixture()
+def store(dynamodb_tables, tenant_id):
+    inventory = InventoryStore()
+    inventory.set_stock(tenant_id, "sku-a", 10, shards=4)
+    inventory.set_stock(tenant_id, "sku-b", 3, shards=1)
+    return inventory
+
+
+def test_reservation_is_atomic_across_lines(store, tenant_id):
+    store.reserve(tenant_id, "ord-1", [{"sku": "sku-a", "quantity": 2}, {"sku": "sku-b", "quantity": 3}])
+
+    with pytest.raises(InsufficientStockError):
+        store.reserve(tenant_id, "ord-2", [{"sku": "sku-a", "quantity": 1}, {"sku": "sku-b", "quantity": 1}])
+
+    assert sum(store.shard_levels(tenant_id, "sku-a").values()) == 8
+    assert store.shard_levels(tenant_id, "sku-b") == {0: 0}
+
+
+def test_line_larger_than_a_shard_is_split_and_shards_are_reclaimed(store, tenant_id):
+    reservation = store.reserve(tenant_id, "ord-3", [{"sku": "sku-a", "quantity": 7}])
+
+    assert sum(line["quantity"] for line in reservation.lines) == 7
+    assert len(reservation.lines) > 1
+    levels = store.shard_levels(tenant_id, "sku-a")
+    assert sum(levels.values()) == 3
+    assert max(levels.values()) - min(levels.values()) <= 1
+
+
+def test_expired_reservations_are_released_and_drift_is_repaired(store, tenant_id):
+    store.reserve(tenant_id, "ord-4", [{"sku": "sku-a", "quantity": 4}], ttl_minutes=1)
+
+    released = store.release_expired(tenant_id, now=datetime.utcnow() + timedelta(minutes=5))
+    assert released == ["ord-4"]
+    assert sum(store.shard_levels(tenant_id, "sku-a").values()) == 10
+
+    store.table.update_item(
+        Key={"inventoryKey": shard_key(tenant_id, "sku-a", 0)},
+        UpdateExpression="ADD available :lost",
+        ExpressionAttributeValues={":lost": -2},
+    )
+    report = store.reconcile_sku(tenant_id, "sku-a")
+    assert report.drift == 2 and report.repaired
+    assert store.reconcile_sku(tenant_id, "sku-a").drift == 0
+
+
+def test_reconcile_does_not_repair_across_a_concurrent_reservation(store, tenant_id):
+    scan = store._records
+
+    def reservation_lands_mid_read(tenant: str, record_type: str, consistent: bool = False):
+        # After the counters were read, before the reservations are scanned.
+        store.reserve(tenant_id, "ord-race", [{"sku": "sku-a", "quantity": 2}])
+        return scan(tenant, record_type, consistent)
+
+    store._records = reservation_lands_mid_read
+    report = store.reconcile_sku(tenant_id, "sku-a")
+    store._records = scan
+
+    assert report.drift == -2 and not report.repaired  # the phantom drift is not written back
+    assert store.reconcile_sku(tenant_id, "sku-a").drift == 0
+    assert sum(store.shard_levels(tenant_id, "sku-a").values()) == 8
+
+
+def order_event(tenant_id: str, items: list) -> dict:
+    claims = {"custom:tenantId": tenant_id, "exp": (datetime.utcnow() + timedelta(minutes=5)).timestamp()}
+    return {
+        "path": f"/v1/{tenant_id}/orders",
+        "httpMethod": "POST",
+        "headers": {},
+        "body": json.dumps({"amount": 10, "items": items}),
+        "requestContext": {"authorizer": {"jwt": {"claims": claims}}},
+    }
+
+
+def test_create_order_reserves_stock_or_returns_409(store, tenant_id):
+    created = handler(order_event(tenant_id, [{"productId": "sku-b", "quantity": 2}]), {})
+    rejected = handler(order_event(tenant_id, [{"productId": "sku-b", "quantity": 2}]), {})
+    unseeded = handler(order_event(tenant_id, [{"productId": "sku-new", "quantity": 1}]), {})
+
+    assert created["statusCode"] == 201
+    assert json.loads(created["body"])["inventoryStatus"] == "reserved"
+    assert rejected["statusCode"] == 409
+    assert json.loads(rejected["body"])["available"] == 1
+    assert unseeded["statusCode"] == 201
+    assert json.loads(unseeded["body"])["inventoryStatus"] == "untracked"
+
+
+def test_order_lines_need_a_positive_integer_quantity(store, tenant_id):
+    responses = [
+        handler(order_event(tenant_id, [{"productId": "sku-a", "quantity": quantity}]), {})
+        for quantity in ("two", None, 0, -1, 1.5, True)
+    ]
+    listed = handler(order_event(tenant_id, ["sku-a"]), {})
+
+    assert [response["statusCode"] for response in responses] == [400] * 6
+    assert json.loads(responses[0]["body"])["message"] == "Quantity for sku-a must be a positive integer, got 'two'"
+    assert listed["statusCode"] == 400
+    assert store.reconcile_sku(tenant_id, "sku-a").available == 10
+    with pytest.raises(InvalidOrderLineError):
+        store.reserve(tenant_id, "ord-x", [{"sku": "sku-a", "quantity": "many"}])
+
+
+def test_approved_payment_commits_the_reservation(store, tenant_id, monkeypatch):
+    monkeypatch.setattr(app, "inventory_store", store)
+    order = json.loads(handler(order_event(tenant_id, [{"productId": "sku-a", "quantity": 3}]), {})["body"])
+
+    app.process_payment_batch(tenant_id, [{"resourceId": "pay-1", "status": "approved", "orderId": order["orderId"].split("#", 1)[1]}])
+
+    assert store._get(reservation_key(tenant_id, order["orderId"]))["status"] == "committed"
+    assert store._get(meta_key(tenant_id, "sku-a"))["onHand"] == 7
+    assert store.release_expired(tenant_id, now=datetime.utcnow() + timedelta(hours=1)) == []
+    assert store.reconcile_sku(tenant_id, "sku-a").drift == 0
+
+
+def test_queued_payment_commits_the_reservation_in_the_consumer(store, tenant_id, monkeypatch):
+    monkeypatch.setattr(app, "inventory_store", store)
+    order = json.loads(handler(order_event(tenant_id, [{"productId": "sku-a", "quantity": 2}]), {})["body"])
+    # A fresh consumer container: only the environment points it at the inventory table.
+    monkeypatch.setattr(app, "inventory_store", None)
+    monkeypatch.setenv("INVENTORY_TABLE", "test-inventory")
+    notification = {
+        "tenantId": tenant_id,
+        "notificationType": "payment",
+        "resourceId": "pay-q",
+        "status": "approved",
+        "orderId": order["orderId"].split("#", 1)[1],
+        "receivedAt": datetime.utcnow().isoformat() + "Z",
+    }
+
+    result = app.webhook_batch_handler({"Records": [{"messageId": "m-1", "body": json.dumps(notification)}]})
+
+    assert result == {"batchItemFailures": []}
+    assert store._get(reservation_key(tenant_id, order["orderId"]))["status"] == "committed"
+    assert store.release_expired(tenant_id, now=datetime.utcnow() + timedelta(hours=1)) == []
+
+
+def test_contention_benchmark_conserves_stock(dynamodb_tables):
+    results = run_benchmark(shard_counts=(1, 4), threads=4, orders_per_thread=5, write_latency_ms=0)
+
+    assert [row["shards"] for row in results] == [1, 4]
+    assert all(row["stockDrift"] == 0 and row["reserved"] == 20 for row in results)
@@ -0,0 +1,134 @@
+import base64
+import hashlib
+import json
+import random
+import time
+
+import pytest
+
+import jwt_verifier
+from app import handler
+from jwt_verifier import JwksCache, JwtVerifier, SHA256_DIGEST_INFO
+
+
+def _is_probable_prime(candidate: int, rng: random.Random) -> bool:
+    if candidate % 2 == 0:
+        return candidate == 2
+    d, r = candidate - 1, 0
+    while d % 2 == 0:
+        d, r = d // 2, r + 1
+    for _ in range(20):
+        x = pow(rng.randrange(2, candidate - 1), d, candidate)
+        if x in (1, candidate - 1):
+            continue
+        for _ in range(r - 1):
+            x = pow(x, 2, candidate)
+            if x == candidate - 1:
+                break
+        else:
+            return False
+    return True
+
+
+def generate_key(seed: int, bits: int = 1024) -> dict:
+    rng = random.Random(seed)
+    primes = []
+    while len(primes) < 2:
+        candidate = rng.getrandbits(bits // 2) | (1 << (bits // 2 - 1)) | 1
+        if _is_probable_prime(candidate, rng) and (candidate - 1) % 65537:
+            primes.append(candidate)
+    p, q = primes
+    return {"n": p * q, "e": 65537, "d": pow(65537, -1, (p - 1) * (q - 1))}
+
+
+def _b64(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def _b64int(value: int) -> str:
+    return _b64(value.to_bytes((value.bit_length() + 7) // 8, "big"))
+
+
+def sign(key: dict, kid: str, claims: dict) -> str:
+    signing_input = f"{_b64(json.dumps({'alg': 'RS256', 'kid': kid}).encode())}.{_b64(json.dumps(claims).encode())}"
+    size = (key["n"].bit_length() + 7) // 8
+    digest_info = SHA256_DIGEST_INFO + hashlib.sha256(signing_input.encode()).digest()
+    encoded = b"\x00\x01" + b"\xff" * (size - len(digest_info) - 3) + b"\x00" + digest_info
+    signature = pow(int.from_bytes(encoded, "big"), key["d"], key["n"]).to_bytes(size, "big")
+    return f"{signing_input}.{_b64(signature)}"
+
+
+def jwks(**keys: dict) -> dict:
+    return {"keys": [{"kty": "RSA", "use": "sig", "alg": "RS256", "kid": kid, "n": _b64int(key["n"]), "e": _b64int(key["e"])} for kid, key in keys.items()]}
+
+
+KEY_A = generate_key(1)
+KEY_B = generate_key(2)
+ISSUER = "https://cognito-idp.us-east-1.amazonaws.com/us-east-1_test"
+
+
+def claims(**extra) -> dict:
+    return {"sub": "user-1", "iss": ISSUER, "token_use": "access", "custom:tenantId": "t-jwt", "exp": int(time.time()) + 300, **extra}
+
+
+def test_verifier_checks_signature_and_caches_until_exp():
+    now = [time.time()]
+    verifier = JwtVerifier(JwksCache(url="https://jwks", fetch=lambda url: jwks(a=KEY_A), clock=lambda: now[0]), issuer=ISSUER, clock=lambda: now[0])
+    token = sign(KEY_A, "a", claims(exp=int(now[0]) + 120))
+
+    assert verifier.verify(token)["sub"] == "user-1"
+    tampered = token.rsplit(".", 1)[0][:-2] + "xx." + token.rsplit(".", 1)[1]
+    with pytest.raises(jwt_verifier.InvalidTokenError):
+        verifier.verify(tampered)
+    with pytest.raises(jwt_verifier.InvalidTokenError, match="issuer"):
+        verifier.verify(sign(KEY_A, "a", claims(iss="https://evil.example.com")))
+
+    calls = []
+    verifier._verify_uncached = lambda *args: calls.append(args)  # cache hits must not re-verify
+    assert verifier.verify(token)["custom:tenantId"] == "t-jwt"
+    assert calls == []
+    now[0] += 120 + jwt_verifier.CLOCK_SKEW_S
+    with pytest.raises(jwt_verifier.TokenExpiredError):
+        verifier.verify(token)
+
+
+def test_unknown_kid_refreshes_jwks_once_for_rotation():
+    now = [1000.0]
+    documents = [jwks(a=KEY_A), jwks(a=KEY_A, b=KEY_B)]
+    fetches = []
+
+    def fetch(url):
+        fetches.append(url)
+        return documents[min(len(fetches), len(documents)) - 1]
+
+    verifier = JwtVerifier(JwksCache(url="https://jwks", fetch=fetch, clock=lambda: now[0]), issuer="", clock=lambda: now[0])
+    verifier.verify(sign(KEY_A, "a", claims(exp=int(now[0]) + 3000)))
+    now[0] += jwt_verifier.JWKS_MIN_REFRESH_S
+
+    assert verifier.verify(sign(KEY_B, "b", claims(exp=int(now[0]) + 3000)))["sub"] == "user-1"
+    with pytest.raises(jwt_verifier.InvalidTokenError, match="Unknown signing key"):
+        verifier.verify(sign(KEY_B, "c", claims(exp=int(now[0]) + 3000)))
+    assert len(fetches) == 2
+
+
+def test_handler_verifies_bearer_token_locally(tmp_path, monkeypatch):
+    jwks_file = tmp_path / "jwks.json"
+    jwks_file.write_text(json.dumps(jwks(a=KEY_A)))
+    monkeypatch.setenv("JWT_VERIFICATION", "local")
+    monkeypatch.setenv("JWKS_FILE", str(jwks_file))
+    monkeypatch.setenv("COGNITO_ISSUER", ISSUER)
+    jwt_verifier.reset_verifier()
+    forged = {"authorizer": {"jwt": {"claims": {"custom:tenantId": "t-jwt", "cognito:groups": ["admin"]}}}}
+
+    def request(path, token=None):
+        headers = {"Authorization": f"Bearer {token}"} if token else {}
+        return handler({"path": path, "httpMethod": "GET", "headers": headers, "body": None, "requestContext": forged}, None)
+
+    try:
+        assert request("/v1/t-jwt/products")["statusCode"] == 401
+        assert request("/v1/t-jwt/products", sign(KEY_A, "a", claims()))["statusCode"] == 200
+        assert request("/v1/admin/tenants/billing", sign(KEY_A, "a", claims()))["statusCode"] == 403
+        expired = request("/v1/t-jwt/products", sign(KEY_A, "a", claims(exp=int(time.time()) - 3600)))
+        assert expired["statusCode"] == 401 and "expired" in json.loads(expired["body"])["message"]
+    finally:
+        jwt_verifier.reset_verifier()
@@ -0,0 +1,114 @@
+import uuid
+
+import pytest
+from botocore.exceptions import ClientError
+
+import boto3
+
+
+@pytest.fixture()
+def ledger():
+    """Composite-key table with a KEYS_ONLY index, created fresh for each test."""
+
+    name = f"ledger-{uuid.uuid4().hex[:8]}"
+    resource = boto3.resource("dynamodb", region_name="us-east-1")
+    resource.create_table(
+        TableName=name,
+        KeySchema=[{"AttributeName": "tenantId", "KeyType": "HASH"}, {"AttributeName": "entryId", "KeyType": "RANGE"}],
+        BillingMode="PAY_PER_REQUEST",
+        GlobalSecondaryIndexes=[
+            {
+                "IndexName": "ByStatus",
+                "KeySchema": [{"AttributeName": "status", "KeyType": "HASH"}],
+                "Projection": {"ProjectionType": "KEYS_ONLY"},
+            }
+        ],
+    )
+    yield resource.Table(name)
+    boto3.configure_local_dynamodb()
+
+
+def test_composite_keys_and_sparse_keys_only_index(ledger):
+    ledger.put_item(Item={"tenantId": "t-1", "entryId": "b", "status": "open", "amount": 5})
+    ledger.put_item(Item={"tenantId": "t-1", "entryId": "a", "amount": 3})
+    ledger.put_item(Item={"tenantId": "t-2", "entryId": "a", "status": "open", "amount": 9})
+
+    page = ledger.query(KeyConditionExpression="tenantId = :t", ExpressionAttributeValues={":t": "t-1"})
+    assert [item["entryId"] for item in page["Items"]] == ["a", "b"]
+
+    by_status = ledger.query(IndexName="ByStatus", KeyConditionExpression="#s = :s", ExpressionAttributeNames={"#s": "status"}, ExpressionAttributeValues={":s": "open"})
+    assert sorted(item["tenantId"] for item in by_status["Items"]) == ["t-1", "t-2"]
+    assert all("amount" not in item for item in by_status["Items"])
+
+    with pytest.raises(ClientError) as missing_range:
+        ledger.get_item(Key={"tenantId": "t-1"})
+    assert missing_range.value.response["Error"]["Code"] == "ValidationException"
+
+
+def test_limit_counts_items_before_the_filter(ledger):
+    for index in range(6):
+        ledger.put_item(Item={"tenantId": "t-1", "entryId": f"e-{index}", "amount": index})
+
+    page = ledger.query(
+        KeyConditionExpression="tenantId = :t",
+        FilterExpression="amount >= :min",
+        ExpressionAttributeValues={":t": "t-1", ":min": 4},
+        Limit=3,
+    )
+
+    assert page["Count"] == 0 and page["ScannedCount"] == 3
+    assert page["LastEvaluatedKey"] == {"tenantId": "t-1", "entryId": "e-2"}
+
+
+def test_scan_pages_stop_at_one_megabyte(ledger):
+    blob = "x" * 100_000
+    for index in range(25):
+        ledger.put_item(Item={"tenantId": "t-1", "entryId": f"e-{index:02d}", "blob": blob})
+
+    pages, request = [], {"ProjectionExpression": "entryId"}
+    while True:
+        response = ledger.scan(**request)
+        pages.append(len(response["Items"]))
+        if "LastEvaluatedKey" not in response:
+            break
+        request["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+    assert pages == [11, 11, 3]
+
+
+def test_capacity_is_metered_like_dynamodb(ledger):
+    boto3.reset_local_dynamodb()
+    item = {"tenantId": "t-1", "entryId": "big", "status": "open", "blob": "x" * 5000}
+
+    written = ledger.put_item(Item=item, ReturnConsumedCapacity="INDEXES")["ConsumedCapacity"]
+    eventual = ledger.get_item(Key={"tenantId": "t-1", "entryId": "big"}, ReturnConsumedCapacity="TOTAL")["ConsumedCapacity"]
+    strong = ledger.get_item(Key={"tenantId": "t-1", "entryId": "big"}, ConsistentRead=True, ReturnConsumedCapacity="TOTAL")["ConsumedCapacity"]
+
+    assert written["Table"]["CapacityUnits"] == 5
+    assert written["GlobalSecondaryIndexes"] == {"ByStatus": {"CapacityUnits": 1.0, "WriteCapacityUnits": 1.0}}
+    assert (eventual["CapacityUnits"], strong["CapacityUnits"]) == (1.0, 2.0)
+    stats = boto3.local_dynamodb_stats(ledger.name)
+    assert (stats["writeUnits"], stats["indexWriteUnits"], stats["readUnits"]) == (5, 1, 3)
+
+    with pytest.raises(ClientError) as too_big:
+        ledger.put_item(Item={"tenantId": "t-1", "entryId": "huge", "blob": "x" * 410_000})
+    assert too_big.value.response["Error"]["Code"] == "ValidationException"
+
+
+def test_throttling_surfaces_as_errors_and_unprocessed_items(ledger):
+    boto3.configure_local_dynamodb(throttle_rate=1.0, throttle_tables=[ledger.name], seed=7)
+    client = boto3.resource("dynamodb", region_name="us-east-1").meta.client
+
+    with pytest.raises(ClientError) as throttled:
+        ledger.put_item(Item={"tenantId": "t-1", "entryId": "a"})
+    response = client.batch_write_item(RequestItems={ledger.name: [{"PutRequest": {"Item": {"tenantId": "t-1", "entryId": "b"}}}]})
+
+    assert throttled.value.response["Error"]["Code"] == "ProvisionedThroughputExceededException"
+    assert len(response["UnprocessedItems"][ledger.name]) == 1
+    assert boto3.local_dynamodb_stats(ledger.name)["throttled"] == 2
+
+    boto3.configure_local_dynamodb()
+    with ledger.batch_writer() as batch:
+        for index in range(30):
+            batch.put_item(Item={"tenantId": "t-1", "entryId": f"w-{index:02d}"})
+    assert ledger.query(KeyConditionExpression="tenantId = :t", ExpressionAttributeValues={":t": "t-1"}, Select="COUNT")["Count"] == 30
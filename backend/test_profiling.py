@@ -0,0 +1,61 @@
+import json
+import pstats
+from datetime import datetime, timedelta
+from pathlib import Path
+from urllib.parse import unquote, urlparse
+
+import pytest
+
+import profiling
+from app import handler
+
+
+def build_event(tenant_id: str, *, admin: bool = False, headers: dict | None = None) -> dict:
+    claims = {"custom:tenantId": tenant_id, "exp": (datetime.utcnow() + timedelta(minutes=5)).timestamp()}
+    if admin:
+        claims["cognito:groups"] = ["admin"]
+    return {
+        "path": f"/v1/{tenant_id}/products",
+        "httpMethod": "GET",
+        "headers": headers or {},
+        "body": None,
+        "pathParameters": {"tenantId": tenant_id},
+        "requestContext": {"requestId": "req-1", "authorizer": {"jwt": {"claims": claims}}},
+    }
+
+
+@pytest.fixture(autouse=True)
+def profile_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv("PROFILE_DIR", str(tmp_path))
+    monkeypatch.delenv("PROFILE_BUCKET", raising=False)
+    yield tmp_path
+    profiling.configure(None)
+
+
+def test_admin_header_captures_stats_and_links_summary(profile_dir):
+    response = handler(build_event("t-prof", admin=True, headers={profiling.HEADER: "true"}), None)
+
+    assert response["statusCode"] == 200
+    summary_path = Path(unquote(urlparse(response["headers"][profiling.RESPONSE_HEADER]).path))
+    summary = json.loads(summary_path.read_text())
+    assert summary["tenantId"] == "t-prof" and summary["reason"] == "header"
+    assert any("route_event" in row["function"] for row in summary["topFunctions"])
+    assert summary["topAllocations"]
+    stats = pstats.Stats(str(profile_dir / summary["statsKey"]))
+    assert stats.total_calls > 0
+
+
+def test_header_is_ignored_for_non_admins():
+    response = handler(build_event("t-prof", headers={profiling.HEADER: "true"}), None)
+
+    assert response["statusCode"] == 200
+    assert profiling.RESPONSE_HEADER not in response["headers"]
+
+
+def test_allow_listed_tenant_is_sampled_for_n_requests():
+    profiling.configure("t-other,t-sampled:2")
+
+    linked = [profiling.RESPONSE_HEADER in handler(build_event("t-sampled"), None)["headers"] for _ in range(3)]
+
+    assert linked == [True, True, False]
+    assert profiling.RESPONSE_HEADER not in handler(build_event("t-unlisted"), None)["headers"]
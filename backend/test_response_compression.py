@@ -0,0 +1,66 @@
+import base64
+import gzip
+import json
+from datetime import date
+
+from app import handler, parse_body, record_usage_event, request_body_size
+from response_compression import negotiate
+from usage_tracker import UsageRecord, tracker
+
+
+def setup_function():
+    tracker.reset()
+
+
+def admin_event(path: str, accept_encoding: str | None = None) -> dict:
+    return {
+        "path": path,
+        "httpMethod": "GET",
+        "headers": {"accept-encoding": accept_encoding} if accept_encoding else {},
+        "queryStringParameters": {},
+        "requestContext": {"authorizer": {"jwt": {"claims": {"exp": (date.today().toordinal() + 1) * 86400, "roles": "admin", "custom:tenantId": "t-gz"}}}},
+    }
+
+
+def test_accept_encoding_negotiation():
+    assert negotiate("gzip, deflate") == "gzip"
+    assert negotiate("deflate, gzip;q=0") is None
+    assert negotiate("*;q=0.5") == "gzip"
+    assert negotiate("identity") is None
+    assert negotiate(None) is None
+
+
+def test_large_opted_in_responses_are_gzipped_and_base64_encoded():
+    for index in range(300):
+        tracker.append_aggregate(UsageRecord(tenantId=f"t-{index}", period="2024-05-01", usage={"requests": 1.0}, createdAt="2024-05-02T00:00:00Z"))
+
+    plain = handler(admin_event("/v1/admin/tenants/usage/export"), {})
+    compressed = handler(admin_event("/v1/admin/tenants/usage/export", "br;q=1, gzip;q=0.8"), {})
+    small = handler(admin_event("/v1/t-gz/usage", "gzip"), {})
+    not_opted_in = handler(admin_event("/v1/t-gz/analytics/sales", "gzip"), {})
+
+    assert "isBase64Encoded" not in plain and "Content-Encoding" not in plain["headers"]
+    assert compressed["isBase64Encoded"] is True
+    assert compressed["headers"]["Content-Encoding"] in ("gzip", "br")
+    assert compressed["headers"]["Vary"] == "Accept-Encoding"
+    if compressed["headers"]["Content-Encoding"] == "gzip":
+        assert gzip.decompress(base64.b64decode(compressed["body"])).decode() == plain["body"]
+    assert len(compressed["body"]) * 4 < len(plain["body"])
+    assert small["isBase64Encoded"] is False and json.loads(small["body"])["tenantId"] == "t-gz"
+    assert "Content-Encoding" not in not_opted_in["headers"]
+
+
+def test_base64_request_bodies_are_decoded():
+    body = base64.b64encode(json.dumps({"items": [1]}).encode()).decode()
+
+    assert parse_body({"body": body, "isBase64Encoded": True}) == {"items": [1]}
+
+
+def test_usage_bills_the_decoded_body_size():
+    for payload in (b"", b"x", b"xy", b"xyz", json.dumps({"name": "Camiseta \u00f1", "qty": 2}).encode()):
+        event = {"body": base64.b64encode(payload).decode(), "isBase64Encoded": True}
+        assert request_body_size(event) == len(payload)
+        assert request_body_size({"body": payload.decode()}) == len(payload)
+
+    record_usage_event({"body": base64.b64encode(b"x" * 300).decode(), "isBase64Encoded": True}, "t-b64", requests=1)
+    assert tracker.get_raw_events()[-1].usage["bytes"] == 300
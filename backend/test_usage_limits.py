@@ -1,8 +1,10 @@
+import uuid
 from datetime import date
 
+import boto3
 from notification_service import NotificationService
 from usage_monitor import run_limit_checks
-from usage_plans import register_contract, reset_registry
+from usage_plans import REGISTRY_KEY, ContractStore, TenantContract, contract_store, get_tenant_contract, register_contract, reset_registry
 from usage_tracker import UsageRecord, tracker
 
 
@@ -52,3 +54,60 @@ def test_no_alerts_when_no_contract():
     assert result["evaluatedTenants"] == 0
     assert result["alerts"] == []
     assert notifier.sent_notifications == []
+
+
+def _contracts_table(resource, name):
+    resource.create_table(
+        TableName=name,
+        KeySchema=[{"AttributeName": "tenantId", "KeyType": "HASH"}],
+        AttributeDefinitions=[{"AttributeName": "tenantId", "AttributeType": "S"}],
+        BillingMode="PAY_PER_REQUEST",
+    )
+    return resource.Table(name)
+
+
+def test_contract_store_bulk_loads_once_and_reloads_on_version_change(dynamodb_tables):
+    name = f"test-contracts-{uuid.uuid4().hex[:6]}"
+    table = _contracts_table(dynamodb_tables, name)
+    for index in range(300):
+        table.put_item(Item={"tenantId": f"t-c{index}", "planId": "growth", "adminContact": {"email": f"ops@t-c{index}.example.com"}, "version": 1})
+    table.put_item(Item={"tenantId": REGISTRY_KEY, "version": 300})
+    now = [0.0]
+    store = ContractStore(name, clock=lambda: now[0])
+    requests = lambda: boto3.local_dynamodb_stats(name)["requests"]  # noqa: E731
+    before = requests()
+
+    contracts = [store.get(f"t-c{index}") for index in range(300)]
+
+    assert all(contract and contract.plan.limits["orders"] == 500 for contract in contracts)
+    after = requests()
+    assert {op: after[op] - before.get(op, 0) for op in ("GetItem", "Scan")} == {"GetItem": 1, "Scan": 1}
+
+    ContractStore(name).put(TenantContract(tenantId="t-new", planId="enterprise"))  # another container
+    assert store.get("t-new") is None
+    now[0] += 60
+    assert store.get("t-new").plan.name == "Enterprise"
+
+
+def test_limit_checks_use_persisted_contracts_and_stream_updates(dynamodb_tables, monkeypatch):
+    name = f"test-contracts-{uuid.uuid4().hex[:6]}"
+    _contracts_table(dynamodb_tables, name)
+    monkeypatch.setenv("CONTRACTS_TABLE", name)
+    reset_registry()
+    try:
+        register_contract("t-persisted", "starter", {"email": "ops@t-persisted.example.com"})
+        reset_registry()  # cold container
+        tracker.append_aggregate(
+            UsageRecord(tenantId="t-persisted", period=date.today().isoformat(), usage={"requests": 1200}, createdAt="2024-06-01T00:00:00Z")
+        )
+
+        assert run_limit_checks(for_date=date.today(), notifier=NotificationService())["evaluatedTenants"] == 1
+
+        store = contract_store()
+        image = {"tenantId": {"S": "t-persisted"}, "planId": {"S": "enterprise"}, "adminContact": {"M": {}}, "version": {"N": "2"}}
+        stale = {**image, "planId": {"S": "growth"}, "version": {"N": "1"}}
+        assert store.apply_changes([{"eventName": "MODIFY", "dynamodb": {"NewImage": image}}, {"eventName": "MODIFY", "dynamodb": {"NewImage": stale}}]) == 1
+        assert get_tenant_contract("t-persisted").planId == "enterprise"
+    finally:
+        monkeypatch.delenv("CONTRACTS_TABLE")
+        reset_registry()
@@ -0,0 +1,100 @@
+import random
+import uuid
+from datetime import datetime, timedelta
+
+from app import get_tenant_usage
+from usage_rollups import RollupStore, UsageRollups
+from usage_tracker import tracker
+
+NOW = datetime(2024, 6, 10, 15, 42, 30)
+
+
+def setup_function():
+    tracker.reset()
+
+
+def test_totals_use_coarsest_complete_levels_and_match_raw_sums():
+    rollups = UsageRollups()
+    rng = random.Random(3)
+    events = [(NOW - timedelta(minutes=rng.randrange(0, 60 * 24 * 30)), rng.randint(1, 5)) for _ in range(3000)]
+    for moment, requests in events[:2000]:
+        rollups.add("t-roll", moment, {"requests": requests})
+    rollups.prune(NOW - timedelta(hours=5))
+    for moment, requests in events[2000:]:  # includes late events for past hours
+        rollups.add("t-roll", moment, {"requests": requests})
+    rollups.add("t-other", NOW - timedelta(days=2), {"requests": 1000})
+
+    start, end = datetime(2024, 5, 14, 9), NOW
+    total, used = rollups.total("t-roll", start, end, now=NOW)
+
+    assert total["requests"] == sum(requests for moment, requests in events if start <= moment.replace(second=0) < end)
+    assert used["day"] and used["hour"] and used["minute"]
+    assert used["minute"] < 200  # only the ragged ends are read at minute resolution
+    hourly = rollups.series("t-roll", "hour", start, end, now=NOW)
+    assert sum(point["usage"]["requests"] for point in hourly) == total["requests"]
+
+
+def test_each_level_keeps_its_own_retention():
+    rollups = UsageRollups()
+    rollups.add("t-ret", datetime(2024, 1, 15, 10, 5), {"requests": 7})
+    later = datetime(2024, 3, 20)
+
+    rollups.prune(later)
+
+    assert rollups.series("t-ret", "minute", datetime(2024, 1, 1), later, now=later) == []
+    assert rollups.series("t-ret", "hour", datetime(2024, 1, 1), later, now=later) == []
+    assert rollups.total("t-ret", datetime(2024, 1, 1), later, now=later)[0]["requests"] == 7
+    assert rollups.series("t-ret", "month", datetime(2024, 1, 1), later, now=later)[0]["period"] == "2024-01"
+
+
+def test_tenant_usage_endpoint_serves_rollups():
+    now = datetime.utcnow()
+    for minutes in (5, 65, 125):
+        tracker.record_usage("t-api", requests=2, timestamp=now - timedelta(minutes=minutes))
+
+    start = (now - timedelta(hours=4)).replace(microsecond=0).isoformat()
+    status, body, _ = get_tenant_usage({"queryStringParameters": {"resolution": "auto", "startDate": start}}, {"tenantId": "t-api"})
+
+    assert status == 200
+    assert body["resolution"] == "minute"
+    assert body["summary"]["requests"] == 6
+    assert len(body["series"]) == 3
+    status, body, _ = get_tenant_usage({"queryStringParameters": {"resolution": "hour", "startDate": start}}, {"tenantId": "t-api"})
+    assert [point["usage"]["requests"] for point in body["series"]] == [2, 2, 2]
+    assert get_tenant_usage({"queryStringParameters": {"resolution": "week"}}, {"tenantId": "t-api"})[0] == 400
+
+
+def test_buckets_are_shared_through_the_store_and_survive_the_process(dynamodb_tables):
+    table_name = f"test-usage-aggregates-{uuid.uuid4().hex[:6]}"
+    dynamodb_tables.create_table(
+        TableName=table_name,
+        KeySchema=[{"AttributeName": "tenantId", "KeyType": "HASH"}, {"AttributeName": "period", "KeyType": "RANGE"}],
+        AttributeDefinitions=[{"AttributeName": "tenantId", "AttributeType": "S"}, {"AttributeName": "period", "AttributeType": "S"}],
+        BillingMode="PAY_PER_REQUEST",
+    )
+    first, second = UsageRollups(store=RollupStore(table_name), flush_seconds=3600), UsageRollups(store=RollupStore(table_name), flush_seconds=3600)
+    for minutes in range(0, 240, 10):
+        first.add("t-store", NOW - timedelta(minutes=minutes), {"requests": 1, "gmv": 2.5})
+        second.add("t-store", NOW - timedelta(days=40, minutes=minutes), {"requests": 1})
+
+    assert first.flush() == 24 + 5 + 1 + 1  # minutes, hours, day, month
+    second.flush()
+    fresh = UsageRollups(store=RollupStore(table_name))  # a new container
+
+    total, used = fresh.total("t-store", NOW - timedelta(days=60), NOW + timedelta(minutes=1), now=NOW)
+    assert total["requests"] == 48 and total["gmv"] == 60
+    assert used["minute"] <= 24
+    assert [point["usage"]["requests"] for point in fresh.series("t-store", "hour", NOW - timedelta(hours=5), NOW, now=NOW)] == [1, 6, 6, 6, 5]
+    row = dynamodb_tables.Table(table_name).get_item(Key={"tenantId": "t-store", "period": "rollup#minute#2024-06-10T15:42"})["Item"]
+    assert row["requests"] == 1 and row["expiresAt"] > 0
+
+
+def test_usage_bounds_with_an_offset_are_normalized_to_utc():
+    now = datetime.utcnow()
+    tracker.record_usage("t-tz", requests=3, timestamp=now - timedelta(minutes=30))
+
+    start = (now - timedelta(hours=1)).replace(microsecond=0).isoformat() + "+00:00"
+    status, body, _ = get_tenant_usage({"queryStringParameters": {"resolution": "minute", "startDate": start, "endDate": now.isoformat() + "Z"}}, {"tenantId": "t-tz"})
+
+    assert status == 200
+    assert body["summary"]["requests"] == 3
@@ -0,0 +1,151 @@
+from datetime import date, datetime, timedelta
+
+import random
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import usage_aggregator
+from app import get_product_by_id, get_sales_analytics, get_tenant_usage, record_usage_event
+from usage_sketches import HyperLogLog, SpaceSaving, counts, decode
+from usage_tracker import UsageTracker, tracker
+
+
+def setup_function():
+    tracker.reset()
+
+
+def usage_event(ip: str, agent: str = "curl/8") -> dict:
+    return {"path": "/v1/t-hll/products", "httpMethod": "GET", "headers": {"User-Agent": agent}, "requestContext": {"identity": {"sourceIp": ip}}}
+
+
+def test_hyperloglog_estimates_and_merges_within_error_bound():
+    left, right = HyperLogLog(), HyperLogLog()
+    for index in range(30000):
+        left.add(f"10.0.{index}")
+    for index in range(20000, 50000):
+        right.add(f"10.0.{index}")
+
+    merged = HyperLogLog.from_text(left.to_text()).merge(right)
+
+    assert abs(left.count() - 30000) / 30000 < 0.05
+    assert abs(merged.count() - 50000) / 50000 < 0.05
+    assert merged.merge(right).count() == merged.count()  # idempotent
+    assert len(merged.registers) == 2048
+    small = HyperLogLog()
+    for index in range(20):
+        small.add(str(index))
+    assert small.count() == 20
+    assert len(small.to_text()) < 200
+
+
+def test_unique_visitors_survive_aggregation_and_merge_across_days():
+    yesterday = date.today() - timedelta(days=1)
+    for index in range(40):
+        tracker.record_usage("t-hll", requests=1, timestamp=datetime.combine(yesterday, datetime.min.time()), metadata={"sourceIp": f"192.0.2.{index}", "userAgent": "app"})
+    usage_aggregator.aggregate_daily_usage(for_date=yesterday)
+    tracker._sketches.clear()  # a new container: yesterday is only in the aggregate
+    for index in range(30, 60):
+        record_usage_event(usage_event(f"192.0.2.{index}"), "t-hll", requests=1)
+        record_usage_event(usage_event(f"192.0.2.{index}", agent="firefox"), "t-hll", requests=1)
+    usage_aggregator.aggregate_daily_usage(for_date=date.today())
+
+    status, body, _ = get_tenant_usage({"queryStringParameters": {"startDate": yesterday.isoformat()}}, {"tenantId": "t-hll"})
+
+    assert status == 200
+    assert abs(body["unique"]["uniqueVisitors"] - 60) <= 2
+    assert abs(body["unique"]["uniqueClients"] - 100) <= 3
+    today, before = body["history"]
+    assert abs(today["unique"]["uniqueVisitors"] - 30) <= 1 and abs(before["unique"]["uniqueVisitors"] - 40) <= 1
+    assert abs(today["unique"]["uniqueClients"] - 60) <= 2
+
+
+def test_space_saving_keeps_heavy_hitters_within_error_bound():
+    rng = random.Random(7)
+    stream = [f"/v1/t/products/prd-{int(rng.paretovariate(1.1))}" for _ in range(20000)]
+    halves = [SpaceSaving(capacity=50), SpaceSaving(capacity=50)]
+    for index, path in enumerate(stream):
+        halves[index % 2].add(path)
+
+    merged = SpaceSaving.from_text(halves[0].to_text()).merge(halves[1])
+
+    exact = Counter(stream)
+    assert merged.total == len(stream) and len(merged.counters) <= 50
+    for item, true_count in exact.items():
+        if true_count > len(stream) / 50:
+            assert item in merged.counters
+    for entry in merged.top(10):
+        assert entry["count"] - entry["maxError"] <= exact[entry["key"]] <= entry["count"]
+    assert [entry["key"] for entry in merged.top(3)] == [path for path, _ in exact.most_common(3)]
+
+
+def test_concurrent_usage_recording_keeps_the_sketches_consistent():
+    def record(worker: int) -> None:
+        for index in range(2000):
+            path = "/v1/t-race/hot" if index % 4 == 0 else f"/v1/t-race/p-{worker}-{index % 300}"
+            tracker.record_usage("t-race", requests=1, metadata={"sourceIp": f"10.{worker}.0.{index % 200}", "path": path})
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        list(pool.map(record, range(4)))  # re-raises any error from a worker
+
+    sketches = tracker.live_sketches("t-race")[date.today().isoformat()]
+    paths = sketches["topPaths"]
+    assert paths.total == 8000 and len(paths.counters) == paths.capacity
+    hot = paths.top(1)[0]
+    assert hot["key"] == "/v1/t-race/hot" and hot["count"] - hot["maxError"] <= 2000 <= hot["count"]
+    assert len(paths._heap) <= 4 * paths.capacity
+    assert abs(counts(sketches)["uniqueVisitors"] - 800) <= 40
+
+
+def test_top_paths_and_products_are_exposed_per_tenant():
+    for product_id, views in (("prd-9", 5), ("prd-4", 3), ("prd-1", 1)):
+        for _ in range(views):
+            get_product_by_id({"path": f"/v1/t-top/products/{product_id}"}, {"tenantId": "t-top", "productId": product_id})
+
+    status, body, _ = get_tenant_usage({"queryStringParameters": {}}, {"tenantId": "t-top"})
+    usage_aggregator.aggregate_daily_usage(for_date=date.today())
+    analytics = get_sales_analytics({}, {"tenantId": "t-top"})[1]
+
+    assert status == 200
+    assert body["topPaths"][0] == {"path": "/v1/t-top/products/prd-9", "count": 5, "maxError": 0}
+    assert [entry["productId"] for entry in body["topProducts"]] == ["prd-9", "prd-4", "prd-1"]
+    # Sales analytics keeps ranking products by orders; page views stay on the usage endpoint.
+    assert all(set(entry) == {"productId", "name", "orders"} for entry in analytics["topProducts"])
+
+
+def usage_table(resource, kind: str) -> str:
+    table_name = f"test-usage-{kind}-{uuid.uuid4().hex[:6]}"
+    resource.create_table(
+        TableName=table_name,
+        KeySchema=[{"AttributeName": "tenantId", "KeyType": "HASH"}, {"AttributeName": "period", "KeyType": "RANGE"}],
+        AttributeDefinitions=[{"AttributeName": "tenantId", "AttributeType": "S"}, {"AttributeName": "period", "AttributeType": "S"}],
+        BillingMode="PAY_PER_REQUEST",
+    )
+    return table_name
+
+
+def test_aggregate_merges_the_sketches_of_every_process(dynamodb_tables, monkeypatch):
+    aggregates, rollups = usage_table(dynamodb_tables, "aggregates"), usage_table(dynamodb_tables, "rollups")
+    monkeypatch.setenv("USAGE_AGGREGATES_TABLE", aggregates)
+    monkeypatch.setenv("USAGE_ROLLUPS_TABLE", rollups)
+    first, second = UsageTracker(), UsageTracker()  # two containers
+    for container in (first, second):
+        container.rollups.flush_seconds = 3600  # keep the background flush out of the way
+    moment = datetime.combine(date.today(), datetime.min.time())
+    for index in range(40):
+        first.record_usage("t-multi", requests=1, timestamp=moment, metadata={"sourceIp": f"192.0.2.{index}", "path": "/v1/t-multi/cart"})
+    for index in range(20, 50):
+        second.record_usage("t-multi", requests=1, timestamp=moment, metadata={"sourceIp": f"192.0.2.{index}", "path": "/v1/t-multi/cart"})
+    assert dynamodb_tables.Table(rollups).scan()["Items"] == []  # recording never writes inline
+    second.flush_sketches()
+    first.flush_pending()
+    first.flush_sketches()  # rewrites its own row instead of adding a second copy
+    monkeypatch.setattr(usage_aggregator, "tracker", first)
+
+    record = usage_aggregator.aggregate_daily_usage(for_date=date.today())[0]
+
+    sketches = decode(record.sketches)
+    assert abs(counts(sketches)["uniqueVisitors"] - 50) <= 1
+    assert sketches["topPaths"].top(1) == [{"key": "/v1/t-multi/cart", "count": 70, "maxError": 0}]
+    assert [item["period"] for item in dynamodb_tables.Table(aggregates).scan()["Items"]] == [date.today().isoformat()]
+    assert {item["tenantId"] for item in dynamodb_tables.Table(rollups).scan()["Items"]} == {f"sketch#{date.today().isoformat()}", "t-multi"}
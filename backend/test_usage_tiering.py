@@ -0,0 +1,92 @@
+import json
+import uuid
+from datetime import date, datetime, timedelta
+
+import pytest
+
+import usage_tiering
+from app import get_tenant_usage
+from usage_tiering import ColdUsageStore, partition_key, query_aggregates, tier_usage
+from usage_tracker import UsagePersistence, UsageRecord, tracker
+
+TODAY = date(2024, 12, 31)
+
+
+def aggregate(tenant_id: str, day: date, requests: float) -> UsageRecord:
+    return UsageRecord(tenantId=tenant_id, period=day.isoformat(), usage={"requests": requests, "orders": 0.0, "gmv": 0.0, "bytes": 0.0}, createdAt=f"{day}T23:59:00Z")
+
+
+@pytest.fixture()
+def cold_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv("USAGE_COLD_DIR", str(tmp_path))
+    monkeypatch.delenv("USAGE_COLD_BUCKET", raising=False)
+    tracker.reset()
+    yield tmp_path
+    tracker.reset()
+
+
+def test_tiered_usage_is_served_from_both_tiers_with_pruning(cold_dir, monkeypatch):
+    for offset in range(365):
+        day = TODAY - timedelta(days=offset)
+        tracker.append_aggregate(aggregate("t-tier", day, 1))
+        tracker.append_aggregate(aggregate("t-other", day, 5))
+
+    result = tier_usage(hot_days=30, today=TODAY)
+
+    assert result["aggregateRecords"] == 2 * 334
+    assert all(record.period >= "2024-12-01" for record in tracker.get_aggregates())
+    assert (cold_dir / partition_key("aggregate", "t-tier", "2024-03-15")).exists()
+
+    reads = []
+    original = ColdUsageStore.read
+    monkeypatch.setattr(ColdUsageStore, "read", lambda self, key: reads.append(key) or original(self, key))
+    query = {"startDate": "2024-01-01", "endDate": "2024-12-31"}
+    status, body, _ = get_tenant_usage({"queryStringParameters": query}, {"tenantId": "t-tier"})
+
+    assert status == 200
+    assert body["summary"]["requests"] == 365
+    assert len(body["history"]) == 365
+    assert len(reads) == 334 and all("tenant=t-tier/" in key for key in reads)
+
+    reads.clear()
+    march = query_aggregates("t-tier", date(2024, 3, 10), date(2024, 3, 19))
+    assert len(march) == 10 and len(reads) == 10
+
+
+def test_rerun_merges_and_hot_rows_are_expired(cold_dir, dynamodb_tables, monkeypatch):
+    table_name = f"test-usage-aggregates-{uuid.uuid4().hex[:6]}"
+    dynamodb_tables.create_table(
+        TableName=table_name,
+        KeySchema=[{"AttributeName": "tenantId", "KeyType": "HASH"}, {"AttributeName": "period", "KeyType": "RANGE"}],
+        AttributeDefinitions=[{"AttributeName": "tenantId", "AttributeType": "S"}, {"AttributeName": "period", "AttributeType": "S"}],
+        BillingMode="PAY_PER_REQUEST",
+    )
+    monkeypatch.setenv("USAGE_AGGREGATES_TABLE", table_name)
+    monkeypatch.setattr(tracker, "persistence", UsagePersistence())
+    old_day = TODAY - timedelta(days=40)
+    tracker.append_aggregate(aggregate("t-ttl", old_day, 7))
+    tracker.append_aggregate(aggregate("t-ttl", TODAY, 3))
+    tracker.reset()  # another process: only DynamoDB has the rows
+
+    tier_usage(hot_days=30, today=TODAY)
+    tier_usage(hot_days=30, today=TODAY)
+
+    row = dynamodb_tables.Table(table_name).get_item(Key={"tenantId": "t-ttl", "period": old_day.isoformat()})["Item"]
+    assert row["expiresAt"] <= datetime.utcnow().timestamp()
+    assert [record.period for record in tracker.get_aggregates()] == [TODAY.isoformat()]
+    lines = usage_tiering.gzip.decompress((cold_dir / partition_key("aggregate", "t-ttl", old_day.isoformat())).read_bytes()).splitlines()
+    assert [json.loads(line)["usage"]["requests"] for line in lines] == [7]
+    assert sorted(record.usage["requests"] for record in query_aggregates("t-ttl")) == [3, 7]
+
+
+def test_tiering_refuses_to_run_without_a_cold_store(monkeypatch):
+    monkeypatch.delenv("USAGE_COLD_DIR", raising=False)
+    monkeypatch.delenv("USAGE_COLD_BUCKET", raising=False)
+    tracker.reset()
+    tracker.append_aggregate(aggregate("t-nocold", TODAY - timedelta(days=40), 2))
+
+    with pytest.raises(RuntimeError):
+        tier_usage(hot_days=30, today=TODAY)
+
+    assert [record.usage["requests"] for record in tracker.get_aggregates()] == [2]
+    tracker.reset()
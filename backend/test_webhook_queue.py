@@ -0,0 +1,81 @@
+import json
+
+import pytest
+
+import app
+from app import handler
+
+
+def webhook(tenant_id: str, payment_id: str, status: str) -> dict:
+    return {
+        "path": f"/v1/{tenant_id}/webhooks/mercadopago",
+        "httpMethod": "POST",
+        "headers": {},
+        "body": json.dumps({"type": "payment", "data": {"id": payment_id, "status": status, "transaction_amount": 10}}),
+        "pathParameters": {"tenantId": tenant_id},
+        "queryStringParameters": {},
+        "requestContext": {},
+    }
+
+
+@pytest.fixture()
+def async_webhooks(dynamodb_tables, monkeypatch):
+    monkeypatch.setenv("WEBHOOK_MODE", "async")
+    monkeypatch.delenv("WEBHOOK_QUEUE_URL", raising=False)
+    monkeypatch.setattr(app, "webhook_queue", None)
+    return dynamodb_tables
+
+
+def test_async_webhooks_are_coalesced_into_one_subscription_write(async_webhooks, monkeypatch):
+    _, _, _, subscriptions = app._get_repositories()
+    writes = []
+    original = subscriptions.record_payments
+    monkeypatch.setattr(
+        subscriptions, "record_payments", lambda tenant_id, *args: writes.append(tenant_id) or original(tenant_id, *args)
+    )
+
+    responses = [
+        handler(webhook("t-q1", "pay-q1", "pending"), {}),
+        handler(webhook("t-q1", "pay-q1", "rejected"), {}),
+        handler(webhook("t-q1", "pay-q2", "rejected"), {}),
+        handler(webhook("t-q2", "pay-q3", "approved"), {}),
+    ]
+    assert [response["statusCode"] for response in responses] == [202] * 4
+    assert writes == []
+
+    assert app.drain_local_webhook_queue() == 4
+
+    transactions = async_webhooks.Table("test-transactions")
+    subscription = transactions.get_item(Key={"transactionId": "t-q1#subscription"})["Item"]
+    assert subscription["retryAttempts"] == 2
+    assert sorted(writes) == ["t-q1", "t-q2"]
+    assert transactions.get_item(Key={"transactionId": "t-q1#pay-q1"})["Item"]["status"] == "rejected"
+    assert "Item" not in transactions.get_item(Key={"transactionId": "t-q1#webhook#pay-q1#pending"})
+
+
+def test_batch_handler_reports_only_failed_groups(async_webhooks, monkeypatch):
+    original = app.process_payment_batch
+
+    def flaky(tenant_id, notifications):
+        if tenant_id == "t-q4":
+            raise RuntimeError("throttled")
+        return original(tenant_id, notifications)
+
+    monkeypatch.setattr(app, "process_payment_batch", flaky)
+    records = [
+        {"messageId": "m-1", "body": json.dumps(app._normalize_webhook({"data": {"id": "pay-q5", "status": "approved"}}, "t-q3"))},
+        {"messageId": "m-2", "body": json.dumps(app._normalize_webhook({"data": {"id": "pay-q6", "status": "approved"}}, "t-q4"))},
+        {"messageId": "m-3", "body": "not json"},
+    ]
+
+    result = app.webhook_batch_handler({"Records": records})
+
+    assert sorted(item["itemIdentifier"] for item in result["batchItemFailures"]) == ["m-2", "m-3"]
+    subscription = async_webhooks.Table("test-transactions").get_item(Key={"transactionId": "t-q3#subscription"})["Item"]
+    assert subscription["status"] == "active"
+
+
+def test_async_webhook_without_payment_id_is_rejected(async_webhooks):
+    event = webhook("t-q5", "", "approved")
+
+    assert handler(event, {})["statusCode"] == 400
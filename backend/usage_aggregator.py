@@ -5,6 +5,7 @@ from collections import defaultdict
 from datetime import date, datetime, timedelta
 from typing import Dict, Iterable
 
+from usage_sketches import encode
 from usage_tracker import UsageRecord, tracker
 
 
@@ -20,6 +21,7 @@ def aggregate_daily_usage(for_date: date | None = None) -> Iterable[UsageRecord]
     period = target_date.isoformat()
 
     totals: Dict[str, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+    sketches = tracker.period_sketches(period)
     for event in tracker.get_raw_events(for_period=period):
         usage = event.usage
         for key in ("requests", "orders", "gmv", "bytes"):
@@ -37,6 +39,7 @@ def aggregate_daily_usage(for_date: date | None = None) -> Iterable[UsageRecord]
                 "bytes": usage_totals.get("bytes", 0.0),
             },
             createdAt=datetime.utcnow().isoformat() + "Z",
+            sketches=encode(sketches.get(tenant_id, {})),
         )
         tracker.append_aggregate(record)
         aggregated_records.append(record)
@@ -1,8 +1,36 @@
-"""Plan and contract registry for tenant usage limits."""
+"""Plan and contract registry for tenant usage limits.
+
+Contracts live in the ``CONTRACTS_TABLE`` DynamoDB table when it is
+configured (and only in memory otherwise, as in tests). Every process keeps
+all of them in a local :class:`ContractStore`, bulk-loaded with a paginated
+scan, so a lookup is a dict access for the limit job and the request path
+alike. The table holds a ``__registry__`` row whose ``version`` is bumped
+after every contract write; the cache compares it at most every
+``CONTRACT_CACHE_TTL_S`` seconds and reloads when it moved. Long-lived
+consumers of the table's DynamoDB stream can apply changes as they happen
+with :meth:`ContractStore.apply_changes` instead of waiting for the check.
+"""
 from __future__ import annotations
 
+import os
+import threading
+import time
 from dataclasses import dataclass, field
-from typing import Dict, Optional
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+try:  # pragma: no cover - compatibility with stubs in repo
+    from botocore.exceptions import BotoCoreError, ClientError
+except ImportError:  # pragma: no cover
+    from botocore.exceptions import ClientError
+
+    class BotoCoreError(Exception):
+        ...
+
+import dynamo_client
+
+REGISTRY_KEY = "__registry__"
+CACHE_TTL_S = float(os.getenv("CONTRACT_CACHE_TTL_S", "30"))
 
 
 @dataclass
@@ -18,13 +46,36 @@ class TenantContract:
     tenantId: str
     planId: str
     adminContact: Dict[str, str] = field(default_factory=dict)
+    version: int = 0
+    _plan: Optional[Plan] = field(default=None, init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        # Resolved once so hot paths read ``contract.plan`` without a lookup.
+        self._plan = get_plan(self.planId)
 
     @property
     def plan(self) -> Plan:
-        plan = get_plan(self.planId)
-        if not plan:
+        if self._plan is None:
             raise ValueError(f"Plan '{self.planId}' not found for tenant '{self.tenantId}'")
-        return plan
+        return self._plan
+
+    def as_item(self) -> Dict[str, Any]:
+        return {
+            "tenantId": self.tenantId,
+            "planId": self.planId,
+            "adminContact": self.adminContact,
+            "version": self.version,
+            "updatedAt": datetime.utcnow().isoformat() + "Z",
+        }
+
+    @classmethod
+    def from_item(cls, item: Dict[str, Any]) -> "TenantContract":
+        return cls(
+            tenantId=str(item["tenantId"]),
+            planId=str(item["planId"]),
+            adminContact={key: str(value) for key, value in (item.get("adminContact") or {}).items()},
+            version=int(item.get("version") or 0),
+        )
 
 
 _DEFAULT_PLANS: Dict[str, Plan] = {
@@ -48,15 +99,147 @@ _DEFAULT_PLANS: Dict[str, Plan] = {
     ),
 }
 
-# Registry of active tenant contracts. In a real implementation this would be
-# persisted in a data store; for this simulation we keep it in memory.
-_TENANT_CONTRACTS: Dict[str, TenantContract] = {
-    "t-sample": TenantContract(
-        tenantId="t-sample",
-        planId="starter",
-        adminContact={"email": "ops+t-sample@example.com"},
-    )
-}
+
+def _sample_contracts() -> Dict[str, TenantContract]:
+    return {
+        "t-sample": TenantContract(
+            tenantId="t-sample",
+            planId="starter",
+            adminContact={"email": "ops+t-sample@example.com"},
+        )
+    }
+
+
+def _from_image(image: Dict[str, Any]) -> Dict[str, Any]:
+    """Plain item from a stream image in DynamoDB JSON (``{"S": ...}``)."""
+
+    def value(typed: Dict[str, Any]) -> Any:
+        kind, raw = next(iter(typed.items()))
+        if kind == "M":
+            return {key: value(inner) for key, inner in raw.items()}
+        if kind == "N":
+            return int(raw) if raw.lstrip("-").isdigit() else float(raw)
+        return raw
+
+    return {key: value(typed) for key, typed in image.items()}
+
+
+class ContractStore:
+    """Process-local cache of every tenant contract (see the module docstring)."""
+
+    def __init__(self, table_name: str | None = None, clock: Callable[[], float] = time.monotonic) -> None:
+        self.table_name = table_name if table_name is not None else os.getenv("CONTRACTS_TABLE")
+        self.version: int | None = None
+        self._contracts: Dict[str, TenantContract] = {} if self.table_name else _sample_contracts()
+        self._clock = clock
+        self._checked_at = float("-inf")
+        self._lock = threading.Lock()
+
+    def _table(self):
+        return dynamo_client.table(self.table_name)
+
+    def _remote_version(self) -> int:
+        item = self._table().get_item(Key={"tenantId": REGISTRY_KEY}).get("Item") or {}
+        return int(item.get("version") or 0)
+
+    def load(self) -> None:
+        """Bulk-load every contract.
+
+        The registry version is read before the scan and writers bump it
+        after writing, so a write racing the scan shows up as a newer version
+        on the next check instead of being lost.
+        """
+
+        version = self._remote_version()
+        table = self._table()
+        contracts: Dict[str, TenantContract] = {}
+        request: Dict[str, Any] = {}
+        while True:
+            response = table.scan(**request)
+            for item in response.get("Items", []):
+                if item.get("tenantId") != REGISTRY_KEY:
+                    contracts[str(item["tenantId"])] = TenantContract.from_item(item)
+            if not response.get("LastEvaluatedKey"):
+                break
+            request["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+        self._contracts, self.version = contracts, version
+
+    def _ensure_fresh(self) -> None:
+        if not self.table_name or self._clock() - self._checked_at < CACHE_TTL_S:
+            return
+        with self._lock:
+            if self._clock() - self._checked_at < CACHE_TTL_S:
+                return
+            try:
+                if self.version is None or self._remote_version() != self.version:
+                    self.load()
+            except (ClientError, BotoCoreError):
+                pass  # keep serving the last snapshot; retried after the TTL
+            self._checked_at = self._clock()
+
+    def invalidate(self) -> None:
+        self._checked_at = float("-inf")
+
+    def get(self, tenant_id: str) -> Optional[TenantContract]:
+        self._ensure_fresh()
+        return self._contracts.get(tenant_id)
+
+    def all(self) -> Dict[str, TenantContract]:
+        self._ensure_fresh()
+        return dict(self._contracts)
+
+    def put(self, contract: TenantContract) -> TenantContract:
+        previous = self._contracts.get(contract.tenantId)
+        contract.version = (previous.version if previous else 0) + 1
+        if self.table_name:
+            table = self._table()
+            table.put_item(Item=contract.as_item())
+            response = table.update_item(
+                Key={"tenantId": REGISTRY_KEY},
+                UpdateExpression="ADD version :one",
+                ExpressionAttributeValues={":one": 1},
+                ReturnValues="UPDATED_NEW",
+            )
+            registry_version = int(response["Attributes"]["version"])
+            with self._lock:
+                # Skipping a version means another writer got in between.
+                if self.version == registry_version - 1:
+                    self.version = registry_version
+        self._contracts[contract.tenantId] = contract
+        return contract
+
+    def apply_changes(self, records: Iterable[Dict[str, Any]]) -> int:
+        """Apply DynamoDB stream records; versions older than the cached contract are ignored."""
+
+        applied = 0
+        for record in records:
+            change = record.get("dynamodb") or {}
+            image = change.get("NewImage") or change.get("OldImage") or {}
+            item = _from_image(image)
+            tenant_id = item.get("tenantId")
+            if not tenant_id or tenant_id == REGISTRY_KEY:
+                continue
+            current = self._contracts.get(tenant_id)
+            if record.get("eventName") == "REMOVE":
+                if current is not None:
+                    del self._contracts[tenant_id]
+                    applied += 1
+                continue
+            contract = TenantContract.from_item(item)
+            if current is None or contract.version >= current.version:
+                self._contracts[tenant_id] = contract
+                applied += 1
+        return applied
+
+
+_store: ContractStore | None = None
+
+
+def contract_store() -> ContractStore:
+    global _store
+    if _store is None:
+        _store = ContractStore()
+    return _store
 
 
 def get_plan(plan_id: str) -> Optional[Plan]:
@@ -68,25 +251,22 @@ def list_plans() -> Dict[str, Plan]:
 
 
 def get_tenant_contract(tenant_id: str) -> Optional[TenantContract]:
-    return _TENANT_CONTRACTS.get(tenant_id)
+    return contract_store().get(tenant_id)
+
+
+def list_contracts() -> List[TenantContract]:
+    return list(contract_store().all().values())
 
 
 def register_contract(tenant_id: str, plan_id: str, admin_contact: Optional[Dict[str, str]] = None) -> TenantContract:
     if plan_id not in _DEFAULT_PLANS:
         raise ValueError(f"Plan '{plan_id}' is not defined")
     contract = TenantContract(tenantId=tenant_id, planId=plan_id, adminContact=admin_contact or {})
-    _TENANT_CONTRACTS[tenant_id] = contract
-    return contract
+    return contract_store().put(contract)
 
 
 def reset_registry() -> None:
-    _TENANT_CONTRACTS.clear()
-    _TENANT_CONTRACTS.update(
-        {
-            "t-sample": TenantContract(
-                tenantId="t-sample",
-                planId="starter",
-                adminContact={"email": "ops+t-sample@example.com"},
-            )
-        }
-    )
+    """Forget cached contracts (environment changed); in memory only ``t-sample`` remains."""
+
+    global _store
+    _store = None
@@ -0,0 +1,276 @@
+"""Multi-resolution usage rollups: minute, hour, day and month buckets.
+
+``UsageTracker.record_usage`` adds every event to its tenant's bucket at
+each level, so every level is complete up to the present and late events
+need no special handling. Each level keeps its own retention
+(``USAGE_ROLLUP_RETENTION``, e.g. ``minute=2d,hour=35d,day=400d``; months are
+kept forever).
+
+With ``USAGE_ROLLUPS_TABLE`` set the buckets live in DynamoDB as ``ADD``
+counters under the sort key ``rollup#<level>#<label>`` (:class:`RollupStore`),
+with the level's retention as the ``expiresAt`` TTL, so every container
+reads the same totals and nothing is lost on scale-in. The process only
+buffers deltas; the tracker's background thread flushes them every
+``USAGE_ROLLUP_FLUSH_S`` seconds and reads flush first, which turns a burst
+of requests into one write per level and bucket without adding those
+writes to any request. Without a table the buckets stay in memory.
+
+:meth:`UsageRollups.total` answers a range with the coarsest buckets that fit
+entirely inside it and only falls back to finer levels for the ragged ends,
+so a year is a dozen month buckets instead of half a million minutes.
+:meth:`UsageRollups.series` returns the buckets of one level for charts.
+"""
+from __future__ import annotations
+
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Tuple
+
+try:  # pragma: no cover - compatibility with stubs in repo
+    from botocore.exceptions import BotoCoreError, ClientError
+except ImportError:  # pragma: no cover
+    from botocore.exceptions import ClientError
+
+    class BotoCoreError(Exception):
+        ...
+
+import dynamo_client
+
+LEVELS = ("minute", "hour", "day", "month")
+LABEL_FORMATS = {"minute": "%Y-%m-%dT%H:%M", "hour": "%Y-%m-%dT%H", "day": "%Y-%m-%d", "month": "%Y-%m"}
+DEFAULT_RETENTION: Dict[str, timedelta | None] = {
+    "minute": timedelta(days=2),
+    "hour": timedelta(days=35),
+    "day": timedelta(days=400),
+    "month": None,
+}
+METRICS = ("requests", "orders", "gmv", "bytes")
+UNIT_LENGTH = {"minute": timedelta(minutes=1), "hour": timedelta(hours=1), "day": timedelta(days=1), "month": timedelta(days=30)}
+MAX_SERIES_POINTS = 500
+ROLLUP_PREFIX = "rollup#"
+FLUSH_SECONDS = float(os.getenv("USAGE_ROLLUP_FLUSH_S", "5"))
+
+Buckets = Dict[datetime, Dict[str, float]]
+
+
+def parse_retention(text: str | None) -> Dict[str, timedelta | None]:
+    """``"minute=2d,hour=36h"`` over the defaults; units ``m``, ``h`` and ``d``."""
+
+    retention = dict(DEFAULT_RETENTION)
+    for entry in (text or "").split(","):
+        level, _, value = entry.strip().partition("=")
+        if not level:
+            continue
+        if level not in LEVELS:
+            raise ValueError(f"Unknown rollup level {level!r}; expected one of {', '.join(LEVELS)}")
+        unit = {"m": "minutes", "h": "hours", "d": "days"}[value[-1]]
+        retention[level] = timedelta(**{unit: int(value[:-1])})
+    return retention
+
+
+def floor(moment: datetime, level: str) -> datetime:
+    if level == "minute":
+        return moment.replace(second=0, microsecond=0)
+    if level == "hour":
+        return moment.replace(minute=0, second=0, microsecond=0)
+    if level == "day":
+        return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    return moment.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def next_start(start: datetime, level: str) -> datetime:
+    if level == "month":
+        return (start.replace(day=1) + timedelta(days=32)).replace(day=1)
+    return start + UNIT_LENGTH[level]
+
+
+def ceil(moment: datetime, level: str) -> datetime:
+    start = floor(moment, level)
+    return start if start == moment else next_start(start, level)
+
+
+def _zero() -> Dict[str, float]:
+    return {metric: 0.0 for metric in METRICS}
+
+
+def _add(target: Dict[str, float], usage: Dict[str, float]) -> None:
+    for metric in METRICS:
+        target[metric] += float(usage.get(metric, 0))
+
+
+def bucket_period(level: str, start: datetime) -> str:
+    return f"{ROLLUP_PREFIX}{level}#{start.strftime(LABEL_FORMATS[level])}"
+
+
+class RollupStore:
+    """Rollup buckets as counter rows in the rollups table."""
+
+    def __init__(self, table_name: str) -> None:
+        self.table_name = table_name
+        self.table = dynamo_client.table(table_name)
+
+    def add(self, tenant_id: str, level: str, start: datetime, usage: Dict[str, float], expires_at: int | None) -> None:
+        names = {f"#m{index}": metric for index, metric in enumerate(METRICS)}
+        values: Dict[str, Any] = {f":m{index}": float(usage.get(metric, 0)) for index, metric in enumerate(METRICS)}
+        expression = "ADD " + ", ".join(f"#m{index} :m{index}" for index in range(len(METRICS)))
+        if expires_at is not None:
+            names["#expires"] = "expiresAt"
+            values[":expires"] = expires_at
+            expression += " SET #expires = :expires"
+        self.table.update_item(
+            Key={"tenantId": tenant_id, "period": bucket_period(level, start)},
+            UpdateExpression=expression,
+            ExpressionAttributeNames=names,
+            ExpressionAttributeValues=values,
+        )
+
+    def buckets(self, tenant_id: str, level: str, start: datetime, end: datetime) -> Buckets:
+        """Buckets of ``level`` starting in ``[start, end)``."""
+
+        request: Dict[str, Any] = {
+            "KeyConditionExpression": "tenantId = :tenantId AND #period BETWEEN :low AND :high",
+            "ExpressionAttributeNames": {"#period": "period"},
+            "ExpressionAttributeValues": {
+                ":tenantId": tenant_id,
+                ":low": bucket_period(level, start),
+                ":high": bucket_period(level, end),
+            },
+        }
+        prefix = f"{ROLLUP_PREFIX}{level}#"
+        found: Buckets = {}
+        while True:
+            response = self.table.query(**request)
+            for item in response.get("Items", []):
+                bucket_start = datetime.strptime(str(item["period"])[len(prefix) :], LABEL_FORMATS[level])
+                if start <= bucket_start < end:
+                    found[bucket_start] = {metric: float(item.get(metric, 0)) for metric in METRICS}
+            if not response.get("LastEvaluatedKey"):
+                return found
+            request["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+
+class UsageRollups:
+    def __init__(self, retention: Dict[str, timedelta | None] | None = None, store: RollupStore | None = None, flush_seconds: float = FLUSH_SECONDS) -> None:
+        self.retention = retention or parse_retention(os.getenv("USAGE_ROLLUP_RETENTION"))
+        self.store = store
+        self.flush_seconds = flush_seconds
+        # Level -> tenant -> bucket start -> counters: every bucket without a
+        # store, the deltas not flushed yet with one.
+        self._buckets: Dict[str, Dict[str, Buckets]] = {level: {} for level in LEVELS}
+        self._lock = threading.Lock()
+
+    def add(self, tenant_id: str, moment: datetime, usage: Dict[str, float]) -> None:
+        with self._lock:
+            self._merge(tenant_id, moment, usage)
+
+    def _merge(self, tenant_id: str, moment: datetime, usage: Dict[str, float]) -> None:
+        for level in LEVELS:
+            _add(self._buckets[level].setdefault(tenant_id, {}).setdefault(floor(moment, level), _zero()), usage)
+
+    def _expires_at(self, level: str, start: datetime) -> int | None:
+        keep = self.retention.get(level)
+        if keep is None:
+            return None
+        return int((next_start(start, level) + keep - datetime(1970, 1, 1)).total_seconds())
+
+    def flush(self) -> int:
+        """Write the buffered deltas to the store; failed ones stay buffered."""
+
+        if self.store is None:
+            return 0
+        with self._lock:
+            pending, self._buckets = self._buckets, {level: {} for level in LEVELS}
+        written = 0
+        for level, tenants in pending.items():
+            for tenant_id, buckets in tenants.items():
+                for start, usage in buckets.items():
+                    try:
+                        self.store.add(tenant_id, level, start, usage, self._expires_at(level, start))
+                        written += 1
+                    except (ClientError, BotoCoreError, dynamo_client.CircuitOpenError):
+                        with self._lock:
+                            _add(self._buckets[level].setdefault(tenant_id, {}).setdefault(start, _zero()), usage)
+        return written
+
+    def prune(self, now: datetime | None = None) -> int:
+        """Drop in-memory buckets past their level's retention (the store uses TTL)."""
+
+        if self.store is not None:
+            return 0
+        now = now or datetime.utcnow()
+        dropped = 0
+        with self._lock:
+            for level, keep in self.retention.items():
+                if keep is None:
+                    continue
+                horizon = floor(now - keep, level)
+                for buckets in self._buckets[level].values():
+                    for start in [start for start in buckets if start < horizon]:
+                        del buckets[start]
+                        dropped += 1
+        return dropped
+
+    def retained_from(self, level: str, now: datetime | None = None) -> datetime:
+        keep = self.retention.get(level)
+        return datetime.min if keep is None else floor((now or datetime.utcnow()) - keep, level)
+
+    def level_for(self, start: datetime, end: datetime, max_points: int = MAX_SERIES_POINTS, now: datetime | None = None) -> str:
+        """Finest level still retained at ``start`` that draws at most ``max_points`` points."""
+
+        for level in LEVELS:
+            if self.retained_from(level, now) <= start and (end - start) / UNIT_LENGTH[level] <= max_points:
+                return level
+        return LEVELS[-1]
+
+    def _level_buckets(self, tenant_id: str, level: str, start: datetime, end: datetime) -> Buckets:
+        if self.store is not None:
+            return self.store.buckets(tenant_id, level, start, end)
+        with self._lock:
+            return {moment: dict(usage) for moment, usage in self._buckets[level].get(tenant_id, {}).items() if start <= moment < end}
+
+    def _sum(self, level: str, tenant_id: str, start: datetime, end: datetime, total: Dict[str, float]) -> int:
+        buckets = self._level_buckets(tenant_id, level, start, end)
+        for usage in buckets.values():
+            _add(total, usage)
+        return len(buckets)
+
+    def _cover(self, tenant_id: str, start: datetime, end: datetime, index: int, now: datetime, total: Dict[str, float], used: Dict[str, int]) -> None:
+        if start >= end:
+            return
+        level = LEVELS[index]
+        if index == 0:
+            used[level] += self._sum(level, tenant_id, floor(start, level), end, total)
+            return
+        low = max(ceil(start, level), self.retained_from(level, now))
+        high = floor(end, level)
+        if low >= high:
+            self._cover(tenant_id, start, end, index - 1, now, total, used)
+            return
+        used[level] += self._sum(level, tenant_id, low, high, total)
+        self._cover(tenant_id, start, low, index - 1, now, total, used)
+        self._cover(tenant_id, high, end, index - 1, now, total, used)
+
+    def total(self, tenant_id: str, start: datetime, end: datetime, now: datetime | None = None) -> Tuple[Dict[str, float], Dict[str, int]]:
+        """Usage in ``[start, end)`` and the number of buckets read per level.
+
+        Parts of the range older than a finer level's retention that do not
+        align with a coarser bucket cannot be resolved and are left out.
+        """
+
+        now = now or datetime.utcnow()
+        self.flush()
+        self.prune(now)
+        total, used = _zero(), {level: 0 for level in LEVELS}
+        self._cover(tenant_id, start, end, len(LEVELS) - 1, now, total, used)
+        return total, used
+
+    def series(self, tenant_id: str, level: str, start: datetime, end: datetime, now: datetime | None = None) -> List[Dict[str, object]]:
+        self.flush()
+        self.prune(now)
+        buckets = self._level_buckets(tenant_id, level, start, end)
+        return [{"period": moment.strftime(LABEL_FORMATS[level]), "usage": buckets[moment]} for moment in sorted(buckets)]
+
+    def reset(self) -> None:
+        with self._lock:
+            self._buckets = {level: {} for level in LEVELS}
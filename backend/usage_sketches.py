@@ -0,0 +1,219 @@
+"""Mergeable sketches summarizing usage metadata per tenant and period.
+
+:class:`HyperLogLog` estimates distinct counts (unique source IPs, unique
+IP/user-agent pairs) in a fixed ``2 ** USAGE_HLL_PRECISION`` bytes instead of
+keeping every value: with the default precision of 11 a sketch is 2 KB and
+its standard error is about 2.3%. Sketches from different periods or
+containers merge by taking the register-wise maximum, so merging is
+idempotent and a value seen in several inputs is still counted once.
+
+:class:`SpaceSaving` keeps the heavy hitters (most requested paths and
+products) in ``ceil(1 / USAGE_TOPK_ERROR)`` counters: any item whose true
+count exceeds ``USAGE_TOPK_ERROR`` times the total is guaranteed to be kept,
+and every reported count overestimates by at most its ``maxError``, which is
+itself at most that fraction of the total.
+
+Sketches travel with the daily aggregates as short text (``to_text``),
+zlib-compressed, which keeps the sketches of small tenants down to a few
+dozen bytes. :func:`observe` is the single place that maps a usage event's
+metadata onto the sketches, so the tracker and the daily job agree.
+"""
+from __future__ import annotations
+
+import base64
+import hashlib
+import heapq
+import json
+import math
+import os
+import zlib
+from typing import Dict, Iterable, List, Mapping, Union
+
+PRECISION = int(os.getenv("USAGE_HLL_PRECISION", "11"))
+TOPK_ERROR = float(os.getenv("USAGE_TOPK_ERROR", "0.01"))
+UNIQUE_VISITORS = "uniqueVisitors"
+UNIQUE_CLIENTS = "uniqueClients"
+TOP_PATHS = "topPaths"
+TOP_PRODUCTS = "topProducts"
+
+
+def _hash64(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), "big")
+
+
+class HyperLogLog:
+    """Distinct-count estimator with ``2 ** precision`` one-byte registers."""
+
+    def __init__(self, precision: int = PRECISION, registers: bytes | None = None) -> None:
+        if not 4 <= precision <= 16:
+            raise ValueError("HyperLogLog precision must be between 4 and 16")
+        self.precision = precision
+        self.size = 1 << precision
+        self.registers = bytearray(registers) if registers is not None else bytearray(self.size)
+        if len(self.registers) != self.size:
+            raise ValueError("HyperLogLog registers do not match the precision")
+
+    def add(self, value: str) -> None:
+        hashed = _hash64(value)
+        index = hashed >> (64 - self.precision)
+        rest = hashed & ((1 << (64 - self.precision)) - 1)
+        rank = (64 - self.precision) - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def empty(self) -> "HyperLogLog":
+        return HyperLogLog(self.precision)
+
+    def merge(self, other: "HyperLogLog") -> "HyperLogLog":
+        if other.precision != self.precision:
+            raise ValueError("Cannot merge HyperLogLog sketches with different precision")
+        self.registers = bytearray(max(pair) for pair in zip(self.registers, other.registers))
+        return self
+
+    def count(self) -> int:
+        alpha = 0.7213 / (1 + 1.079 / self.size)
+        estimate = alpha * self.size * self.size / sum(2.0 ** -register for register in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * self.size and zeros:
+            # Linear counting is more accurate while most registers are empty.
+            estimate = self.size * math.log(self.size / zeros)
+        return int(round(estimate))
+
+    def to_text(self) -> str:
+        return base64.b64encode(zlib.compress(bytes([self.precision]) + bytes(self.registers))).decode()
+
+    @classmethod
+    def from_text(cls, text: str) -> "HyperLogLog":
+        raw = zlib.decompress(base64.b64decode(text))
+        return cls(precision=raw[0], registers=raw[1:])
+
+
+class SpaceSaving:
+    """Top-k counter (Metwally et al.) with mergeable summaries.
+
+    ``counters`` maps an item to ``[count, error]``; the true count lies in
+    ``[count - error, count]``.
+    """
+
+    def __init__(self, capacity: int | None = None, counters: Dict[str, List[int]] | None = None, total: int = 0) -> None:
+        self.capacity = capacity or math.ceil(1 / TOPK_ERROR)
+        self.counters: Dict[str, List[int]] = counters or {}
+        self.total = total
+        self._rebuild_heap()
+
+    def _rebuild_heap(self) -> None:
+        # Min-heap of ``(count, item)``; entries whose count changed since are
+        # skipped when popped, and the heap is rebuilt once stale ones pile up.
+        self._heap = [(count, item) for item, (count, _) in self.counters.items()]
+        heapq.heapify(self._heap)
+
+    def _push(self, item: str) -> None:
+        heapq.heappush(self._heap, (self.counters[item][0], item))
+        if len(self._heap) > 4 * self.capacity:
+            self._rebuild_heap()
+
+    def empty(self) -> "SpaceSaving":
+        return SpaceSaving(self.capacity)
+
+    def _floor(self) -> int:
+        """Largest count an item missing from a full summary can have."""
+
+        return min(count for count, _ in self.counters.values()) if len(self.counters) >= self.capacity else 0
+
+    def add(self, item: str, weight: int = 1) -> None:
+        self.total += weight
+        entry = self.counters.get(item)
+        if entry is not None:
+            entry[0] += weight
+        elif len(self.counters) < self.capacity:
+            self.counters[item] = [weight, 0]
+        else:
+            # Replace the smallest counter; the newcomer inherits its count as error.
+            while True:
+                count, victim = heapq.heappop(self._heap)
+                if self.counters.get(victim, [None])[0] == count:
+                    break
+            floor = self.counters.pop(victim)[0]
+            self.counters[item] = [floor + weight, floor]
+        self._push(item)
+
+    def merge(self, other: "SpaceSaving") -> "SpaceSaving":
+        mine, theirs = self._floor(), other._floor()
+        combined = {}
+        for item in self.counters.keys() | other.counters.keys():
+            count, error = self.counters.get(item, [mine, mine])
+            other_count, other_error = other.counters.get(item, [theirs, theirs])
+            combined[item] = [count + other_count, error + other_error]
+        ranked = sorted(combined.items(), key=lambda entry: (-entry[1][0], entry[0]))
+        self.counters = dict(ranked[: max(self.capacity, other.capacity)])
+        self.capacity = max(self.capacity, other.capacity)
+        self.total += other.total
+        self._rebuild_heap()
+        return self
+
+    def top(self, limit: int = 10) -> List[Dict[str, object]]:
+        ranked = sorted(self.counters.items(), key=lambda entry: (-entry[1][0], entry[0]))
+        return [{"key": item, "count": count, "maxError": error} for item, (count, error) in ranked[:limit]]
+
+    def to_text(self) -> str:
+        payload = json.dumps({"capacity": self.capacity, "total": self.total, "counters": self.counters}, separators=(",", ":"))
+        return base64.b64encode(zlib.compress(payload.encode())).decode()
+
+    @classmethod
+    def from_text(cls, text: str) -> "SpaceSaving":
+        payload = json.loads(zlib.decompress(base64.b64decode(text)))
+        return cls(capacity=payload["capacity"], counters=payload["counters"], total=payload["total"])
+
+
+Sketch = Union[HyperLogLog, SpaceSaving]
+KINDS = {UNIQUE_VISITORS: HyperLogLog, UNIQUE_CLIENTS: HyperLogLog, TOP_PATHS: SpaceSaving, TOP_PRODUCTS: SpaceSaving}
+
+
+def observe(sketches: Dict[str, Sketch], metadata: Mapping[str, str]) -> None:
+    """Feed one usage event's metadata into ``sketches`` (created on demand)."""
+
+    source_ip = metadata.get("sourceIp") or ""
+    if source_ip:
+        _sketch(sketches, UNIQUE_VISITORS).add(source_ip)  # type: ignore[union-attr]
+        _sketch(sketches, UNIQUE_CLIENTS).add(f"{source_ip}|{metadata.get('userAgent') or ''}")  # type: ignore[union-attr]
+    if metadata.get("path"):
+        _sketch(sketches, TOP_PATHS).add(metadata["path"])  # type: ignore[union-attr]
+    for product_id in filter(None, (metadata.get("productIds") or "").split(",")):
+        _sketch(sketches, TOP_PRODUCTS).add(product_id)  # type: ignore[union-attr]
+
+
+def _sketch(sketches: Dict[str, Sketch], name: str) -> Sketch:
+    if name not in sketches:
+        sketches[name] = KINDS[name]()
+    return sketches[name]
+
+
+def decode(encoded: Mapping[str, str]) -> Dict[str, Sketch]:
+    return {name: KINDS[name].from_text(text) for name, text in encoded.items() if name in KINDS}
+
+
+def encode(sketches: Mapping[str, Sketch]) -> Dict[str, str]:
+    return {name: sketch.to_text() for name, sketch in sketches.items()}
+
+
+def merge_all(groups: Iterable[Mapping[str, Sketch]]) -> Dict[str, Sketch]:
+    """Union of several name -> sketch mappings; the inputs are left untouched."""
+
+    merged: Dict[str, Sketch] = {}
+    for sketches in groups:
+        for name, sketch in sketches.items():
+            merged.setdefault(name, sketch.empty()).merge(sketch)  # type: ignore[arg-type]
+    return merged
+
+
+def counts(sketches: Mapping[str, Sketch]) -> Dict[str, int]:
+    return {name: sketches[name].count() if name in sketches else 0 for name in (UNIQUE_VISITORS, UNIQUE_CLIENTS)}  # type: ignore[union-attr]
+
+
+def heavy_hitters(sketches: Mapping[str, Sketch], name: str, label: str, limit: int = 10) -> List[Dict[str, object]]:
+    """Top entries of a :class:`SpaceSaving` sketch, keyed by ``label``."""
+
+    sketch = sketches.get(name)
+    if not isinstance(sketch, SpaceSaving):
+        return []
+    return [{label: entry["key"], "count": entry["count"], "maxError": entry["maxError"]} for entry in sketch.top(limit)]
@@ -0,0 +1,221 @@
+"""Hot/cold tiering for usage data.
+
+DynamoDB (and the tracker's in-memory copy) keeps the last
+``USAGE_HOT_DAYS`` days. :func:`tier_usage` compacts anything older into
+gzip-compressed JSONL objects, one per kind, tenant and day, under
+
+    usage/cold/<kind>/month=YYYY-MM/tenant=<tenantId>/YYYY-MM-DD.jsonl.gz
+
+in ``USAGE_COLD_BUCKET`` (or the ``USAGE_COLD_DIR`` directory for tests and
+local runs). The compacted hot rows get an ``expiresAt`` TTL so DynamoDB
+deletes them; readers ignore marked rows right away. Without either setting
+:func:`tier_usage` refuses to run: there would be nowhere durable to keep
+the only copy.
+
+:func:`query_aggregates` reads both tiers. On the cold side it prunes by
+partition: only the month prefixes overlapping the range are listed (and
+only the tenant's prefix when a tenant is given), and only objects whose day
+falls inside the range are downloaded, so a year of one tenant's usage is at
+most twelve listings and one small object per active day.
+"""
+from __future__ import annotations
+
+import gzip
+import json
+import os
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
+
+import boto3
+try:  # pragma: no cover - compatibility with stubs in repo
+    from botocore.exceptions import BotoCoreError, ClientError
+except ImportError:  # pragma: no cover
+    from botocore.exceptions import ClientError
+
+    class BotoCoreError(Exception):
+        ...
+
+from usage_tracker import UsageRecord, tracker
+
+COLD_PREFIX = "usage/cold"
+RAW = "raw"
+AGGREGATE = "aggregate"
+HOT_DAYS = int(os.getenv("USAGE_HOT_DAYS", "90"))
+
+
+def _record_key(record: UsageRecord) -> Tuple[str, str, str]:
+    return record.tenantId, record.period, record.createdAt
+
+
+def partition_key(kind: str, tenant_id: str, period: str) -> str:
+    return f"{COLD_PREFIX}/{kind}/month={period[:7]}/tenant={tenant_id}/{period}.jsonl.gz"
+
+
+def _months(start: date, end: date) -> List[str]:
+    months = []
+    cursor = start.replace(day=1)
+    while cursor <= end:
+        months.append(cursor.strftime("%Y-%m"))
+        cursor = (cursor + timedelta(days=32)).replace(day=1)
+    return months
+
+
+class ColdUsageStore:
+    """Cold objects in ``USAGE_COLD_BUCKET`` or, without one, under ``USAGE_COLD_DIR``."""
+
+    def __init__(self, bucket: str | None = None, local_dir: str | None = None) -> None:
+        self.bucket = bucket if bucket is not None else os.getenv("USAGE_COLD_BUCKET")
+        local_dir = local_dir or os.getenv("USAGE_COLD_DIR")
+        if not (self.bucket or local_dir):
+            raise RuntimeError("Missing cold tier env var: USAGE_COLD_BUCKET or USAGE_COLD_DIR")
+        self.local_dir = Path(local_dir or ".")
+        self._s3 = None
+
+    @classmethod
+    def from_env(cls) -> "ColdUsageStore | None":
+        """The configured store, or ``None`` when usage is not tiered."""
+
+        if os.getenv("USAGE_COLD_BUCKET") or os.getenv("USAGE_COLD_DIR"):
+            return cls()
+        return None
+
+    def _s3_client(self):
+        if self._s3 is None:
+            self._s3 = boto3.client("s3", region_name=os.getenv("AWS_REGION", "us-east-1"))
+        return self._s3
+
+    def read(self, key: str) -> List[UsageRecord]:
+        if self.bucket:
+            try:
+                body = self._s3_client().get_object(Bucket=self.bucket, Key=key)["Body"].read()
+            except ClientError:
+                return []
+        else:
+            path = self.local_dir / key
+            if not path.exists():
+                return []
+            body = path.read_bytes()
+        return [UsageRecord(**json.loads(line)) for line in gzip.decompress(body).decode().splitlines() if line]
+
+    def write(self, key: str, records: List[UsageRecord]) -> None:
+        body = gzip.compress("".join(json.dumps(record.as_item(), sort_keys=True) + "\n" for record in records).encode())
+        if self.bucket:
+            self._s3_client().put_object(Bucket=self.bucket, Key=key, Body=body, ContentType="application/x-ndjson", ContentEncoding="gzip")
+            return
+        path = self.local_dir / key
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(path.suffix + ".tmp")
+        tmp_path.write_bytes(body)
+        tmp_path.replace(path)
+
+    def list_keys(self, prefix: str) -> List[str]:
+        if self.bucket:
+            keys: List[str] = []
+            request = {"Bucket": self.bucket, "Prefix": prefix}
+            while True:
+                response = self._s3_client().list_objects_v2(**request)
+                keys.extend(item["Key"] for item in response.get("Contents", []))
+                if not response.get("IsTruncated"):
+                    return keys
+                request["ContinuationToken"] = response["NextContinuationToken"]
+        root = self.local_dir / prefix
+        if not root.is_dir():
+            return []
+        return sorted(path.relative_to(self.local_dir).as_posix() for path in root.rglob("*.jsonl.gz"))
+
+    def months(self, kind: str) -> List[str]:
+        """Month partitions present for ``kind`` (one delimiter listing)."""
+
+        prefix = f"{COLD_PREFIX}/{kind}/"
+        if self.bucket:
+            months: List[str] = []
+            request = {"Bucket": self.bucket, "Prefix": prefix, "Delimiter": "/"}
+            while True:
+                response = self._s3_client().list_objects_v2(**request)
+                months.extend(entry["Prefix"][len(prefix) :].strip("/").partition("=")[2] for entry in response.get("CommonPrefixes", []))
+                if not response.get("IsTruncated"):
+                    return sorted(months)
+                request["ContinuationToken"] = response["NextContinuationToken"]
+        root = self.local_dir / prefix
+        if not root.is_dir():
+            return []
+        return sorted(path.name.partition("=")[2] for path in root.iterdir() if path.is_dir())
+
+    def scan(self, kind: str, tenant_id: str | None = None, start: date | None = None, end: date | None = None) -> Iterator[UsageRecord]:
+        """Records of ``kind`` in ``[start, end]``, reading only matching partitions."""
+
+        if start and end:
+            months = _months(start, end)
+        else:
+            months = [
+                month
+                for month in self.months(kind)
+                if (not start or month >= start.strftime("%Y-%m")) and (not end or month <= end.strftime("%Y-%m"))
+            ]
+        low, high = start.isoformat() if start else "", end.isoformat() if end else "9999-12-31"
+        for month in months:
+            prefix = f"{COLD_PREFIX}/{kind}/month={month}/" + (f"tenant={tenant_id}/" if tenant_id else "")
+            for key in self.list_keys(prefix):
+                period = key.rsplit("/", 1)[1].split(".", 1)[0]
+                if low <= period <= high:
+                    yield from self.read(key)
+
+
+def _group(records: Iterable[UsageRecord]) -> Dict[Tuple[str, str], List[UsageRecord]]:
+    groups: Dict[Tuple[str, str], List[UsageRecord]] = {}
+    for record in records:
+        groups.setdefault((record.tenantId, record.period), []).append(record)
+    return groups
+
+
+def tier_usage(hot_days: int | None = None, today: date | None = None, store: ColdUsageStore | None = None) -> Dict[str, Any]:
+    """Move raw events and aggregates older than ``hot_days`` to the cold tier."""
+
+    store = store or ColdUsageStore.from_env()
+    if store is None:
+        # Marking the hot rows would let TTL delete the only copy.
+        raise RuntimeError("Missing cold tier env var: USAGE_COLD_BUCKET or USAGE_COLD_DIR")
+    cutoff = ((today or datetime.utcnow().date()) - timedelta(days=HOT_DAYS if hot_days is None else hot_days)).isoformat()
+    raw, aggregates = tracker.take_older_than(cutoff)
+    expires_at = int(time.time())
+    written = 0
+    for kind, records, table_name in ((RAW, raw, tracker.persistence.raw_table), (AGGREGATE, aggregates, tracker.persistence.aggregate_table)):
+        for (tenant_id, period), group in _group(records).items():
+            key = partition_key(kind, tenant_id, period)
+            # Re-runs and late rows merge into the existing object.
+            merged = {_record_key(record): record for record in store.read(key)}
+            merged.update((_record_key(record), record) for record in group)
+            store.write(key, sorted(merged.values(), key=lambda record: record.createdAt))
+            written += 1
+        tracker.persistence.mark_tiered(table_name, records, expires_at)
+    return {"cutoff": cutoff, "rawRecords": len(raw), "aggregateRecords": len(aggregates), "objectsWritten": written}
+
+
+def query_aggregates(tenant_id: str | None = None, start: date | None = None, end: date | None = None) -> List[UsageRecord]:
+    """Daily aggregates from both tiers for ``tenant_id`` (all tenants if ``None``) in ``[start, end]``."""
+
+    low, high = start.isoformat() if start else "", end.isoformat() if end else "9999-12-31"
+    records = [
+        record
+        for record in tracker.get_aggregates()
+        if (tenant_id is None or record.tenantId == tenant_id) and low <= record.period <= high
+    ]
+    store = ColdUsageStore.from_env()
+    if store is None:
+        return records
+    try:
+        cold = list(store.scan(AGGREGATE, tenant_id, start, end))
+    except (ClientError, BotoCoreError):  # pragma: no cover - defensive
+        return records
+    # A row copied to the cold tier but not yet marked hot must not count twice.
+    seen = {_record_key(record) for record in cold}
+    return cold + [record for record in records if _record_key(record) not in seen]
+
+
+def lambda_handler(event: dict, context: object | None = None) -> Dict[str, Any]:
+    """Scheduled entry point; ``event["hotDays"]`` overrides ``USAGE_HOT_DAYS``."""
+
+    hot_days = (event or {}).get("hotDays")
+    return tier_usage(int(hot_days) if hot_days is not None else None)
@@ -3,9 +3,12 @@ from __future__ import annotations
 
 import json
 import os
+import threading
+import time
+import uuid
 from dataclasses import dataclass, field
 from datetime import datetime
-from typing import Dict, Iterable, List
+from typing import Dict, Iterable, List, Set, Tuple
 
 import boto3
 try:  # pragma: no cover - compatibility with stubs in repo
@@ -16,6 +19,19 @@ except ImportError:  # pragma: no cover
     class BotoCoreError(Exception):
         ...
 
+import dynamo_client
+from usage_rollups import RollupStore, UsageRollups
+from usage_sketches import Sketch, decode, encode, merge_all, observe
+
+# TTL attribute set on hot rows once they are copied to the cold tier.
+TIERED_ATTRIBUTE = "expiresAt"
+# Each process keeps one row per tenant and day with its own sketches in the
+# rollups table, partitioned by day (``sketch#<period>``) so the daily job reads
+# them with one query; rewritten every ``USAGE_SKETCH_FLUSH_S``.
+SKETCH_PREFIX = "sketch#"
+SKETCH_FLUSH_SECONDS = float(os.getenv("USAGE_SKETCH_FLUSH_S", "30"))
+SKETCH_TTL_SECONDS = 7 * 86400
+
 
 @dataclass
 class UsageRecord:
@@ -24,15 +40,31 @@ class UsageRecord:
     usage: Dict[str, float]
     createdAt: str
     metadata: Dict[str, str] = field(default_factory=dict)
+    # Serialized sketches (see ``usage_sketches``), aggregates only.
+    sketches: Dict[str, str] = field(default_factory=dict)
 
     def as_item(self) -> Dict[str, object]:
-        return {
+        item: Dict[str, object] = {
             "tenantId": self.tenantId,
             "period": self.period,
             "usage": self.usage,
             "createdAt": self.createdAt,
             "metadata": self.metadata,
         }
+        if self.sketches:
+            item["sketches"] = self.sketches
+        return item
+
+
+def _from_item(item: Dict[str, object]) -> UsageRecord:
+    return UsageRecord(
+        tenantId=str(item["tenantId"]),
+        period=str(item["period"]),
+        usage={key: float(value) for key, value in (item.get("usage") or {}).items()},  # type: ignore[union-attr]
+        createdAt=str(item.get("createdAt", "")),
+        metadata=dict(item.get("metadata") or {}),  # type: ignore[arg-type]
+        sketches=dict(item.get("sketches") or {}),  # type: ignore[arg-type]
+    )
 
 
 class UsagePersistence:
@@ -46,14 +78,26 @@ class UsagePersistence:
     def __init__(self) -> None:
         self.raw_table = os.getenv("USAGE_EVENTS_TABLE")
         self.aggregate_table = os.getenv("USAGE_AGGREGATES_TABLE")
+        # Rollup counters and per-process sketches; kept apart so scans of the
+        # aggregates table only see daily aggregates.
+        self.rollup_table = os.getenv("USAGE_ROLLUPS_TABLE")
         self.firehose_stream = os.getenv("USAGE_FIREHOSE_STREAM")
-        self._dynamodb = None
         self._firehose = None
 
-    def _dynamodb_resource(self):
-        if self._dynamodb is None:
-            self._dynamodb = boto3.resource("dynamodb", region_name=os.getenv("AWS_REGION", "us-east-1"))
-        return self._dynamodb
+    def _table(self, name: str):
+        return dynamo_client.table(name)
+
+    def _scan(self, name: str, **request) -> List[Dict[str, object]]:
+        """Scan every page, following ``LastEvaluatedKey``."""
+
+        table = self._table(name)
+        items: List[Dict[str, object]] = []
+        while True:
+            response = table.scan(**request)
+            items.extend(response.get("Items", []))
+            if not response.get("LastEvaluatedKey"):
+                return items
+            request["ExclusiveStartKey"] = response["LastEvaluatedKey"]
 
     def _firehose_client(self):
         if self._firehose is None:
@@ -63,7 +107,7 @@ class UsagePersistence:
     def persist_raw(self, record: UsageRecord) -> None:
         if self.raw_table:
             try:
-                table = self._dynamodb_resource().Table(self.raw_table)
+                table = self._table(self.raw_table)
                 table.put_item(Item=record.as_item())
             except (ClientError, BotoCoreError):  # pragma: no cover - defensive
                 pass
@@ -77,22 +121,55 @@ class UsagePersistence:
     def persist_aggregate(self, record: UsageRecord) -> None:
         if self.aggregate_table:
             try:
-                table = self._dynamodb_resource().Table(self.aggregate_table)
+                table = self._table(self.aggregate_table)
                 table.put_item(Item=record.as_item())
             except (ClientError, BotoCoreError):  # pragma: no cover - defensive
                 pass
 
+    def persist_sketches(self, tenant_id: str, period: str, writer: str, sketches: Dict[str, str]) -> None:
+        """Overwrite ``writer``'s sketches for the day; errors propagate so the caller can retry."""
+
+        self._table(self.rollup_table).put_item(
+            Item={
+                "tenantId": f"{SKETCH_PREFIX}{period}",
+                "period": f"{tenant_id}#{writer}",
+                "tenant": tenant_id,
+                "sketches": sketches,
+                TIERED_ATTRIBUTE: int(time.time()) + SKETCH_TTL_SECONDS,
+            }
+        )
+
+    def fetch_sketches(self, period: str) -> Dict[str, List[Dict[str, str]]]:
+        """TenantId -> the sketches every process persisted for ``period``."""
+
+        if not self.rollup_table:
+            return {}
+        table = self._table(self.rollup_table)
+        request: Dict[str, object] = {
+            "KeyConditionExpression": "tenantId = :day",
+            "ExpressionAttributeValues": {":day": f"{SKETCH_PREFIX}{period}"},
+        }
+        by_tenant: Dict[str, List[Dict[str, str]]] = {}
+        while True:
+            response = table.query(**request)
+            for item in response.get("Items", []):
+                by_tenant.setdefault(str(item["tenant"]), []).append(dict(item.get("sketches") or {}))
+            if not response.get("LastEvaluatedKey"):
+                return by_tenant
+            request["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
     def fetch_events(self, period: str) -> Iterable[UsageRecord]:
         if not self.raw_table:
             return []
         try:
-            table = self._dynamodb_resource().Table(self.raw_table)
-            response = table.scan(
-                FilterExpression="period = :period",
+            items = self._scan(
+                self.raw_table,
+                # PERIOD is a DynamoDB reserved word.
+                FilterExpression="#period = :period",
+                ExpressionAttributeNames={"#period": "period"},
                 ExpressionAttributeValues={":period": period},
             )
-            items = response.get("Items", [])
-            return [UsageRecord(**item) for item in items]
+            return [_from_item(item) for item in items if TIERED_ATTRIBUTE not in item]
         except (ClientError, BotoCoreError):  # pragma: no cover - defensive
             return []
 
@@ -100,13 +177,41 @@ class UsagePersistence:
         if not self.aggregate_table:
             return []
         try:
-            table = self._dynamodb_resource().Table(self.aggregate_table)
-            response = table.scan()
-            items = response.get("Items", [])
-            return [UsageRecord(**item) for item in items]
+            return [
+                _from_item(item)
+                for item in self._scan(self.aggregate_table)
+                if TIERED_ATTRIBUTE not in item
+            ]
         except (ClientError, BotoCoreError):  # pragma: no cover - defensive
             return []
 
+    def fetch_untiered(self, table_name: str | None, before_period: str) -> List[UsageRecord]:
+        """Rows older than ``before_period`` that have not been moved to the cold tier yet."""
+
+        if not table_name:
+            return []
+        items = self._scan(
+            table_name,
+            FilterExpression="#period < :period AND attribute_not_exists(#tiered)",
+            ExpressionAttributeNames={"#period": "period", "#tiered": TIERED_ATTRIBUTE},
+            ExpressionAttributeValues={":period": before_period},
+        )
+        return [_from_item(item) for item in items]
+
+    def mark_tiered(self, table_name: str | None, records: Iterable[UsageRecord], expires_at: int) -> None:
+        """Hide compacted rows from readers and let DynamoDB TTL delete them."""
+
+        if not table_name:
+            return
+        table = self._table(table_name)
+        for record in records:
+            table.update_item(
+                Key={"tenantId": record.tenantId, "period": record.period},
+                UpdateExpression="SET #tiered = :expires",
+                ExpressionAttributeNames={"#tiered": TIERED_ATTRIBUTE},
+                ExpressionAttributeValues={":expires": expires_at},
+            )
+
 
 class UsageTracker:
     """In-memory tracker that simulates persistence in a metrics store.
@@ -121,6 +226,18 @@ class UsageTracker:
         self._aggregated: List[UsageRecord] = []
         self.persistence = UsagePersistence()
         self._aggregates_hydrated = False
+        self.rollups = UsageRollups(store=RollupStore(self.persistence.rollup_table) if self.persistence.rollup_table else None)
+        # tenantId -> period -> sketch name -> live sketch.
+        self._sketches: Dict[str, Dict[str, Dict[str, Sketch]]] = {}
+        self._sketch_writer = uuid.uuid4().hex
+        self._dirty_sketches: Set[Tuple[str, str]] = set()
+        self._sketches_flushed_at = time.monotonic()
+        # Usage is recorded from concurrent threads (batch entries, the async
+        # I/O pool): ``_sketch_lock`` guards the live sketches and the dirty
+        # set, ``_flush_lock`` keeps an older snapshot from overwriting a newer one.
+        self._sketch_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._flusher: threading.Thread | None = None
 
     def record_usage(
         self,
@@ -147,6 +264,13 @@ class UsageTracker:
             metadata=metadata or {},
         )
         self._raw_events.append(record)
+        self.rollups.add(tenant_id, ts, record.usage)
+        with self._sketch_lock:
+            observe(self._sketches.setdefault(tenant_id, {}).setdefault(period, {}), record.metadata)
+            self._dirty_sketches.add((tenant_id, period))
+            if self._flusher is None and self.persistence.rollup_table:
+                self._flusher = threading.Thread(target=self._flush_loop, name="usage-flush", daemon=True)
+                self._flusher.start()
         self.persistence.persist_raw(record)
         return record
 
@@ -169,10 +293,112 @@ class UsageTracker:
             self._aggregates_hydrated = True
         return list(self._aggregated)
 
+    def live_sketches(self, tenant_id: str) -> Dict[str, Dict[str, Sketch]]:
+        """Period -> sketches updated by this process for ``tenant_id``."""
+
+        with self._sketch_lock:
+            return {period: merge_all([sketches]) for period, sketches in self._sketches.get(tenant_id, {}).items()}
+
+    def _flush_loop(self) -> None:
+        # Runs beside the requests instead of inside whichever one crosses the
+        # interval. Lambda freezes the thread between invocations, so buffered
+        # deltas go out on the next one (or before the next read).
+        while True:
+            time.sleep(self.rollups.flush_seconds)
+            try:
+                self.flush_pending()
+            except Exception:  # noqa: BLE001 - the next round retries
+                continue
+
+    def flush_pending(self) -> None:
+        """Write buffered rollup deltas, and the sketches once ``USAGE_SKETCH_FLUSH_S`` has passed."""
+
+        self.rollups.flush()
+        if time.monotonic() - self._sketches_flushed_at >= SKETCH_FLUSH_SECONDS:
+            self.flush_sketches()
+
+    def flush_sketches(self) -> int:
+        """Persist the sketches changed since the last flush; failed ones stay pending."""
+
+        with self._flush_lock:
+            with self._sketch_lock:
+                self._sketches_flushed_at = time.monotonic()
+                if not self.persistence.rollup_table:
+                    return 0
+                pending = {
+                    (tenant_id, period): encode(self._sketches[tenant_id][period])
+                    for tenant_id, period in sorted(self._dirty_sketches)
+                    if self._sketches.get(tenant_id, {}).get(period)
+                }
+                self._dirty_sketches.clear()
+            written = 0
+            for (tenant_id, period), encoded in pending.items():
+                try:
+                    self.persistence.persist_sketches(tenant_id, period, self._sketch_writer, encoded)
+                    written += 1
+                except (ClientError, BotoCoreError, dynamo_client.CircuitOpenError):
+                    with self._sketch_lock:
+                        self._dirty_sketches.add((tenant_id, period))
+            return written
+
+    def period_sketches(self, period: str) -> Dict[str, Dict[str, Sketch]]:
+        """TenantId -> sketches for ``period`` across every process.
+
+        Raw events cannot be replayed for this: ``UsageEventsTable`` is keyed
+        by tenant and day, so it only keeps the last event of each day. Every
+        process persists its own sketches instead, and the rows are merged
+        here; each holds a disjoint set of events, so the heavy-hitter counts
+        add up exactly. Without a table only this process's sketches exist.
+        """
+
+        if not self.persistence.rollup_table:
+            with self._sketch_lock:
+                return {tenant_id: merge_all([periods[period]]) for tenant_id, periods in self._sketches.items() if period in periods}
+        self.flush_sketches()
+        with self._sketch_lock:
+            failed = any(pending == period for _, pending in self._dirty_sketches)
+        if failed:
+            raise RuntimeError(f"Usage sketches for {period} could not be persisted")
+        return {
+            tenant_id: merge_all(decode(encoded) for encoded in rows)
+            for tenant_id, rows in self.persistence.fetch_sketches(period).items()
+        }
+
+    def take_older_than(self, before_period: str) -> Tuple[List[UsageRecord], List[UsageRecord]]:
+        """Remove and return raw events and aggregates with ``period < before_period``.
+
+        Hot rows persisted by other processes are included; the caller marks
+        them with :meth:`UsagePersistence.mark_tiered` once they are safely
+        stored elsewhere.
+        """
+
+        taken: List[List[UsageRecord]] = []
+        for records, table_name in ((self._raw_events, self.persistence.raw_table), (self._aggregated, self.persistence.aggregate_table)):
+            old = [record for record in records if record.period < before_period]
+            records[:] = [record for record in records if record.period >= before_period]
+            seen = {(record.tenantId, record.period, record.createdAt) for record in old}
+            old.extend(
+                record
+                for record in self.persistence.fetch_untiered(table_name, before_period)
+                if (record.tenantId, record.period, record.createdAt) not in seen
+            )
+            taken.append(old)
+        # Tiered periods are closed; their sketches already live in the aggregates.
+        with self._sketch_lock:
+            for periods in self._sketches.values():
+                for period in [period for period in periods if period < before_period]:
+                    del periods[period]
+            self._dirty_sketches = {key for key in self._dirty_sketches if key[1] >= before_period}
+        return taken[0], taken[1]
+
     def reset(self) -> None:
         self._raw_events.clear()
         self._aggregated.clear()
         self._aggregates_hydrated = False
+        with self._sketch_lock:
+            self._sketches.clear()
+            self._dirty_sketches.clear()
+        self.rollups.reset()
 
     def default_schedule(self) -> str:
         """Describe the default EventBridge schedule for documentation."""
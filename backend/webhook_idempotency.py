@@ -0,0 +1,120 @@
+"""Duplicate suppression for Mercado Pago notifications.
+
+Mercado Pago redelivers notifications until it gets a 2xx and sometimes
+sends the same one several times. A notification is identified by
+``(tenant, resource id, status)``; once it has been applied, later copies
+must return the original receipt without touching the subscription again.
+
+Two layers keep that cheap:
+
+* a bounded LRU in the warm Lambda container answers repeats with no I/O
+  (an LRU rather than a Bloom filter because it can hand back the receipt
+  itself instead of only saying "probably seen");
+* a dedupe record in ``TRANSACTIONS_TABLE`` with a TTL covers cold
+  containers: one ``GetItem`` answers a duplicate. The record is written
+  with ``attribute_not_exists`` in the same transaction that applies the
+  notification, so concurrent deliveries cannot both be applied.
+"""
+from __future__ import annotations
+
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Dict
+
+try:  # pragma: no cover - compatibility with stubs in repo
+    from botocore.exceptions import BotoCoreError, ClientError
+except ImportError:  # pragma: no cover
+    from botocore.exceptions import ClientError
+
+    class BotoCoreError(Exception):
+        ...
+
+import dynamo_client
+
+
+DEFAULT_CAPACITY = int(os.getenv("WEBHOOK_DEDUPE_CACHE_SIZE", "4096"))
+DEFAULT_TTL_HOURS = int(os.getenv("WEBHOOK_DEDUPE_TTL_HOURS", "72"))
+
+
+def dedupe_key(tenant_id: str, resource_id: str, status: str) -> str:
+    return f"{tenant_id}#webhook#{resource_id}#{status.lower()}"
+
+
+class DuplicateDeliveryError(Exception):
+    """Another delivery applied one of the notifications first."""
+
+
+class ReceiptCache:
+    """Thread-safe LRU of recently applied notifications and their receipts."""
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY) -> None:
+        self.capacity = max(1, capacity)
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Dict[str, Any] | None:
+        with self._lock:
+            receipt = self._entries.get(key)
+            if receipt is not None:
+                self._entries.move_to_end(key)
+            return receipt
+
+    def put(self, key: str, receipt: Dict[str, Any]) -> None:
+        with self._lock:
+            self._entries[key] = receipt
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+
+    def discard(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class WebhookDeduplicator:
+    def __init__(self, table_env: str = "TRANSACTIONS_TABLE", cache: ReceiptCache | None = None, ttl_hours: int = DEFAULT_TTL_HOURS) -> None:
+        self.table_name = os.environ.get(table_env)
+        if not self.table_name:
+            raise RuntimeError(f"Missing DynamoDB table env var: {table_env}")
+        self.table = dynamo_client.table(self.table_name)
+        self.cache = cache or ReceiptCache()
+        self.ttl_hours = ttl_hours
+
+    def record(self, key: str, tenant_id: str, receipt: Dict[str, Any]) -> Dict[str, Any]:
+        """Dedupe item stored next to the receipts; also usable inside a transaction."""
+
+        return {
+            "transactionId": key,
+            "tenantId": tenant_id,
+            "recordType": "webhook-dedupe",
+            "receipt": receipt,
+            "ttl": int((datetime.utcnow() + timedelta(hours=self.ttl_hours)).timestamp()),
+        }
+
+    def find(self, key: str) -> Dict[str, Any] | None:
+        """Return the stored receipt for ``key``: LRU first, then one ``GetItem``."""
+
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+        try:
+            item = self.table.get_item(Key={"transactionId": key}).get("Item")
+        except (ClientError, BotoCoreError):
+            return None
+        if not item:
+            return None
+        receipt = item.get("receipt") or {}
+        self.cache.put(key, receipt)
+        return receipt
+
+    def remember(self, key: str, receipt: Dict[str, Any]) -> None:
+        self.cache.put(key, receipt)
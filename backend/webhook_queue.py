@@ -0,0 +1,100 @@
+"""Transport for asynchronous Mercado Pago webhook processing.
+
+With ``WEBHOOK_MODE=async`` the API only validates a notification and hands
+it to this queue; ``app.webhook_batch_handler`` consumes it later. Messages
+go to SQS when ``WEBHOOK_QUEUE_URL`` is set and otherwise to an in-process
+queue that mimics the SQS event shape, which keeps local runs and tests
+free of AWS.
+"""
+from __future__ import annotations
+
+import json
+import os
+import threading
+import uuid
+from collections import deque
+from typing import Any, Dict, Iterable, List, Tuple
+
+import boto3
+
+MAX_BATCH_SIZE = 10
+
+
+def async_enabled() -> bool:
+    return os.getenv("WEBHOOK_MODE", "sync").lower() == "async"
+
+
+class LocalQueue:
+    """In-process stand-in for SQS; ``receive`` returns SQS-shaped records."""
+
+    def __init__(self) -> None:
+        self._messages: deque[Dict[str, Any]] = deque()
+        self._lock = threading.Lock()
+
+    def send(self, body: str) -> str:
+        message_id = uuid.uuid4().hex
+        with self._lock:
+            self._messages.append({"messageId": message_id, "body": body, "eventSource": "local:queue"})
+        return message_id
+
+    def receive(self, max_messages: int = MAX_BATCH_SIZE) -> List[Dict[str, Any]]:
+        with self._lock:
+            count = min(max_messages, len(self._messages))
+            return [self._messages.popleft() for _ in range(count)]
+
+    def requeue(self, records: Iterable[Dict[str, Any]]) -> None:
+        with self._lock:
+            self._messages.extend(records)
+
+    def __len__(self) -> int:
+        return len(self._messages)
+
+
+class WebhookQueue:
+    def __init__(self, queue_url: str | None = None) -> None:
+        self.queue_url = queue_url if queue_url is not None else os.getenv("WEBHOOK_QUEUE_URL", "")
+        self.local = None if self.queue_url else LocalQueue()
+        self._client = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = boto3.client("sqs", region_name=os.getenv("AWS_REGION", "us-east-1"))
+        return self._client
+
+    def send(self, notification: Dict[str, Any]) -> str:
+        body = json.dumps(notification, default=str)
+        if self.local is not None:
+            return self.local.send(body)
+        response = self.client.send_message(QueueUrl=self.queue_url, MessageBody=body)
+        return response.get("MessageId", "")
+
+
+def coalesce(records: Iterable[Dict[str, Any]]) -> Tuple[Dict[str, Dict[str, Any]], Dict[str, List[str]], List[str]]:
+    """Group a batch by tenant, keeping only the latest status per resource.
+
+    Returns ``(groups, message_ids, malformed)`` where ``groups[tenant]`` maps
+    each resource id to its newest notification, ``message_ids[tenant]``
+    lists every message folded into that group (so a failed group reports
+    all of them) and ``malformed`` holds ids of bodies that could not be read.
+    """
+
+    groups: Dict[str, Dict[str, Any]] = {}
+    message_ids: Dict[str, List[str]] = {}
+    malformed: List[str] = []
+    for position, record in enumerate(records):
+        message_id = record.get("messageId", str(position))
+        try:
+            notification = json.loads(record.get("body") or "")
+            tenant_id = notification["tenantId"]
+            resource_id = notification["resourceId"]
+        except (TypeError, ValueError, KeyError):
+            malformed.append(message_id)
+            continue
+        message_ids.setdefault(tenant_id, []).append(message_id)
+        latest = groups.setdefault(tenant_id, {})
+        current = latest.get(resource_id)
+        order = (notification.get("receivedAt", ""), position)
+        if current is None or order >= current["_order"]:
+            latest[resource_id] = {**notification, "_order": order}
+    return groups, message_ids, malformed
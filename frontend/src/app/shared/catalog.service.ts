@@ -1,11 +1,18 @@
 import { HttpClient, HttpHeaders, HttpParams } from '@angular/common/http';
 import { Injectable } from '@angular/core';
-import { catchError, delay, map, Observable, of } from 'rxjs';
+import { catchError, delay, forkJoin, map, Observable, of, switchMap } from 'rxjs';
 import { AuthService } from './auth.service';
 import { Product } from './models';
-import { API_ROUTES } from './routes';
+import { API_ROUTES, CATALOG_SNAPSHOT_ROUTES } from './routes';
 import { TenantContextService } from './tenant-context.service';
 
+interface CatalogSnapshotManifest {
+  tenantId: string;
+  version: number;
+  listing: string[];
+  categories: Record<string, string[]>;
+}
+
 @Injectable({ providedIn: 'root' })
 export class CatalogService {
   private readonly productsByTenant = new Map<string, Product[]>();
@@ -95,6 +102,26 @@ export class CatalogService {
 
   list(search?: string): Observable<Product[]> {
     const tenantId = this.resolveTenantId();
+    return this.listFromSnapshot(tenantId).pipe(
+      map((products) => this.filterProducts(this.normalizeProducts(products, tenantId), search)),
+      catchError(() => this.listFromApi(tenantId, search))
+    );
+  }
+
+  private listFromSnapshot(tenantId: string): Observable<Product[]> {
+    return this.http.get<CatalogSnapshotManifest>(CATALOG_SNAPSHOT_ROUTES.manifest(tenantId)).pipe(
+      switchMap((manifest) =>
+        manifest.listing.length
+          ? forkJoin(
+              manifest.listing.map((key) => this.http.get<{ items?: Product[] }>(CATALOG_SNAPSHOT_ROUTES.object(key)))
+            )
+          : of([])
+      ),
+      map((pages) => pages.flatMap((page) => page.items ?? []))
+    );
+  }
+
+  private listFromApi(tenantId: string, search?: string): Observable<Product[]> {
     const headers = this.tenantHeaders(tenantId);
     const params = this.tenantParams(tenantId, search);
     return this.http.get<{ items?: Product[] }>(API_ROUTES.products(tenantId), { headers, params }).pipe(
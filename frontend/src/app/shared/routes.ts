@@ -15,6 +15,11 @@ export const API_ROUTES = {
   adminBilling: '/v1/admin/tenants/billing'
 };
 
+export const CATALOG_SNAPSHOT_ROUTES = {
+  manifest: (tenantId: string) => `/catalog/${tenantId}/manifest.json`,
+  object: (key: string) => `/${key}`
+};
+
 export const ROUTES_REQUIRING_TENANT = new Set([
   API_ROUTES.products,
   API_ROUTES.cart,
@@ -0,0 +1,1279 @@
+"""Local DynamoDB engine behind the in-repo ``boto3`` stub.
+
+Tables keep items under their real primary key (hash, or hash + range),
+maintain global secondary indexes, and implement the data-plane API the
+backend uses: single-item reads and writes with condition and update
+expressions, ``query`` and ``scan`` with filters, projections, ``Limit``,
+1 MB pages and ``LastEvaluatedKey``, batch reads and writes, and
+transactions.
+
+Every call is metered the way DynamoDB bills it (4 KB read units, halved
+for eventually consistent reads; 1 KB write units, doubled inside
+transactions; index writes included), so tests and benchmarks can assert on
+the capacity an access pattern consumes. :func:`configure_local_dynamodb`
+adds read/write latency and random throttling, and tables created with
+``ProvisionedThroughput`` throttle once their per-second budget is spent.
+"""
+from __future__ import annotations
+
+import copy
+import math
+import random
+import re
+import threading
+import time
+import zlib
+from decimal import Decimal
+from types import SimpleNamespace
+from typing import Any, Dict, Iterator, List, Tuple
+
+from botocore.exceptions import ClientError
+
+
+def _client_error(code: str, message: str, operation: str, **extra: Any) -> ClientError:
+    return ClientError({"Error": {"Code": code, "Message": message}, **extra}, operation)
+
+
+# ---------------------------------------------------------------------------
+# Expression evaluation (ConditionExpression / UpdateExpression / key conditions)
+# ---------------------------------------------------------------------------
+
+_TOKEN_RE = re.compile(r"\s*(<>|<=|>=|[=<>(),.\[\]+-]|#[A-Za-z0-9_]+|:[A-Za-z0-9_]+|[A-Za-z_][A-Za-z0-9_]*|\d+)")
+_MISSING = object()
+
+
+def _tokenize(expression: str) -> List[str]:
+    tokens: List[str] = []
+    position = 0
+    expression = expression.strip()
+    while position < len(expression):
+        match = _TOKEN_RE.match(expression, position)
+        if not match:
+            raise _client_error("ValidationException", f"Invalid expression near: {expression[position:]}", "Expression")
+        tokens.append(match.group(1))
+        position = match.end()
+    return tokens
+
+
+def _arith(left: Any, right: Any, operator: str) -> Any:
+    if isinstance(left, Decimal) and isinstance(right, float):
+        right = Decimal(str(right))
+    elif isinstance(left, float) and isinstance(right, Decimal):
+        left = Decimal(str(left))
+    return left + right if operator == "+" else left - right
+
+
+class _Expression:
+    def __init__(self, expression: str, names: Dict[str, str] | None, values: Dict[str, Any] | None) -> None:
+        self.tokens = _tokenize(expression)
+        self.position = 0
+        self.names = names or {}
+        self.values = values or {}
+
+    # -- token helpers -----------------------------------------------------
+    def peek(self, offset: int = 0) -> str | None:
+        index = self.position + offset
+        return self.tokens[index] if index < len(self.tokens) else None
+
+    def take(self, expected: str | None = None) -> str:
+        token = self.peek()
+        if token is None or (expected is not None and token.upper() != expected):
+            raise _client_error("ValidationException", f"Expected {expected} but found {token}", "Expression")
+        self.position += 1
+        return token
+
+    def at_keyword(self, keyword: str) -> bool:
+        token = self.peek()
+        return token is not None and token.upper() == keyword
+
+    # -- paths and operands ------------------------------------------------
+    def parse_path(self) -> List[Any]:
+        path: List[Any] = [self._name(self.take())]
+        while self.peek() in {".", "["}:
+            if self.take() == ".":
+                path.append(self._name(self.take()))
+            else:
+                path.append(int(self.take()))
+                self.take("]")
+        return path
+
+    def _name(self, token: str) -> str:
+        if token.startswith("#"):
+            if token not in self.names:
+                raise _client_error("ValidationException", f"Undefined attribute name {token}", "Expression")
+            return self.names[token]
+        return token
+
+    def parse_operand(self) -> tuple:
+        token = self.peek()
+        if token is None:
+            raise _client_error("ValidationException", "Unexpected end of expression", "Expression")
+        if token.startswith(":"):
+            self.take()
+            if token not in self.values:
+                raise _client_error("ValidationException", f"Undefined attribute value {token}", "Expression")
+            return ("value", self.values[token])
+        if self.peek(1) == "(" and token.lower() in {"size", "if_not_exists", "list_append"}:
+            name = self.take().lower()
+            self.take("(")
+            args = [self.parse_operand()]
+            while self.peek() == ",":
+                self.take()
+                args.append(self.parse_operand())
+            self.take(")")
+            return ("call", name, args)
+        return ("path", self.parse_path())
+
+    def parse_value(self) -> tuple:
+        left = self.parse_operand()
+        while self.peek() in {"+", "-"}:
+            operator = self.take()
+            left = ("arith", operator, left, self.parse_operand())
+        return left
+
+
+def _resolve(item: Dict[str, Any], path: List[Any]) -> Any:
+    current: Any = item
+    for part in path:
+        if isinstance(part, int):
+            if not isinstance(current, list) or part >= len(current):
+                return _MISSING
+            current = current[part]
+        else:
+            if not isinstance(current, dict) or part not in current:
+                return _MISSING
+            current = current[part]
+    return current
+
+
+def _evaluate(item: Dict[str, Any], operand: tuple) -> Any:
+    kind = operand[0]
+    if kind == "value":
+        return operand[1]
+    if kind == "path":
+        return _resolve(item, operand[1])
+    if kind == "arith":
+        left = _evaluate(item, operand[2])
+        right = _evaluate(item, operand[3])
+        if left is _MISSING or right is _MISSING:
+            raise _client_error("ValidationException", "Operand for arithmetic does not exist", "UpdateItem")
+        return _arith(left, right, operand[1])
+    name, args = operand[1], operand[2]
+    if name == "size":
+        value = _evaluate(item, args[0])
+        return _MISSING if value is _MISSING else len(value)
+    if name == "if_not_exists":
+        value = _evaluate(item, args[0])
+        return _evaluate(item, args[1]) if value is _MISSING else value
+    if name == "list_append":
+        return list(_evaluate(item, args[0])) + list(_evaluate(item, args[1]))
+    raise _client_error("ValidationException", f"Unsupported function {name}", "Expression")
+
+
+def _compare(left: Any, operator: str, right: Any) -> bool:
+    if left is _MISSING or right is _MISSING:
+        return operator == "<>" and not (left is _MISSING and right is _MISSING)
+    try:
+        if operator == "=":
+            return left == right
+        if operator == "<>":
+            return left != right
+        if operator == "<":
+            return left < right
+        if operator == "<=":
+            return left <= right
+        if operator == ">":
+            return left > right
+        if operator == ">=":
+            return left >= right
+    except TypeError:
+        return False
+    raise _client_error("ValidationException", f"Unsupported comparator {operator}", "Expression")
+
+
+class _Condition(_Expression):
+    def parse(self):
+        node = self.parse_or()
+        if self.peek() is not None:
+            raise _client_error("ValidationException", f"Unexpected token {self.peek()}", "Expression")
+        return node
+
+    def parse_or(self):
+        node = self.parse_and()
+        while self.at_keyword("OR"):
+            self.take()
+            node = ("or", node, self.parse_and())
+        return node
+
+    def parse_and(self):
+        node = self.parse_not()
+        while self.at_keyword("AND"):
+            self.take()
+            node = ("and", node, self.parse_not())
+        return node
+
+    def parse_not(self):
+        if self.at_keyword("NOT"):
+            self.take()
+            return ("not", self.parse_not())
+        return self.parse_primary()
+
+    def parse_primary(self):
+        token = self.peek()
+        if token == "(":
+            self.take()
+            node = self.parse_or()
+            self.take(")")
+            return node
+        lowered = (token or "").lower()
+        if self.peek(1) == "(" and lowered in {"attribute_exists", "attribute_not_exists", "begins_with", "contains", "attribute_type"}:
+            self.take()
+            self.take("(")
+            args = [self.parse_operand()]
+            while self.peek() == ",":
+                self.take()
+                args.append(self.parse_operand())
+            self.take(")")
+            return ("fn", lowered, args)
+        left = self.parse_operand()
+        if self.at_keyword("BETWEEN"):
+            self.take()
+            low = self.parse_operand()
+            self.take("AND")
+            return ("between", left, low, self.parse_operand())
+        if self.at_keyword("IN"):
+            self.take()
+            self.take("(")
+            options = [self.parse_operand()]
+            while self.peek() == ",":
+                self.take()
+                options.append(self.parse_operand())
+            self.take(")")
+            return ("in", left, options)
+        operator = self.take()
+        return ("cmp", operator, left, self.parse_operand())
+
+
+def _check(item: Dict[str, Any], node: tuple) -> bool:
+    kind = node[0]
+    if kind == "or":
+        return _check(item, node[1]) or _check(item, node[2])
+    if kind == "and":
+        return _check(item, node[1]) and _check(item, node[2])
+    if kind == "not":
+        return not _check(item, node[1])
+    if kind == "cmp":
+        return _compare(_evaluate(item, node[2]), node[1], _evaluate(item, node[3]))
+    if kind == "between":
+        value = _evaluate(item, node[1])
+        return _compare(value, ">=", _evaluate(item, node[2])) and _compare(value, "<=", _evaluate(item, node[3]))
+    if kind == "in":
+        value = _evaluate(item, node[1])
+        return any(_compare(value, "=", _evaluate(item, option)) for option in node[2])
+    name, args = node[1], node[2]
+    value = _evaluate(item, args[0])
+    if name == "attribute_exists":
+        return value is not _MISSING
+    if name == "attribute_not_exists":
+        return value is _MISSING
+    if name == "begins_with":
+        prefix = _evaluate(item, args[1])
+        return isinstance(value, str) and value.startswith(prefix)
+    if name == "contains":
+        needle = _evaluate(item, args[1])
+        return value is not _MISSING and needle in value
+    return value is not _MISSING
+
+
+def _condition_matches(item: Dict[str, Any], expression: str | None, names, values) -> bool:
+    if not expression:
+        return True
+    return _check(item, _Condition(expression, names, values).parse())
+
+
+def _assign(item: Dict[str, Any], path: List[Any], value: Any) -> None:
+    parent = _resolve(item, path[:-1]) if len(path) > 1 else item
+    if parent is _MISSING or not isinstance(parent, (dict, list)):
+        raise _client_error(
+            "ValidationException", "The document path provided in the update expression is invalid for update", "UpdateItem"
+        )
+    leaf = path[-1]
+    if isinstance(parent, list):
+        if leaf >= len(parent):
+            parent.append(value)
+        else:
+            parent[leaf] = value
+    else:
+        parent[leaf] = value
+
+
+def _remove(item: Dict[str, Any], path: List[Any]) -> None:
+    parent = _resolve(item, path[:-1]) if len(path) > 1 else item
+    leaf = path[-1]
+    if isinstance(parent, dict):
+        parent.pop(leaf, None)
+    elif isinstance(parent, list) and leaf < len(parent):
+        parent.pop(leaf)
+
+
+def _apply_update(item: Dict[str, Any], expression: str, names, values) -> Dict[str, Any]:
+    parser = _Expression(expression, names, values)
+    actions: List[tuple] = []
+    while parser.peek() is not None:
+        clause = parser.take().upper()
+        if clause not in {"SET", "REMOVE", "ADD", "DELETE"}:
+            raise _client_error("ValidationException", f"Invalid update clause {clause}", "UpdateItem")
+        while True:
+            path = parser.parse_path()
+            if clause == "SET":
+                parser.take("=")
+                actions.append((clause, path, parser.parse_value()))
+            elif clause == "REMOVE":
+                actions.append((clause, path, None))
+            else:
+                actions.append((clause, path, parser.parse_operand()))
+            if parser.peek() != ",":
+                break
+            parser.take()
+
+    original = copy.deepcopy(item)
+    updated = copy.deepcopy(item)
+    for clause, path, operand in actions:
+        if clause == "SET":
+            _assign(updated, path, copy.deepcopy(_evaluate(original, operand)))
+        elif clause == "REMOVE":
+            _remove(updated, path)
+        elif clause == "ADD":
+            increment = _evaluate(original, operand)
+            current = _resolve(updated, path)
+            if isinstance(increment, set):
+                _assign(updated, path, (set() if current is _MISSING else set(current)) | increment)
+            else:
+                _assign(updated, path, increment if current is _MISSING else _arith(current, increment, "+"))
+        else:
+            current = _resolve(updated, path)
+            if current is not _MISSING:
+                _assign(updated, path, set(current) - _evaluate(original, operand))
+    return updated
+
+
+
+# ---------------------------------------------------------------------------
+# Projections, item sizes and capacity units
+# ---------------------------------------------------------------------------
+
+READ_UNIT_BYTES = 4096
+WRITE_UNIT_BYTES = 1024
+PAGE_BYTES = 1024 * 1024
+MAX_ITEM_BYTES = 400 * 1024
+MAX_BATCH_GET = 100
+MAX_BATCH_WRITE = 25
+MAX_TRANSACTION_ITEMS = 100
+
+
+def _parse_projection(expression: str, names: Dict[str, str] | None) -> List[List[Any]]:
+    parser = _Expression(expression, names, None)
+    paths = [parser.parse_path()]
+    while parser.peek() == ",":
+        parser.take()
+        paths.append(parser.parse_path())
+    if parser.peek() is not None:
+        raise _client_error("ValidationException", f"Invalid ProjectionExpression: {expression}", "Projection")
+    return paths
+
+
+def _project(item: Dict[str, Any], expression: str | None, names: Dict[str, str] | None) -> Dict[str, Any]:
+    if not expression:
+        return item
+    result: Dict[str, Any] = {}
+    for path in _parse_projection(expression, names):
+        value = _resolve(item, path)
+        if value is _MISSING:
+            continue
+        if any(isinstance(part, int) for part in path):
+            result[path[0]] = copy.deepcopy(item[path[0]])
+            continue
+        target = result
+        for part in path[:-1]:
+            target = target.setdefault(part, {})
+        target[path[-1]] = copy.deepcopy(value)
+    return result
+
+
+def _value_size(value: Any) -> int:
+    if value is None or isinstance(value, bool):
+        return 1
+    if isinstance(value, str):
+        return len(value.encode("utf-8"))
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if isinstance(value, (int, float, Decimal)):
+        digits = Decimal(str(value)).normalize().as_tuple().digits
+        return 1 + math.ceil(len(digits) / 2)
+    if isinstance(value, (set, frozenset)):
+        return sum(_value_size(member) for member in value)
+    if isinstance(value, (list, tuple)):
+        return 3 + sum(1 + _value_size(member) for member in value)
+    if isinstance(value, dict):
+        return 3 + sum(1 + len(str(name).encode("utf-8")) + _value_size(member) for name, member in value.items())
+    return len(str(value).encode("utf-8"))
+
+
+def item_size(item: Dict[str, Any] | None) -> int:
+    """Approximate stored size in bytes using DynamoDB's sizing rules."""
+
+    if not item:
+        return 0
+    return sum(len(name.encode("utf-8")) + _value_size(value) for name, value in item.items())
+
+
+def _read_units(size: int, consistent: bool) -> float:
+    units = max(1, math.ceil(size / READ_UNIT_BYTES))
+    return float(units) if consistent else units / 2
+
+
+def _write_units(size: int) -> float:
+    return float(max(1, math.ceil(size / WRITE_UNIT_BYTES)))
+
+
+def _key_part(value: Any) -> Tuple[str, Any]:
+    if isinstance(value, bool) or value is None or isinstance(value, (dict, list, set, tuple)):
+        raise _client_error("ValidationException", "Key attributes must be strings, numbers or binary", "Key")
+    if isinstance(value, (int, float, Decimal)):
+        return ("N", Decimal(str(value)))
+    if isinstance(value, (bytes, bytearray)):
+        return ("B", bytes(value))
+    return ("S", str(value))
+
+
+# ---------------------------------------------------------------------------
+# Simulation settings: latency, throttling and metering
+# ---------------------------------------------------------------------------
+
+
+class _Settings:
+    def __init__(self) -> None:
+        self.write_latency = 0.0
+        self.read_latency = 0.0
+        self.throttle_rate = 0.0
+        self.throttle_tables: set | None = None
+        self.rng = random.Random()
+
+
+_SETTINGS = _Settings()
+
+
+def configure_local_dynamodb(
+    write_latency_ms: float = 0.0,
+    read_latency_ms: float = 0.0,
+    throttle_rate: float = 0.0,
+    throttle_tables: List[str] | None = None,
+    seed: int | None = None,
+) -> None:
+    """Simulate service latency and throttling; call with no arguments to reset.
+
+    Writes to one item are serialized for ``write_latency_ms``, the same way
+    DynamoDB serializes writes to a single item, and transactions touching
+    an item with a write in flight are cancelled with ``TransactionConflict``.
+    ``throttle_rate`` is the probability that a request against one of
+    ``throttle_tables`` (all tables by default) is rejected with
+    ``ProvisionedThroughputExceededException``; batch calls report the
+    rejected entries as unprocessed instead, as DynamoDB does.
+    """
+
+    _SETTINGS.write_latency = max(0.0, write_latency_ms) / 1000.0
+    _SETTINGS.read_latency = max(0.0, read_latency_ms) / 1000.0
+    _SETTINGS.throttle_rate = min(1.0, max(0.0, throttle_rate))
+    _SETTINGS.throttle_tables = set(throttle_tables) if throttle_tables else None
+    _SETTINGS.rng = random.Random(seed)
+
+
+class _Bucket:
+    """Provisioned capacity: ``rate`` units per second with one second of burst."""
+
+    def __init__(self, rate: float) -> None:
+        self.rate = float(rate)
+        self.tokens = float(rate)
+        self.updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def available(self) -> bool:
+        self._refill()
+        return self.tokens > 0
+
+    def spend(self, units: float) -> None:
+        self._refill()
+        self.tokens -= units
+
+
+def _empty_stats() -> Dict[str, Any]:
+    return {"readUnits": 0.0, "writeUnits": 0.0, "indexWriteUnits": 0.0, "requests": {}, "throttled": 0}
+
+
+# ---------------------------------------------------------------------------
+# Table state
+# ---------------------------------------------------------------------------
+
+TableKey = Tuple[Tuple[str, Any], Any]
+
+
+class _Index:
+    def __init__(self, spec: Dict[str, Any]) -> None:
+        schema = {entry["KeyType"]: entry["AttributeName"] for entry in spec["KeySchema"]}
+        projection = spec.get("Projection") or {}
+        self.name = spec["IndexName"]
+        self.hash_key = schema["HASH"]
+        self.range_key = schema.get("RANGE")
+        self.projection = projection.get("ProjectionType", "ALL")
+        self.non_key = set(projection.get("NonKeyAttributes") or [])
+        self.partitions: Dict[Tuple[str, Any], Dict[tuple, Dict[str, Any]]] = {}
+
+    @property
+    def key_names(self) -> List[str]:
+        return [self.hash_key] + ([self.range_key] if self.range_key else [])
+
+    def entry_key(self, item: Dict[str, Any] | None, table_key: TableKey) -> tuple | None:
+        if not item or any(name not in item for name in self.key_names):
+            return None
+        range_part = _key_part(item[self.range_key]) if self.range_key else ()
+        return _key_part(item[self.hash_key]), (range_part, table_key)
+
+    def project(self, item: Dict[str, Any], table_keys: List[str]) -> Dict[str, Any]:
+        if self.projection == "ALL":
+            return item
+        keep = set(table_keys) | set(self.key_names) | (self.non_key if self.projection == "INCLUDE" else set())
+        return {name: value for name, value in item.items() if name in keep}
+
+    def add(self, entry: tuple, item: Dict[str, Any]) -> None:
+        self.partitions.setdefault(entry[0], {})[entry[1]] = item
+
+    def remove(self, entry: tuple) -> None:
+        partition = self.partitions.get(entry[0])
+        if partition is not None:
+            partition.pop(entry[1], None)
+            if not partition:
+                del self.partitions[entry[0]]
+
+
+class _TableState:
+    def __init__(self, name: str, key_schema: List[Dict[str, str]], indexes: List[Dict[str, Any]], provisioned: Dict[str, Any] | None) -> None:
+        schema = {entry["KeyType"]: entry["AttributeName"] for entry in key_schema}
+        self.name = name
+        self.hash_key = schema["HASH"]
+        self.range_key = schema.get("RANGE")
+        self.partitions: Dict[Tuple[str, Any], Dict[Any, Dict[str, Any]]] = {}
+        self.indexes: Dict[str, _Index] = {}
+        self.stats = _empty_stats()
+        self.read_bucket = _Bucket(provisioned["ReadCapacityUnits"]) if provisioned else None
+        self.write_bucket = _Bucket(provisioned["WriteCapacityUnits"]) if provisioned else None
+        for spec in indexes:
+            self.add_index(spec)
+
+    @property
+    def key_names(self) -> List[str]:
+        return [self.hash_key] + ([self.range_key] if self.range_key else [])
+
+    def key_of(self, mapping: Dict[str, Any], operation: str, exact: bool = False) -> TableKey:
+        names = self.key_names
+        if any(name not in mapping for name in names) or (exact and len(mapping) != len(names)):
+            raise _client_error("ValidationException", "The provided key element does not match the schema", operation)
+        range_part = _key_part(mapping[self.range_key]) if self.range_key else ()
+        return _key_part(mapping[self.hash_key]), range_part
+
+    def key_attributes(self, item: Dict[str, Any]) -> Dict[str, Any]:
+        return {name: item[name] for name in self.key_names}
+
+    def get(self, key: TableKey) -> Dict[str, Any] | None:
+        return self.partitions.get(key[0], {}).get(key[1])
+
+    def add_index(self, spec: Dict[str, Any]) -> None:
+        index = _Index(spec)
+        for key, item in self.ordered():
+            entry = index.entry_key(item, key)
+            if entry:
+                index.add(entry, item)
+        self.indexes[index.name] = index
+
+    def ordered(self) -> Iterator[Tuple[TableKey, Dict[str, Any]]]:
+        for hash_part in sorted(self.partitions):
+            partition = self.partitions[hash_part]
+            for range_part in sorted(partition):
+                yield (hash_part, range_part), partition[range_part]
+
+    def commit(self, key: TableKey, new_item: Dict[str, Any] | None) -> Dict[str, float]:
+        """Store (or delete when ``None``) an item and keep the indexes in step.
+
+        Returns the write units each index consumed.
+        """
+
+        old_item = self.get(key)
+        if new_item is None:
+            partition = self.partitions.get(key[0], {})
+            partition.pop(key[1], None)
+            if not partition:
+                self.partitions.pop(key[0], None)
+        else:
+            self.partitions.setdefault(key[0], {})[key[1]] = new_item
+        index_units: Dict[str, float] = {}
+        for index in self.indexes.values():
+            old_entry = index.entry_key(old_item, key)
+            new_entry = index.entry_key(new_item, key)
+            if old_entry:
+                index.remove(old_entry)
+            if new_entry:
+                index.add(new_entry, new_item)
+            if old_entry or new_entry:
+                sized = index.project(new_item or old_item or {}, self.key_names)
+                moved = old_entry is not None and new_entry is not None and old_entry != new_entry
+                index_units[index.name] = _write_units(item_size(sized)) * (2 if moved else 1)
+        return index_units
+
+
+_TABLES: Dict[str, _TableState] = {}
+_STORE_LOCK = threading.RLock()
+_ITEM_LOCKS: Dict[Tuple[str, TableKey], threading.Lock] = {}
+
+
+def _state(name: str, operation: str) -> _TableState:
+    state = _TABLES.get(name)
+    if state is None:
+        raise _client_error("ResourceNotFoundException", f"Requested resource not found: Table: {name} not found", operation)
+    return state
+
+
+def _item_lock(table_name: str, key: TableKey) -> threading.Lock:
+    with _STORE_LOCK:
+        return _ITEM_LOCKS.setdefault((table_name, key), threading.Lock())
+
+
+def _hold_for_write() -> None:
+    if _SETTINGS.write_latency:
+        time.sleep(_SETTINGS.write_latency)
+
+
+def _hold_for_read() -> None:
+    if _SETTINGS.read_latency:
+        time.sleep(_SETTINGS.read_latency)
+
+
+def _admitted(state: _TableState, kind: str) -> bool:
+    throttled = False
+    if _SETTINGS.throttle_rate and (_SETTINGS.throttle_tables is None or state.name in _SETTINGS.throttle_tables):
+        throttled = _SETTINGS.rng.random() < _SETTINGS.throttle_rate
+    bucket = state.read_bucket if kind == "read" else state.write_bucket
+    if not throttled and bucket is not None:
+        with _STORE_LOCK:
+            throttled = not bucket.available()
+    if throttled:
+        with _STORE_LOCK:
+            state.stats["throttled"] += 1
+    return not throttled
+
+
+def _admit(state: _TableState, kind: str, operation: str) -> None:
+    if not _admitted(state, kind):
+        raise _client_error(
+            "ProvisionedThroughputExceededException",
+            "The level of configured provisioned throughput for the table was exceeded.",
+            operation,
+        )
+
+
+def _charge(state: _TableState, kind: str, units: float, operation: str, index_units: Dict[str, float] | None = None) -> None:
+    extra = sum((index_units or {}).values())
+    with _STORE_LOCK:
+        stats = state.stats
+        stats["readUnits" if kind == "read" else "writeUnits"] += units
+        stats["indexWriteUnits"] += extra
+        stats["requests"][operation] = stats["requests"].get(operation, 0) + 1
+        bucket = state.read_bucket if kind == "read" else state.write_bucket
+        if bucket is not None:
+            bucket.spend(units)
+
+
+def _consumed(table_name: str, kind: str, units: float, mode: str | None, index_units: Dict[str, float] | None = None) -> Dict[str, Any] | None:
+    if mode not in {"TOTAL", "INDEXES"}:
+        return None
+    label = "ReadCapacityUnits" if kind == "read" else "WriteCapacityUnits"
+    extra = sum((index_units or {}).values())
+    consumed: Dict[str, Any] = {"TableName": table_name, "CapacityUnits": units + extra, label: units + extra}
+    if mode == "INDEXES":
+        consumed["Table"] = {"CapacityUnits": units, label: units}
+        if index_units:
+            consumed["GlobalSecondaryIndexes"] = {name: {"CapacityUnits": value, label: value} for name, value in index_units.items()}
+    return consumed
+
+
+def local_dynamodb_stats(table_name: str | None = None) -> Dict[str, Any]:
+    """Capacity consumed, requests and throttles per table since the last reset."""
+
+    with _STORE_LOCK:
+        if table_name is not None:
+            return copy.deepcopy(_state(table_name, "Stats").stats)
+        return {name: copy.deepcopy(state.stats) for name, state in _TABLES.items()}
+
+
+def reset_local_dynamodb(data: bool = False) -> None:
+    """Zero the meters; with ``data=True`` drop every table as well."""
+
+    with _STORE_LOCK:
+        if data:
+            _TABLES.clear()
+            _ITEM_LOCKS.clear()
+            return
+        for state in _TABLES.values():
+            state.stats = _empty_stats()
+
+
+# ---------------------------------------------------------------------------
+# Reads: pagination shared by query and scan
+# ---------------------------------------------------------------------------
+
+
+def _key_condition_hash(expression: str, names, values, hash_name: str) -> Any:
+    tree = _Condition(expression, names, values).parse()
+    pending = [tree]
+    while pending:
+        node = pending.pop()
+        if node[0] == "and":
+            pending.extend(node[1:])
+        elif node[0] == "cmp" and node[1] == "=":
+            for side, other in ((node[2], node[3]), (node[3], node[2])):
+                if side[0] == "path" and side[1] == [hash_name] and other[0] == "value":
+                    return other[1]
+    raise _client_error("ValidationException", f"Query condition missed key schema element: {hash_name}", "Query")
+
+
+def _read_page(
+    state: _TableState,
+    operation: str,
+    entries: List[Tuple[Any, Dict[str, Any]]],
+    index: _Index | None,
+    params: Dict[str, Any],
+    matches=None,
+) -> Dict[str, Any]:
+    names = params.get("ExpressionAttributeNames")
+    values = params.get("ExpressionAttributeValues")
+    limit = params.get("Limit")
+    consistent = bool(params.get("ConsistentRead"))
+    if index is not None and consistent:
+        raise _client_error("ValidationException", "Consistent reads are not supported on global secondary indexes", operation)
+    if limit is not None and limit < 1:
+        raise _client_error("ValidationException", "Limit must be greater than or equal to 1", operation)
+
+    page: List[Dict[str, Any]] = []
+    scanned_bytes = 0
+    truncated = False
+    for _, item in entries:
+        if matches is not None and not matches(item):
+            continue
+        if (limit is not None and len(page) >= limit) or scanned_bytes >= PAGE_BYTES:
+            truncated = True
+            break
+        stored = index.project(item, state.key_names) if index else item
+        page.append(stored)
+        scanned_bytes += item_size(stored)
+    truncated = truncated or (limit is not None and len(page) >= limit)
+
+    filtered = [
+        item for item in page if _condition_matches(item, params.get("FilterExpression"), names, values)
+    ]
+    units = _read_units(scanned_bytes, consistent)
+    _charge(state, "read", units, operation)
+    response: Dict[str, Any] = {"Count": len(filtered), "ScannedCount": len(page)}
+    if params.get("Select") != "COUNT":
+        response["Items"] = [copy.deepcopy(_project(item, params.get("ProjectionExpression"), names)) for item in filtered]
+    if truncated and page:
+        last = page[-1]
+        key_names = state.key_names + (index.key_names if index else [])
+        response["LastEvaluatedKey"] = {name: copy.deepcopy(last[name]) for name in dict.fromkeys(key_names)}
+    consumed = _consumed(state.name, "read", units, params.get("ReturnConsumedCapacity"))
+    if consumed:
+        response["ConsumedCapacity"] = consumed
+    return response
+
+
+def _after(entries: List[Tuple[Any, Dict[str, Any]]], start: Any, forward: bool) -> List[Tuple[Any, Dict[str, Any]]]:
+    if start is None:
+        return entries
+    return [entry for entry in entries if (entry[0] > start if forward else entry[0] < start)]
+
+
+# ---------------------------------------------------------------------------
+# boto3-style Table, client and resource
+# ---------------------------------------------------------------------------
+
+_WRITE_CONTROL = {"ReturnValues", "ReturnConsumedCapacity", "ReturnItemCollectionMetrics", "ReturnValuesOnConditionCheckFailure"}
+
+
+class Table:
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.table_name = name
+
+    # -- prepare halves shared with batches and transactions ---------------
+    @staticmethod
+    def _check(existing, expression, names, values, operation: str) -> None:
+        if not _condition_matches(existing or {}, expression, names, values):
+            raise _client_error("ConditionalCheckFailedException", "The conditional request failed", operation)
+
+    @staticmethod
+    def _check_size(item: Dict[str, Any], operation: str) -> None:
+        if item_size(item) > MAX_ITEM_BYTES:
+            raise _client_error("ValidationException", "Item size has exceeded the maximum allowed size", operation)
+
+    def _prepare_put(self, state, Item, ConditionExpression=None, ExpressionAttributeNames=None, ExpressionAttributeValues=None):  # noqa: N803
+        key = state.key_of(Item, "PutItem")
+        self._check_size(Item, "PutItem")
+        existing = state.get(key)
+        self._check(existing, ConditionExpression, ExpressionAttributeNames, ExpressionAttributeValues, "PutItem")
+        return key, copy.deepcopy(Item), existing
+
+    def _prepare_update(
+        self,
+        state,
+        Key,  # noqa: N803
+        UpdateExpression,  # noqa: N803
+        ConditionExpression=None,  # noqa: N803
+        ExpressionAttributeNames=None,  # noqa: N803
+        ExpressionAttributeValues=None,  # noqa: N803
+    ):
+        key = state.key_of(Key, "UpdateItem", exact=True)
+        existing = state.get(key)
+        self._check(existing, ConditionExpression, ExpressionAttributeNames, ExpressionAttributeValues, "UpdateItem")
+        updated = _apply_update({**(existing or {}), **Key}, UpdateExpression, ExpressionAttributeNames, ExpressionAttributeValues)
+        for name in state.key_names:
+            if updated.get(name, _MISSING) != Key[name]:
+                raise _client_error(
+                    "ValidationException", f"Cannot update attribute {name}. This attribute is part of the key", "UpdateItem"
+                )
+        self._check_size(updated, "UpdateItem")
+        return key, updated, existing
+
+    def _prepare_delete(self, state, Key, ConditionExpression=None, ExpressionAttributeNames=None, ExpressionAttributeValues=None):  # noqa: N803
+        key = state.key_of(Key, "DeleteItem", exact=True)
+        existing = state.get(key)
+        self._check(existing, ConditionExpression, ExpressionAttributeNames, ExpressionAttributeValues, "DeleteItem")
+        return key, None, existing
+
+    def _prepare_condition_check(self, state, Key, ConditionExpression, ExpressionAttributeNames=None, ExpressionAttributeValues=None):  # noqa: N803
+        key = state.key_of(Key, "ConditionCheck", exact=True)
+        existing = state.get(key)
+        self._check(existing, ConditionExpression, ExpressionAttributeNames, ExpressionAttributeValues, "ConditionCheck")
+        return key, _MISSING, existing
+
+    def _write(self, operation: str, prepare, params: Dict[str, Any]):
+        state = _state(self.name, operation)
+        key = state.key_of(params["Item"] if "Item" in params else params["Key"], operation)
+        _admit(state, "write", operation)
+        arguments = {name: value for name, value in params.items() if name not in _WRITE_CONTROL}
+        with _item_lock(self.name, key):
+            _hold_for_write()
+            with _STORE_LOCK:
+                try:
+                    key, new_item, existing = prepare(state, **arguments)
+                except ClientError as exc:
+                    if exc.response["Error"]["Code"] == "ConditionalCheckFailedException":
+                        _charge(state, "write", _write_units(item_size(state.get(key))), operation)
+                    raise
+                index_units = state.commit(key, new_item) if new_item is not _MISSING else {}
+        units = _write_units(max(item_size(existing), item_size(new_item if isinstance(new_item, dict) else None)))
+        _charge(state, "write", units, operation, index_units)
+        response: Dict[str, Any] = {}
+        consumed = _consumed(self.name, "write", units, params.get("ReturnConsumedCapacity"), index_units)
+        if consumed:
+            response["ConsumedCapacity"] = consumed
+        return new_item, existing, response
+
+    # -- boto3 Table API ---------------------------------------------------
+    def put_item(self, **params: Any) -> Dict[str, Any]:  # noqa: N802
+        _, existing, response = self._write("PutItem", self._prepare_put, params)
+        if params.get("ReturnValues") == "ALL_OLD" and existing:
+            response["Attributes"] = copy.deepcopy(existing)
+        return response
+
+    def get_item(
+        self,
+        Key: Dict[str, Any],  # noqa: N803
+        ConsistentRead: bool = False,  # noqa: N803
+        ProjectionExpression: str | None = None,  # noqa: N803
+        ExpressionAttributeNames: Dict[str, str] | None = None,  # noqa: N803
+        ReturnConsumedCapacity: str | None = None,  # noqa: N803
+    ) -> Dict[str, Any]:
+        state = _state(self.name, "GetItem")
+        key = state.key_of(Key, "GetItem", exact=True)
+        _admit(state, "read", "GetItem")
+        _hold_for_read()
+        with _STORE_LOCK:
+            item = copy.deepcopy(state.get(key))
+        units = _read_units(item_size(item), ConsistentRead)
+        _charge(state, "read", units, "GetItem")
+        response: Dict[str, Any] = {}
+        if item:
+            response["Item"] = _project(item, ProjectionExpression, ExpressionAttributeNames)
+        consumed = _consumed(self.name, "read", units, ReturnConsumedCapacity)
+        if consumed:
+            response["ConsumedCapacity"] = consumed
+        return response
+
+    def update_item(self, **params: Any) -> Dict[str, Any]:  # noqa: N802
+        updated, existing, response = self._write("UpdateItem", self._prepare_update, params)
+        existing = existing or {}
+        mode = params.get("ReturnValues", "NONE")
+        changed = [name for name in updated if existing.get(name, _MISSING) != updated[name]]
+        if mode == "ALL_NEW":
+            response["Attributes"] = copy.deepcopy(updated)
+        elif mode == "ALL_OLD" and existing:
+            response["Attributes"] = copy.deepcopy(existing)
+        elif mode == "UPDATED_NEW":
+            response["Attributes"] = {name: copy.deepcopy(updated[name]) for name in changed}
+        elif mode == "UPDATED_OLD":
+            response["Attributes"] = {name: copy.deepcopy(existing[name]) for name in changed if name in existing}
+        return response
+
+    def delete_item(self, **params: Any) -> Dict[str, Any]:  # noqa: N802
+        _, existing, response = self._write("DeleteItem", self._prepare_delete, params)
+        if params.get("ReturnValues") == "ALL_OLD" and existing:
+            response["Attributes"] = copy.deepcopy(existing)
+        return response
+
+    def query(self, KeyConditionExpression: str, IndexName: str | None = None, ScanIndexForward: bool = True, ExclusiveStartKey=None, **params: Any):  # noqa: N802,N803
+        state = _state(self.name, "Query")
+        index = self._index(state, IndexName, "Query")
+        names = params.get("ExpressionAttributeNames")
+        values = params.get("ExpressionAttributeValues")
+        hash_name = index.hash_key if index else state.hash_key
+        hash_part = _key_part(_key_condition_hash(KeyConditionExpression, names, values, hash_name))
+        _admit(state, "read", "Query")
+        _hold_for_read()
+        with _STORE_LOCK:
+            partition = (index.partitions if index else state.partitions).get(hash_part, {})
+            entries = sorted(partition.items(), key=lambda entry: entry[0], reverse=not ScanIndexForward)
+        start = None
+        if ExclusiveStartKey:
+            table_key = state.key_of(ExclusiveStartKey, "Query")
+            start = index.entry_key(ExclusiveStartKey, table_key)[1] if index else table_key[1]
+        entries = _after(entries, start, ScanIndexForward)
+
+        def in_range(item: Dict[str, Any]) -> bool:
+            return _condition_matches(item, KeyConditionExpression, names, values)
+
+        return _read_page(state, "Query", entries, index, params, matches=in_range)
+
+    def scan(self, IndexName: str | None = None, ExclusiveStartKey=None, Segment: int | None = None, TotalSegments: int | None = None, **params: Any):  # noqa: N802,N803
+        state = _state(self.name, "Scan")
+        index = self._index(state, IndexName, "Scan")
+        _admit(state, "read", "Scan")
+        _hold_for_read()
+        with _STORE_LOCK:
+            if index:
+                entries = sorted(
+                    ((hash_part, position), item) for hash_part, partition in index.partitions.items() for position, item in partition.items()
+                )
+            else:
+                entries = list(state.ordered())
+        if TotalSegments:
+            entries = [entry for entry in entries if zlib.crc32(repr(entry[0][0]).encode()) % TotalSegments == Segment]
+        start = None
+        if ExclusiveStartKey:
+            table_key = state.key_of(ExclusiveStartKey, "Scan")
+            start = index.entry_key(ExclusiveStartKey, table_key) if index else table_key
+        return _read_page(state, "Scan", _after(entries, start, True), index, params)
+
+    @staticmethod
+    def _index(state: _TableState, name: str | None, operation: str) -> _Index | None:
+        if not name:
+            return None
+        if name not in state.indexes:
+            raise _client_error("ValidationException", "The table does not have the specified index: " + name, operation)
+        return state.indexes[name]
+
+    def batch_writer(self, overwrite_by_pkeys: List[str] | None = None) -> "_BatchWriter":
+        return _BatchWriter(self.name, overwrite_by_pkeys)
+
+
+class _BatchWriter:
+    """Buffers puts/deletes and flushes them 25 at a time, resending unprocessed items."""
+
+    def __init__(self, table_name: str, overwrite_by_pkeys: List[str] | None = None) -> None:
+        self.table_name = table_name
+        self.overwrite_by_pkeys = overwrite_by_pkeys
+        self._buffer: List[Dict[str, Any]] = []
+        self._client = Client()
+
+    def put_item(self, Item: Dict[str, Any]) -> None:  # noqa: N803
+        self._add({"PutRequest": {"Item": Item}})
+
+    def delete_item(self, Key: Dict[str, Any]) -> None:  # noqa: N803
+        self._add({"DeleteRequest": {"Key": Key}})
+
+    def _add(self, request: Dict[str, Any]) -> None:
+        if self.overwrite_by_pkeys:
+            body = request.get("PutRequest", {}).get("Item") or request["DeleteRequest"]["Key"]
+            identity = tuple(body.get(name) for name in self.overwrite_by_pkeys)
+            self._buffer = [
+                queued
+                for queued in self._buffer
+                if tuple((queued.get("PutRequest", {}).get("Item") or queued["DeleteRequest"]["Key"]).get(name) for name in self.overwrite_by_pkeys)
+                != identity
+            ]
+        self._buffer.append(request)
+        if len(self._buffer) >= MAX_BATCH_WRITE:
+            self._flush(MAX_BATCH_WRITE)
+
+    def _flush(self, until: int = 0) -> None:
+        while len(self._buffer) >= max(1, until):
+            chunk, self._buffer = self._buffer[:MAX_BATCH_WRITE], self._buffer[MAX_BATCH_WRITE:]
+            response = self._client.batch_write_item(RequestItems={self.table_name: chunk})
+            self._buffer.extend((response.get("UnprocessedItems") or {}).get(self.table_name, []))
+            if until:
+                return
+
+    def __enter__(self) -> "_BatchWriter":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self._flush()
+
+
+class _TransactionCanceledException(ClientError):
+    pass
+
+
+def _cancel(size: int, failures: Dict[int, str]) -> None:
+    reasons = [{"Code": failures.get(index, "None")} for index in range(size)]
+    raise _TransactionCanceledException(
+        {
+            "Error": {"Code": "TransactionCanceledException", "Message": "Transaction cancelled"},
+            "CancellationReasons": reasons,
+        },
+        "TransactWriteItems",
+    )
+
+
+class Client:
+    """Low-level client as exposed by ``resource.meta.client`` (native Python values)."""
+
+    class exceptions:  # noqa: N801 - boto3 style
+        TransactionCanceledException = _TransactionCanceledException
+        ConditionalCheckFailedException = ClientError
+
+    def get_item(self, TableName: str, **params: Any) -> Dict[str, Any]:  # noqa: N802,N803
+        return Table(TableName).get_item(**params)
+
+    def put_item(self, TableName: str, **params: Any) -> Dict[str, Any]:  # noqa: N802,N803
+        return Table(TableName).put_item(**params)
+
+    def update_item(self, TableName: str, **params: Any) -> Dict[str, Any]:  # noqa: N802,N803
+        return Table(TableName).update_item(**params)
+
+    def delete_item(self, TableName: str, **params: Any) -> Dict[str, Any]:  # noqa: N802,N803
+        return Table(TableName).delete_item(**params)
+
+    def query(self, TableName: str, **params: Any) -> Dict[str, Any]:  # noqa: N802,N803
+        return Table(TableName).query(**params)
+
+    def scan(self, TableName: str, **params: Any) -> Dict[str, Any]:  # noqa: N802,N803
+        return Table(TableName).scan(**params)
+
+    def batch_get_item(self, RequestItems: Dict[str, Dict[str, Any]], ReturnConsumedCapacity: str | None = None) -> Dict[str, Any]:  # noqa: N802,N803
+        if sum(len(request.get("Keys") or []) for request in RequestItems.values()) > MAX_BATCH_GET:
+            raise _client_error("ValidationException", "Too many items requested for the BatchGetItem call", "BatchGetItem")
+        responses: Dict[str, List[Dict[str, Any]]] = {}
+        unprocessed: Dict[str, Dict[str, Any]] = {}
+        consumed: List[Dict[str, Any]] = []
+        for table_name, request in RequestItems.items():
+            state = _state(table_name, "BatchGetItem")
+            keys = request.get("Keys") or []
+            table_keys = [state.key_of(key, "BatchGetItem", exact=True) for key in keys]
+            if len(set(table_keys)) != len(table_keys):
+                raise _client_error("ValidationException", "Provided list of item keys contains duplicates", "BatchGetItem")
+            consistent = bool(request.get("ConsistentRead"))
+            _hold_for_read()
+            found, skipped, units = [], [], 0.0
+            for key, table_key in zip(keys, table_keys):
+                if not _admitted(state, "read"):
+                    skipped.append(key)
+                    continue
+                with _STORE_LOCK:
+                    item = copy.deepcopy(state.get(table_key))
+                units += _read_units(item_size(item), consistent)
+                if item:
+                    found.append(_project(item, request.get("ProjectionExpression"), request.get("ExpressionAttributeNames")))
+            _charge(state, "read", units, "BatchGetItem")
+            responses[table_name] = found
+            if skipped:
+                unprocessed[table_name] = {**request, "Keys": skipped}
+            entry = _consumed(table_name, "read", units, ReturnConsumedCapacity)
+            if entry:
+                consumed.append(entry)
+        response: Dict[str, Any] = {"Responses": responses, "UnprocessedKeys": unprocessed}
+        if consumed:
+            response["ConsumedCapacity"] = consumed
+        return response
+
+    def batch_write_item(self, RequestItems: Dict[str, List[Dict[str, Any]]], ReturnConsumedCapacity: str | None = None) -> Dict[str, Any]:  # noqa: N802,N803
+        if sum(len(requests) for requests in RequestItems.values()) > MAX_BATCH_WRITE:
+            raise _client_error("ValidationException", "Too many items requested for the BatchWriteItem call", "BatchWriteItem")
+        unprocessed: Dict[str, List[Dict[str, Any]]] = {}
+        consumed: List[Dict[str, Any]] = []
+        for table_name, requests in RequestItems.items():
+            state = _state(table_name, "BatchWriteItem")
+            table = Table(table_name)
+            keys = [
+                state.key_of(request["PutRequest"]["Item"] if "PutRequest" in request else request["DeleteRequest"]["Key"], "BatchWriteItem")
+                for request in requests
+            ]
+            if len(set(keys)) != len(keys):
+                raise _client_error("ValidationException", "Provided list of item keys contains duplicates", "BatchWriteItem")
+            units = 0.0
+            for key, request in zip(keys, requests):
+                if not _admitted(state, "write"):
+                    unprocessed.setdefault(table_name, []).append(request)
+                    continue
+                with _item_lock(table_name, key):
+                    _hold_for_write()
+                    with _STORE_LOCK:
+                        if "PutRequest" in request:
+                            key, new_item, existing = table._prepare_put(state, request["PutRequest"]["Item"])
+                        else:
+                            key, new_item, existing = table._prepare_delete(state, request["DeleteRequest"]["Key"])
+                        index_units = state.commit(key, new_item)
+                item_units = _write_units(max(item_size(existing), item_size(new_item)))
+                units += item_units
+                _charge(state, "write", item_units, "BatchWriteItem", index_units)
+            entry = _consumed(table_name, "write", units, ReturnConsumedCapacity)
+            if entry:
+                consumed.append(entry)
+        response: Dict[str, Any] = {"UnprocessedItems": unprocessed}
+        if consumed:
+            response["ConsumedCapacity"] = consumed
+        return response
+
+    def transact_get_items(self, TransactItems: List[Dict[str, Any]], ReturnConsumedCapacity: str | None = None) -> Dict[str, Any]:  # noqa: N802,N803
+        if len(TransactItems) > MAX_TRANSACTION_ITEMS:
+            raise _client_error("ValidationException", "Too many items in the transaction", "TransactGetItems")
+        requests = [entry["Get"] for entry in TransactItems]
+        states = [_state(request["TableName"], "TransactGetItems") for request in requests]
+        for position, state in enumerate(states):
+            if not _admitted(state, "read"):
+                _cancel(len(requests), {position: "ThrottlingError"})
+        _hold_for_read()
+        responses, consumed = [], []
+        with _STORE_LOCK:
+            for request, state in zip(requests, states):
+                item = copy.deepcopy(state.get(state.key_of(request["Key"], "TransactGetItems", exact=True)))
+                units = 2 * _read_units(item_size(item), True)
+                _charge(state, "read", units, "TransactGetItems")
+                responses.append({"Item": _project(item, request.get("ProjectionExpression"), request.get("ExpressionAttributeNames"))} if item else {})
+                entry = _consumed(state.name, "read", units, ReturnConsumedCapacity)
+                if entry:
+                    consumed.append(entry)
+        response: Dict[str, Any] = {"Responses": responses}
+        if consumed:
+            response["ConsumedCapacity"] = consumed
+        return response
+
+    def transact_write_items(
+        self, TransactItems: List[Dict[str, Any]], ClientRequestToken: str | None = None, ReturnConsumedCapacity: str | None = None  # noqa: N803
+    ) -> Dict[str, Any]:  # noqa: N802
+        if len(TransactItems) > MAX_TRANSACTION_ITEMS:
+            raise _client_error("ValidationException", "Too many items in the transaction", "TransactWriteItems")
+        operations = []
+        for entry in TransactItems:
+            (action, request), = entry.items()
+            state = _state(request["TableName"], "TransactWriteItems")
+            params = {name: value for name, value in request.items() if name != "TableName" and name not in _WRITE_CONTROL}
+            key = state.key_of(request["Item"] if action == "Put" else request["Key"], "TransactWriteItems")
+            operations.append((action, state, key, params))
+
+        keys = [(state.name, key) for _, state, key, _ in operations]
+        if len(set(keys)) != len(keys):
+            raise _client_error("ValidationException", "Transaction request cannot include multiple operations on one item", "TransactWriteItems")
+        for position, (_, state, _, _) in enumerate(operations):
+            if not _admitted(state, "write"):
+                _cancel(len(keys), {position: "ThrottlingError"})
+
+        acquired: List[threading.Lock] = []
+        charges: List[Tuple[_TableState, float, Dict[str, float]]] = []
+        try:
+            for position, (table_name, key) in enumerate(keys):
+                lock = _item_lock(table_name, key)
+                if not lock.acquire(blocking=False):
+                    _cancel(len(keys), {position: "TransactionConflict"})
+                acquired.append(lock)
+            _hold_for_write()
+            with _STORE_LOCK:
+                prepared = []
+                failures: Dict[int, str] = {}
+                for position, (action, state, key, params) in enumerate(operations):
+                    table = Table(state.name)
+                    prepare = {
+                        "Put": table._prepare_put,
+                        "Update": table._prepare_update,
+                        "Delete": table._prepare_delete,
+                        "ConditionCheck": table._prepare_condition_check,
+                    }[action]
+                    try:
+                        prepared.append((state,) + prepare(state, **params))
+                    except ClientError as exc:
+                        if exc.response["Error"]["Code"] != "ConditionalCheckFailedException":
+                            raise
+                        failures[position] = "ConditionalCheckFailed"
+                if failures:
+                    _cancel(len(keys), failures)
+                for state, key, new_item, existing in prepared:
+                    index_units = state.commit(key, new_item) if new_item is not _MISSING else {}
+                    size = max(item_size(existing), item_size(new_item if isinstance(new_item, dict) else None))
+                    charges.append((state, 2 * _write_units(size), index_units))
+        finally:
+            for lock in acquired:
+                lock.release()
+
+        consumed: Dict[str, float] = {}
+        for state, units, index_units in charges:
+            _charge(state, "write", units, "TransactWriteItems", index_units)
+            consumed[state.name] = consumed.get(state.name, 0.0) + units + sum(index_units.values())
+        if ReturnConsumedCapacity in {"TOTAL", "INDEXES"}:
+            return {"ConsumedCapacity": [_consumed(name, "write", units, "TOTAL") for name, units in consumed.items()]}
+        return {}
+
+
+class Resource:
+    def __init__(self, service_name: str, region_name: str | None = None) -> None:
+        self.service_name = service_name
+        self.region_name = region_name
+        self.meta = SimpleNamespace(client=Client())
+
+    def Table(self, name: str) -> Table:  # noqa: N802 - boto3 style
+        return Table(name)
+
+    def create_table(
+        self,
+        TableName: str,  # noqa: N803
+        KeySchema: List[Dict[str, str]],  # noqa: N803
+        AttributeDefinitions: List[Dict[str, str]] | None = None,  # noqa: N803
+        BillingMode: str = "PROVISIONED",  # noqa: N803
+        GlobalSecondaryIndexes: List[Dict[str, Any]] | None = None,  # noqa: N803
+        ProvisionedThroughput: Dict[str, int] | None = None,  # noqa: N803
+        **_: Any,
+    ) -> Dict[str, Any]:
+        """Create a table; re-creating an existing table keeps its items (fixtures rely on it)."""
+
+        provisioned = ProvisionedThroughput if BillingMode != "PAY_PER_REQUEST" else None
+        with _STORE_LOCK:
+            state = _TABLES.get(TableName)
+            schema = {entry["KeyType"]: entry["AttributeName"] for entry in KeySchema}
+            if state is None or [state.hash_key, state.range_key] != [schema["HASH"], schema.get("RANGE")]:
+                state = _TABLES[TableName] = _TableState(TableName, KeySchema, GlobalSecondaryIndexes or [], provisioned)
+            else:
+                for spec in GlobalSecondaryIndexes or []:
+                    if spec["IndexName"] not in state.indexes:
+                        state.add_index(spec)
+                state.read_bucket = _Bucket(provisioned["ReadCapacityUnits"]) if provisioned else None
+                state.write_bucket = _Bucket(provisioned["WriteCapacityUnits"]) if provisioned else None
+        return {"TableDescription": {"TableName": TableName, "KeySchema": KeySchema, "TableStatus": "ACTIVE"}}